@@ -1,7 +1,7 @@
 """
 Configuración centralizada del proyecto usando Pydantic Settings.
 """
-from typing import Optional
+from typing import Dict, List, Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -34,6 +34,134 @@ class Settings(BaseSettings):
 
     # Serper API (opcional para búsqueda web)
     SERPER_API_KEY: Optional[str] = None
+    # Segundos máximos por consulta de búsqueda (web o un marketplace): la
+    # que no responde se omite y se sigue con los resultados de las demás
+    BUSQUEDA_TIMEOUT_SEG: float = 10.0
+    # Consultas de búsqueda simultáneas (producto × fuente) del Investigador
+    # en modo síncrono
+    BUSQUEDA_MAX_CONCURRENCIA: int = 8
+
+    # Jobs en segundo plano (POST /solicitud/procesar-completa con en_segundo_plano)
+    JOBS_MAX_WORKERS: int = 4
+    # Segundos que un worker conserva un job sin renovarlo; un job "ejecutando"
+    # con el lease vencido (proceso caído) se retoma en otro worker
+    JOBS_LEASE_SEG: float = 120.0
+
+    # Lotes de solicitudes (POST /solicitudes/batch)
+    LOTE_MAX_SOLICITUDES: int = 500
+    RECEPTOR_TAMANO_LOTE: int = 10  # Solicitudes extraídas por llamada al Receptor
+
+    # Parser por reglas del Receptor para solicitudes ya estructuradas
+    # ("5 x PLC Siemens", CSV, viñetas): se usa el LLM solo si la confianza
+    # de las reglas (0-1) no llega al mínimo
+    RECEPTOR_REGLAS_HABILITADAS: bool = True
+    RECEPTOR_REGLAS_CONFIANZA_MINIMA: float = 0.9
+
+    # Segundos sin eventos tras los que el stream SSE envía un keep-alive
+    SSE_INTERVALO_LATIDO: float = 15.0
+
+    # Lanzar las búsquedas web de cada producto mientras el Receptor responde
+    # en streaming, en lugar de esperar la extracción completa
+    INVESTIGADOR_BUSQUEDA_ANTICIPADA: bool = True
+
+    # Prompt del Investigador: candidatos más relevantes por producto y
+    # fuente (BD, web, ecommerce) y tokens máximos del mensaje
+    INVESTIGADOR_TOP_K_POR_PRODUCTO: int = 5
+    INVESTIGADOR_MAX_TOKENS_PROMPT: int = 6000
+
+    # Índice en memoria del catálogo de proveedores: candidatos de BD que se
+    # preseleccionan por producto y segundos tras los que se reconstruye
+    # desde la BD para recoger cambios de otros procesos (0 = nunca)
+    INDICE_PROVEEDORES_CANDIDATOS_POR_PRODUCTO: int = 20
+    INDICE_PROVEEDORES_MAX_ANTIGUEDAD_SEG: float = 300.0
+
+    # Similitud coseno mínima (0-1, TF-IDF de trigramas) para que el motor
+    # local de similitud proponga un proveedor para un producto
+    SIMILITUD_PROVEEDORES_MINIMA: float = 0.15
+
+    # Proveedores a los que se genera y envía RFQ a la vez por solicitud
+    RFQ_MAX_CONCURRENCIA: int = 5
+
+    # Generación del envío masivo de RFQs: "por_proveedor" (una llamada al
+    # LLM por proveedor) o "por_solicitud" (un cuerpo por conjunto de
+    # productos, personalizado por proveedor con plantilla Jinja2)
+    RFQ_MODO_GENERACION: str = "por_proveedor"
+
+    # Redactar en streaming los RFQs del flujo y publicar el texto en eventos
+    # `rfq_fragmento` del SSE de la solicitud mientras se escribe
+    RFQ_STREAMING_HABILITADO: bool = False
+
+    # Planificación por urgencia: solicitudes en Investigador/Generador a la
+    # vez, envíos de RFQ a la vez (entre todas las solicitudes) y segundos de
+    # espera que suben un nivel la prioridad de quien espera
+    PLANIFICADOR_MAX_FLUJOS: int = 8
+    PLANIFICADOR_MAX_RFQS: int = 10
+    PLANIFICADOR_ENVEJECIMIENTO_SEG: float = 30.0
+
+    # Idempotencia de procesar-completa y batch: horas que se repite la
+    # respuesta exitosa de un Idempotency-Key y si un envío idéntico sin clave
+    # espera al que sigue en curso en lugar de ejecutarse de nuevo
+    IDEMPOTENCIA_TTL_HORAS: int = 24
+    IDEMPOTENCIA_DEDUPLICAR_EN_VUELO: bool = True
+
+    # Caché de respuestas del LLM (extracciones deterministas): archivo
+    # SQLite, horas de vigencia y entradas máximas antes de desalojar (LRU)
+    LLM_CACHE_HABILITADA: bool = True
+    LLM_CACHE_RUTA: str = "cache/llm_respuestas.sqlite3"
+    LLM_CACHE_TTL_HORAS: float = 24.0
+    LLM_CACHE_MAX_ENTRADAS: int = 5000
+
+    # Caché de búsquedas de Serper (misma consulta, gl, hl y num): archivo
+    # SQLite, horas de vigencia, horas extra en que una respuesta vencida se
+    # sigue sirviendo mientras se actualiza en segundo plano y entradas
+    # máximas antes de desalojar (LRU)
+    BUSQUEDA_CACHE_HABILITADA: bool = True
+    BUSQUEDA_CACHE_RUTA: str = "cache/busquedas.sqlite3"
+    BUSQUEDA_CACHE_TTL_HORAS: float = 24.0
+    BUSQUEDA_CACHE_OBSOLETA_HORAS: float = 72.0
+    BUSQUEDA_CACHE_MAX_ENTRADAS: int = 5000
+
+    # Despachador de llamadas al LLM: cuota por modelo (solicitudes y tokens
+    # por minuto), llamadas en vuelo a la vez y reintentos con backoff
+    LLM_LIMITES_POR_MODELO: Dict[str, Dict[str, int]] = {
+        "gpt-4o-mini": {"rpm": 500, "tpm": 200000},
+        "gpt-4o": {"rpm": 500, "tpm": 30000},
+    }
+    LLM_MAX_CONCURRENCIA: int = 16
+    LLM_MAX_REINTENTOS: int = 5
+    LLM_BACKOFF_BASE_SEG: float = 0.5
+    LLM_BACKOFF_MAX_SEG: float = 30.0
+
+    # Precio por millón de tokens (USD) para estimar el costo de cada llamada
+    LLM_PRECIOS_POR_MODELO: Dict[str, Dict[str, float]] = {
+        "gpt-4o-mini": {"entrada": 0.15, "salida": 0.60},
+        "gpt-4o": {"entrada": 2.50, "salida": 10.00},
+    }
+
+    # Enrutamiento de modelos: por tipo de tarea, modelos del más barato al
+    # más capaz (se escala al siguiente si la respuesta no pasa la
+    # validación) y política ("escalonada", "economica" o "maxima")
+    LLM_MODELOS_POR_TAREA: Dict[str, List[str]] = {
+        "analizar_solicitud": ["gpt-4o-mini", "gpt-4o"],
+        "investigar": ["gpt-4o-mini", "gpt-4o"],
+        "generar_rfq": ["gpt-4o-mini", "gpt-4o"],
+        "analizar_cotizacion": ["gpt-4o-mini", "gpt-4o"],
+        "comparar_cotizaciones": ["gpt-4o-mini", "gpt-4o"],
+        "comparar_precios": ["gpt-4o-mini", "gpt-4o"],
+        "extraer_json": ["gpt-4o-mini", "gpt-4o"],
+    }
+    LLM_POLITICA_ENRUTAMIENTO: str = "escalonada"
+
+    # Generación de RFQs en lote (OpenAI Batch API) para urgencia normal:
+    # backend ("openai" o "local" para pruebas sin red), directorio de los
+    # archivos JSONL, solicitudes por lote, segundos que se acumulan antes de
+    # enviar el lote y cada cuánto se consultan los lotes enviados
+    RFQ_LOTE_HABILITADO: bool = False
+    RFQ_LOTE_BACKEND: str = "openai"
+    RFQ_LOTE_DIRECTORIO: str = "cache/lotes_rfq"
+    RFQ_LOTE_MAX_SOLICITUDES: int = 1000
+    RFQ_LOTE_MAX_ESPERA_SEG: float = 600.0
+    RFQ_LOTE_INTERVALO_SONDEO_SEG: float = 60.0
 
     # Security
     SECRET_KEY: str = "your-secret-key-here-change-in-production"
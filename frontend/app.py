@@ -20,6 +20,8 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.agents.receptor import procesar_solicitud, validar_solicitud
 from src.agents.investigador import buscar_proveedores
+from src.core.indice_proveedores import palabras_clave
+from src.core.similitud_proveedores import motor_similitud
 from src.database.session import get_db
 from src.database.crud import solicitud as crud_solicitud
 from src.database.models import EstadoSolicitud
@@ -692,6 +694,18 @@ def tab_buscar_proveedores():
 
         st.markdown(f"**Descripción:** {solicitud_sel.descripcion}")
 
+    # Sugerencias del catálogo local (sin red ni LLM, al instante)
+    terminos = palabras_clave(f"{solicitud_sel.descripcion} {solicitud_sel.categoria or ''}")
+    similares = motor_similitud.buscar(db, terminos, top_k=5)
+    if similares:
+        with st.expander(f"⚡ Proveedores similares en el catálogo ({len(similares)})"):
+            for prov in similares:
+                st.markdown(
+                    f"**{prov['nombre']}** · {prov.get('categoria', 'N/A')} · "
+                    f"similitud {prov['similitud']:.0%}"
+                    + (f" · 📧 `{prov['email']}`" if prov.get('email') else "")
+                )
+
     # Botón para buscar proveedores
     col1, col2 = st.columns([1, 3])
     with col1:
@@ -758,6 +772,8 @@ def tab_buscar_proveedores():
                         with col1:
                             st.markdown(f"### {prov['nombre']}")
                             st.markdown(f"**Categoría:** {prov.get('categoria', 'N/A')}")
+                            if prov.get('similitud'):
+                                st.caption(f"🧭 Similitud con el producto: {prov['similitud']:.0%}")
                             if prov.get('notas'):
                                 st.markdown(f"_{prov['notas']}_")
 
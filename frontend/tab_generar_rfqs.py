@@ -205,11 +205,21 @@ def tab_generar_rfqs():
                                     for prov_rec in selected_proveedores:
                                         prov = prov_rec["proveedor_data"]
 
+                                        # Mostrar el borrador mientras el modelo lo redacta
+                                        st.caption(f"✍️ {prov.get('nombre', 'N/A')}")
+                                        vista_previa = st.empty()
+                                        texto = []
+
+                                        def mostrar_fragmento(fragmento, vista=vista_previa, partes=texto):
+                                            partes.append(fragmento)
+                                            vista.text("".join(partes))
+
                                         resultado_rfq = generar_borrador_rfq(
                                             solicitud_id=solicitud_seleccionada.id,
                                             proveedor=prov,
                                             productos=productos,
-                                            urgencia=solicitud_seleccionada.urgencia
+                                            urgencia=solicitud_seleccionada.urgencia,
+                                            al_fragmento=mostrar_fragmento
                                         )
 
                                         if resultado_rfq.get("exito"):
@@ -240,6 +250,9 @@ def tab_generar_rfqs():
                     st.write(f"**Email:** {borrador['proveedor_email']}")
                     st.write(f"**Creado:** {borrador['created_at'].strftime('%d/%m/%Y %H:%M')}")
 
+                    if borrador.get("pendiente_generacion"):
+                        st.info("⏳ Contenido en generación por lote; aparecerá al terminar el lote")
+
                     # Mostrar contenido
                     contenido_editado = st.text_area(
                         "Contenido del RFQ:",
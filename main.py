@@ -6,16 +6,46 @@ Este módulo proporciona los endpoints REST para:
 - Consultar estado de solicitudes
 - Gestionar proveedores, RFQs y cotizaciones
 """
-from typing import Dict
+import asyncio
+import json
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Header, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
 from config.settings import settings
 from src.database.session import get_db
-from src.agents.orquestador import procesar_solicitud_completa, obtener_estado_solicitud
+from src.agents.orquestador import (
+    procesar_solicitud_completa,
+    reanudar_solicitud,
+    obtener_estado_solicitud,
+    flujo_en_curso,
+)
+from src.agents.investigador import precargar_catalogo
+from src.agents.receptor_reglas import parser_reglas
+from src.agents.registro import registro_agentes
+from src.core.eventos import bus_eventos
+from src.core.indice_proveedores import indice_proveedores
+from src.core.similitud_proveedores import motor_similitud
+from src.core.idempotencia import (
+    MAX_LARGO_CLAVE,
+    ConflictoIdempotencia,
+    calcular_huella,
+    gestor_idempotencia,
+)
+from src.core.jobs import gestor_jobs
+from src.core.lotes_rfq import gestor_lotes_rfq
+from src.core.cache import cache_busquedas, cache_llm
+from src.core.despachador import despachador_llm
+from src.core.enrutador import enrutador_modelos
+from src.core.metricas import registro_metricas
+from src.core.planificador import planificador_flujos, planificador_rfqs
+from src.core.uso_llm import resumir_uso
 from config.logging_config import logger
 
 
@@ -41,6 +71,42 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+async def precargar_agentes():
+    """Carga prompts y clientes de los agentes antes de la primera solicitud."""
+    registro_agentes.precargar()
+
+
+@app.on_event("startup")
+async def precargar_catalogo_proveedores():
+    """Construye en segundo plano el índice y el motor de similitud de proveedores."""
+    asyncio.get_running_loop().run_in_executor(None, precargar_catalogo)
+
+
+@app.on_event("startup")
+async def iniciar_gestor_jobs():
+    """Arranca el pool de workers y re-encola jobs pendientes."""
+    await gestor_jobs.iniciar()
+
+
+@app.on_event("shutdown")
+async def detener_gestor_jobs():
+    """Detiene el pool de workers (los jobs en curso quedan pendientes en BD)."""
+    await gestor_jobs.detener()
+
+
+@app.on_event("startup")
+async def iniciar_lotes_rfq():
+    """Arranca el envío y sondeo de lotes de RFQ (si RFQ_LOTE_HABILITADO)."""
+    await gestor_lotes_rfq.iniciar()
+
+
+@app.on_event("shutdown")
+async def detener_lotes_rfq():
+    """Detiene el sondeo de lotes (los lotes enviados se retoman al reiniciar)."""
+    await gestor_lotes_rfq.detener()
+
+
 # ============================================================================
 # MODELOS DE REQUEST/RESPONSE
 # ============================================================================
@@ -51,12 +117,32 @@ class SolicitudRequest(BaseModel):
 
     texto: str
     origen: str = "api"
+    en_segundo_plano: bool = False
 
     class Config:
         json_schema_extra = {
             "example": {
                 "texto": "Necesito 5 PLCs Siemens S7-1200 y 10 sensores de temperatura bajo norma EMA",
                 "origen": "api",
+                "en_segundo_plano": False,
+            }
+        }
+
+
+class LoteRequest(BaseModel):
+    """Modelo para enviar un lote de solicitudes."""
+
+    textos: List[str] = Field(..., min_length=1, max_length=settings.LOTE_MAX_SOLICITUDES)
+    origen: str = "api"
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "textos": [
+                    "Necesito 5 PLCs Siemens S7-1200",
+                    "Requerimos 20 sillas ergonómicas para la oficina de Monterrey",
+                ],
+                "origen": "email",
             }
         }
 
@@ -88,6 +174,42 @@ class SolicitudResponse(BaseModel):
         }
 
 
+class JobEncoladoResponse(BaseModel):
+    """Modelo de respuesta para una solicitud encolada en segundo plano."""
+
+    message: str
+    job_id: int
+    estado: str
+    url_estado: str
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "message": "Solicitud encolada para procesamiento",
+                "job_id": 42,
+                "estado": "en_cola",
+                "url_estado": "/jobs/42",
+            }
+        }
+
+
+class ErrorSolicitudResponse(BaseModel):
+    """Modelo de respuesta cuando el flujo falla en alguna etapa."""
+
+    detail: Dict
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "detail": {
+                    "error": "No se encontraron proveedores",
+                    "etapa_fallida": "investigador",
+                    "detalles": {"exito": False, "etapa": "investigador"},
+                }
+            }
+        }
+
+
 # ============================================================================
 # ENDPOINTS
 # ============================================================================
@@ -104,6 +226,13 @@ async def root():
         "endpoints": {
             "procesar_solicitud_completa": "POST /solicitud/procesar-completa",
             "consultar_estado": "GET /solicitud/{solicitud_id}/estado",
+            "eventos_solicitud": "GET /solicitud/{solicitud_id}/events (SSE)",
+            "reanudar_solicitud": "POST /solicitud/{solicitud_id}/reanudar",
+            "procesar_lote": "POST /solicitudes/batch",
+            "consultar_lote": "GET /solicitudes/batch/{lote_id}",
+            "consultar_job": "GET /jobs/{job_id}",
+            "metricas": "GET /metricas",
+            "uso_llm": "GET /uso-llm",
             "health_check": "GET /health",
         },
     }
@@ -115,10 +244,100 @@ async def health_check():
     return {"status": "healthy", "version": settings.VERSION}
 
 
-@app.post("/solicitud/procesar-completa", response_model=SolicitudResponse)
+@app.get("/metricas")
+async def metricas():
+    """
+    Latencias y throughput del flujo de solicitudes.
+
+    **Returns:**
+    - spans: Por cada etapa y sub-llamada (orquestador.*, investigador.*,
+      generador_rfq.*): conteo, p50/p95/p99, máximo y promedio en ms, y
+      conteo por resultado (ok, error, sin_proveedores...)
+    - solicitudes_por_minuto: Flujos completados en el último minuto
+    - planificador: Turnos en uso y profundidad de la cola por urgencia de
+      las etapas del flujo y de los envíos de RFQ (la espera por nivel está
+      en los spans planificador.*.espera.<nivel>)
+    - cache_llm: Aciertos, fallos, tasa de aciertos y entradas de la caché
+      de respuestas del LLM
+    - despachador_llm: Llamadas al LLM en vuelo, reintentos y cuota
+      disponible por modelo (la espera en cola está en los spans
+      llm.espera.<modelo> y cada intento en llm.<modelo>)
+    - lotes_rfq: Lotes de generación de RFQs abiertos y enviados
+    - enrutador_llm: Política de modelos y, por tarea, respuestas válidas
+      por modelo y escalamientos (cada intento está en los spans
+      enrutador.<tarea>)
+    - receptor_reglas: Solicitudes resueltas por el parser por reglas del
+      Receptor sin llamar al LLM y su tasa de aciertos
+    - indice_proveedores: Proveedores y términos del índice en memoria
+      del catálogo, antigüedad y actualizaciones incrementales
+    - similitud_proveedores: Lo mismo para el motor local de similitud
+      (columnas TF-IDF de trigramas en uso)
+    - cache_busquedas: Aciertos (frescos y vencidos), fallos, tasa de
+      aciertos, revalidaciones en segundo plano y entradas de la caché de
+      resultados de Serper
+    """
+    return {
+        **registro_metricas.resumen(),
+        "planificador": {
+            "flujos": planificador_flujos.estado(),
+            "rfqs": planificador_rfqs.estado(),
+        },
+        "cache_llm": await asyncio.to_thread(cache_llm.estadisticas),
+        "cache_busquedas": await asyncio.to_thread(cache_busquedas.estadisticas),
+        "despachador_llm": despachador_llm.estado(),
+        "lotes_rfq": await asyncio.to_thread(gestor_lotes_rfq.estado),
+        "enrutador_llm": enrutador_modelos.estado(),
+        "receptor_reglas": parser_reglas.estado(),
+        "indice_proveedores": indice_proveedores.estado(),
+        "similitud_proveedores": motor_similitud.estado(),
+    }
+
+
+@app.get("/uso-llm")
+async def uso_llm(
+    agrupar_por: str = "agente",
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    solicitud_id: Optional[int] = None,
+):
+    """
+    Tokens y costo estimado de las llamadas al LLM.
+
+    **Args:**
+    - agrupar_por: dia, agente, solicitud o modelo
+    - desde / hasta: Rango de fechas (ISO 8601; `hasta` exclusivo)
+    - solicitud_id: Limitar a una solicitud
+
+    **Returns:**
+    - grupos: Por grupo, llamadas, tokens de entrada y salida, costo en USD
+      y latencia promedio (ordenados por costo)
+    - total: Suma de llamadas, tokens y costo
+
+    **Raises:**
+    - HTTPException 422: Si `agrupar_por` no es válido
+
+    **Example:**
+    ```bash
+    curl "http://localhost:8000/uso-llm?agrupar_por=dia&desde=2025-01-01"
+    ```
+    """
+    try:
+        return await asyncio.to_thread(resumir_uso, agrupar_por, desde, hasta, solicitud_id)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+
+
+@app.post(
+    "/solicitud/procesar-completa",
+    response_model=SolicitudResponse,
+    responses={
+        202: {"model": JobEncoladoResponse, "description": "Encolada en segundo plano"},
+        400: {"model": ErrorSolicitudResponse, "description": "El flujo falló en una etapa"},
+    },
+)
 async def procesar_completa(
-    data: SolicitudRequest, db: Session = Depends(get_db)
-) -> SolicitudResponse:
+    data: SolicitudRequest, idempotency_key: Optional[str] = Header(None)
+) -> JSONResponse:
     """
     Procesa una solicitud end-to-end: Receptor → Investigador → RFQs.
 
@@ -132,17 +351,28 @@ async def procesar_completa(
     **Args:**
     - texto: Texto de la solicitud en lenguaje natural
     - origen: Origen de la solicitud (api, formulario, whatsapp, email)
+    - en_segundo_plano: Si es true, encola el flujo y responde 202 de inmediato
+      con el `job_id`; el avance se consulta en `GET /jobs/{job_id}`
+    - Header `Idempotency-Key` (opcional): Los reenvíos con la misma clave
+      reciben la respuesta original (header `Idempotent-Replayed: true`) sin
+      volver a ejecutar el flujo; solo se guardan las respuestas exitosas.
+      Sin clave, un envío idéntico a otro que sigue en curso recibe su
+      respuesta (`IDEMPOTENCIA_DEDUPLICAR_EN_VUELO`).
 
     **Returns:**
     - Resultado completo del procesamiento con detalles de cada etapa
+    - 202 con `job_id` si se pidió modo en segundo plano
 
     **Raises:**
     - HTTPException 400: Si hubo error procesando la solicitud
+    - HTTPException 409: Si la misma clave sigue ejecutándose en otro proceso
+    - HTTPException 422: Si la clave ya se usó con otro contenido
 
     **Example:**
     ```bash
     curl -X POST "http://localhost:8000/solicitud/procesar-completa" \\
          -H "Content-Type: application/json" \\
+         -H "Idempotency-Key: 7c1e9a52-whatsapp-msg-001" \\
          -d '{
            "texto": "Necesito 5 PLCs Siemens S7-1200",
            "origen": "api"
@@ -155,46 +385,13 @@ async def procesar_completa(
     )
 
     try:
-        # Procesar solicitud completa usando el orquestador
-        resultado = await procesar_solicitud_completa(
-            texto_solicitud=data.texto, origen=data.origen
+        return await _responder_idempotente(
+            "/solicitud/procesar-completa",
+            data.model_dump(),
+            idempotency_key,
+            lambda: _procesar_completa(data),
         )
 
-        # Verificar si fue exitoso
-        if not resultado.get("exito"):
-            error_msg = resultado.get("error", "Error desconocido")
-            etapa_fallida = resultado.get("etapa", "desconocida")
-
-            logger.error(
-                f"❌ Solicitud fallida en etapa '{etapa_fallida}': {error_msg}"
-            )
-
-            raise HTTPException(
-                status_code=400,
-                detail={
-                    "error": error_msg,
-                    "etapa_fallida": etapa_fallida,
-                    "detalles": resultado,
-                },
-            )
-
-        # Preparar respuesta exitosa
-        rfqs_data = resultado.get("rfqs", {})
-        respuesta = SolicitudResponse(
-            message="Solicitud procesada exitosamente",
-            solicitud_id=resultado["solicitud_id"],
-            proveedores_contactados=rfqs_data.get("total", 0),
-            rfqs_enviados=rfqs_data.get("exitosos", 0),
-            detalles=resultado,
-        )
-
-        logger.info(
-            f"✅ Solicitud {resultado['solicitud_id']} procesada exitosamente. "
-            f"RFQs enviados: {rfqs_data.get('exitosos', 0)}/{rfqs_data.get('total', 0)}"
-        )
-
-        return respuesta
-
     except HTTPException:
         # Re-lanzar HTTPException tal cual
         raise
@@ -207,6 +404,98 @@ async def procesar_completa(
         )
 
 
+async def _procesar_completa(data: SolicitudRequest) -> Tuple[int, Dict]:
+    """Ejecuta (o encola) el flujo completo y retorna (código HTTP, cuerpo)."""
+    if data.en_segundo_plano:
+        job_id = await gestor_jobs.encolar(texto=data.texto, origen=data.origen)
+        return 202, {
+            "message": "Solicitud encolada para procesamiento",
+            "job_id": job_id,
+            "estado": "en_cola",
+            "url_estado": f"/jobs/{job_id}",
+        }
+
+    # Procesar solicitud completa usando el orquestador
+    resultado = await procesar_solicitud_completa(
+        texto_solicitud=data.texto, origen=data.origen
+    )
+
+    # Verificar si fue exitoso
+    if not resultado.get("exito"):
+        error_msg = resultado.get("error", "Error desconocido")
+        etapa_fallida = resultado.get("etapa", "desconocida")
+
+        logger.error(
+            f"❌ Solicitud fallida en etapa '{etapa_fallida}': {error_msg}"
+        )
+
+        return 400, jsonable_encoder({
+            "detail": {
+                "error": error_msg,
+                "etapa_fallida": etapa_fallida,
+                "detalles": resultado,
+            }
+        })
+
+    # Preparar respuesta exitosa
+    rfqs_data = resultado.get("rfqs", {})
+    respuesta = SolicitudResponse(
+        message="Solicitud procesada exitosamente",
+        solicitud_id=resultado["solicitud_id"],
+        proveedores_contactados=rfqs_data.get("total", 0),
+        rfqs_enviados=rfqs_data.get("exitosos", 0),
+        detalles=resultado,
+    )
+
+    logger.info(
+        f"✅ Solicitud {resultado['solicitud_id']} procesada exitosamente. "
+        f"RFQs enviados: {rfqs_data.get('exitosos', 0)}/{rfqs_data.get('total', 0)}"
+    )
+
+    return 200, jsonable_encoder(respuesta)
+
+
+async def _responder_idempotente(
+    ruta: str,
+    cuerpo: Dict,
+    idempotency_key: Optional[str],
+    funcion: Callable[[], Awaitable[Tuple[int, Dict]]],
+) -> JSONResponse:
+    """
+    Ejecuta `funcion` a través del gestor de idempotencia.
+
+    Con `Idempotency-Key` la respuesta exitosa se repite durante
+    `IDEMPOTENCIA_TTL_HORAS`; sin clave se usa la huella del cuerpo y solo
+    se agrupan los envíos en vuelo (si `IDEMPOTENCIA_DEDUPLICAR_EN_VUELO`).
+    """
+    huella = calcular_huella(ruta, cuerpo)
+
+    if idempotency_key:
+        if len(idempotency_key) > MAX_LARGO_CLAVE:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Idempotency-Key excede {MAX_LARGO_CLAVE} caracteres",
+            )
+        clave = f"{ruta}:{idempotency_key}"
+        ttl = timedelta(hours=settings.IDEMPOTENCIA_TTL_HORAS)
+    elif settings.IDEMPOTENCIA_DEDUPLICAR_EN_VUELO:
+        clave = f"auto:{huella}"
+        ttl = None
+    else:
+        codigo, contenido = await funcion()
+        return JSONResponse(status_code=codigo, content=contenido)
+
+    try:
+        codigo, contenido, repetida = await gestor_idempotencia.ejecutar(
+            clave, huella, funcion, ttl
+        )
+    except ConflictoIdempotencia as e:
+        raise HTTPException(status_code=e.codigo_http, detail=str(e)) from e
+
+    headers = {"Idempotent-Replayed": "true"} if repetida else None
+    return JSONResponse(status_code=codigo, content=contenido, headers=headers)
+
+
 @app.get("/solicitud/{solicitud_id}/estado")
 async def consultar_estado(solicitud_id: int, db: Session = Depends(get_db)):
     """
@@ -233,7 +522,8 @@ async def consultar_estado(solicitud_id: int, db: Session = Depends(get_db)):
     logger.info(f"📊 Consultando estado de solicitud {solicitud_id}")
 
     try:
-        estado = obtener_estado_solicitud(solicitud_id)
+        # Consulta síncrona a BD: se ejecuta en un hilo para no bloquear el loop
+        estado = await asyncio.to_thread(obtener_estado_solicitud, solicitud_id)
 
         if "error" in estado:
             logger.warning(f"⚠️  Solicitud {solicitud_id} no encontrada")
@@ -251,6 +541,245 @@ async def consultar_estado(solicitud_id: int, db: Session = Depends(get_db)):
         )
 
 
+@app.get("/solicitud/{solicitud_id}/events")
+async def eventos_solicitud(
+    solicitud_id: int,
+    request: Request,
+    last_event_id: Optional[str] = Header(None),
+):
+    """
+    Stream de progreso de una solicitud (Server-Sent Events).
+
+    Envía en vivo los eventos publicados por el orquestador y el generador
+    de RFQs, sin consultar la BD en cada actualización:
+    - `etapa`: transición de etapa con su progreso (0-100)
+    - `proveedores`: proveedores recomendados por el Investigador
+    - `rfq_fragmento`: texto del RFQ de un proveedor mientras se redacta
+      (con `RFQ_STREAMING_HABILITADO`)
+    - `rfq`: resultado del RFQ de cada proveedor
+    - `finalizado`: resultado final; el stream se cierra después
+
+    Al conectarse se reenvían los eventos recientes de la solicitud (o
+    los posteriores a `Last-Event-ID` al reconectar). Si no hay eventos en
+    memoria se envía primero un evento `estado` con el estado actual en BD;
+    si además no hay un flujo de la solicitud en curso (ya terminó, con
+    éxito o con error) el stream se cierra después de enviarlo.
+
+    **Raises:**
+    - HTTPException 404: Si la solicitud no existe
+
+    **Example:**
+    ```bash
+    curl -N "http://localhost:8000/solicitud/123/events"
+    ```
+    """
+    desde_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+
+    estado_inicial = None
+    if not bus_eventos.eventos(solicitud_id):
+        estado_inicial = await asyncio.to_thread(obtener_estado_solicitud, solicitud_id)
+        if "error" in estado_inicial:
+            raise HTTPException(status_code=404, detail=estado_inicial["error"])
+
+    async def stream():
+        if estado_inicial is not None:
+            yield _formatear_sse("estado", estado_inicial)
+            if not flujo_en_curso(solicitud_id):
+                return
+
+        async for evento in bus_eventos.suscribir(
+            solicitud_id, desde_id, intervalo_latido=settings.SSE_INTERVALO_LATIDO
+        ):
+            if await request.is_disconnected():
+                break
+
+            if evento is None:
+                yield ": ping\n\n"
+                continue
+
+            yield _formatear_sse(evento["tipo"], evento, evento["id"])
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _formatear_sse(evento: str, datos: Dict, evento_id: Optional[int] = None) -> str:
+    """Serializa un evento en el formato de Server-Sent Events."""
+    cabecera = f"id: {evento_id}\n" if evento_id is not None else ""
+    return f"{cabecera}event: {evento}\ndata: {json.dumps(datos, default=str)}\n\n"
+
+
+@app.post("/solicitud/{solicitud_id}/reanudar", response_model=SolicitudResponse)
+async def reanudar(solicitud_id: int) -> SolicitudResponse:
+    """
+    Reanuda una solicitud fallida desde la primera etapa incompleta.
+
+    Reutiliza los checkpoints del Receptor y del Investigador y no reenvía
+    los RFQs que ya salieron, por lo que un reintento tras un error
+    transitorio (SMTP, OpenAI) no repite todo el flujo.
+
+    **Args:**
+    - solicitud_id: ID de la solicitud a reanudar
+
+    **Returns:**
+    - Resultado completo con el mismo formato que `procesar-completa`
+      (`detalles.reanudada_desde` indica la etapa donde se retomó)
+
+    **Raises:**
+    - HTTPException 404: Si la solicitud no existe
+    - HTTPException 400: Si el flujo vuelve a fallar o no hay checkpoint
+    - HTTPException 409: Si la solicitud ya tiene un flujo en curso (reanudarla
+      reenviaría los RFQs que ese flujo aún no marca como enviados)
+
+    **Example:**
+    ```bash
+    curl -X POST "http://localhost:8000/solicitud/123/reanudar"
+    ```
+    """
+    logger.info(f"♻️  Reanudando solicitud {solicitud_id} vía API")
+
+    if flujo_en_curso(solicitud_id):
+        raise HTTPException(
+            status_code=409, detail=f"La solicitud {solicitud_id} ya tiene un flujo en curso"
+        )
+
+    resultado = await reanudar_solicitud(solicitud_id)
+
+    if not resultado.get("exito"):
+        if resultado.get("en_curso"):
+            raise HTTPException(status_code=409, detail=resultado["error"])
+
+        if "solicitud_id" not in resultado:
+            raise HTTPException(status_code=404, detail=resultado.get("error"))
+
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": resultado.get("error", "Error desconocido"),
+                "etapa_fallida": resultado.get("etapa", "desconocida"),
+                "detalles": resultado,
+            },
+        )
+
+    rfqs_data = resultado.get("rfqs", {})
+    return SolicitudResponse(
+        message="Solicitud reanudada exitosamente",
+        solicitud_id=solicitud_id,
+        proveedores_contactados=rfqs_data.get("total", 0),
+        rfqs_enviados=rfqs_data.get("exitosos", 0),
+        detalles=resultado,
+    )
+
+
+@app.post("/solicitudes/batch", status_code=202)
+async def procesar_lote(
+    data: LoteRequest, idempotency_key: Optional[str] = Header(None)
+) -> JSONResponse:
+    """
+    Encola un lote de solicitudes para procesarlas en segundo plano.
+
+    Cada texto se convierte en un job que pasa por el flujo completo. La
+    extracción del Receptor se hace en bloques (pocas llamadas a OpenAI para
+    todo el lote) y los jobs comparten el pool de workers con el resto de
+    solicitudes en segundo plano.
+
+    **Args:**
+    - textos: Lista de textos de solicitudes (máximo `LOTE_MAX_SOLICITUDES`)
+    - origen: Origen común de las solicitudes
+    - Header `Idempotency-Key` (opcional): Un reenvío con la misma clave
+      recibe el mismo `lote_id` sin volver a encolar el lote
+
+    **Returns:**
+    - 202 con `lote_id`, los `job_id` en el orden de `textos` y la URL de estado
+
+    **Example:**
+    ```bash
+    curl -X POST "http://localhost:8000/solicitudes/batch" \\
+         -H "Content-Type: application/json" \\
+         -d '{"textos": ["Necesito 5 PLCs", "Requerimos 20 sillas"], "origen": "email"}'
+    ```
+    """
+    logger.info(f"📦 Lote recibido vía API: {len(data.textos)} solicitud(es)")
+
+    return await _responder_idempotente(
+        "/solicitudes/batch", data.model_dump(), idempotency_key, lambda: _encolar_lote(data)
+    )
+
+
+async def _encolar_lote(data: LoteRequest) -> Tuple[int, Dict]:
+    """Encola el lote y retorna (código HTTP, cuerpo)."""
+    lote_id, job_ids = await gestor_jobs.encolar_lote(data.textos, origen=data.origen)
+
+    return 202, {
+        "message": "Lote encolado para procesamiento",
+        "lote_id": lote_id,
+        "total": len(job_ids),
+        "jobs": [
+            {"indice": indice, "job_id": job_id} for indice, job_id in enumerate(job_ids)
+        ],
+        "url_estado": f"/solicitudes/batch/{lote_id}",
+    }
+
+
+@app.get("/solicitudes/batch/{lote_id}")
+async def consultar_lote(lote_id: str):
+    """
+    Consulta el estado agregado de un lote.
+
+    **Args:**
+    - lote_id: ID retornado por `POST /solicitudes/batch`
+
+    **Returns:**
+    - total, terminado y progreso promedio (0-100)
+    - por_estado: Conteo de jobs en_cola, ejecutando, completado y error
+    - jobs: Estado resumido de cada job (el detalle está en `GET /jobs/{job_id}`)
+
+    **Raises:**
+    - HTTPException 404: Si el lote no existe
+    """
+    estado = await gestor_jobs.obtener_lote(lote_id)
+
+    if estado is None:
+        raise HTTPException(status_code=404, detail="Lote no encontrado")
+
+    return estado
+
+
+@app.get("/jobs/{job_id}")
+async def consultar_job(job_id: int):
+    """
+    Consulta el estado de un job en segundo plano.
+
+    **Args:**
+    - job_id: ID retornado por `POST /solicitud/procesar-completa` en modo
+      en segundo plano
+
+    **Returns:**
+    - estado: en_cola, ejecutando, completado o error
+    - etapa: Última etapa del orquestador (receptor, investigador, generador_rfq...)
+    - progreso: Porcentaje de avance (0-100)
+    - solicitud_id: ID de la solicitud, cuando ya fue creada
+    - resultado: Resultado completo del orquestador al terminar
+
+    **Raises:**
+    - HTTPException 404: Si el job no existe
+
+    **Example:**
+    ```bash
+    curl "http://localhost:8000/jobs/42"
+    ```
+    """
+    estado = await gestor_jobs.obtener(job_id)
+
+    if estado is None:
+        raise HTTPException(status_code=404, detail="Job no encontrado")
+
+    return estado
+
+
 # ============================================================================
 # INICIALIZACIÓN
 # ============================================================================
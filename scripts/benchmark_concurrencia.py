@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark de concurrencia del orquestador asíncrono.
+
+Ejecuta N solicitudes completas (Receptor → Investigador → RFQs) contra
+clientes falsos con latencia simulada de OpenAI y SMTP, primero en serie y
+luego concurrentemente en un solo event loop, y reporta tiempos y throughput.
+
+No hace llamadas reales: usa una base SQLite temporal y dobles de OpenAI/SMTP.
+
+Uso:
+    python scripts/benchmark_concurrencia.py --solicitudes 50 --latencia-llm 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+# Agregar directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# BD temporal y credenciales de relleno: el benchmark no toca servicios reales.
+# Sin cachés: la fase concurrente repite los textos de la serial y los aciertos
+# inflarían el speedup
+_DB_TEMPORAL = Path(tempfile.mkdtemp()) / "benchmark.db"
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_TEMPORAL}"
+os.environ["LLM_CACHE_HABILITADA"] = "false"
+os.environ["BUSQUEDA_CACHE_HABILITADA"] = "false"
+for _variable in ("OPENAI_API_KEY", "EVOLUTION_API_KEY", "GMAIL_USER", "GMAIL_APP_PASSWORD"):
+    os.environ.setdefault(_variable, "benchmark")
+
+from src.agents.orquestador import procesar_solicitud_completa  # noqa: E402
+from src.agents.receptor import ReceptorAgent  # noqa: E402
+from src.database.models import Proveedor  # noqa: E402
+from src.database.session import SessionLocal, create_tables  # noqa: E402
+
+
+class ClienteLLMFalso:
+    """Cliente AsyncOpenAI falso que responde tras una latencia fija."""
+
+    def __init__(self, responder, latencia: float):
+        self.responder = responder
+        self.latencia = latencia
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        await asyncio.sleep(self.latencia)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=self.responder(kwargs)))]
+        )
+
+
+def preparar_bd() -> int:
+    """Crea las tablas y un proveedor; retorna su ID."""
+    create_tables()
+    db = SessionLocal()
+    try:
+        proveedor = Proveedor(
+            nombre="Proveedor Benchmark", email="ventas@benchmark.com", categoria="tecnologia"
+        )
+        db.add(proveedor)
+        db.commit()
+        return proveedor.id
+    finally:
+        db.close()
+
+
+async def ejecutar(n: int, concurrente: bool) -> float:
+    """Procesa N solicitudes y retorna la duración total en segundos."""
+    textos = [f"Necesito {i} PLCs Siemens S7-1200" for i in range(1, n + 1)]
+    inicio = time.perf_counter()
+
+    if concurrente:
+        resultados = await asyncio.gather(*(procesar_solicitud_completa(t) for t in textos))
+    else:
+        resultados = [await procesar_solicitud_completa(t) for t in textos]
+
+    duracion = time.perf_counter() - inicio
+    fallidas = sum(1 for r in resultados if not r["exito"])
+    if fallidas:
+        print(f"  ⚠️  {fallidas} solicitud(es) fallaron")
+    return duracion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--solicitudes", type=int, default=30)
+    parser.add_argument("--latencia-llm", type=float, default=0.3)
+    parser.add_argument("--latencia-smtp", type=float, default=0.1)
+    args = parser.parse_args()
+
+    proveedor_id = preparar_bd()
+
+    respuesta_receptor = json.dumps({
+        "productos": [{"nombre": "PLC Siemens S7-1200", "cantidad": 5, "categoria": "tecnologia"}],
+        "urgencia": "normal",
+    })
+    respuesta_investigador = json.dumps({
+        "proveedores_recomendados": [
+            {"proveedor_id": proveedor_id, "nombre": "Proveedor Benchmark", "fuente": "base_de_datos"}
+        ]
+    })
+
+    def responder_agentes(kwargs):
+        if "response_format" in kwargs:
+            return respuesta_investigador
+        return "Estimado proveedor, solicitamos cotización..."
+
+    def enviar_email_lento(**kwargs):
+        time.sleep(args.latencia_smtp)
+        return True
+
+    print("=" * 70)
+    print("⏱️  BENCHMARK DE CONCURRENCIA DEL ORQUESTADOR")
+    print("=" * 70)
+    print(
+        f"Solicitudes: {args.solicitudes} | Latencia LLM: {args.latencia_llm}s | "
+        f"Latencia SMTP: {args.latencia_smtp}s"
+    )
+
+    with patch(
+        "src.agents.receptor.get_agente",
+        return_value=ReceptorAgent(
+            async_client=ClienteLLMFalso(lambda kwargs: respuesta_receptor, args.latencia_llm)
+        ),
+    ), patch(
+        "src.services.openai_service.openai_service.async_client",
+        ClienteLLMFalso(responder_agentes, args.latencia_llm),
+    ), patch(
+        "src.agents.investigador.search_service.is_available", return_value=False
+    ), patch(
+        "src.agents.generador_rfq.email_service.send_email", side_effect=enviar_email_lento
+    ):
+        serial = asyncio.run(ejecutar(args.solicitudes, concurrente=False))
+        concurrente = asyncio.run(ejecutar(args.solicitudes, concurrente=True))
+
+    print(f"\n{'Modo':<15}{'Total (s)':>12}{'Solicitudes/s':>16}")
+    print("-" * 43)
+    for nombre, duracion in (("Serie", serial), ("Concurrente", concurrente)):
+        print(f"{nombre:<15}{duracion:>12.2f}{args.solicitudes / duracion:>16.1f}")
+    print(f"\n🚀 Aceleración: {serial / concurrente:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
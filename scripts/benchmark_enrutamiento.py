@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Benchmark de las políticas de enrutamiento de modelos.
+
+Ejecuta N análisis de cotización con cada política ("maxima": siempre el
+modelo completo, como antes del enrutador; "escalonada": mini y escala si
+la respuesta no valida; "economica": solo mini) contra un cliente falso
+con latencia y consumo de tokens por modelo, y reporta latencia, costo
+estimado y respuestas sin validar.
+
+El cliente falso devuelve un análisis inválido (precio en cero) del modelo
+mini con la probabilidad indicada en `--tasa-invalidas`.
+
+Uso:
+    python scripts/benchmark_enrutamiento.py --llamadas 200 --tasa-invalidas 0.1
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+# Agregar directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Credenciales de relleno, sin caché ni cuotas (solo se mide la política) y
+# sin el log de cada escalamiento: el benchmark no toca servicios reales
+for _variable in ("OPENAI_API_KEY", "EVOLUTION_API_KEY", "GMAIL_USER", "GMAIL_APP_PASSWORD"):
+    os.environ.setdefault(_variable, "benchmark")
+os.environ["LLM_CACHE_HABILITADA"] = "false"
+os.environ["LLM_LIMITES_POR_MODELO"] = "{}"
+logging.disable(logging.CRITICAL)
+
+from config.settings import settings  # noqa: E402
+from src.core.enrutador import POLITICAS, EnrutadorModelos  # noqa: E402
+from src.core.uso_llm import calcular_costo  # noqa: E402
+from src.services.openai_service import OpenAIService  # noqa: E402
+
+# Latencia simulada (segundos) por modelo
+LATENCIAS = {"gpt-4o-mini": 0.02, "gpt-4o": 0.06}
+
+# Tokens de una llamada típica de análisis de cotización
+TOKENS_ENTRADA = 900
+TOKENS_SALIDA = 250
+
+COTIZACION = {
+    "proveedor": "Proveedor Benchmark",
+    "precio_total": 45000.0,
+    "tiempo_entrega_dias": 15,
+    "calidad_score": 8.0,
+    "ventajas": ["Entrega rápida"],
+    "desventajas": [],
+    "recomendacion": "Buena opción",
+}
+
+
+class ClienteLLMFalso:
+    """Cliente OpenAI falso que responde según el modelo y acumula el costo."""
+
+    def __init__(self, tasa_invalidas: float, semilla: int):
+        self.tasa_invalidas = tasa_invalidas
+        self.azar = random.Random(semilla)
+        self.costo_usd = 0.0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        modelo = kwargs["model"]
+        time.sleep(LATENCIAS.get(modelo, 0.05))
+        self.costo_usd += calcular_costo(modelo, TOKENS_ENTRADA, TOKENS_SALIDA)
+
+        invalida = modelo == "gpt-4o-mini" and self.azar.random() < self.tasa_invalidas
+        contenido = {**COTIZACION, "precio_total": 0.0 if invalida else 45000.0}
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(contenido)))]
+        )
+
+
+def ejecutar(politica: str, llamadas: int, tasa_invalidas: float, semilla: int) -> dict:
+    """Analiza `llamadas` cotizaciones con una política y retorna sus estadísticas."""
+    servicio = OpenAIService(api_key="benchmark")
+    cliente = ClienteLLMFalso(tasa_invalidas, semilla)
+    servicio.client = cliente
+    enrutador_politica = EnrutadorModelos(settings.LLM_MODELOS_POR_TAREA, politica=politica)
+
+    latencias, fallidas = [], 0
+    with patch("src.services.openai_service.enrutador_modelos", enrutador_politica):
+        for _ in range(llamadas):
+            inicio = time.perf_counter()
+            try:
+                servicio.analizar_cotizacion("Email", "Proveedor Benchmark", "Laptops", usar_cache=False)
+            except ValueError:
+                fallidas += 1
+            latencias.append((time.perf_counter() - inicio) * 1000)
+
+    latencias.sort()
+    tarea = enrutador_politica.estado()["tareas"].get("analizar_cotizacion", {})
+    return {
+        "p50_ms": statistics.median(latencias),
+        "p95_ms": latencias[int(0.95 * (len(latencias) - 1))],
+        "costo_usd": cliente.costo_usd,
+        "escalamientos": tarea.get("escalamientos", 0),
+        "fallidas": fallidas,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--llamadas", type=int, default=200)
+    parser.add_argument("--tasa-invalidas", type=float, default=0.1)
+    parser.add_argument("--semilla", type=int, default=7)
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("🧭 BENCHMARK DE POLÍTICAS DE ENRUTAMIENTO")
+    print("=" * 70)
+    print(
+        f"Llamadas: {args.llamadas} | Respuestas inválidas del mini: "
+        f"{args.tasa_invalidas:.0%} | Latencias: {LATENCIAS}"
+    )
+
+    resultados = {
+        politica: ejecutar(politica, args.llamadas, args.tasa_invalidas, args.semilla)
+        for politica in POLITICAS
+    }
+
+    print(
+        f"\n{'Política':<12}{'p50 (ms)':>10}{'p95 (ms)':>10}{'Costo (USD)':>14}"
+        f"{'Escalados':>11}{'Fallidas':>10}"
+    )
+    print("-" * 67)
+    for politica, r in resultados.items():
+        print(
+            f"{politica:<12}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['costo_usd']:>14.4f}"
+            f"{r['escalamientos']:>11}{r['fallidas']:>10}"
+        )
+
+    base = resultados["maxima"]["costo_usd"]
+    if base:
+        ahorro = 1 - resultados["escalonada"]["costo_usd"] / base
+        print(f"\n💰 Escalonada vs. máxima: {ahorro:.0%} menos costo")
+
+
+if __name__ == "__main__":
+    main()
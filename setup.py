@@ -32,6 +32,7 @@ setup(
         "pydantic>=2.5.0",
         "pydantic-settings>=2.1.0",
         "openai>=1.10.0",
+        "tiktoken>=0.7.0",
         "langchain>=0.1.0",
         "langchain-openai>=0.0.5",
         "langgraph>=0.0.20",
@@ -45,6 +46,7 @@ setup(
         "streamlit>=1.29.0",
         "pillow>=10.1.0",
         "jinja2>=3.1.2",
+        "numpy>=1.24.0",
     ],
     extras_require={
         "dev": [
@@ -4,62 +4,19 @@ Analiza precios de múltiples fuentes y recomienda mejor opción
 """
 
 import json
+from src.agents.registro import registro_agentes
+from src.core.enrutador import TAREA_COMPARAR_PRECIOS
 from src.services.openai_service import llamar_agente
 
-PROMPT_COMPARADOR = """
-Eres un experto en análisis de precios y estrategias de compra.
 
-Tu tarea es comparar precios de diferentes fuentes y recomendar la mejor decisión de compra.
+def _validar_analisis(contenido: str) -> None:
+    """Escala de modelo si el análisis no trae una recomendación principal."""
+    analisis = json.loads(contenido)
+    if not isinstance(analisis, dict) or not isinstance(
+        analisis.get("recomendacion_principal"), dict
+    ):
+        raise ValueError("El análisis no incluye recomendacion_principal")
 
-FACTORES A CONSIDERAR:
-1. PRECIO:
-   - Precio unitario y total
-   - Descuentos por volumen
-   - Costos de envío
-   - Impuestos
-
-2. TIEMPO:
-   - Tiempo de cotización (proveedores)
-   - Tiempo de entrega
-   - Urgencia de la compra
-
-3. CONFIABILIDAD:
-   - Proveedores conocidos vs desconocidos
-   - Rating de proveedores
-   - Garantías ofrecidas
-   - Política de devoluciones
-
-4. TÉRMINOS:
-   - Condiciones de pago
-   - Garantía
-   - Soporte post-venta
-
-DECISIONES A TOMAR:
-- ¿Solicitar cotización formal o comprar directo?
-- ¿Vale la pena esperar cotizaciones si hay opción inmediata?
-- ¿El ahorro justifica el riesgo de proveedor nuevo?
-
-FORMATO SALIDA JSON:
-{
-  "recomendacion_principal": {
-    "accion": "cotizar|comprar_directo|ambas",
-    "fuente_recomendada": "proveedores_bd|web|ecommerce",
-    "justificacion": "...",
-    "ahorro_estimado": 0.0,
-    "tiempo_estimado": "..."
-  },
-  "comparativa_precios": [
-    {
-      "fuente": "...",
-      "precio_estimado": 0.0,
-      "ventajas": [...],
-      "desventajas": [...]
-    }
-  ],
-  "alertas": [...],
-  "siguiente_paso": "..."
-}
-"""
 
 def comparar_precios_multiples_fuentes(
     productos: list,
@@ -101,11 +58,14 @@ Analiza todas las opciones y recomienda la mejor estrategia de compra.
         """
 
         resultado = llamar_agente(
-            prompt_sistema=PROMPT_COMPARADOR,
+            prompt_sistema=registro_agentes.prompt("comparador"),
+            agente="comparador",
             mensaje_usuario=contexto,
-            modelo="gpt-4o",
+            tarea=TAREA_COMPARAR_PRECIOS,
+            validar=_validar_analisis,
             temperatura=0.3,
-            formato_json=True
+            formato_json=True,
+            usar_cache=False,  # Los precios cambian: cada comparación se genera de nuevo
         )
 
         analisis = json.loads(resultado)
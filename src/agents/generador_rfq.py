@@ -6,26 +6,67 @@ Este agente es responsable de:
 2. Guardar los RFQs en la base de datos
 3. Enviar los RFQs por email a los proveedores
 4. Gestionar el estado de los RFQs
+
+Los borradores de urgencia normal pueden generarse con la Batch API de
+OpenAI (`src.core.lotes_rfq`) en lugar de una llamada por proveedor.
+
+En el modo "por_solicitud" (`RFQ_MODO_GENERACION`) el envío masivo genera
+el cuerpo del RFQ una sola vez por conjunto de productos y lo personaliza
+por proveedor con la plantilla Jinja2 `rfq_personalizado.j2`: N proveedores
+cuestan una llamada al LLM más N renderizados. El modo "por_proveedor"
+genera un RFQ completo para cada uno.
+
+`generar_rfq` acepta `al_fragmento` para redactar en streaming (la pestaña
+de RFQs de Streamlit muestra el borrador mientras se escribe). Con
+`RFQ_STREAMING_HABILITADO`, el envío del flujo publica el texto en eventos
+`rfq_fragmento` del SSE de la solicitud.
 """
-import os
+import asyncio
+import contextvars
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 
-from src.database.models import RFQ
+from src.database.models import RFQ, EstadoRFQ
 
 from config.logging_config import logger
+from config.settings import settings
+from src.agents.registro import registro_agentes
+from src.core.enrutador import TAREA_GENERAR_RFQ, enrutador_modelos, validar_redaccion
+from src.core.eventos import publicar_evento
+from src.core.lotes_rfq import gestor_lotes_rfq
+from src.core.metricas import RESULTADO_ERROR, medir
+from src.core.planificador import planificador_rfqs, prioridad_de
 from src.database.session import SessionLocal
 from src.database.crud import crear_rfq, rfq as crud_rfq
-from src.services.openai_service import llamar_agente
+from src.services.openai_service import (
+    construir_kwargs_agente,
+    llamar_agente,
+    llamar_agente_async,
+    llamar_agente_stream,
+    llamar_agente_stream_async,
+)
 from src.services.email_service import email_service
 
+TEMPERATURA_RFQ = 0.7
+
+# Modos de generación del envío masivo
+MODO_POR_PROVEEDOR = "por_proveedor"
+MODO_POR_SOLICITUD = "por_solicitud"
+MODOS_GENERACION = (MODO_POR_PROVEEDOR, MODO_POR_SOLICITUD)
 
-# Cargar prompt del generador
-PROMPT_PATH = os.path.join(
-    os.path.dirname(__file__), "..", "prompts", "generador_rfq_prompt.txt"
+# Indicación extra al generar el cuerpo común (el saludo lo pone la plantilla)
+INSTRUCCION_CUERPO_COMUN = (
+    "Este RFQ se enviará a varios proveedores y el saludo se agrega después "
+    "para cada uno: NO incluyas la línea de saludo ni el nombre de ningún "
+    "proveedor o contacto; empieza directamente con la presentación de PEI."
 )
-with open(PROMPT_PATH, "r", encoding="utf-8") as f:
-    PROMPT_GENERADOR = f.read()
+
+# Caracteres acumulados por evento `rfq_fragmento` (el bus retiene 200 eventos
+# por solicitud; un evento por token los agotaría)
+CARACTERES_POR_EVENTO = 200
 
 
 def generar_rfq(
@@ -33,6 +74,7 @@ def generar_rfq(
     proveedor: dict,
     productos: list,
     urgencia: str = "normal",
+    al_fragmento: Optional[Callable[[str], None]] = None,
 ) -> dict:
     """
     Genera contenido de RFQ personalizado para un proveedor.
@@ -50,6 +92,8 @@ def generar_rfq(
             - especificaciones: Especificaciones técnicas (opcional)
             - marca: Marca preferida (opcional)
         urgencia: Nivel de urgencia ("normal", "alta", "urgente")
+        al_fragmento: Si se indica, el RFQ se redacta en streaming y se
+            llama con cada fragmento de texto a medida que llega
 
     Returns:
         Dict con:
@@ -76,62 +120,76 @@ def generar_rfq(
         >>> resultado = generar_rfq(1, proveedor, productos, "alta")
     """
     try:
-        # Calcular fecha límite según urgencia
-        dias_respuesta = {"normal": 5, "alta": 3, "urgente": 1}
-        fecha_limite = datetime.now() + timedelta(
-            days=dias_respuesta.get(urgencia, 5)
+        contexto_completo, fecha_limite = _construir_contexto(proveedor, productos, urgencia)
+
+        logger.info(
+            f"Generando RFQ para proveedor {proveedor.get('nombre')} "
+            f"con {len(productos)} producto(s)"
         )
 
-        # Formatear fecha en español
-        meses = [
-            "enero", "febrero", "marzo", "abril", "mayo", "junio",
-            "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"
-        ]
-        fecha_str = f"{fecha_limite.day} de {meses[fecha_limite.month - 1]} de {fecha_limite.year}"
+        # Generar RFQ usando el agente
+        with medir("generador_rfq.llm"):
+            if al_fragmento is not None:
+                contenido_rfq = _redactar_en_stream(_mensaje_rfq(contexto_completo), al_fragmento)
+            else:
+                contenido_rfq = _redactar(_mensaje_rfq(contexto_completo))
 
-        # Preparar contexto para el agente
-        contexto_proveedor = f"""
-INFORMACIÓN PROVEEDOR:
-- Nombre: {proveedor.get('nombre', 'N/A')}
-- Contacto: {proveedor.get('contacto', 'Estimado proveedor')}
-"""
+        logger.info("RFQ generado exitosamente")
 
-        contexto_productos = "PRODUCTOS A COTIZAR:\n"
-        for p in productos:
-            contexto_productos += f"- {p.get('nombre', 'N/A')}\n"
-            contexto_productos += f"  Cantidad: {p.get('cantidad', 'N/A')}\n"
-            if p.get('especificaciones'):
-                contexto_productos += f"  Especificaciones: {p.get('especificaciones')}\n"
-            if p.get('marca'):
-                contexto_productos += f"  Marca/modelo: {p.get('marca')}\n"
-            contexto_productos += "\n"
+        return {
+            "exito": True,
+            "contenido": contenido_rfq,
+            "fecha_limite": fecha_limite,
+            "proveedor": proveedor,
+        }
 
-        contexto_completo = f"""{contexto_proveedor}
+    except Exception as e:
+        logger.error(f"Error generando RFQ: {e}")
+        return {
+            "exito": False,
+            "error": str(e),
+            "proveedor": proveedor,
+        }
 
-{contexto_productos}
 
-FECHA LÍMITE RESPUESTA: {fecha_str}
-URGENCIA: {urgencia.upper()}
+async def generar_rfq_async(
+    solicitud_id: int,
+    proveedor: dict,
+    productos: list,
+    urgencia: str = "normal",
+    al_fragmento: Optional[Callable[[str], None]] = None,
+) -> dict:
+    """
+    Versión asíncrona de `generar_rfq`.
 
-DATOS CONTACTO PEI:
-- Empresa: PEI (Productos y Servicios)
-- Departamento: Compras
-- Email: compras@pei.com
-- Teléfono: +52-55-1234-5678
-"""
+    La llamada al LLM usa `AsyncOpenAI`, por lo que no bloquea el event loop.
+
+    Args:
+        solicitud_id: ID de la solicitud de compra
+        proveedor: Diccionario con datos del proveedor
+        productos: Lista de productos a cotizar
+        urgencia: Nivel de urgencia ("normal", "alta", "urgente")
+        al_fragmento: Si se indica, el RFQ se redacta en streaming y se
+            llama con cada fragmento de texto a medida que llega
+
+    Returns:
+        Dict con el mismo formato que `generar_rfq`
+    """
+    try:
+        contexto_completo, fecha_limite = _construir_contexto(proveedor, productos, urgencia)
 
         logger.info(
             f"Generando RFQ para proveedor {proveedor.get('nombre')} "
             f"con {len(productos)} producto(s)"
         )
 
-        # Generar RFQ usando el agente
-        contenido_rfq = llamar_agente(
-            prompt_sistema=PROMPT_GENERADOR,
-            mensaje_usuario=f"Genera RFQ profesional con esta información:\n\n{contexto_completo}",
-            modelo="gpt-4o",  # Usar modelo más potente para documentos formales
-            temperatura=0.7,
-        )
+        with medir("generador_rfq.llm"):
+            if al_fragmento is not None:
+                contenido_rfq = await _redactar_en_stream_async(
+                    _mensaje_rfq(contexto_completo), al_fragmento
+                )
+            else:
+                contenido_rfq = await _redactar_async(_mensaje_rfq(contexto_completo))
 
         logger.info("RFQ generado exitosamente")
 
@@ -151,6 +209,315 @@ DATOS CONTACTO PEI:
         }
 
 
+def _mensaje_rfq(contexto_completo: str) -> str:
+    """Mensaje de usuario con el que se pide el RFQ al agente."""
+    return f"Genera RFQ profesional con esta información:\n\n{contexto_completo}"
+
+
+def _redactar(mensaje_usuario: str) -> str:
+    """Redacta un RFQ completo con escalamiento de modelo."""
+    return llamar_agente(
+        prompt_sistema=registro_agentes.prompt("generador"),
+        agente="generador",
+        mensaje_usuario=mensaje_usuario,
+        tarea=TAREA_GENERAR_RFQ,
+        validar=validar_redaccion,
+        temperatura=TEMPERATURA_RFQ,
+        usar_cache=False,  # Cada RFQ es una redacción nueva
+    )
+
+
+async def _redactar_async(mensaje_usuario: str) -> str:
+    """Versión asíncrona de `_redactar`."""
+    return await llamar_agente_async(
+        prompt_sistema=registro_agentes.prompt("generador"),
+        agente="generador",
+        mensaje_usuario=mensaje_usuario,
+        tarea=TAREA_GENERAR_RFQ,
+        validar=validar_redaccion,
+        temperatura=TEMPERATURA_RFQ,
+        usar_cache=False,
+    )
+
+
+def _redactar_en_stream(mensaje_usuario: str, al_fragmento: Callable[[str], None]) -> str:
+    """
+    Redacta un RFQ en streaming entregando cada fragmento a `al_fragmento`.
+
+    El stream usa el primer modelo de la tarea y no puede escalar; si el
+    texto completo no pasa `validar_redaccion`, se redacta de nuevo sin
+    streaming con escalamiento (el contenido válido es el que se retorna).
+    """
+    partes = []
+    for fragmento in llamar_agente_stream(
+        prompt_sistema=registro_agentes.prompt("generador"),
+        agente="generador",
+        mensaje_usuario=mensaje_usuario,
+        tarea=TAREA_GENERAR_RFQ,
+        temperatura=TEMPERATURA_RFQ,
+    ):
+        partes.append(fragmento)
+        al_fragmento(fragmento)
+
+    try:
+        return validar_redaccion("".join(partes))
+    except ValueError as e:
+        logger.warning(f"⚠️  RFQ en streaming no pasó la revisión ({e}); se redacta de nuevo")
+        return _redactar(mensaje_usuario)
+
+
+async def _redactar_en_stream_async(
+    mensaje_usuario: str, al_fragmento: Callable[[str], None]
+) -> str:
+    """Versión asíncrona de `_redactar_en_stream`."""
+    partes = []
+    async for fragmento in llamar_agente_stream_async(
+        prompt_sistema=registro_agentes.prompt("generador"),
+        agente="generador",
+        mensaje_usuario=mensaje_usuario,
+        tarea=TAREA_GENERAR_RFQ,
+        temperatura=TEMPERATURA_RFQ,
+    ):
+        partes.append(fragmento)
+        al_fragmento(fragmento)
+
+    try:
+        return validar_redaccion("".join(partes))
+    except ValueError as e:
+        logger.warning(f"⚠️  RFQ en streaming no pasó la revisión ({e}); se redacta de nuevo")
+        return await _redactar_async(mensaje_usuario)
+
+
+class PublicadorFragmentos:
+    """
+    Publica el borrador de un RFQ en el bus de eventos mientras se redacta.
+
+    Acumula fragmentos y publica un evento `rfq_fragmento` cada
+    `CARACTERES_POR_EVENTO` caracteres; `vaciar` publica el resto al terminar.
+    """
+
+    def __init__(self, solicitud_id: int, proveedor: dict):
+        self.solicitud_id = solicitud_id
+        self.proveedor = proveedor
+        self._pendiente: List[str] = []
+        self._caracteres = 0
+
+    def __call__(self, fragmento: str) -> None:
+        self._pendiente.append(fragmento)
+        self._caracteres += len(fragmento)
+        if self._caracteres >= CARACTERES_POR_EVENTO:
+            self.vaciar()
+
+    def vaciar(self) -> None:
+        """Publica lo acumulado (si hay algo)."""
+        if not self._pendiente:
+            return
+
+        publicar_evento(
+            self.solicitud_id,
+            "rfq_fragmento",
+            {
+                "proveedor_id": self.proveedor.get("id"),
+                "proveedor": self.proveedor.get("nombre"),
+                "texto": "".join(self._pendiente),
+            },
+        )
+        self._pendiente = []
+        self._caracteres = 0
+
+
+def _publicador_fragmentos(solicitud_id: int, proveedor: dict) -> Optional[PublicadorFragmentos]:
+    """Publicador de fragmentos del flujo, si el streaming de RFQs está habilitado."""
+    if not settings.RFQ_STREAMING_HABILITADO:
+        return None
+    return PublicadorFragmentos(solicitud_id, proveedor)
+
+
+def generar_cuerpo_rfq(productos: list, urgencia: str = "normal") -> dict:
+    """
+    Genera el cuerpo común de los RFQs de una solicitud (sin saludo).
+
+    Es la única llamada al LLM del modo "por_solicitud"; cada proveedor
+    recibe después el cuerpo con su saludo mediante `personalizar_rfq`.
+
+    Args:
+        productos: Productos a cotizar (los mismos para todos los proveedores)
+        urgencia: Nivel de urgencia ("normal", "alta", "urgente")
+
+    Returns:
+        Dict con:
+            - exito: bool, True si se generó correctamente
+            - cuerpo: str, Texto común del RFQ
+            - fecha_limite: datetime, Fecha límite de respuesta
+            - error: str (opcional), Mensaje de error si falló
+
+    Example:
+        >>> cuerpo = generar_cuerpo_rfq([{"nombre": "PLC Siemens", "cantidad": "5"}])
+        >>> rfq_data = personalizar_rfq(cuerpo, {"nombre": "TechSupply"})
+    """
+    try:
+        contexto_completo, fecha_limite = _construir_contexto(None, productos, urgencia)
+        logger.info(f"Generando cuerpo común de RFQ para {len(productos)} producto(s)")
+
+        with medir("generador_rfq.llm"):
+            cuerpo = llamar_agente(
+                prompt_sistema=registro_agentes.prompt("generador"),
+                agente="generador",
+                mensaje_usuario=_mensaje_cuerpo_comun(contexto_completo),
+                tarea=TAREA_GENERAR_RFQ,
+                validar=validar_redaccion,
+                temperatura=TEMPERATURA_RFQ,
+                usar_cache=False,
+            )
+
+        return {"exito": True, "cuerpo": _quitar_saludo(cuerpo), "fecha_limite": fecha_limite}
+
+    except Exception as e:
+        logger.error(f"Error generando cuerpo común de RFQ: {e}")
+        return {"exito": False, "error": str(e)}
+
+
+async def generar_cuerpo_rfq_async(productos: list, urgencia: str = "normal") -> dict:
+    """
+    Versión asíncrona de `generar_cuerpo_rfq`.
+
+    Args:
+        productos: Productos a cotizar (los mismos para todos los proveedores)
+        urgencia: Nivel de urgencia ("normal", "alta", "urgente")
+
+    Returns:
+        Dict con el mismo formato que `generar_cuerpo_rfq`
+    """
+    try:
+        contexto_completo, fecha_limite = _construir_contexto(None, productos, urgencia)
+        logger.info(f"Generando cuerpo común de RFQ para {len(productos)} producto(s)")
+
+        with medir("generador_rfq.llm"):
+            cuerpo = await llamar_agente_async(
+                prompt_sistema=registro_agentes.prompt("generador"),
+                agente="generador",
+                mensaje_usuario=_mensaje_cuerpo_comun(contexto_completo),
+                tarea=TAREA_GENERAR_RFQ,
+                validar=validar_redaccion,
+                temperatura=TEMPERATURA_RFQ,
+                usar_cache=False,
+            )
+
+        return {"exito": True, "cuerpo": _quitar_saludo(cuerpo), "fecha_limite": fecha_limite}
+
+    except Exception as e:
+        logger.error(f"Error generando cuerpo común de RFQ: {e}")
+        return {"exito": False, "error": str(e)}
+
+
+def personalizar_rfq(cuerpo_data: dict, proveedor: dict) -> dict:
+    """
+    Arma el RFQ de un proveedor a partir del cuerpo común (sin llamar al LLM).
+
+    Args:
+        cuerpo_data: Resultado exitoso de `generar_cuerpo_rfq`
+        proveedor: Datos del proveedor (nombre, contacto)
+
+    Returns:
+        Dict con el mismo formato que `generar_rfq`
+    """
+    with medir("generador_rfq.plantilla"):
+        contenido = registro_agentes.plantilla("rfq").render(
+            contacto=proveedor.get("contacto"),
+            proveedor=proveedor.get("nombre"),
+            cuerpo=cuerpo_data["cuerpo"],
+        )
+
+    return {
+        "exito": True,
+        "contenido": contenido,
+        "fecha_limite": cuerpo_data["fecha_limite"],
+        "proveedor": proveedor,
+    }
+
+
+def _mensaje_cuerpo_comun(contexto_completo: str) -> str:
+    """Mensaje con el que se pide el cuerpo común (sin saludo) al agente."""
+    return f"{_mensaje_rfq(contexto_completo)}\n{INSTRUCCION_CUERPO_COMUN}"
+
+
+def _quitar_saludo(texto: str) -> str:
+    """Quita la línea de saludo si el modelo la escribió de todos modos."""
+    lineas = texto.strip().splitlines()
+    if lineas and lineas[0].lower().startswith("estimad") and lineas[0].rstrip().endswith(","):
+        lineas = lineas[1:]
+    return "\n".join(lineas).strip()
+
+
+def _clave_productos(productos: list) -> str:
+    """Identifica un conjunto de productos (proveedores con el mismo comparten cuerpo)."""
+    return json.dumps(productos, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _construir_contexto(
+    proveedor: Optional[dict], productos: list, urgencia: str
+) -> Tuple[str, datetime]:
+    """
+    Arma el contexto del RFQ y calcula la fecha límite de respuesta.
+
+    Args:
+        proveedor: Datos del proveedor (None para el cuerpo común, que no
+            menciona a ningún proveedor)
+        productos: Productos a cotizar
+        urgencia: Nivel de urgencia
+
+    Returns:
+        Tupla (contexto para el agente, fecha límite)
+    """
+    # Calcular fecha límite según urgencia
+    dias_respuesta = {"normal": 5, "alta": 3, "urgente": 1}
+    fecha_limite = datetime.now() + timedelta(
+        days=dias_respuesta.get(urgencia, 5)
+    )
+
+    # Formatear fecha en español
+    meses = [
+        "enero", "febrero", "marzo", "abril", "mayo", "junio",
+        "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"
+    ]
+    fecha_str = f"{fecha_limite.day} de {meses[fecha_limite.month - 1]} de {fecha_limite.year}"
+
+    # Preparar contexto para el agente
+    contexto_proveedor = ""
+    if proveedor is not None:
+        contexto_proveedor = f"""
+INFORMACIÓN PROVEEDOR:
+- Nombre: {proveedor.get('nombre', 'N/A')}
+- Contacto: {proveedor.get('contacto', 'Estimado proveedor')}
+"""
+
+    contexto_productos = "PRODUCTOS A COTIZAR:\n"
+    for p in productos:
+        contexto_productos += f"- {p.get('nombre', 'N/A')}\n"
+        contexto_productos += f"  Cantidad: {p.get('cantidad', 'N/A')}\n"
+        if p.get('especificaciones'):
+            contexto_productos += f"  Especificaciones: {p.get('especificaciones')}\n"
+        if p.get('marca'):
+            contexto_productos += f"  Marca/modelo: {p.get('marca')}\n"
+        contexto_productos += "\n"
+
+    contexto_completo = f"""{contexto_proveedor}
+
+{contexto_productos}
+
+FECHA LÍMITE RESPUESTA: {fecha_str}
+URGENCIA: {urgencia.upper()}
+
+DATOS CONTACTO PEI:
+- Empresa: PEI (Productos y Servicios)
+- Departamento: Compras
+- Email: compras@pei.com
+- Teléfono: +52-55-1234-5678
+"""
+
+    return contexto_completo, fecha_limite
+
+
 def enviar_rfq(
     solicitud_id: int,
     proveedor: dict,
@@ -192,37 +559,108 @@ def enviar_rfq(
         >>> if resultado["exito"]:
         ...     print(f"RFQ #{resultado['rfq_id']} enviado a {resultado['email']}")
     """
-    db = SessionLocal()
-
     try:
         # Generar contenido del RFQ
         logger.info(
             f"Iniciando proceso de envío de RFQ para solicitud {solicitud_id}, "
             f"proveedor {proveedor.get('nombre')}"
         )
-        rfq_data = generar_rfq(solicitud_id, proveedor, productos, urgencia)
+        publicador = _publicador_fragmentos(solicitud_id, proveedor)
+        if publicador is None:
+            rfq_data = generar_rfq(solicitud_id, proveedor, productos, urgencia)
+        else:
+            rfq_data = generar_rfq(
+                solicitud_id, proveedor, productos, urgencia, al_fragmento=publicador
+            )
+            publicador.vaciar()
+
+        if not rfq_data["exito"]:
+            return rfq_data
+
+        return _guardar_y_enviar(solicitud_id, proveedor, rfq_data)
+
+    except Exception as e:
+        logger.error(f"Error en proceso RFQ: {e}")
+        return {"exito": False, "error": str(e)}
+
+
+async def enviar_rfq_async(
+    solicitud_id: int,
+    proveedor: dict,
+    productos: list,
+    urgencia: str = "normal",
+) -> dict:
+    """
+    Versión asíncrona de `enviar_rfq`.
+
+    La generación usa el cliente asíncrono de OpenAI; el guardado en BD y el
+    envío SMTP (ambos bloqueantes) se ejecutan en un hilo con `asyncio.to_thread`.
+
+    Args:
+        solicitud_id: ID de la solicitud de compra
+        proveedor: Diccionario con datos del proveedor (id, nombre, email, contacto)
+        productos: Lista de productos a cotizar
+        urgencia: Nivel de urgencia ("normal", "alta", "urgente")
+
+    Returns:
+        Dict con el mismo formato que `enviar_rfq`
+    """
+    try:
+        logger.info(
+            f"Iniciando proceso de envío de RFQ para solicitud {solicitud_id}, "
+            f"proveedor {proveedor.get('nombre')}"
+        )
+        publicador = _publicador_fragmentos(solicitud_id, proveedor)
+        if publicador is None:
+            rfq_data = await generar_rfq_async(solicitud_id, proveedor, productos, urgencia)
+        else:
+            rfq_data = await generar_rfq_async(
+                solicitud_id, proveedor, productos, urgencia, al_fragmento=publicador
+            )
+            publicador.vaciar()
 
         if not rfq_data["exito"]:
             return rfq_data
 
+        return await asyncio.to_thread(_guardar_y_enviar, solicitud_id, proveedor, rfq_data)
+
+    except Exception as e:
+        logger.error(f"Error en proceso RFQ: {e}")
+        return {"exito": False, "error": str(e)}
+
+
+def _guardar_y_enviar(solicitud_id: int, proveedor: dict, rfq_data: dict) -> dict:
+    """
+    Guarda un RFQ ya generado en BD y lo envía por email.
+
+    Es síncrono (SQLAlchemy + SMTP); la versión asíncrona lo ejecuta en un hilo.
+
+    Args:
+        solicitud_id: ID de la solicitud de compra
+        proveedor: Datos del proveedor (id, nombre, email)
+        rfq_data: Resultado exitoso de `generar_rfq`
+
+    Returns:
+        Dict con el resultado del envío
+    """
+    db = SessionLocal()
+
+    try:
         # Guardar en BD
         logger.info("Guardando RFQ en base de datos...")
-        rfq_obj = crear_rfq(
-            db=db,
-            solicitud_id=solicitud_id,
-            proveedor_id=proveedor["id"],
-            contenido=rfq_data["contenido"],
-        )
+        with medir("generador_rfq.guardar_bd"):
+            rfq_obj = crear_rfq(
+                db=db,
+                solicitud_id=solicitud_id,
+                proveedor_id=proveedor["id"],
+                contenido=rfq_data["contenido"],
+            )
 
         asunto = f"Solicitud de Cotización - {rfq_obj.numero_rfq}"
 
         # Enviar email usando el servicio existente
         logger.info(f"Enviando email a {proveedor.get('email')}...")
-        email_enviado = email_service.send_email(
-            to=proveedor["email"],
-            subject=asunto,
-            body=rfq_data["contenido"],
-        )
+        email_enviado = _enviar_email_medido(proveedor["email"], asunto, rfq_data["contenido"])
 
         if email_enviado:
             # Marcar RFQ como enviado
@@ -264,6 +702,8 @@ def enviar_rfqs_multiples(
     proveedores_recomendados: list,
     productos: list,
     urgencia: str = "normal",
+    max_concurrencia: Optional[int] = None,
+    modo: Optional[str] = None,
 ) -> dict:
     """
     Envía RFQs a múltiples proveedores de forma eficiente.
@@ -272,6 +712,10 @@ def enviar_rfqs_multiples(
     a cada uno. Puede asignar productos específicos a cada proveedor o enviar
     todos los productos a todos los proveedores.
 
+    Los proveedores se procesan concurrentemente (hasta `max_concurrencia` a
+    la vez); el fallo de uno no afecta a los demás y los detalles conservan
+    el orden de `proveedores_recomendados`.
+
     Args:
         solicitud_id: ID de la solicitud de compra
         proveedores_recomendados: Lista de proveedores, cada uno con:
@@ -280,6 +724,11 @@ def enviar_rfqs_multiples(
             - score: Puntuación del proveedor (opcional)
         productos: Lista completa de productos de la solicitud
         urgencia: Nivel de urgencia ("normal", "alta", "urgente")
+        max_concurrencia: Proveedores procesados a la vez
+            (por defecto settings.RFQ_MAX_CONCURRENCIA)
+        modo: "por_proveedor" (un RFQ generado por proveedor) o
+            "por_solicitud" (un cuerpo por conjunto de productos,
+            personalizado con plantilla); por defecto settings.RFQ_MODO_GENERACION
 
     Returns:
         Dict con:
@@ -304,46 +753,264 @@ def enviar_rfqs_multiples(
         >>> resultado = enviar_rfqs_multiples(1, proveedores, productos, "normal")
         >>> print(f"{resultado['exitosos']} de {resultado['total']} RFQs enviados")
     """
+    total = len(proveedores_recomendados)
+    limite = max_concurrencia or settings.RFQ_MAX_CONCURRENCIA
+    modo = _modo_generacion(modo)
+
     logger.info(
-        f"Iniciando envío masivo de RFQs: {len(proveedores_recomendados)} proveedores"
+        f"Iniciando envío masivo de RFQs: {total} proveedores "
+        f"(concurrencia máx: {limite}, modo: {modo})"
     )
 
-    resultados = []
-    exitosos = 0
-    fallidos = 0
-
-    for idx, proveedor_rec in enumerate(proveedores_recomendados, 1):
+    # Cuerpo común por conjunto de productos: lo genera el primer hilo que lo
+    # necesita y los demás esperan su resultado
+    cuerpos: Dict[str, Future] = {}
+    lock_cuerpos = threading.Lock()
+
+    def cuerpo_compartido(productos_proveedor: list) -> dict:
+        clave = _clave_productos(productos_proveedor)
+        with lock_cuerpos:
+            futuro = cuerpos.get(clave)
+            propio = futuro is None
+            if propio:
+                futuro = cuerpos[clave] = Future()
+        if propio:
+            try:
+                futuro.set_result(generar_cuerpo_rfq(productos_proveedor, urgencia))
+            except BaseException as e:
+                futuro.set_exception(e)  # No dejar esperando a los demás hilos
+                raise
+        return futuro.result()
+
+    def procesar(idx: int, proveedor_rec: dict) -> dict:
         proveedor = proveedor_rec.get("proveedor_data", {})
-        productos_asignados = proveedor_rec.get("productos_asignados", [])
+        logger.info(f"Procesando proveedor {idx}/{total}: {proveedor.get('nombre')}")
+
+        with medir("generador_rfq.proveedor") as span:
+            try:
+                productos_proveedor = _productos_para_proveedor(proveedor_rec, productos)
+                if modo == MODO_POR_SOLICITUD:
+                    resultado = _enviar_personalizado(
+                        solicitud_id, proveedor, cuerpo_compartido(productos_proveedor)
+                    )
+                else:
+                    resultado = enviar_rfq(solicitud_id, proveedor, productos_proveedor, urgencia)
+            except Exception as e:
+                resultado = _resultado_fallido(proveedor, e)
+            if not resultado["exito"]:
+                span.resultado = RESULTADO_ERROR
+
+        _publicar_resultado_rfq(solicitud_id, idx, total, proveedor, resultado)
+        return resultado
 
-        logger.info(
-            f"Procesando proveedor {idx}/{len(proveedores_recomendados)}: "
-            f"{proveedor.get('nombre')}"
+    # Cada proveedor se procesa en su propio hilo (LLM + BD + SMTP son
+    # bloqueantes); map conserva el orden de los proveedores recomendados.
+    # Cada hilo corre en una copia del contexto para conservar las métricas
+    # de la solicitud en curso.
+    contextos = [contextvars.copy_context() for _ in proveedores_recomendados]
+    with ThreadPoolExecutor(max_workers=max(1, min(limite, total))) as executor:
+        resultados = list(
+            executor.map(
+                lambda contexto, idx, rec: contexto.run(procesar, idx, rec),
+                contextos,
+                range(1, total + 1),
+                proveedores_recomendados,
+            )
         )
 
-        # Filtrar productos para este proveedor si hay asignación específica
-        if productos_asignados:
-            productos_proveedor = [
-                p for p in productos if p.get("nombre") in productos_asignados
-            ]
-            if not productos_proveedor:
-                logger.warning(
-                    f"No se encontraron productos asignados para {proveedor.get('nombre')}, "
-                    f"enviando todos los productos"
-                )
-                productos_proveedor = productos
-        else:
-            # Enviar todos si no hay asignación específica
-            productos_proveedor = productos
+    return _resumir_envios(resultados)
 
-        # Enviar RFQ a este proveedor
-        resultado = enviar_rfq(solicitud_id, proveedor, productos_proveedor, urgencia)
-        resultados.append(resultado)
 
-        if resultado["exito"]:
-            exitosos += 1
-        else:
-            fallidos += 1
+async def enviar_rfqs_multiples_async(
+    solicitud_id: int,
+    proveedores_recomendados: list,
+    productos: list,
+    urgencia: str = "normal",
+    rfqs_previos: Optional[Dict[int, dict]] = None,
+    max_concurrencia: Optional[int] = None,
+    modo: Optional[str] = None,
+) -> dict:
+    """
+    Versión asíncrona de `enviar_rfqs_multiples`.
+
+    Los proveedores se procesan concurrentemente, limitados por un semáforo
+    por solicitud y por los turnos globales de `planificador_rfqs`, que
+    atienden primero a las solicitudes más urgentes.
+
+    Args:
+        solicitud_id: ID de la solicitud de compra
+        proveedores_recomendados: Lista de proveedores recomendados
+        productos: Lista completa de productos de la solicitud
+        urgencia: Nivel de urgencia ("normal", "alta", "urgente")
+        rfqs_previos: RFQs ya existentes de la solicitud por proveedor_id
+            (ver `obtener_rfqs_previos`). Al reanudar, los ya enviados se
+            omiten y los borradores se reenvían sin volver a generarlos.
+        max_concurrencia: Proveedores procesados a la vez
+            (por defecto settings.RFQ_MAX_CONCURRENCIA)
+        modo: "por_proveedor" o "por_solicitud" (ver `enviar_rfqs_multiples`)
+
+    Returns:
+        Dict con el mismo formato que `enviar_rfqs_multiples`
+    """
+    rfqs_previos = rfqs_previos or {}
+    total = len(proveedores_recomendados)
+    limite = max_concurrencia or settings.RFQ_MAX_CONCURRENCIA
+    semaforo = asyncio.Semaphore(limite)
+    prioridad = prioridad_de(urgencia)
+    modo = _modo_generacion(modo)
+
+    # Tareas de generación del cuerpo común por conjunto de productos (solo
+    # en modo por_solicitud); los proveedores ya enviados no generan nada
+    cuerpos: Optional[Dict[str, asyncio.Task]] = {} if modo == MODO_POR_SOLICITUD else None
+
+    logger.info(
+        f"Iniciando envío masivo de RFQs: {total} proveedores "
+        f"(concurrencia máx: {limite}, modo: {modo})"
+    )
+
+    async def procesar(idx: int, proveedor_rec: dict) -> dict:
+        proveedor = proveedor_rec.get("proveedor_data", {})
+
+        async with semaforo, planificador_rfqs.turno(prioridad):
+            logger.info(f"Procesando proveedor {idx}/{total}: {proveedor.get('nombre')}")
+
+            with medir("generador_rfq.proveedor") as span:
+                try:
+                    resultado = await _enviar_a_proveedor_async(
+                        solicitud_id,
+                        proveedor_rec,
+                        productos,
+                        urgencia,
+                        rfqs_previos.get(proveedor.get("id")),
+                        cuerpos,
+                    )
+                except Exception as e:
+                    resultado = _resultado_fallido(proveedor, e)
+                if not resultado["exito"]:
+                    span.resultado = RESULTADO_ERROR
+
+        _publicar_resultado_rfq(solicitud_id, idx, total, proveedor, resultado)
+        return resultado
+
+    # gather conserva el orden de los proveedores recomendados
+    resultados = await asyncio.gather(
+        *(procesar(idx, rec) for idx, rec in enumerate(proveedores_recomendados, 1))
+    )
+
+    return _resumir_envios(list(resultados))
+
+
+async def _enviar_a_proveedor_async(
+    solicitud_id: int,
+    proveedor_rec: dict,
+    productos: list,
+    urgencia: str,
+    previo: Optional[dict],
+    cuerpos: Optional[Dict[str, asyncio.Task]] = None,
+) -> dict:
+    """
+    Envía (o reanuda) el RFQ de un proveedor recomendado.
+
+    Args:
+        solicitud_id: ID de la solicitud de compra
+        proveedor_rec: Proveedor recomendado (con proveedor_data)
+        productos: Lista completa de productos de la solicitud
+        urgencia: Nivel de urgencia
+        previo: RFQ existente del proveedor (ver `obtener_rfqs_previos`), o None
+        cuerpos: Cuerpos comunes por conjunto de productos (modo
+            por_solicitud); None genera un RFQ completo para el proveedor
+
+    Returns:
+        Dict con el resultado del envío
+    """
+    proveedor = proveedor_rec.get("proveedor_data", {})
+
+    if previo and previo["estado"] != EstadoRFQ.BORRADOR.value:
+        logger.info(f"↪️  RFQ {previo['numero_rfq']} ya fue enviado, se omite")
+        return {
+            "exito": True,
+            "rfq_id": previo["rfq_id"],
+            "numero_rfq": previo["numero_rfq"],
+            "proveedor": proveedor.get("nombre"),
+            "email": proveedor.get("email"),
+            "omitido": True,
+        }
+
+    if previo:
+        # El RFQ ya se generó pero el envío falló: reenviar sin llamar al LLM
+        resultado = await asyncio.to_thread(enviar_rfq_existente, previo["rfq_id"])
+        resultado["rfq_id"] = previo["rfq_id"]
+        return resultado
+
+    productos_proveedor = _productos_para_proveedor(proveedor_rec, productos)
+    if cuerpos is None:
+        return await enviar_rfq_async(solicitud_id, proveedor, productos_proveedor, urgencia)
+
+    # El primer proveedor de cada conjunto de productos lanza la generación;
+    # el resto espera la misma tarea
+    clave = _clave_productos(productos_proveedor)
+    if clave not in cuerpos:
+        cuerpos[clave] = asyncio.ensure_future(
+            generar_cuerpo_rfq_async(productos_proveedor, urgencia)
+        )
+    cuerpo_data = await cuerpos[clave]
+    return await asyncio.to_thread(_enviar_personalizado, solicitud_id, proveedor, cuerpo_data)
+
+
+def _enviar_personalizado(solicitud_id: int, proveedor: dict, cuerpo_data: dict) -> dict:
+    """Personaliza el cuerpo común para un proveedor, lo guarda y lo envía."""
+    if not cuerpo_data["exito"]:
+        return {"exito": False, "error": cuerpo_data["error"], "proveedor": proveedor}
+
+    return _guardar_y_enviar(solicitud_id, proveedor, personalizar_rfq(cuerpo_data, proveedor))
+
+
+def _modo_generacion(modo: Optional[str]) -> str:
+    """Modo de generación pedido o el configurado (ValueError si no existe)."""
+    modo = modo or settings.RFQ_MODO_GENERACION
+    if modo not in MODOS_GENERACION:
+        raise ValueError(f"Modo de generación de RFQ desconocido: {modo}")
+    return modo
+
+
+def _enviar_email_medido(destinatario: str, asunto: str, contenido: str) -> bool:
+    """Envía el email del RFQ registrando la duración del envío SMTP."""
+    with medir("generador_rfq.smtp") as span:
+        enviado = email_service.send_email(to=destinatario, subject=asunto, body=contenido)
+        if not enviado:
+            span.resultado = RESULTADO_ERROR
+    return enviado
+
+
+def _resultado_fallido(proveedor: dict, error: Exception) -> dict:
+    """Resultado de un proveedor cuyo envío lanzó una excepción inesperada."""
+    logger.error(f"Error enviando RFQ a {proveedor.get('nombre')}: {error}")
+    return {"exito": False, "error": str(error), "proveedor": proveedor.get("nombre")}
+
+
+def _publicar_resultado_rfq(
+    solicitud_id: int, idx: int, total: int, proveedor: dict, resultado: dict
+) -> None:
+    """Publica el resultado del RFQ de un proveedor en el bus de eventos."""
+    publicar_evento(
+        solicitud_id,
+        "rfq",
+        {
+            "indice": idx,
+            "total": total,
+            "proveedor": proveedor.get("nombre"),
+            "exito": resultado.get("exito", False),
+            "numero_rfq": resultado.get("numero_rfq"),
+            "omitido": resultado.get("omitido", False),
+            "error": resultado.get("error"),
+        },
+    )
+
+
+def _resumir_envios(resultados: List[dict]) -> dict:
+    """Cuenta exitosos y fallidos de un envío masivo."""
+    exitosos = sum(1 for r in resultados if r["exito"])
+    fallidos = len(resultados) - exitosos
 
     logger.info(
         f"Envío masivo completado: {exitosos} exitosos, {fallidos} fallidos "
@@ -358,31 +1025,102 @@ def enviar_rfqs_multiples(
     }
 
 
+def obtener_rfqs_previos(solicitud_id: int) -> Dict[int, dict]:
+    """
+    Obtiene los RFQs ya creados para una solicitud, indexados por proveedor.
+
+    Se usa al reanudar una solicitud para no volver a generar ni enviar los
+    RFQs que ya existen. Si un proveedor tiene varios, se toma el más avanzado
+    (enviado antes que borrador).
+
+    Args:
+        solicitud_id: ID de la solicitud de compra
+
+    Returns:
+        Dict {proveedor_id: {"rfq_id", "numero_rfq", "estado"}}
+    """
+    db = SessionLocal()
+
+    try:
+        rfqs_previos = {}
+        for rfq_obj in crud_rfq.get_by_solicitud(db, solicitud_id):
+            actual = rfqs_previos.get(rfq_obj.proveedor_id)
+            if actual and actual["estado"] != EstadoRFQ.BORRADOR.value:
+                continue
+
+            rfqs_previos[rfq_obj.proveedor_id] = {
+                "rfq_id": rfq_obj.id,
+                "numero_rfq": rfq_obj.numero_rfq,
+                "estado": rfq_obj.estado.value,
+            }
+
+        return rfqs_previos
+
+    finally:
+        db.close()
+
+
+def _productos_para_proveedor(proveedor_rec: dict, productos: list) -> list:
+    """
+    Filtra los productos asignados a un proveedor recomendado.
+
+    Si no hay asignación específica (o no coincide ninguno) se envían todos.
+    """
+    proveedor = proveedor_rec.get("proveedor_data", {})
+    productos_asignados = proveedor_rec.get("productos_asignados", [])
+
+    # Enviar todos si no hay asignación específica
+    if not productos_asignados:
+        return productos
+
+    productos_proveedor = [
+        p for p in productos if p.get("nombre") in productos_asignados
+    ]
+    if not productos_proveedor:
+        logger.warning(
+            f"No se encontraron productos asignados para {proveedor.get('nombre')}, "
+            f"enviando todos los productos"
+        )
+        return productos
+
+    return productos_proveedor
+
+
 def generar_borrador_rfq(
     solicitud_id: int,
     proveedor: dict,
     productos: list,
     urgencia: str = "normal",
+    en_lote: Optional[bool] = None,
+    al_fragmento: Optional[Callable[[str], None]] = None,
 ) -> dict:
     """
     Genera RFQ y lo guarda en BD como BORRADOR sin enviarlo por email.
 
-    Útil para revisar y aprobar RFQs antes de enviarlos.
+    Útil para revisar y aprobar RFQs antes de enviarlos. En modo lote el
+    borrador se crea vacío y `gestor_lotes_rfq` escribe el contenido cuando
+    la Batch API devuelve el resultado.
 
     Args:
         solicitud_id: ID de la solicitud de compra
         proveedor: Diccionario con datos del proveedor (id, nombre, email, contacto)
         productos: Lista de productos a cotizar
         urgencia: Nivel de urgencia ("normal", "alta", "urgente")
+        en_lote: Generar con la Batch API (por defecto, si RFQ_LOTE_HABILITADO
+            y la urgencia es normal)
+        al_fragmento: Si se indica, el borrador se redacta en streaming y se
+            llama con cada fragmento (no aplica en modo lote)
 
     Returns:
         Dict con:
             - exito: bool
             - rfq_id: int (ID del RFQ en BD)
             - numero_rfq: str (Número único del RFQ)
-            - contenido: str (Contenido generado)
+            - contenido: str (Contenido generado; None si está en lote)
             - proveedor: dict
             - fecha_limite: datetime
+            - pendiente_generacion: bool (True si el contenido llegará en lote)
+            - lote_id: int (solo en modo lote)
             - error: str (opcional)
 
     Example:
@@ -394,6 +1132,11 @@ def generar_borrador_rfq(
         ... )
         >>> print(f"Borrador {borrador['numero_rfq']} creado. Revisa antes de enviar.")
     """
+    if en_lote is None:
+        en_lote = settings.RFQ_LOTE_HABILITADO and urgencia == "normal"
+    if en_lote:
+        return _encolar_borrador_en_lote(solicitud_id, proveedor, productos, urgencia)
+
     db = SessionLocal()
 
     try:
@@ -403,7 +1146,9 @@ def generar_borrador_rfq(
         )
 
         # Generar contenido del RFQ
-        rfq_data = generar_rfq(solicitud_id, proveedor, productos, urgencia)
+        rfq_data = generar_rfq(
+            solicitud_id, proveedor, productos, urgencia, al_fragmento=al_fragmento
+        )
 
         if not rfq_data["exito"]:
             return rfq_data
@@ -429,6 +1174,7 @@ def generar_borrador_rfq(
             "proveedor": proveedor,
             "fecha_limite": rfq_data["fecha_limite"],
             "estado": "borrador",
+            "pendiente_generacion": False,
         }
 
     except Exception as e:
@@ -439,6 +1185,40 @@ def generar_borrador_rfq(
         db.close()
 
 
+def _encolar_borrador_en_lote(
+    solicitud_id: int, proveedor: dict, productos: list, urgencia: str
+) -> dict:
+    """Crea el borrador vacío y deja su generación en el lote abierto."""
+    try:
+        contexto_completo, fecha_limite = _construir_contexto(proveedor, productos, urgencia)
+        kwargs = construir_kwargs_agente(
+            prompt_sistema=registro_agentes.prompt("generador"),
+            mensaje_usuario=_mensaje_rfq(contexto_completo),
+            # El lote no puede escalar: va con el primer modelo de la tarea
+            modelo=enrutador_modelos.modelos(TAREA_GENERAR_RFQ)[0],
+            temperatura=TEMPERATURA_RFQ,
+            formato_json=False,
+        )
+
+        encolado = gestor_lotes_rfq.agregar(solicitud_id, proveedor["id"], kwargs)
+
+        return {
+            "exito": True,
+            "rfq_id": encolado["rfq_id"],
+            "numero_rfq": encolado["numero_rfq"],
+            "contenido": None,
+            "proveedor": proveedor,
+            "fecha_limite": fecha_limite,
+            "estado": "borrador",
+            "pendiente_generacion": True,
+            "lote_id": encolado["lote_id"],
+        }
+
+    except Exception as e:
+        logger.error(f"Error encolando borrador en lote: {e}")
+        return {"exito": False, "error": str(e)}
+
+
 def enviar_rfq_existente(rfq_id: int, contenido_editado: str = None) -> dict:
     """
     Envía un RFQ que ya existe en la BD (típicamente en estado BORRADOR).
@@ -477,13 +1257,23 @@ def enviar_rfq_existente(rfq_id: int, contenido_editado: str = None) -> dict:
                 "error": f"RFQ con ID {rfq_id} no encontrado",
             }
 
+        if rfq_obj.pendiente_generacion and not contenido_editado:
+            return {
+                "exito": False,
+                "error": f"RFQ {rfq_obj.numero_rfq} pendiente de generación en lote",
+                "numero_rfq": rfq_obj.numero_rfq,
+            }
+
         # Usar contenido editado si se proporciona, sino usar el original
         contenido_final = contenido_editado if contenido_editado else rfq_obj.contenido
 
-        # Actualizar contenido si fue editado
+        # Actualizar contenido si fue editado (un resultado de lote posterior
+        # ya no lo sobrescribe)
         if contenido_editado:
             crud_rfq.update(
-                db, db_obj=rfq_obj, obj_in={"contenido": contenido_editado}
+                db,
+                db_obj=rfq_obj,
+                obj_in={"contenido": contenido_editado, "pendiente_generacion": False},
             )
 
         # Obtener datos del proveedor
@@ -495,11 +1285,7 @@ def enviar_rfq_existente(rfq_id: int, contenido_editado: str = None) -> dict:
 
         # Enviar email
         asunto = f"Solicitud de Cotización - {rfq_obj.numero_rfq}"
-        email_enviado = email_service.send_email(
-            to=proveedor.email,
-            subject=asunto,
-            body=contenido_final,
-        )
+        email_enviado = _enviar_email_medido(proveedor.email, asunto, contenido_final)
 
         if email_enviado:
             # Marcar como enviado
@@ -568,6 +1354,7 @@ def obtener_rfqs_pendientes(solicitud_id: int = None) -> List[dict]:
                 "proveedor_nombre": rfq_obj.proveedor.nombre,
                 "proveedor_email": rfq_obj.proveedor.email,
                 "contenido": rfq_obj.contenido,
+                "pendiente_generacion": rfq_obj.pendiente_generacion,
                 "asunto": rfq_obj.asunto,
                 "estado": rfq_obj.estado.value,
                 "created_at": rfq_obj.created_at,
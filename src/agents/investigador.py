@@ -3,26 +3,65 @@ Agente Investigador - FASE 3
 Busca proveedores en BD local, web y ecommerce
 """
 
+import asyncio
 import json
-import os
+from concurrent.futures import ThreadPoolExecutor, wait
 from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import aiohttp
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
+from src.agents.registro import registro_agentes
 from src.database.models import Proveedor
-from src.services.openai_service import llamar_agente
+from src.services.openai_service import llamar_agente, llamar_agente_async
 from src.services.search_service import search_service
+from src.core.enrutador import TAREA_INVESTIGAR
+from src.core.indice_proveedores import indice_proveedores, palabras_clave
+from src.core.metricas import medir
+from src.core.similitud_proveedores import motor_similitud
+from src.core.tokens import contar_tokens
+from config.logging_config import logger
 from config.settings import settings
 
-# Leer prompt del archivo
-PROMPT_PATH = os.path.join(os.path.dirname(__file__), "../prompts/investigador_prompt.txt")
-with open(PROMPT_PATH, "r", encoding="utf-8") as f:
-    PROMPT_INVESTIGADOR = f.read()
-
 # Configurar sesión de BD
 engine = create_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(bind=engine)
 
+# Tokenizador con el que se presupuesta el mensaje (los modelos de la tarea
+# investigar comparten codificación)
+MODELO_TOKENIZADOR = "gpt-4o-mini"
+
+# Campos de cada fuente que se envían al agente (el resto no aporta a la
+# decisión y solo ocupa tokens)
+CAMPOS_PROMPT = {
+    "bd": (
+        "id", "nombre", "categoria", "ciudad", "rating", "email", "telefono",
+        "es_verificado", "notas",
+    ),
+    "web": ("nombre", "url", "descripcion"),
+    "ecommerce": ("marketplace", "producto", "url_compra", "precio_aprox"),
+}
+
+# Campos con los que se mide la relevancia de cada fuente respecto al producto
+CAMPOS_RELEVANCIA = {
+    "bd": ("nombre", "categoria", "subcategorias", "notas", "ciudad"),
+    "web": ("nombre", "descripcion"),
+    "ecommerce": ("producto", "descripcion"),
+}
+
+# Datos de contacto con que se enriquecen las recomendaciones de la BD
+CAMPOS_CONTACTO = ("id", "nombre", "email", "telefono", "ciudad")
+
+# Segundos extra sobre BUSQUEDA_TIMEOUT_SEG que se espera a una búsqueda
+# síncrona: el servicio corta cada consulta en el timeout y devuelve lo que
+# alcanzó a traer (p. ej. los marketplaces que sí respondieron)
+MARGEN_TIMEOUT_SEG = 1.0
+
+# Textos largos (descripciones, notas) se recortan a este largo en el prompt
+MAX_CARACTERES_TEXTO = 160
+
 
 def buscar_proveedores(productos: list, usar_web: bool = True) -> dict:
     """
@@ -39,27 +78,9 @@ def buscar_proveedores(productos: list, usar_web: bool = True) -> dict:
     db = SessionLocal()
 
     try:
-        # 1. Obtener todos los proveedores de BD LOCAL (verificados preferentemente)
-        proveedores_bd = db.query(Proveedor).all()
-
-        if not proveedores_bd:
-            proveedores_bd = []
-
-        # Preparar info para el agente
-        info_proveedores_bd = [
-            {
-                "id": p.id,
-                "nombre": p.nombre,
-                "categoria": p.categoria,
-                "rating": p.rating,
-                "email": p.email,
-                "telefono": p.telefono,
-                "notas": p.notas,
-                "es_verificado": p.es_verificado,
-                "fuente": "base_de_datos"
-            }
-            for p in proveedores_bd
-        ]
+        # 1. Candidatos de BD LOCAL por producto (índice en memoria)
+        with medir("investigador.carga_bd"):
+            info_proveedores_bd = _cargar_proveedores_bd(db, productos)
 
         # 2. NUEVO: Buscar en INTERNET si está habilitado
         proveedores_web = []
@@ -67,113 +88,640 @@ def buscar_proveedores(productos: list, usar_web: bool = True) -> dict:
 
         if usar_web and search_service.is_available():
             print("🌐 Buscando proveedores en internet...")
+            proveedores_web, enlaces_ecommerce = _buscar_web_en_paralelo(productos)
 
-            for producto in productos:
-                nombre_producto = producto.get("nombre", "")
-
-                # Buscar proveedores en web
-                try:
-                    web_results = search_service.buscar_proveedores_web(
-                        nombre_producto,
-                        ubicacion="México",
-                        num_resultados=5
-                    )
-                    proveedores_web.extend(web_results)
-                    print(f"  ✓ Encontrados {len(web_results)} proveedores web para {nombre_producto}")
-                except Exception as e:
-                    print(f"  ⚠️  Error buscando proveedores web: {e}")
-
-                # Buscar en marketplaces
-                try:
-                    ecommerce_results = search_service.buscar_en_ecommerce(nombre_producto)
-                    enlaces_ecommerce.extend(ecommerce_results)
-                    print(f"  ✓ Encontrados {len(ecommerce_results)} productos en ecommerce")
-                except Exception as e:
-                    print(f"  ⚠️  Error buscando en ecommerce: {e}")
-
-        # 3. Preparar mensaje para el agente con TODAS las fuentes
-        mensaje = f"""
-PRODUCTOS A COMPRAR:
-{json.dumps(productos, indent=2, ensure_ascii=False)}
+        # 3. Preparar mensaje con los candidatos más relevantes de cada fuente
+        mensaje, seleccion = _construir_mensaje(
+            productos, info_proveedores_bd, proveedores_web, enlaces_ecommerce
+        )
 
-PROVEEDORES EN BASE DE DATOS LOCAL ({len(info_proveedores_bd)}):
-{json.dumps(info_proveedores_bd, indent=2, ensure_ascii=False)}
+        # 4. Llamar agente
+        with medir("investigador.llm"):
+            resultado = llamar_agente(
+                prompt_sistema=registro_agentes.prompt("investigador"),
+                agente="investigador",
+                mensaje_usuario=mensaje,
+                tarea=TAREA_INVESTIGAR,
+                validar=_validar_recomendaciones,
+                temperatura=0.4,
+                formato_json=True
+            )
 
-PROVEEDORES ENCONTRADOS EN WEB ({len(proveedores_web)}):
-{json.dumps(proveedores_web, indent=2, ensure_ascii=False)}
+        # 5. Parsear resultado
+        recomendaciones = json.loads(resultado)
 
-PRODUCTOS EN ECOMMERCE ({len(enlaces_ecommerce)}):
-{json.dumps(enlaces_ecommerce, indent=2, ensure_ascii=False)}
+        # 6. Enriquecer con datos completos de proveedores BD
+        with medir("investigador.enriquecimiento"):
+            _enriquecer_recomendaciones(db, recomendaciones, info_proveedores_bd)
 
-INSTRUCCIONES IMPORTANTES:
-1. Para cada proveedor recomendado, incluye TODA la información de contacto disponible:
-   - Proveedores BD: proveedor_id, email, telefono, ciudad, rating
-   - Proveedores Web: nombre completo, URL completa, descripción
-   - Ecommerce: marketplace, producto, URL COMPLETA de compra, precio
+        # 7. Retornar resultado completo con TODAS las fuentes
+        return _armar_resultado(
+            info_proveedores_bd,
+            proveedores_web,
+            enlaces_ecommerce,
+            recomendaciones,
+            busqueda_web_activa=usar_web and search_service.is_available(),
+            seleccion=seleccion,
+        )
 
-2. Analiza y recomienda:
-   - Qué proveedores de BD contactar (con email y teléfono)
-   - Qué proveedores web investigar (con URL completa)
-   - Qué productos comprar directo en ecommerce (con URL de compra)
-   - Cuál es la estrategia más eficiente (precio vs tiempo)
+    except json.JSONDecodeError as e:
+        print(f"Error parseando JSON: {e}")
+        return {
+            "error": "Error parseando respuesta del agente",
+            "proveedores_recomendados": []
+        }
 
-3. En "como_contactar" describe específicamente cómo proceder con cada proveedor.
-        """
+    except Exception as e:
+        print(f"Error buscando proveedores: {e}")
+        return {
+            "error": str(e),
+            "proveedores_recomendados": []
+        }
 
-        # 4. Llamar agente con contexto completo
-        resultado = llamar_agente(
-            prompt_sistema=PROMPT_INVESTIGADOR,
-            mensaje_usuario=mensaje,
-            modelo="gpt-4o-mini",
-            temperatura=0.4,
-            formato_json=True
-        )
+    finally:
+        db.close()
 
-        # 5. Parsear resultado
+
+async def buscar_proveedores_async(
+    productos: list,
+    usar_web: bool = True,
+    busqueda_anticipada: Optional["BusquedaWebAnticipada"] = None,
+) -> dict:
+    """
+    Versión asíncrona de `buscar_proveedores`.
+
+    Las consultas a BD se ejecutan en un hilo (SQLAlchemy es síncrono), las
+    búsquedas web usan HTTP asíncrono (todos los productos a la vez) y la
+    llamada al LLM usa `AsyncOpenAI`, por lo que el event loop queda libre
+    durante toda la búsqueda.
+
+    Args:
+        productos: Lista de productos con nombre, cantidad, categoría
+        usar_web: Si True, también busca en internet (default: True)
+        busqueda_anticipada: Búsquedas ya lanzadas mientras el Receptor
+            emitía los productos (ver `BusquedaWebAnticipada`); solo se
+            espera a las que faltan. El llamador es responsable de cerrarla.
+
+    Returns:
+        Dict con el mismo formato que `buscar_proveedores`
+    """
+    try:
+        # 1. Candidatos de BD local (en hilo aparte: la primera vez construye el índice)
+        with medir("investigador.carga_bd"):
+            info_proveedores_bd = await asyncio.to_thread(
+                _en_sesion, _cargar_proveedores_bd, productos
+            )
+
+        # 2. Búsqueda web y ecommerce con HTTP asíncrono, un producto por tarea
+        proveedores_web = []
+        enlaces_ecommerce = []
+        busqueda_web_activa = usar_web and search_service.is_available()
+
+        if busqueda_web_activa:
+            logger.info("🌐 Buscando proveedores en internet...")
+
+            busqueda = busqueda_anticipada or BusquedaWebAnticipada()
+            try:
+                proveedores_web, enlaces_ecommerce = await busqueda.resultados(productos)
+            finally:
+                if busqueda_anticipada is None:
+                    await busqueda.cerrar()
+
+        # 3-5. Mensaje, llamada al agente y parseo
+        mensaje, seleccion = _construir_mensaje(
+            productos, info_proveedores_bd, proveedores_web, enlaces_ecommerce
+        )
+        with medir("investigador.llm"):
+            resultado = await llamar_agente_async(
+                prompt_sistema=registro_agentes.prompt("investigador"),
+                agente="investigador",
+                mensaje_usuario=mensaje,
+                tarea=TAREA_INVESTIGAR,
+                validar=_validar_recomendaciones,
+                temperatura=0.4,
+                formato_json=True
+            )
         recomendaciones = json.loads(resultado)
 
-        # 6. Enriquecer con datos completos de proveedores BD
-        for rec in recomendaciones.get("proveedores_recomendados", []):
-            if rec.get("fuente") == "base_de_datos":
-                proveedor = db.query(Proveedor).filter(
-                    Proveedor.id == rec["proveedor_id"]
-                ).first()
-
-                if proveedor:
-                    rec["proveedor_data"] = {
-                        "nombre": proveedor.nombre,
-                        "email": proveedor.email,
-                        "telefono": proveedor.telefono,
-                        "ciudad": proveedor.ciudad
-                    }
+        # 6. Enriquecer con datos de BD (en hilo aparte)
+        with medir("investigador.enriquecimiento"):
+            await asyncio.to_thread(
+                _en_sesion, _enriquecer_recomendaciones, recomendaciones, info_proveedores_bd
+            )
 
-        # 7. Retornar resultado completo con TODAS las fuentes
-        return {
-            "proveedores_bd": info_proveedores_bd,
-            "proveedores_web": proveedores_web,
-            "enlaces_ecommerce": enlaces_ecommerce,
-            "recomendaciones": recomendaciones,
-            "resumen": {
-                "total_proveedores_bd": len(info_proveedores_bd),
-                "total_proveedores_web": len(proveedores_web),
-                "total_enlaces_ecommerce": len(enlaces_ecommerce),
-                "busqueda_web_activa": usar_web and search_service.is_available()
-            }
-        }
+        return _armar_resultado(
+            info_proveedores_bd,
+            proveedores_web,
+            enlaces_ecommerce,
+            recomendaciones,
+            busqueda_web_activa=busqueda_web_activa,
+            seleccion=seleccion,
+        )
 
     except json.JSONDecodeError as e:
-        print(f"Error parseando JSON: {e}")
+        logger.error(f"Error parseando JSON: {e}")
         return {
             "error": "Error parseando respuesta del agente",
             "proveedores_recomendados": []
         }
 
     except Exception as e:
-        print(f"Error buscando proveedores: {e}")
+        logger.error(f"Error buscando proveedores: {e}")
         return {
             "error": str(e),
             "proveedores_recomendados": []
         }
 
+
+class BusquedaWebAnticipada:
+    """
+    Búsquedas web y ecommerce por producto, lanzadas en cuanto se conoce cada uno.
+
+    El orquestador la alimenta con los productos que el Receptor va emitiendo
+    en streaming; cuando el Investigador arranca, solo espera a las búsquedas
+    pendientes en lugar de sumar la latencia de extracción y de búsqueda.
+
+    Uso típico:
+        >>> busqueda = BusquedaWebAnticipada()
+        >>> busqueda.iniciar({"nombre": "PLC Siemens S7-1200"})  # durante el streaming
+        >>> web, ecommerce = await busqueda.resultados(productos)
+        >>> await busqueda.cerrar()
+    """
+
+    def __init__(self):
+        """Inicializa sin búsquedas en curso."""
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._tareas: Dict[str, asyncio.Task] = {}
+
+    def iniciar(self, producto: dict) -> None:
+        """
+        Lanza la búsqueda de un producto si aún no se lanzó.
+
+        Debe llamarse desde el event loop (crea una tarea de asyncio).
+
+        Args:
+            producto: Producto con al menos "nombre"
+        """
+        nombre = _nombre_busqueda(producto)
+        if not nombre or nombre in self._tareas:
+            return
+
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+
+        self._tareas[nombre] = asyncio.create_task(
+            _buscar_producto_web(nombre, self._session)
+        )
+        logger.info(f"🌐 Búsqueda iniciada: {nombre}")
+
+    async def resultados(self, productos: list) -> Tuple[list, list]:
+        """
+        Espera las búsquedas de los productos finales.
+
+        Lanza las que falten y cancela las de productos que la extracción
+        final descartó o renombró.
+
+        Args:
+            productos: Productos validados por el Receptor
+
+        Returns:
+            Tupla (proveedores_web, enlaces_ecommerce) en el orden de `productos`
+        """
+        nombres = list(dict.fromkeys(
+            nombre for nombre in map(_nombre_busqueda, productos) if nombre
+        ))
+        for nombre in nombres:
+            self.iniciar({"nombre": nombre})
+
+        for nombre, tarea in self._tareas.items():
+            if nombre not in nombres:
+                tarea.cancel()
+
+        pares = await asyncio.gather(*(self._tareas[nombre] for nombre in nombres))
+
+        proveedores_web = [r for web, _ in pares for r in web]
+        enlaces_ecommerce = [r for _, ecommerce in pares for r in ecommerce]
+        return proveedores_web, enlaces_ecommerce
+
+    async def cerrar(self) -> None:
+        """Cancela las búsquedas pendientes y cierra la sesión HTTP."""
+        for tarea in self._tareas.values():
+            tarea.cancel()
+        await asyncio.gather(*self._tareas.values(), return_exceptions=True)
+
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+def crear_busqueda_anticipada() -> Optional[BusquedaWebAnticipada]:
+    """
+    Crea una búsqueda anticipada si la búsqueda web está disponible.
+
+    Returns:
+        BusquedaWebAnticipada, o None si está desactivada
+        (settings.INVESTIGADOR_BUSQUEDA_ANTICIPADA) o no hay API de búsqueda
+    """
+    if not settings.INVESTIGADOR_BUSQUEDA_ANTICIPADA or not search_service.is_available():
+        return None
+    return BusquedaWebAnticipada()
+
+
+async def _buscar_producto_web(
+    nombre_producto: str, session: aiohttp.ClientSession
+) -> Tuple[list, list]:
+    """Busca un producto en web y ecommerce a la vez; retorna (web, ecommerce)."""
+    async def web() -> list:
+        with medir("investigador.busqueda_web"):
+            return await search_service.buscar_proveedores_web_async(
+                nombre_producto,
+                ubicacion="México",
+                num_resultados=5,
+                session=session,
+            )
+
+    async def ecommerce() -> list:
+        with medir("investigador.busqueda_ecommerce"):
+            return await search_service.buscar_en_ecommerce_async(
+                nombre_producto, session=session
+            )
+
+    web_results, ecommerce_results = await asyncio.gather(web(), ecommerce())
+    return web_results, ecommerce_results
+
+
+def _buscar_web_en_paralelo(productos: list) -> Tuple[list, list]:
+    """
+    Busca todos los productos en web y ecommerce a la vez (versión síncrona).
+
+    Cada par producto × fuente va en un hilo de un pool acotado por
+    `BUSQUEDA_MAX_CONCURRENCIA`, así que el tiempo total es el de la
+    búsqueda más lenta y no la suma. Las que no terminan en
+    `BUSQUEDA_TIMEOUT_SEG` (más `MARGEN_TIMEOUT_SEG`) se omiten.
+
+    Args:
+        productos: Productos con al menos "nombre"
+
+    Returns:
+        Tupla (proveedores_web, enlaces_ecommerce) en el orden de `productos`
+    """
+    nombres = list(dict.fromkeys(
+        nombre for nombre in map(_nombre_busqueda, productos) if nombre
+    ))
+    if not nombres:
+        return [], []
+
+    fuentes = {
+        "web": lambda nombre: search_service.buscar_proveedores_web(
+            nombre, ubicacion="México", num_resultados=5
+        ),
+        "ecommerce": search_service.buscar_en_ecommerce,
+    }
+    pool = ThreadPoolExecutor(
+        max_workers=min(settings.BUSQUEDA_MAX_CONCURRENCIA, len(nombres) * len(fuentes)),
+        thread_name_prefix="investigador-busqueda",
+    )
+    try:
+        futuros = {
+            (nombre, fuente): pool.submit(_buscar_fuente, fuente, buscar, nombre)
+            for nombre in nombres
+            for fuente, buscar in fuentes.items()
+        }
+        _, pendientes = wait(
+            futuros.values(), timeout=settings.BUSQUEDA_TIMEOUT_SEG + MARGEN_TIMEOUT_SEG
+        )
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    resultados: Dict[Tuple[str, str], list] = {}
+    for (nombre, fuente), futuro in futuros.items():
+        if futuro in pendientes:
+            logger.warning(f"⏱️ Búsqueda {fuente} de {nombre} sin respuesta; se omite")
+            resultados[(nombre, fuente)] = []
+        else:
+            resultados[(nombre, fuente)] = futuro.result()
+            logger.info(
+                f"✓ {len(resultados[(nombre, fuente)])} resultado(s) {fuente} para {nombre}"
+            )
+
+    proveedores_web = [r for nombre in nombres for r in resultados[(nombre, "web")]]
+    enlaces_ecommerce = [r for nombre in nombres for r in resultados[(nombre, "ecommerce")]]
+    return proveedores_web, enlaces_ecommerce
+
+
+def _buscar_fuente(fuente: str, buscar, nombre: str) -> list:
+    """Ejecuta una búsqueda midiéndola; ante error retorna lista vacía."""
+    try:
+        with medir(f"investigador.busqueda_{fuente}"):
+            return buscar(nombre)
+    except Exception as e:
+        logger.warning(f"⚠️  Error buscando {fuente} para {nombre}: {e}")
+        return []
+
+
+def _nombre_busqueda(producto: dict) -> str:
+    """Nombre del producto usado como término (y clave) de búsqueda."""
+    nombre = producto.get("nombre") if isinstance(producto, dict) else None
+    return nombre.strip() if isinstance(nombre, str) else ""
+
+
+def _en_sesion(funcion, *args):
+    """Ejecuta `funcion(db, *args)` con una sesión propia que se cierra al terminar."""
+    db = SessionLocal()
+    try:
+        return funcion(db, *args)
     finally:
         db.close()
+
+
+def _cargar_proveedores_bd(db, productos: list) -> list:
+    """
+    Candidatos de BD para los productos, en el formato que recibe el agente.
+
+    Por producto, junta los `INDICE_PROVEEDORES_CANDIDATOS_POR_PRODUCTO` con
+    más términos en común (`indice_proveedores`) y los más similares por
+    trigramas (`motor_similitud`), sin repetir. La similitud se guarda por
+    producto en la clave "similitudes" ({índice en `productos`: similitud}),
+    así un proveedor parecido a un producto no sube en el ranking de otro.
+    Solo la primera consulta (o una reconstrucción) lee la tabla.
+    """
+    top_k = settings.INDICE_PROVEEDORES_CANDIDATOS_POR_PRODUCTO
+    candidatos: Dict[int, dict] = {}
+    for indice_producto, producto in enumerate(productos):
+        if not isinstance(producto, dict):
+            continue
+        terminos = _terminos_producto(producto)
+        for proveedor in indice_proveedores.buscar(db, terminos, top_k):
+            candidatos.setdefault(proveedor["id"], proveedor)
+        for proveedor in motor_similitud.buscar(db, terminos, top_k):
+            similitud = proveedor.pop("similitud")
+            previo = candidatos.setdefault(proveedor["id"], proveedor)
+            previo.setdefault("similitudes", {})[indice_producto] = similitud
+    return list(candidatos.values())
+
+
+def precargar_catalogo() -> None:
+    """
+    Construye el índice y el motor de similitud antes de la primera búsqueda.
+
+    Con catálogos grandes la construcción tarda segundos; se llama al
+    arrancar la API para que no la pague la primera solicitud.
+    """
+    try:
+        _en_sesion(indice_proveedores.construir)
+        _en_sesion(motor_similitud.construir)
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo precargar el catálogo de proveedores: {e}")
+
+
+def _terminos_producto(producto: dict) -> Set[str]:
+    """Términos con los que se buscan candidatos para un producto."""
+    terminos: Set[str] = set()
+    for campo in ("nombre", "categoria", "especificaciones", "marca"):
+        terminos |= palabras_clave(producto.get(campo))
+    return terminos
+
+
+def _ranking(
+    terminos: Set[str], candidatos: list, fuente: str, top_k: int, indice_producto: int
+) -> List[int]:
+    """
+    Índices de los `top_k` candidatos más relevantes para un producto.
+
+    Los proveedores de BD sin ningún término en común ni similitud con este
+    producto (ver `_cargar_proveedores_bd`) se descartan; la similitud suma
+    a las coincidencias y a igualdad ganan los verificados y mejor
+    calificados.
+    Los resultados web y de ecommerce ya vienen de buscar el producto, así
+    que solo se ordenan (manteniendo el orden del buscador en empates).
+    """
+    puntajes = []
+    for indice, candidato in enumerate(candidatos):
+        texto = [candidato.get(campo) or "" for campo in CAMPOS_RELEVANCIA[fuente]]
+        coincidencias = len(terminos & palabras_clave(texto))
+
+        if fuente == "bd":
+            similitud = (candidato.get("similitudes") or {}).get(indice_producto, 0)
+            if not coincidencias and not similitud:
+                continue
+            extra = (
+                similitud
+                + (candidato.get("rating") or 0) / 10
+                + (0.5 if candidato.get("es_verificado") else 0)
+            )
+        else:
+            extra = 0
+        puntajes.append((coincidencias + extra, -indice, indice))
+
+    puntajes.sort(reverse=True)
+    return [indice for _, _, indice in puntajes[:top_k]]
+
+
+def _compactar(candidato: dict, fuente: str) -> str:
+    """Proyección del candidato a sus campos útiles, en JSON de una línea."""
+    proyeccion = {}
+    for campo in CAMPOS_PROMPT[fuente]:
+        valor = candidato.get(campo)
+        if valor in (None, ""):
+            continue
+        if isinstance(valor, str) and len(valor) > MAX_CARACTERES_TEXTO:
+            valor = valor[:MAX_CARACTERES_TEXTO] + "…"
+        proyeccion[campo] = valor
+    return _json_compacto(proyeccion)
+
+
+def _json_compacto(valor) -> str:
+    return json.dumps(valor, ensure_ascii=False, separators=(",", ":"))
+
+
+def _construir_mensaje(
+    productos: list,
+    info_proveedores_bd: list,
+    proveedores_web: list,
+    enlaces_ecommerce: list,
+    top_k: Optional[int] = None,
+    max_tokens: Optional[int] = None,
+) -> Tuple[str, Dict[str, int]]:
+    """
+    Arma el mensaje de usuario con los candidatos más relevantes de cada fuente.
+
+    Por cada producto y fuente se toman los `top_k` candidatos más
+    relevantes (una línea JSON compacta por candidato) y se agregan por
+    rondas (el mejor de cada producto y fuente, luego el segundo...) hasta
+    llenar el presupuesto de tokens. Así el mensaje no crece con el tamaño
+    de la tabla de proveedores ni desborda la ventana de contexto.
+
+    Args:
+        productos: Productos a comprar
+        info_proveedores_bd: Proveedores de la BD local
+        proveedores_web: Resultados de búsqueda web
+        enlaces_ecommerce: Resultados de marketplaces
+        top_k: Candidatos por producto y fuente
+            (settings.INVESTIGADOR_TOP_K_POR_PRODUCTO)
+        max_tokens: Tokens máximos del mensaje
+            (settings.INVESTIGADOR_MAX_TOKENS_PROMPT)
+
+    Returns:
+        Tupla (mensaje, {"candidatos_en_prompt", "candidatos_descartados",
+        "tokens_prompt"})
+    """
+    top_k = top_k or settings.INVESTIGADOR_TOP_K_POR_PRODUCTO
+    max_tokens = max_tokens or settings.INVESTIGADOR_MAX_TOKENS_PROMPT
+
+    fuentes = {"bd": info_proveedores_bd, "web": proveedores_web, "ecommerce": enlaces_ecommerce}
+    terminos = {
+        indice: _terminos_producto(producto)
+        for indice, producto in enumerate(productos) if isinstance(producto, dict)
+    }
+    rankings = {
+        fuente: [_ranking(t, candidatos, fuente, top_k, i) for i, t in terminos.items()]
+        for fuente, candidatos in fuentes.items()
+    }
+
+    lineas: Dict[str, List[str]] = {fuente: [] for fuente in fuentes}
+    incluidos: Dict[str, Set[int]] = {fuente: set() for fuente in fuentes}
+    tokens = contar_tokens(_plantilla_mensaje(productos, lineas), MODELO_TOKENIZADOR)
+
+    for rango in range(top_k):
+        for fuente, por_producto in rankings.items():
+            for ranking in por_producto:
+                if rango >= len(ranking) or ranking[rango] in incluidos[fuente]:
+                    continue
+
+                linea = _compactar(fuentes[fuente][ranking[rango]], fuente)
+                costo = contar_tokens(linea, MODELO_TOKENIZADOR) + 1  # Salto de línea
+                if tokens + costo > max_tokens:
+                    continue
+
+                lineas[fuente].append(linea)
+                incluidos[fuente].add(ranking[rango])
+                tokens += costo
+
+    mensaje = _plantilla_mensaje(productos, lineas)
+    en_prompt = sum(len(i) for i in incluidos.values())
+    seleccion = {
+        "candidatos_en_prompt": en_prompt,
+        "candidatos_descartados": sum(len(c) for c in fuentes.values()) - en_prompt,
+        "tokens_prompt": contar_tokens(mensaje, MODELO_TOKENIZADOR),
+    }
+
+    logger.info(
+        f"🧮 Prompt del investigador: {seleccion['candidatos_en_prompt']} candidato(s), "
+        f"{seleccion['candidatos_descartados']} descartado(s), "
+        f"{seleccion['tokens_prompt']} tokens"
+    )
+    return mensaje, seleccion
+
+
+def _plantilla_mensaje(productos: list, lineas: Dict[str, List[str]]) -> str:
+    """Mensaje de usuario con los candidatos ya seleccionados y compactados."""
+    def seccion(fuente: str) -> str:
+        return "\n".join(lineas[fuente]) or "(ninguno)"
+
+    return f"""
+PRODUCTOS A COMPRAR:
+{_json_compacto(productos)}
+
+Cada candidato es un objeto JSON por línea, ordenados por relevancia.
+
+PROVEEDORES EN BASE DE DATOS LOCAL ({len(lineas["bd"])}):
+{seccion("bd")}
+
+PROVEEDORES ENCONTRADOS EN WEB ({len(lineas["web"])}):
+{seccion("web")}
+
+PRODUCTOS EN ECOMMERCE ({len(lineas["ecommerce"])}):
+{seccion("ecommerce")}
+
+INSTRUCCIONES IMPORTANTES:
+1. Para cada proveedor recomendado, incluye TODA la información de contacto disponible:
+   - Proveedores BD: proveedor_id, email, telefono, ciudad, rating
+   - Proveedores Web: nombre completo, URL completa, descripción
+   - Ecommerce: marketplace, producto, URL COMPLETA de compra, precio
+
+2. Analiza y recomienda:
+   - Qué proveedores de BD contactar (con email y teléfono)
+   - Qué proveedores web investigar (con URL completa)
+   - Qué productos comprar directo en ecommerce (con URL de compra)
+   - Cuál es la estrategia más eficiente (precio vs tiempo)
+
+3. En "como_contactar" describe específicamente cómo proceder con cada proveedor.
+        """
+
+
+def _validar_recomendaciones(contenido: str) -> None:
+    """Escala de modelo si la respuesta no trae la lista de recomendados."""
+    datos = json.loads(contenido)
+    if not isinstance(datos, dict) or not isinstance(datos.get("proveedores_recomendados"), list):
+        raise ValueError("La respuesta no incluye proveedores_recomendados")
+
+
+def _enriquecer_recomendaciones(
+    db, recomendaciones: dict, proveedores_cargados: Optional[list] = None
+) -> None:
+    """
+    Agrega `proveedor_data` a las recomendaciones que vienen de la BD.
+
+    Los datos salen de los candidatos ya cargados para el prompt; solo los
+    proveedores que no están entre ellos se leen de la BD, todos en una
+    consulta `IN`.
+
+    Args:
+        db: Sesión de SQLAlchemy
+        recomendaciones: Respuesta del agente (se modifica en el lugar)
+        proveedores_cargados: Proveedores de BD ya cargados (formato de
+            `_cargar_proveedores_bd`)
+    """
+    recomendados_bd = [
+        rec for rec in recomendaciones.get("proveedores_recomendados", [])
+        if rec.get("fuente") == "base_de_datos"
+    ]
+    if not recomendados_bd:
+        return
+
+    conocidos = {p["id"]: p for p in proveedores_cargados or []}
+    faltantes = {
+        proveedor_id for proveedor_id in map(_id_proveedor, recomendados_bd)
+        if proveedor_id is not None and proveedor_id not in conocidos
+    }
+    if faltantes:
+        for proveedor in db.query(Proveedor).filter(Proveedor.id.in_(faltantes)):
+            conocidos[proveedor.id] = {campo: getattr(proveedor, campo) for campo in CAMPOS_CONTACTO}
+
+    for rec in recomendados_bd:
+        proveedor = conocidos.get(_id_proveedor(rec))
+        if proveedor:
+            rec["proveedor_data"] = {campo: proveedor.get(campo) for campo in CAMPOS_CONTACTO}
+
+
+def _id_proveedor(recomendacion: dict) -> Optional[int]:
+    """`proveedor_id` de una recomendación como entero (el LLM a veces lo manda como texto)."""
+    try:
+        return int(recomendacion.get("proveedor_id"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _armar_resultado(
+    info_proveedores_bd: list,
+    proveedores_web: list,
+    enlaces_ecommerce: list,
+    recomendaciones: dict,
+    busqueda_web_activa: bool,
+    seleccion: Dict[str, int],
+) -> dict:
+    """Arma el resultado completo del investigador."""
+    return {
+        "proveedores_bd": info_proveedores_bd,
+        "proveedores_web": proveedores_web,
+        "enlaces_ecommerce": enlaces_ecommerce,
+        "recomendaciones": recomendaciones,
+        "proveedores_recomendados": recomendaciones.get("proveedores_recomendados", []),
+        "resumen": {
+            "total_proveedores_bd": len(info_proveedores_bd),
+            "total_proveedores_web": len(proveedores_web),
+            "total_enlaces_ecommerce": len(enlaces_ecommerce),
+            "busqueda_web_activa": busqueda_web_activa,
+            **seleccion,
+        }
+    }
@@ -11,19 +11,75 @@ El orquestador maneja:
 - Logging detallado de cada etapa
 - Manejo robusto de errores
 - Resultados consolidados
+
+Todo el flujo es asíncrono: las llamadas a OpenAI y Serper usan clientes
+asíncronos, y las operaciones bloqueantes (SQLAlchemy, SMTP) se ejecutan en
+hilos con `asyncio.to_thread`. Así un worker de uvicorn puede atender muchas
+solicitudes concurrentes sin que una lenta bloquee a las demás.
+
+La salida del Receptor y del Investigador se guarda como checkpoint de la
+solicitud; `reanudar_solicitud` retoma el flujo desde la primera etapa
+incompleta sin repetir las llamadas al LLM ya hechas.
+
+Las transiciones de etapa se publican en `src.core.eventos` para el stream
+SSE `GET /solicitud/{id}/events`, y cada etapa se mide con
+`src.core.metricas` (desglose en `resultado_final["tiempos"]`).
+
+Con búsqueda web disponible, el Receptor responde en streaming y cada
+producto se busca en internet en cuanto aparece, así el Investigador solo
+espera la última búsqueda en lugar de extracción + búsquedas en serie.
+
+Las etapas Investigador y Generador RFQ esperan un turno de
+`src.core.planificador` según la urgencia detectada por el Receptor, así
+una solicitud urgente no queda detrás de las normales cuando el sistema
+está saturado.
 """
-from typing import Dict
+import asyncio
+import json
+from typing import Awaitable, Callable, Dict, Optional, Tuple
 
 from config.logging_config import logger
-from src.agents.receptor import procesar_solicitud
-from src.agents.investigador import buscar_proveedores
-from src.agents.generador_rfq import enviar_rfqs_multiples
-from src.database.crud import crear_solicitud, actualizar_estado_solicitud
+from src.agents.receptor import (
+    procesar_solicitud_async,
+    procesar_solicitud_streaming_async,
+)
+from src.agents.investigador import (
+    BusquedaWebAnticipada,
+    buscar_proveedores_async,
+    crear_busqueda_anticipada,
+)
+from src.agents.generador_rfq import enviar_rfqs_multiples_async, obtener_rfqs_previos
+from src.core.eventos import EVENTO_FINALIZADO, bus_eventos, publicar_evento
+from src.core.metricas import (
+    RESULTADO_ERROR,
+    SPAN_TOTAL,
+    iniciar_tiempos,
+    medir,
+    terminar_tiempos,
+)
+from src.core.planificador import planificador_flujos, prioridad_de
+from src.core.uso_llm import asignar_solicitud, iniciar_cuenta, terminar_cuenta
+from src.database.crud import (
+    crear_solicitud,
+    actualizar_estado_solicitud,
+    checkpoint as crud_checkpoint,
+    solicitud as crud_solicitud,
+)
 from src.database.session import SessionLocal
 
+# Callback de progreso: (etapa, progreso 0-100, solicitud_id o None)
+CallbackAvance = Callable[[str, int, Optional[int]], Awaitable[None]]
+
+# Solicitudes con un flujo (completo o reanudación) en ejecución en este proceso,
+# con el token de la ejecución que la tiene tomada
+_flujos_en_curso: Dict[int, object] = {}
+
 
 async def procesar_solicitud_completa(
-    texto_solicitud: str, origen: str = "formulario"
+    texto_solicitud: str,
+    origen: str = "formulario",
+    al_avanzar: Optional[CallbackAvance] = None,
+    resultado_receptor: Optional[Dict] = None,
 ) -> Dict:
     """
     Flujo completo end-to-end: Solicitud → Proveedores → RFQs.
@@ -61,6 +117,12 @@ async def procesar_solicitud_completa(
             - "whatsapp": Mensaje de WhatsApp
             - "email": Email recibido
             - "api": Llamada directa a API
+        al_avanzar: Callback asíncrono opcional que se invoca al entrar a cada
+            etapa con (etapa, progreso, solicitud_id). Lo usa el gestor de jobs
+            para reportar avance; sus errores se registran y no detienen el flujo.
+        resultado_receptor: Extracción ya hecha por el Receptor (por ejemplo,
+            en lote desde POST /solicitudes/batch). Si se proporciona, se omite
+            la llamada al Receptor.
 
     Returns:
         Diccionario con el resultado completo del proceso:
@@ -72,6 +134,7 @@ async def procesar_solicitud_completa(
             "proveedores": dict,  # Proveedores encontrados por Investigador
             "rfqs": dict,         # Resultado de envío de RFQs
             "error": str,         # Mensaje de error si falló (opcional)
+            "tiempos": dict,      # Duración total y por span (ver src.core.metricas)
 
             # Detalles de cada etapa:
             "rfqs": {
@@ -107,13 +170,25 @@ async def procesar_solicitud_completa(
         >>> if not resultado["exito"]:
         ...     print(f"Error en etapa {resultado['etapa']}: {resultado.get('error')}")
     """
+    return await _medir_flujo(
+        _flujo_completo(texto_solicitud, origen, al_avanzar, resultado_receptor)
+    )
+
+
+async def _flujo_completo(
+    texto_solicitud: str,
+    origen: str,
+    al_avanzar: Optional[CallbackAvance],
+    resultado_receptor: Optional[Dict],
+) -> Dict:
+    """Ejecuta las 4 etapas de `procesar_solicitud_completa`."""
     resultado_final = {
         "etapa": None,
         "exito": False,
         "error": None,
     }
-
-    db = SessionLocal()
+    busqueda_anticipada: Optional[BusquedaWebAnticipada] = None
+    token_flujo: Optional[object] = None
 
     try:
         # ====================================================================
@@ -125,10 +200,29 @@ async def procesar_solicitud_completa(
         logger.info(f"📥 [1/4] Procesando solicitud (origen: {origen})...")
 
         resultado_final["etapa"] = "receptor"
-
-        resultado_receptor = procesar_solicitud(texto_solicitud, origen)
-
-        if not resultado_receptor["exito"]:
+        await _notificar_avance(al_avanzar, "receptor", 10)
+
+        with medir("orquestador.receptor") as span:
+            if resultado_receptor is None:
+                busqueda_anticipada = crear_busqueda_anticipada()
+
+            if busqueda_anticipada is not None:
+                # Cada producto se busca en web en cuanto el Receptor lo emite
+                resultado_receptor = await procesar_solicitud_streaming_async(
+                    texto_solicitud, origen, al_detectar_producto=busqueda_anticipada.iniciar
+                )
+            elif resultado_receptor is None:
+                resultado_receptor = await procesar_solicitud_async(texto_solicitud, origen)
+            else:
+                span.resultado = "extraccion_previa"
+                logger.info("  Usando extracción previa del Receptor (lote)")
+
+            # El receptor retorna los datos extraídos o lanza excepción; "exito"
+            # solo viene explícito cuando la etapa reporta un fallo controlado.
+            if not resultado_receptor.get("exito", True):
+                span.resultado = RESULTADO_ERROR
+
+        if not resultado_receptor.get("exito", True):
             resultado_final["error"] = (
                 resultado_receptor.get("error", "Error procesando solicitud")
             )
@@ -146,129 +240,517 @@ async def procesar_solicitud_completa(
         # ====================================================================
         logger.info(f"💾 [2/4] Guardando solicitud en base de datos...")
 
-        solicitud = crear_solicitud(
-            db=db,
-            origen=origen,
-            contenido=texto_solicitud,
-            productos=resultado_receptor["productos"],
-            urgencia=resultado_receptor.get("urgencia", "normal"),
-        )
-        resultado_final["solicitud_id"] = solicitud.id
+        with medir("orquestador.guardar_solicitud"):
+            solicitud_id, estado_inicial = await asyncio.to_thread(
+                _guardar_solicitud, origen, texto_solicitud, resultado_receptor
+            )
+            await asyncio.to_thread(asignar_solicitud, solicitud_id)
+        token_flujo = _tomar_flujo(solicitud_id)
+        bus_eventos.reiniciar(solicitud_id)
+        resultado_final["solicitud_id"] = solicitud_id
         resultado_final["solicitud"] = resultado_receptor
 
         logger.info(
-            f"✓ Solicitud guardada con ID={solicitud.id}, Estado={solicitud.estado.value}"
+            f"✓ Solicitud guardada con ID={solicitud_id}, Estado={estado_inicial}"
+        )
+        await _notificar_avance(al_avanzar, "solicitud_guardada", 30, solicitud_id)
+
+        resultado_final = await _ejecutar_etapas_pendientes(
+            resultado_final,
+            solicitud_id,
+            resultado_receptor,
+            al_avanzar=al_avanzar,
+            busqueda_anticipada=busqueda_anticipada,
         )
 
-        # ====================================================================
-        # ETAPA 3: INVESTIGADOR - Buscar proveedores
-        # ====================================================================
-        logger.info(f"🔍 [3/4] Buscando proveedores adecuados...")
-        resultado_final["etapa"] = "investigador"
+    except Exception as e:
+        resultado_final = await _registrar_error_inesperado(resultado_final, e)
 
-        # Actualizar estado a "procesando"
-        actualizar_estado_solicitud(db, solicitud.id, "procesando")
+    finally:
+        if busqueda_anticipada is not None:
+            await busqueda_anticipada.cerrar()
+        if token_flujo is not None:
+            _liberar_flujo(solicitud_id, token_flujo)
 
-        resultado_investigador = buscar_proveedores(
-            productos=resultado_receptor["productos"],
-            usar_web=True,  # Habilitar búsqueda web
-        )
+    _publicar_fin(resultado_final)
+    return resultado_final
 
-        if "error" in resultado_investigador:
-            resultado_final["error"] = resultado_investigador["error"]
-            logger.error(f"❌ Error en Investigador: {resultado_final['error']}")
-            actualizar_estado_solicitud(db, solicitud.id, "error")
+
+async def reanudar_solicitud(
+    solicitud_id: int,
+    al_avanzar: Optional[CallbackAvance] = None,
+) -> Dict:
+    """
+    Reanuda una solicitud desde la primera etapa incompleta.
+
+    Usa los checkpoints guardados por `procesar_solicitud_completa`: la salida
+    del Receptor siempre se reutiliza, y la del Investigador si ya existe. En
+    la etapa de RFQs se omiten los proveedores con RFQ ya enviado y los
+    borradores se reenvían sin regenerarlos, así un reintento tras un error
+    transitorio de SMTP u OpenAI cuesta segundos en lugar del flujo completo.
+
+    Args:
+        solicitud_id: ID de la solicitud a reanudar
+        al_avanzar: Callback de progreso, igual que en `procesar_solicitud_completa`
+
+    Returns:
+        Diccionario con el mismo formato que `procesar_solicitud_completa`,
+        más "reanudada_desde" con la etapa donde se retomó el flujo. Si la
+        solicitud ya tiene un flujo en curso no se reanuda y el resultado trae
+        "en_curso": True.
+
+    Example:
+        >>> resultado = await procesar_solicitud_completa("Necesito 5 PLCs")
+        >>> if not resultado["exito"] and resultado.get("solicitud_id"):
+        ...     resultado = await reanudar_solicitud(resultado["solicitud_id"])
+    """
+    return await _medir_flujo(_flujo_reanudacion(solicitud_id, al_avanzar), solicitud_id)
+
+
+async def _flujo_reanudacion(
+    solicitud_id: int, al_avanzar: Optional[CallbackAvance]
+) -> Dict:
+    """Retoma el flujo de `reanudar_solicitud` desde sus checkpoints."""
+    resultado_final = {
+        "etapa": None,
+        "exito": False,
+        "error": None,
+    }
+
+    token_flujo = _tomar_flujo(solicitud_id)
+    if token_flujo is None:
+        # Otro flujo aún no marca sus RFQs como enviados: reanudar ahora los
+        # reenviaría. No se publica "finalizado" para no cerrar su stream SSE.
+        resultado_final["solicitud_id"] = solicitud_id
+        resultado_final["en_curso"] = True
+        resultado_final["error"] = f"La solicitud {solicitud_id} ya tiene un flujo en curso"
+        logger.warning(f"⚠️  {resultado_final['error']}")
+        return resultado_final
+
+    # El replay SSE debe empezar en esta ejecución, no en el "finalizado" anterior
+    bus_eventos.reiniciar(solicitud_id)
+
+    try:
+        logger.info("=" * 70)
+        logger.info(f"REANUDANDO SOLICITUD {solicitud_id}")
+        logger.info("=" * 70)
+
+        checkpoints = await asyncio.to_thread(_cargar_checkpoints, solicitud_id)
+
+        if checkpoints is None:
+            resultado_final["error"] = f"Solicitud {solicitud_id} no encontrada"
+            logger.error(f"❌ {resultado_final['error']}")
             return resultado_final
 
-        proveedores_recomendados = resultado_investigador.get(
-            "proveedores_recomendados", []
-        )
+        resultado_final["solicitud_id"] = solicitud_id
 
-        if not proveedores_recomendados:
+        if "receptor" not in checkpoints:
+            resultado_final["etapa"] = "receptor"
             resultado_final["error"] = (
-                "No se encontraron proveedores adecuados para los productos solicitados"
+                "La solicitud no tiene checkpoint del Receptor; debe procesarse de nuevo"
             )
-            logger.warning(f"⚠️  {resultado_final['error']}")
-            actualizar_estado_solicitud(db, solicitud.id, "error")
+            logger.error(f"❌ {resultado_final['error']}")
             return resultado_final
 
-        resultado_final["proveedores"] = resultado_investigador
+        resultado_receptor = checkpoints["receptor"]["resultado"]
+        resultado_investigador = checkpoints.get("investigador")
+        resultado_final["solicitud"] = resultado_receptor
+        resultado_final["reanudada_desde"] = (
+            "generador_rfq" if resultado_investigador else "investigador"
+        )
+        logger.info(f"♻️  Reanudando desde etapa: {resultado_final['reanudada_desde']}")
+
+        rfqs_previos = await asyncio.to_thread(obtener_rfqs_previos, solicitud_id)
 
-        logger.info(
-            f"✓ Investigador completado: {len(proveedores_recomendados)} proveedor(es) "
-            f"recomendado(s)"
+        resultado_final = await _ejecutar_etapas_pendientes(
+            resultado_final,
+            solicitud_id,
+            resultado_receptor,
+            resultado_investigador=resultado_investigador,
+            rfqs_previos=rfqs_previos,
+            al_avanzar=al_avanzar,
         )
 
-        for idx, prov in enumerate(proveedores_recomendados[:3], 1):
-            prov_data = prov.get("proveedor_data", {})
-            score = prov.get("score", "N/A")
-            logger.info(
-                f"  {idx}. {prov_data.get('nombre', 'N/A')} "
-                f"(Score: {score}, Email: {prov_data.get('email', 'N/A')})"
+    except Exception as e:
+        resultado_final = await _registrar_error_inesperado(resultado_final, e)
+
+    finally:
+        _liberar_flujo(solicitud_id, token_flujo)
+
+    _publicar_fin(resultado_final)
+    return resultado_final
+
+
+async def _ejecutar_etapas_pendientes(
+    resultado_final: Dict,
+    solicitud_id: int,
+    resultado_receptor: Dict,
+    resultado_investigador: Optional[Dict] = None,
+    rfqs_previos: Optional[Dict[int, dict]] = None,
+    al_avanzar: Optional[CallbackAvance] = None,
+    busqueda_anticipada: Optional[BusquedaWebAnticipada] = None,
+) -> Dict:
+    """
+    Ejecuta las etapas Investigador y Generador RFQ de una solicitud guardada.
+
+    Si `resultado_investigador` viene de un checkpoint, la búsqueda de
+    proveedores se omite; si hay `busqueda_anticipada`, el Investigador
+    reutiliza las búsquedas web lanzadas durante el Receptor. Las etapas
+    esperan antes un turno del planificador según la urgencia de la
+    solicitud. Las excepciones se propagan al llamador.
+    """
+    urgencia = resultado_receptor.get("urgencia", "normal")
+
+    async with planificador_flujos.turno(prioridad_de(urgencia)):
+        return await _ejecutar_etapas(
+            resultado_final,
+            solicitud_id,
+            resultado_receptor,
+            resultado_investigador,
+            rfqs_previos,
+            al_avanzar,
+            busqueda_anticipada,
+        )
+
+
+async def _ejecutar_etapas(
+    resultado_final: Dict,
+    solicitud_id: int,
+    resultado_receptor: Dict,
+    resultado_investigador: Optional[Dict],
+    rfqs_previos: Optional[Dict[int, dict]],
+    al_avanzar: Optional[CallbackAvance],
+    busqueda_anticipada: Optional[BusquedaWebAnticipada],
+) -> Dict:
+    """Cuerpo de `_ejecutar_etapas_pendientes`, ya con turno asignado."""
+    # ====================================================================
+    # ETAPA 3: INVESTIGADOR - Buscar proveedores
+    # ====================================================================
+    resultado_final["etapa"] = "investigador"
+    await _notificar_avance(al_avanzar, "investigador", 40, solicitud_id)
+
+    # Actualizar estado a "procesando"
+    await asyncio.to_thread(_actualizar_estado, solicitud_id, "procesando")
+
+    if resultado_investigador is None:
+        logger.info(f"🔍 [3/4] Buscando proveedores adecuados...")
+
+        with medir("orquestador.investigador") as span:
+            resultado_investigador = await buscar_proveedores_async(
+                productos=resultado_receptor["productos"],
+                usar_web=True,  # Habilitar búsqueda web
+                busqueda_anticipada=busqueda_anticipada,
             )
+            if "error" in resultado_investigador:
+                span.resultado = RESULTADO_ERROR
+            elif not resultado_investigador.get("proveedores_recomendados"):
+                span.resultado = "sin_proveedores"
 
-        # ====================================================================
-        # ETAPA 4: GENERADOR RFQ - Generar y enviar RFQs
-        # ====================================================================
-        logger.info(f"📧 [4/4] Generando y enviando RFQs...")
-        resultado_final["etapa"] = "generador_rfq"
+        if "error" in resultado_investigador:
+            resultado_final["error"] = resultado_investigador["error"]
+            logger.error(f"❌ Error en Investigador: {resultado_final['error']}")
+            await asyncio.to_thread(_actualizar_estado, solicitud_id, "error")
+            return resultado_final
+
+        if resultado_investigador.get("proveedores_recomendados"):
+            await asyncio.to_thread(
+                _guardar_checkpoint, solicitud_id, "investigador", resultado_investigador
+            )
+    else:
+        logger.info("🔍 [3/4] Proveedores recuperados del checkpoint")
+
+    proveedores_recomendados = resultado_investigador.get(
+        "proveedores_recomendados", []
+    )
+
+    if not proveedores_recomendados:
+        resultado_final["error"] = (
+            "No se encontraron proveedores adecuados para los productos solicitados"
+        )
+        logger.warning(f"⚠️  {resultado_final['error']}")
+        await asyncio.to_thread(_actualizar_estado, solicitud_id, "error")
+        return resultado_final
+
+    resultado_final["proveedores"] = resultado_investigador
+    publicar_evento(
+        solicitud_id,
+        "proveedores",
+        {
+            "total": len(proveedores_recomendados),
+            "proveedores": [
+                p.get("proveedor_data", {}).get("nombre") for p in proveedores_recomendados
+            ],
+        },
+    )
+
+    logger.info(
+        f"✓ Investigador completado: {len(proveedores_recomendados)} proveedor(es) "
+        f"recomendado(s)"
+    )
+
+    for idx, prov in enumerate(proveedores_recomendados[:3], 1):
+        prov_data = prov.get("proveedor_data", {})
+        score = prov.get("score", "N/A")
+        logger.info(
+            f"  {idx}. {prov_data.get('nombre', 'N/A')} "
+            f"(Score: {score}, Email: {prov_data.get('email', 'N/A')})"
+        )
+
+    # ====================================================================
+    # ETAPA 4: GENERADOR RFQ - Generar y enviar RFQs
+    # ====================================================================
+    logger.info(f"📧 [4/4] Generando y enviando RFQs...")
+    resultado_final["etapa"] = "generador_rfq"
+    await _notificar_avance(al_avanzar, "generador_rfq", 70, solicitud_id)
 
-        resultado_rfqs = enviar_rfqs_multiples(
-            solicitud_id=solicitud.id,
+    with medir("orquestador.generador_rfq") as span:
+        resultado_rfqs = await enviar_rfqs_multiples_async(
+            solicitud_id=solicitud_id,
             proveedores_recomendados=proveedores_recomendados,
             productos=resultado_receptor["productos"],
             urgencia=resultado_receptor.get("urgencia", "normal"),
+            rfqs_previos=rfqs_previos,
         )
+        if resultado_rfqs["exitosos"] == 0:
+            span.resultado = RESULTADO_ERROR
+        elif resultado_rfqs["fallidos"] > 0:
+            span.resultado = "parcial"
+
+    resultado_final["rfqs"] = resultado_rfqs
+
+    # ====================================================================
+    # FINALIZACIÓN
+    # ====================================================================
+    if resultado_rfqs["exitosos"] > 0:
+        # Al menos un RFQ fue enviado exitosamente
+        await asyncio.to_thread(_actualizar_estado, solicitud_id, "rfqs_enviados")
+        resultado_final["exito"] = True
+        resultado_final["etapa"] = "completado"
 
-        resultado_final["rfqs"] = resultado_rfqs
+        logger.info("=" * 70)
+        logger.info("✅ PROCESO COMPLETADO EXITOSAMENTE")
+        logger.info("=" * 70)
+        logger.info("📊 Resumen:")
+        logger.info(f"  - Solicitud ID: {solicitud_id}")
+        logger.info(f"  - Productos procesados: {len(resultado_receptor['productos'])}")
+        logger.info(f"  - Proveedores encontrados: {len(proveedores_recomendados)}")
+        logger.info(
+            f"  - RFQs enviados: {resultado_rfqs['exitosos']}/{resultado_rfqs['total']}"
+        )
+        logger.info(f"  - Urgencia: {resultado_receptor.get('urgencia', 'normal')}")
+        logger.info("=" * 70)
 
-        # ====================================================================
-        # FINALIZACIÓN
-        # ====================================================================
-        if resultado_rfqs["exitosos"] > 0:
-            # Al menos un RFQ fue enviado exitosamente
-            actualizar_estado_solicitud(db, solicitud.id, "rfqs_enviados")
-            resultado_final["exito"] = True
-            resultado_final["etapa"] = "completado"
-
-            logger.info("=" * 70)
-            logger.info("✅ PROCESO COMPLETADO EXITOSAMENTE")
-            logger.info("=" * 70)
-            logger.info(f"📊 Resumen:")
-            logger.info(f"  - Solicitud ID: {solicitud.id}")
-            logger.info(f"  - Productos procesados: {len(resultado_receptor['productos'])}")
-            logger.info(f"  - Proveedores encontrados: {len(proveedores_recomendados)}")
-            logger.info(
-                f"  - RFQs enviados: {resultado_rfqs['exitosos']}/{resultado_rfqs['total']}"
-            )
-            logger.info(f"  - Urgencia: {resultado_receptor.get('urgencia', 'normal')}")
-            logger.info("=" * 70)
+    else:
+        # Ningún RFQ fue enviado
+        resultado_final["error"] = (
+            f"No se pudo enviar ningún RFQ. "
+            f"Fallaron {resultado_rfqs['fallidos']} intentos."
+        )
+        logger.error(f"❌ {resultado_final['error']}")
+        await asyncio.to_thread(_actualizar_estado, solicitud_id, "error")
 
-        else:
-            # Ningún RFQ fue enviado
-            resultado_final["error"] = (
-                f"No se pudo enviar ningún RFQ. "
-                f"Fallaron {resultado_rfqs['fallidos']} intentos."
-            )
-            logger.error(f"❌ {resultado_final['error']}")
-            actualizar_estado_solicitud(db, solicitud.id, "error")
+    return resultado_final
 
-        return resultado_final
 
+async def _medir_flujo(flujo: Awaitable[Dict], solicitud_id: Optional[int] = None) -> Dict:
+    """
+    Ejecuta un flujo midiendo su duración total y la de cada sub-etapa.
+
+    El desglose queda en `resultado_final["tiempos"]` y el resultado total
+    se registra como "ok" o "error_<etapa>" para contar fallos por etapa.
+    El consumo de tokens de las llamadas al LLM del flujo se atribuye a la
+    solicitud (ver `src.core.uso_llm`).
+    """
+    token = iniciar_tiempos()
+    token_cuenta = iniciar_cuenta(solicitud_id)
+
+    try:
+        with medir(SPAN_TOTAL) as span:
+            resultado_final = await flujo
+            if not resultado_final["exito"]:
+                span.resultado = f"error_{resultado_final.get('etapa') or 'inicio'}"
+    finally:
+        tiempos = terminar_tiempos(token)
+        terminar_cuenta(token_cuenta)
+
+    resultado_final["tiempos"] = tiempos
+    logger.info(f"⏱️  Flujo terminado en {tiempos['total_ms']:.0f} ms")
+    return resultado_final
+
+
+async def _registrar_error_inesperado(resultado_final: Dict, error: Exception) -> Dict:
+    """Registra un error no controlado y marca la solicitud como error."""
+    logger.error(f"💥 Error inesperado en orquestador: {error}", exc_info=True)
+    resultado_final["error"] = f"Error inesperado: {str(error)}"
+
+    if "solicitud_id" in resultado_final:
+        await asyncio.to_thread(
+            _actualizar_estado, resultado_final["solicitud_id"], "error"
+        )
+
+    return resultado_final
+
+
+async def _notificar_avance(
+    al_avanzar: Optional[CallbackAvance],
+    etapa: str,
+    progreso: int,
+    solicitud_id: Optional[int] = None,
+) -> None:
+    """
+    Publica la transición de etapa e invoca el callback de progreso.
+
+    Los errores del callback se registran y no rompen el flujo.
+    """
+    publicar_evento(solicitud_id, "etapa", {"etapa": etapa, "progreso": progreso})
+
+    if al_avanzar is None:
+        return
+
+    try:
+        await al_avanzar(etapa, progreso, solicitud_id)
     except Exception as e:
-        # Capturar cualquier error inesperado
-        logger.error(f"💥 Error inesperado en orquestador: {e}", exc_info=True)
-        resultado_final["error"] = f"Error inesperado: {str(e)}"
+        logger.warning(f"⚠️  Error notificando avance ({etapa}): {e}")
 
-        if "solicitud_id" in resultado_final:
-            actualizar_estado_solicitud(db, resultado_final["solicitud_id"], "error")
 
-        return resultado_final
+def _publicar_fin(resultado_final: Dict) -> None:
+    """Publica el evento que cierra el stream SSE de la solicitud."""
+    rfqs = resultado_final.get("rfqs", {})
+    publicar_evento(
+        resultado_final.get("solicitud_id"),
+        EVENTO_FINALIZADO,
+        {
+            "exito": resultado_final["exito"],
+            "etapa": resultado_final["etapa"],
+            "error": resultado_final["error"],
+            "rfqs_exitosos": rfqs.get("exitosos", 0),
+            "rfqs_total": rfqs.get("total", 0),
+        },
+    )
+
+
+def _guardar_solicitud(
+    origen: str, contenido: str, resultado_receptor: Dict
+) -> Tuple[int, str]:
+    """
+    Crea la solicitud en BD y guarda el checkpoint del Receptor.
+
+    Se ejecuta en un hilo desde el flujo asíncrono con una sesión propia.
+
+    Returns:
+        Tupla (solicitud_id, estado inicial)
+    """
+    db = SessionLocal()
+
+    try:
+        solicitud = crear_solicitud(
+            db=db,
+            origen=origen,
+            contenido=contenido,
+            productos=resultado_receptor["productos"],
+            urgencia=resultado_receptor.get("urgencia", "normal"),
+        )
+        crud_checkpoint.guardar(
+            db,
+            solicitud.id,
+            "receptor",
+            _serializable(
+                {"texto": contenido, "origen": origen, "resultado": resultado_receptor}
+            ),
+        )
+        return solicitud.id, solicitud.estado.value
 
     finally:
         db.close()
 
 
+def _guardar_checkpoint(solicitud_id: int, etapa: str, datos: Dict) -> None:
+    """Guarda la salida de una etapa con una sesión propia (se ejecuta en un hilo)."""
+    db = SessionLocal()
+
+    try:
+        crud_checkpoint.guardar(db, solicitud_id, etapa, _serializable(datos))
+
+    finally:
+        db.close()
+
+
+def _cargar_checkpoints(solicitud_id: int) -> Optional[Dict[str, dict]]:
+    """
+    Carga los checkpoints de una solicitud (se ejecuta en un hilo).
+
+    Returns:
+        Diccionario {etapa: datos}, o None si la solicitud no existe
+    """
+    db = SessionLocal()
+
+    try:
+        if crud_solicitud.get(db, solicitud_id) is None:
+            return None
+        return crud_checkpoint.get_by_solicitud(db, solicitud_id)
+
+    finally:
+        db.close()
+
+
+def _serializable(datos: Dict) -> Dict:
+    """Convierte fechas y otros valores no JSON a texto para guardarlos en BD."""
+    return json.loads(json.dumps(datos, default=str))
+
+
+def _actualizar_estado(solicitud_id: int, nuevo_estado: str) -> None:
+    """
+    Actualiza el estado de una solicitud con una sesión propia.
+
+    Se ejecuta en un hilo desde el flujo asíncrono.
+    """
+    db = SessionLocal()
+
+    try:
+        actualizar_estado_solicitud(db, solicitud_id, nuevo_estado)
+
+    finally:
+        db.close()
+
+
+def _tomar_flujo(solicitud_id: int) -> Optional[object]:
+    """
+    Registra un flujo de la solicitud como en curso.
+
+    Returns:
+        Token de la ejecución, o None si la solicitud ya tiene un flujo en curso
+    """
+    if solicitud_id in _flujos_en_curso:
+        return None
+
+    token = object()
+    _flujos_en_curso[solicitud_id] = token
+    return token
+
+
+def _liberar_flujo(solicitud_id: int, token: object) -> None:
+    """Quita la marca de flujo en curso solo si pertenece a la ejecución del token."""
+    if _flujos_en_curso.get(solicitud_id) is token:
+        del _flujos_en_curso[solicitud_id]
+
+
+def flujo_en_curso(solicitud_id: int) -> bool:
+    """
+    Indica si un flujo de la solicitud se está ejecutando en este proceso.
+
+    Una solicitud sin flujo en curso ya no publicará eventos de progreso
+    (hasta que se reanude), sin importar el estado que tenga en BD.
+
+    Args:
+        solicitud_id: ID de la solicitud
+
+    Returns:
+        True mientras `procesar_solicitud_completa` o `reanudar_solicitud`
+        la estén procesando
+    """
+    return solicitud_id in _flujos_en_curso
+
+
 def obtener_estado_solicitud(solicitud_id: int) -> Dict:
     """
     Obtiene el estado actual de una solicitud procesada.
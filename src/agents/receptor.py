@@ -3,19 +3,37 @@ Agente Receptor - Procesamiento de Solicitudes de Compra.
 
 Este agente es responsable de recibir solicitudes de compra en lenguaje natural
 (desde formulario web, WhatsApp, o email) y extraer información estructurada.
+
+Las solicitudes ya estructuradas (listas con cantidades, CSV) las resuelve
+primero el parser por reglas de `src.agents.receptor_reglas`, sin llamar a
+OpenAI; el LLM se usa cuando las reglas no alcanzan la confianza mínima.
 """
+import asyncio
 import json
 import logging
+import time
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 
-from openai import OpenAI, OpenAIError
-from pydantic import BaseModel, Field, validator
+from openai import AsyncOpenAI, OpenAI, OpenAIError
+from pydantic import BaseModel, Field, ValidationError, validator
 
 from config.settings import settings
+from src.agents.receptor_reglas import parser_reglas
+from src.core.despachador import despachador_llm
+from src.core.enrutador import TAREA_ANALIZAR_SOLICITUD, enrutador_modelos
+from src.core.json_incremental import LectorArregloJSON
+from src.core.metricas import medir
+from src.core.uso_llm import registrar_uso
 
 logger = logging.getLogger(__name__)
 
+# Nombre con el que se atribuye el consumo de tokens del Receptor
+AGENTE_RECEPTOR = "receptor"
+
+# Resultado del span "receptor.reglas" cuando la solicitud pasa al LLM
+RESULTADO_USA_LLM = "usa_llm"
+
 
 class ProductoExtraido(BaseModel):
     """Modelo para un producto extraído de la solicitud."""
@@ -78,6 +96,40 @@ class SolicitudProcesada(BaseModel):
         return v.lower()
 
 
+class ParserProductosIncremental:
+    """
+    Extrae los productos de una respuesta JSON del Receptor mientras llega.
+
+    Recibe los fragmentos de una respuesta en streaming y retorna cada objeto
+    del arreglo "productos" en cuanto se cierra, sin esperar al JSON completo
+    (ver `LectorArregloJSON`). Los productos retornados no están validados;
+    la validación se hace al final sobre la respuesta completa.
+
+    Example:
+        >>> parser = ParserProductosIncremental()
+        >>> parser.alimentar('{"productos": [{"nombre": "PLC"')
+        []
+        >>> parser.alimentar(', "cantidad": 5}, {"nom')
+        [{'nombre': 'PLC', 'cantidad': 5}]
+    """
+
+    def __init__(self):
+        """Inicializa el parser sin contenido."""
+        self._lector = LectorArregloJSON("productos")
+
+    def alimentar(self, fragmento: str) -> List[Dict]:
+        """
+        Procesa un fragmento de la respuesta.
+
+        Args:
+            fragmento: Texto recibido del stream
+
+        Returns:
+            Productos completados dentro de este fragmento (puede ser vacía)
+        """
+        return [p for p in self._lector.alimentar(fragmento) if isinstance(p, dict)]
+
+
 class ReceptorAgent:
     """
     Agente Receptor para procesamiento de solicitudes de compra.
@@ -86,22 +138,58 @@ class ReceptorAgent:
     de textos informales en lenguaje natural.
     """
 
-    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model: Optional[str] = None,
+        client: Optional[OpenAI] = None,
+        async_client: Optional[AsyncOpenAI] = None,
+        system_prompt: Optional[str] = None,
+    ):
         """
         Inicializa el agente receptor.
 
         Args:
             api_key: API key de OpenAI (usa settings si no se proporciona)
-            model: Modelo a usar (gpt-4o-mini por defecto)
+            model: Modelo fijo a usar; si no se da, el enrutador elige el modelo
+                de `TAREA_ANALIZAR_SOLICITUD` y escala si la respuesta no valida
+            client: Cliente síncrono a reutilizar (se crea uno si no se da)
+            async_client: Cliente asíncrono a reutilizar
+            system_prompt: Prompt ya cargado (se lee del archivo si no se da)
         """
         self.api_key = api_key or settings.OPENAI_API_KEY
-        self.model = model or settings.OPENAI_MODEL_MINI
-        self.client = OpenAI(api_key=self.api_key)
+        self.model = model
+        self.client = client or OpenAI(api_key=self.api_key, max_retries=0)
+        self.async_client = async_client or AsyncOpenAI(api_key=self.api_key, max_retries=0)
 
         # Cargar el prompt del agente
-        self.system_prompt = self._cargar_prompt()
+        self.system_prompt = system_prompt or self._cargar_prompt()
+
+        logger.info(
+            f"Agente Receptor inicializado - Modelo: {self.model or TAREA_ANALIZAR_SOLICITUD}"
+        )
 
-        logger.info(f"Agente Receptor inicializado - Modelo: {self.model}")
+    def _modelos(self) -> List[str]:
+        """Modelos a intentar: el fijo, o la escalera del enrutador para la tarea."""
+        if self.model is not None:
+            return [self.model]
+        return enrutador_modelos.modelos(TAREA_ANALIZAR_SOLICITUD)
+
+    def _extraer(self, llamar: Callable[[str], Optional[str]]) -> Dict:
+        """Llama al modelo y valida la respuesta, escalando si no es válida."""
+        if self.model is not None:
+            return self._parsear_respuesta(llamar(self.model))
+        return enrutador_modelos.ejecutar(
+            TAREA_ANALIZAR_SOLICITUD, llamar, self._parsear_respuesta
+        )
+
+    async def _extraer_async(self, llamar: Callable[[str], Awaitable[Optional[str]]]) -> Dict:
+        """Versión asíncrona de `_extraer`."""
+        if self.model is not None:
+            return self._parsear_respuesta(await llamar(self.model))
+        return await enrutador_modelos.ejecutar_async(
+            TAREA_ANALIZAR_SOLICITUD, llamar, self._parsear_respuesta
+        )
 
     def _cargar_prompt(self) -> str:
         """
@@ -187,46 +275,73 @@ Formato de respuesta:
             f"Procesando solicitud - Origen: {origen}, Longitud: {len(texto)} chars"
         )
 
+        resultado_reglas = self._procesar_con_reglas(texto)
+        if resultado_reglas is not None:
+            return resultado_reglas
+
+        def llamar(modelo: str) -> Optional[str]:
+            response = despachador_llm.ejecutar(
+                self.client.chat.completions.create,
+                agente=AGENTE_RECEPTOR,
+                **self._construir_peticion(texto, origen, modelo),
+            )
+            return response.choices[0].message.content
+
         try:
-            # Preparar el prompt
-            user_prompt = f"""Origen de la solicitud: {origen}
+            # Llamar a OpenAI
+            return self._extraer(llamar)
 
-Texto de la solicitud:
-{texto}
+        except OpenAIError as e:
+            logger.error(f"Error en OpenAI API: {e}")
+            raise
+        except json.JSONDecodeError as e:
+            logger.error(f"Error parseando JSON de respuesta: {e}")
+            raise ValueError(f"La respuesta de IA no es JSON válido: {e}") from e
+        except Exception as e:
+            logger.error(f"Error procesando solicitud: {e}")
+            raise
 
-Extrae la información y responde con el JSON estructurado."""
+    async def procesar_solicitud_async(
+        self, texto: str, origen: str = "formulario"
+    ) -> Dict:
+        """
+        Versión asíncrona de `procesar_solicitud`.
 
-            # Llamar a OpenAI
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0.3,  # Baja temperatura para mayor precisión
-                response_format={"type": "json_object"},
-            )
+        Usa el cliente `AsyncOpenAI`, por lo que la espera de la respuesta
+        no bloquea el event loop.
 
-            # Extraer y parsear respuesta
-            content = response.choices[0].message.content
-            if not content:
-                raise ValueError("Respuesta vacía de OpenAI")
+        Args:
+            texto: Texto de la solicitud en lenguaje natural
+            origen: Origen de la solicitud (formulario, whatsapp, email)
 
-            data = json.loads(content)
+        Returns:
+            Dict con la información extraída (mismo formato que la versión síncrona)
 
-            # Validar con Pydantic
-            solicitud_procesada = SolicitudProcesada(**data)
+        Raises:
+            ValueError: Si el texto está vacío o la respuesta no es válida
+            OpenAIError: Si hay error en la llamada a OpenAI
+        """
+        if not texto or not texto.strip():
+            raise ValueError("El texto de la solicitud no puede estar vacío")
+
+        logger.info(
+            f"Procesando solicitud (async) - Origen: {origen}, Longitud: {len(texto)} chars"
+        )
 
-            # Convertir a dict para retornar
-            resultado = solicitud_procesada.model_dump()
+        resultado_reglas = self._procesar_con_reglas(texto)
+        if resultado_reglas is not None:
+            return resultado_reglas
 
-            logger.info(
-                f"Solicitud procesada exitosamente - "
-                f"Productos: {len(resultado['productos'])}, "
-                f"Urgencia: {resultado['urgencia']}"
+        async def llamar(modelo: str) -> Optional[str]:
+            response = await despachador_llm.ejecutar_async(
+                self.async_client.chat.completions.create,
+                agente=AGENTE_RECEPTOR,
+                **self._construir_peticion(texto, origen, modelo),
             )
+            return response.choices[0].message.content
 
-            return resultado
+        try:
+            return await self._extraer_async(llamar)
 
         except OpenAIError as e:
             logger.error(f"Error en OpenAI API: {e}")
@@ -238,6 +353,310 @@ Extrae la información y responde con el JSON estructurado."""
             logger.error(f"Error procesando solicitud: {e}")
             raise
 
+    async def procesar_solicitud_streaming_async(
+        self,
+        texto: str,
+        origen: str = "formulario",
+        al_detectar_producto: Optional[Callable[[Dict], None]] = None,
+    ) -> Dict:
+        """
+        Versión en streaming de `procesar_solicitud_async`.
+
+        Pide la respuesta en streaming y avisa de cada producto en cuanto el
+        modelo termina de emitirlo, para que el llamador pueda adelantar
+        trabajo (por ejemplo, las búsquedas web del Investigador) mientras
+        el resto de la respuesta sigue llegando.
+
+        Args:
+            texto: Texto de la solicitud en lenguaje natural
+            origen: Origen de la solicitud (formulario, whatsapp, email)
+            al_detectar_producto: Callback síncrono que recibe cada producto
+                (sin validar) en cuanto aparece; sus errores se registran y
+                no interrumpen la extracción
+
+        Returns:
+            Dict con la información extraída y validada (mismo formato que
+            `procesar_solicitud_async`)
+
+        Raises:
+            ValueError: Si el texto está vacío o la respuesta no es válida
+            OpenAIError: Si hay error en la llamada a OpenAI
+        """
+        if not texto or not texto.strip():
+            raise ValueError("El texto de la solicitud no puede estar vacío")
+
+        logger.info(
+            f"Procesando solicitud (streaming) - Origen: {origen}, Longitud: {len(texto)} chars"
+        )
+
+        resultado_reglas = self._procesar_con_reglas(texto)
+        if resultado_reglas is not None:
+            for producto in resultado_reglas["productos"]:
+                if al_detectar_producto is None:
+                    break
+                try:
+                    al_detectar_producto(producto)
+                except Exception as e:
+                    logger.warning(f"Error en callback de producto detectado: {e}")
+            return resultado_reglas
+
+        # Un stream no puede escalar: los productos ya se entregaron al callback
+        modelo = self._modelos()[0]
+
+        try:
+            inicio = time.perf_counter()
+            parser = ParserProductosIncremental()
+            partes = []
+            chunk_uso = None
+            async with despachador_llm.stream_async(
+                self.async_client.chat.completions.create,
+                **self._construir_peticion(texto, origen, modelo),
+                stream=True,
+                stream_options={"include_usage": True},
+            ) as stream:
+                async for chunk in stream:
+                    if getattr(chunk, "usage", None) is not None:
+                        chunk_uso = chunk  # El último chunk trae los tokens
+                    if not chunk.choices or not chunk.choices[0].delta.content:
+                        continue
+
+                    fragmento = chunk.choices[0].delta.content
+                    partes.append(fragmento)
+
+                    if al_detectar_producto is None:
+                        continue
+                    for producto in parser.alimentar(fragmento):
+                        try:
+                            al_detectar_producto(producto)
+                        except Exception as e:
+                            logger.warning(f"Error en callback de producto detectado: {e}")
+
+            if chunk_uso is not None:
+                await asyncio.to_thread(
+                    registrar_uso,
+                    AGENTE_RECEPTOR,
+                    modelo,
+                    chunk_uso,
+                    (time.perf_counter() - inicio) * 1000,
+                )
+            return self._parsear_respuesta("".join(partes))
+
+        except OpenAIError as e:
+            logger.error(f"Error en OpenAI API: {e}")
+            raise
+        except json.JSONDecodeError as e:
+            logger.error(f"Error parseando JSON de respuesta: {e}")
+            raise ValueError(f"La respuesta de IA no es JSON válido: {e}") from e
+        except Exception as e:
+            logger.error(f"Error procesando solicitud: {e}")
+            raise
+
+    async def procesar_lote_async(
+        self, textos: List[str], origen: str = "formulario"
+    ) -> List[Optional[Dict]]:
+        """
+        Extrae varias solicitudes agrupándolas en pocas llamadas a OpenAI.
+
+        Los textos se dividen en bloques de `settings.RECEPTOR_TAMANO_LOTE` y
+        cada bloque se procesa con una sola llamada; los bloques se envían
+        concurrentemente. Un bloque o elemento que falle no afecta al resto.
+        Los textos que resuelve el parser por reglas no entran en los bloques.
+
+        Args:
+            textos: Textos de las solicitudes en lenguaje natural
+            origen: Origen común de las solicitudes
+
+        Returns:
+            Lista alineada con `textos`: el dict extraído de cada solicitud, o
+            None si no se pudo extraer (el llamador puede procesarla por separado)
+
+        Example:
+            >>> agente = ReceptorAgent()
+            >>> resultados = await agente.procesar_lote_async(["Necesito 5 PLCs", "..."])
+        """
+        resultados: List[Optional[Dict]] = [None] * len(textos)
+        indices_validos = []
+        for i, texto in enumerate(textos):
+            if not texto or not texto.strip():
+                continue
+            resultados[i] = self._procesar_con_reglas(texto)
+            if resultados[i] is None:
+                indices_validos.append(i)
+        tamano = max(1, settings.RECEPTOR_TAMANO_LOTE)
+        bloques = [
+            indices_validos[inicio:inicio + tamano]
+            for inicio in range(0, len(indices_validos), tamano)
+        ]
+
+        logger.info(
+            f"Procesando lote de {len(textos)} solicitudes en {len(bloques)} bloque(s)"
+        )
+        # Los elementos que no validan quedan en None y se extraen por separado
+        modelo = self._modelos()[0]
+
+        async def procesar_bloque(indices: List[int]) -> None:
+            try:
+                response = await despachador_llm.ejecutar_async(
+                    self.async_client.chat.completions.create,
+                    agente=AGENTE_RECEPTOR,
+                    **self._construir_peticion_lote(
+                        [textos[i] for i in indices], origen, modelo
+                    ),
+                )
+                content = response.choices[0].message.content
+                extraidas = json.loads(content or "{}").get("solicitudes", [])
+            except Exception as e:
+                logger.warning(f"Error procesando bloque de {len(indices)} solicitudes: {e}")
+                return
+
+            por_posicion = {
+                item.get("indice"): item for item in extraidas if isinstance(item, dict)
+            }
+            for posicion, indice in enumerate(indices):
+                item = por_posicion.get(posicion)
+                if item is None:
+                    continue
+                try:
+                    resultados[indice] = self._validar_datos(item)
+                except Exception as e:
+                    logger.warning(f"Solicitud {indice} del lote no es válida: {e}")
+
+        await asyncio.gather(*(procesar_bloque(bloque) for bloque in bloques))
+        return resultados
+
+    def _procesar_con_reglas(self, texto: str) -> Optional[Dict]:
+        """
+        Intenta extraer la solicitud con el parser por reglas, sin OpenAI.
+
+        Args:
+            texto: Texto de la solicitud
+
+        Returns:
+            Dict validado con `SolicitudProcesada`, o None si hay que usar el LLM
+        """
+        if not settings.RECEPTOR_REGLAS_HABILITADAS:
+            return None
+
+        with medir("receptor.reglas") as span:
+            datos = parser_reglas.parsear(texto)
+            try:
+                resultado = self._validar_datos(datos) if datos is not None else None
+            except ValidationError as e:
+                logger.warning(f"Extracción por reglas no válida, se usa el LLM: {e}")
+                resultado = None
+            if resultado is None:
+                span.resultado = RESULTADO_USA_LLM
+
+        if resultado is not None:
+            logger.info("⚡ Solicitud estructurada resuelta por reglas, sin LLM")
+        return resultado
+
+    def _construir_peticion(self, texto: str, origen: str, modelo: str) -> Dict:
+        """
+        Construye los parámetros de la llamada a chat completions.
+
+        Args:
+            texto: Texto de la solicitud
+            origen: Origen de la solicitud
+            modelo: Modelo de la llamada
+
+        Returns:
+            Dict con model, messages, temperature y response_format
+        """
+        user_prompt = f"""Origen de la solicitud: {origen}
+
+Texto de la solicitud:
+{texto}
+
+Extrae la información y responde con el JSON estructurado."""
+
+        return {
+            "model": modelo,
+            "messages": [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "temperature": 0.3,  # Baja temperatura para mayor precisión
+            "response_format": {"type": "json_object"},
+        }
+
+    def _construir_peticion_lote(self, textos: List[str], origen: str, modelo: str) -> Dict:
+        """
+        Construye la llamada a chat completions para un bloque de solicitudes.
+
+        Args:
+            textos: Textos del bloque
+            origen: Origen de las solicitudes
+            modelo: Modelo de la llamada
+
+        Returns:
+            Dict con model, messages, temperature y response_format
+        """
+        solicitudes = "\n\n".join(
+            f"### Solicitud {indice}\n{texto}" for indice, texto in enumerate(textos)
+        )
+        user_prompt = f"""Origen de las solicitudes: {origen}
+
+Recibirás {len(textos)} solicitudes independientes, numeradas desde 0.
+Extrae la información de cada una por separado, con el mismo formato JSON de
+una solicitud individual, y responde con:
+{{"solicitudes": [{{"indice": 0, "productos": [...], "urgencia": "...", ...}}, ...]}}
+
+{solicitudes}"""
+
+        return {
+            "model": modelo,
+            "messages": [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "temperature": 0.3,
+            "response_format": {"type": "json_object"},
+        }
+
+    def _parsear_respuesta(self, content: Optional[str]) -> Dict:
+        """
+        Parsea y valida la respuesta JSON del modelo.
+
+        Args:
+            content: Contenido de la respuesta de OpenAI
+
+        Returns:
+            Dict validado con `SolicitudProcesada`
+
+        Raises:
+            ValueError: Si la respuesta está vacía
+            json.JSONDecodeError: Si la respuesta no es JSON
+        """
+        if not content:
+            raise ValueError("Respuesta vacía de OpenAI")
+
+        return self._validar_datos(json.loads(content))
+
+    def _validar_datos(self, data: Dict) -> Dict:
+        """
+        Valida los datos extraídos de una solicitud.
+
+        Args:
+            data: Diccionario con la extracción del modelo
+
+        Returns:
+            Dict validado con `SolicitudProcesada`
+        """
+        # Validar con Pydantic
+        solicitud_procesada = SolicitudProcesada(**data)
+
+        # Convertir a dict para retornar
+        resultado = solicitud_procesada.model_dump()
+
+        logger.info(
+            f"Solicitud procesada exitosamente - "
+            f"Productos: {len(resultado['productos'])}, "
+            f"Urgencia: {resultado['urgencia']}"
+        )
+
+        return resultado
+
 
 def validar_solicitud(datos: Dict) -> Tuple[bool, str]:
     """
@@ -299,7 +718,7 @@ def procesar_solicitud(texto: str, origen: str = "formulario") -> Dict:
     """
     Función de conveniencia para procesar una solicitud.
 
-    Crea una instancia del agente y procesa la solicitud.
+    Usa el agente compartido del proceso (ver `get_agente`).
 
     Args:
         texto: Texto de la solicitud en lenguaje natural
@@ -312,22 +731,81 @@ def procesar_solicitud(texto: str, origen: str = "formulario") -> Dict:
         ValueError: Si el texto está vacío o la respuesta no es válida
         OpenAIError: Si hay error en la llamada a OpenAI
     """
-    agente = ReceptorAgent()
+    agente = get_agente()
     return agente.procesar_solicitud(texto, origen)
 
 
-# Instancia global del agente (opcional, para reutilización)
-_agente_global: Optional[ReceptorAgent] = None
+async def procesar_solicitud_async(texto: str, origen: str = "formulario") -> Dict:
+    """
+    Versión asíncrona de `procesar_solicitud`.
+
+    Args:
+        texto: Texto de la solicitud en lenguaje natural
+        origen: Origen de la solicitud (formulario, whatsapp, email)
+
+    Returns:
+        Dict con la información extraída
+
+    Raises:
+        ValueError: Si el texto está vacío o la respuesta no es válida
+        OpenAIError: Si hay error en la llamada a OpenAI
+    """
+    agente = get_agente()
+    return await agente.procesar_solicitud_async(texto, origen)
+
+
+async def procesar_solicitud_streaming_async(
+    texto: str,
+    origen: str = "formulario",
+    al_detectar_producto: Optional[Callable[[Dict], None]] = None,
+) -> Dict:
+    """
+    Versión en streaming de `procesar_solicitud_async`.
+
+    Args:
+        texto: Texto de la solicitud en lenguaje natural
+        origen: Origen de la solicitud (formulario, whatsapp, email)
+        al_detectar_producto: Callback invocado con cada producto en cuanto
+            el modelo lo emite
+
+    Returns:
+        Dict con la información extraída
+
+    Raises:
+        ValueError: Si el texto está vacío o la respuesta no es válida
+        OpenAIError: Si hay error en la llamada a OpenAI
+    """
+    agente = get_agente()
+    return await agente.procesar_solicitud_streaming_async(texto, origen, al_detectar_producto)
+
+
+async def procesar_lote_async(
+    textos: List[str], origen: str = "formulario"
+) -> List[Optional[Dict]]:
+    """
+    Extrae un lote de solicitudes con llamadas agrupadas a OpenAI.
+
+    Args:
+        textos: Textos de las solicitudes en lenguaje natural
+        origen: Origen común de las solicitudes
+
+    Returns:
+        Lista alineada con `textos` con el dict extraído o None si falló
+    """
+    agente = get_agente()
+    return await agente.procesar_lote_async(textos, origen)
 
 
 def get_agente() -> ReceptorAgent:
     """
     Obtiene la instancia global del agente receptor.
 
+    El agente vive en `src.agents.registro`: comparte los clientes de OpenAI
+    del proceso y su prompt se lee una sola vez.
+
     Returns:
         Instancia del ReceptorAgent
     """
-    global _agente_global
-    if _agente_global is None:
-        _agente_global = ReceptorAgent()
-    return _agente_global
+    from src.agents.registro import registro_agentes
+
+    return registro_agentes.receptor()
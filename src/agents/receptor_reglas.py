@@ -0,0 +1,379 @@
+"""
+Parser por reglas del Receptor para solicitudes ya estructuradas.
+
+Muchas solicitudes llegan como listas: "5 x PLC Siemens S7-1200", líneas
+tipo CSV ("Toner HP 85A;4") o viñetas con cantidades. Para ellas no hace
+falta el LLM: `ParserReglas` extrae los productos con patrones de cantidad
+y unidad, clasifica cada uno con un léxico de palabras clave por categoría
+y detecta la urgencia ("URGENTE", "lo antes posible"...) y el presupuesto.
+
+Cada línea con contenido suma a la confianza: 1 si es un producto con
+categoría reconocida, 0.5 si es un producto sin categoría y 0 si no se
+entiende. Los saludos, encabezados ("Necesito:"), líneas de urgencia,
+presupuesto, notas y datos de contacto ("Teléfono: ...") no cuentan. Si la
+confianza (promedio de las líneas) no llega a
+`RECEPTOR_REGLAS_CONFIANZA_MINIMA`, el Receptor usa el LLM.
+
+El texto libre ("Necesito 5 PLCs para la planta") siempre va al LLM: solo
+se reconocen líneas que empiezan o terminan con la cantidad.
+"""
+import re
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import settings
+
+# Palabras clave por categoría, sin acentos y en singular. El orden es la
+# prioridad: "servicio de mantención de impresoras" es un servicio y
+# "papel para impresora" un insumo.
+LEXICO_CATEGORIAS: Dict[str, Tuple[str, ...]] = {
+    "servicios": (
+        "servicio", "mantencion", "mantenimiento", "instalacion", "reparacion",
+        "capacitacion", "consultoria", "asesoria", "limpieza", "soporte",
+        "transporte", "arriendo", "calibracion",
+    ),
+    "insumos": (
+        "papel", "resma", "toner", "tinta", "cartucho", "lapiz", "lapices",
+        "boligrafo", "carpeta", "cuaderno", "archivador", "corchetera",
+        "corchete", "clip", "sobre", "cinta", "pila", "bateria", "guante",
+        "mascarilla", "detergente", "tornillo", "perno", "tuerca", "clavo",
+        "electrodo", "lija",
+    ),
+    "mobiliario": (
+        "silla", "sillon", "escritorio", "mesa", "estante", "estanteria",
+        "repisa", "mueble", "casillero", "locker", "pizarra", "gabinete",
+        "cajonera", "butaca",
+    ),
+    "tecnologia": (
+        "laptop", "notebook", "computador", "computadora", "pc", "desktop",
+        "monitor", "pantalla", "impresora", "escaner", "proyector", "tablet",
+        "celular", "smartphone", "telefono", "servidor", "router", "switch",
+        "teclado", "mouse", "disco", "ssd", "memoria", "cable", "webcam",
+        "audifono", "licencia", "software", "ups",
+    ),
+    "equipamiento": (
+        "plc", "sensor", "variador", "motor", "bomba", "valvula", "compresor",
+        "generador", "taladro", "esmeril", "soldadora", "herramienta",
+        "maquina", "torno", "contactor", "rele", "transformador", "actuador",
+        "multimetro", "manometro", "termocupla",
+    ),
+}
+
+# Frases de urgencia (sin acentos), de mayor a menor nivel
+FRASES_URGENCIA: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("urgente", (
+        "urgente", "urgencia", "inmediato", "inmediata", "asap", "para hoy",
+        "para manana", "esta semana",
+    )),
+    ("alta", ("lo antes posible", "pronto", "prioridad alta", "este mes")),
+)
+
+# Máximo de palabras de un nombre de producto (más es texto libre)
+MAX_PALABRAS_NOMBRE = 8
+
+# Mayor cantidad aceptada tras ":" ("Sillas: 10"); más es un teléfono, un RUT o
+# un código y no una cantidad
+MAX_CANTIDAD_DOS_PUNTOS = 99_999
+
+_CANTIDAD = r"\d{1,3}(?:[.,]\d{3})+|\d+"
+_UNIDAD = r"(?:unidades|unidad|unid\.?|uds?\.?|u\.|pzas?\.?|piezas?)"
+
+# "5 x PLC Siemens", "10 unidades de sillas", "3 Monitores 24''"
+PATRON_CANTIDAD_PRIMERO = re.compile(
+    rf"^(?P<cantidad>{_CANTIDAD})(?:\s*[x×*]\s*|\s+)(?:{_UNIDAD}\s+)?(?:de\s+)?(?P<nombre>\S.*)$",
+    re.I,
+)
+# "PLC Siemens S7-1200 x 5", "Sillas: 10", "Toner HP 85A - 4 unidades"
+PATRON_CANTIDAD_AL_FINAL = re.compile(
+    rf"^(?P<nombre>.+?)(?P<separador>\s*[x×*:]\s*|\s+[-–]\s+)(?P<cantidad>{_CANTIDAD})(?:\s*{_UNIDAD})?$",
+    re.I,
+)
+# Última palabra de "Pantalla 1920 x 1080", "Tornillos M8 x 20", "Perno 1/2 x 3" o
+# "Perfil 40mm x 6": una medida (número, rosca métrica, fracción o longitud),
+# así que lo que sigue a la "x" es otra medida y no la cantidad
+PATRON_MEDIDA = re.compile(
+    r"""^(?:
+        \d+(?:[.,]\d+)?(?:\s*(?:mm|cm|mts?|m|in|pulg(?:adas?)?|"|''|'))?
+        |\d+(?:-\d+)?/\d+(?:"|''|')?
+        |m\d+(?:[.,]\d+)?
+    )$""",
+    re.I | re.X,
+)
+PATRON_CANTIDAD_SOLA = re.compile(rf"^(?:{_CANTIDAD})(?:\s*{_UNIDAD})?$", re.I)
+PATRON_VINETA = re.compile(r"^\s*(?:[-*•·]|\d+[.)])\s+")
+PATRON_SEPARADOR_CSV = re.compile(r"[;\t,|]")
+PATRON_PRESUPUESTO = re.compile(
+    rf"^presupuesto\b[^\d]*(?P<monto>{_CANTIDAD})\s*(?P<escala>millones|millon|mil|mm)?",
+    re.I,
+)
+PATRON_NOTA = re.compile(
+    r"^(?:nota|notas|obs|observaci[oó]n(?:es)?|entrega|comentarios?|lugar de entrega)\s*:", re.I
+)
+# Datos de contacto o identificación ("Teléfono: 5512345678", "RUT: 76.123.456"):
+# van a las notas aunque terminen en un número
+PATRON_DATO_CONTACTO = re.compile(
+    r"^(?:tel[eé]fono|tel\.?|fono|celular|cel\.?|whatsapp|m[oó]vil|rut|rfc|cp|c\.p\.|"
+    r"c[oó]digo postal|n[°º]?\s*(?:de\s+)?cotizaci[oó]n|n[uú]mero de cotizaci[oó]n)\s*:",
+    re.I,
+)
+PATRON_SALUDO = re.compile(
+    r"^(?:hola|buen[oa]s?\b|estimad[oa]s?|saludos|gracias|muchas gracias|atte|atentamente|"
+    r"quedo atent[oa])",
+    re.I,
+)
+
+ESCALAS_PRESUPUESTO = {"mil": 1_000, "millon": 1_000_000, "millones": 1_000_000, "mm": 1_000_000}
+
+
+def _sin_acentos(texto: str) -> str:
+    """Minúsculas y sin acentos, para comparar con el léxico."""
+    normalizado = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in normalizado if not unicodedata.combining(c))
+
+
+def _entero(cantidad: str) -> int:
+    """'1.000' o '1,000' -> 1000."""
+    return int(re.sub(r"[.,]", "", cantidad))
+
+
+def detectar_urgencia(texto: str) -> str:
+    """
+    Nivel de urgencia según las frases del texto.
+
+    Args:
+        texto: Texto de la solicitud
+
+    Returns:
+        "urgente", "alta" o "normal"
+    """
+    normalizado = _sin_acentos(texto)
+    for nivel, frases in FRASES_URGENCIA:
+        if any(re.search(rf"\b{re.escape(frase)}\b", normalizado) for frase in frases):
+            return nivel
+    return "normal"
+
+
+def categorizar(nombre: str) -> Optional[str]:
+    """
+    Categoría de un producto según el léxico (None si no se reconoce).
+
+    Args:
+        nombre: Nombre del producto
+
+    Returns:
+        Categoría de `SolicitudProcesada` o None
+    """
+    palabras = set(re.findall(r"[a-z0-9]+", _sin_acentos(nombre)))
+    for categoria, claves in LEXICO_CATEGORIAS.items():
+        for clave in claves:
+            if clave in palabras or f"{clave}s" in palabras or f"{clave}es" in palabras:
+                return categoria
+    return None
+
+
+def _quitar_urgencia(linea: str) -> str:
+    """Quita las frases de urgencia de una línea de producto."""
+    for _, frases in FRASES_URGENCIA:
+        for frase in frases:
+            linea = re.sub(rf"\b{re.escape(frase)}\b", "", linea, flags=re.I)
+    return linea.strip(" \t.,;:!-–")
+
+
+def _nombre_valido(nombre: str) -> bool:
+    """Un nombre de producto, no una oración."""
+    palabras = nombre.split()
+    return (
+        0 < len(palabras) <= MAX_PALABRAS_NOMBRE
+        and re.search(r"[a-záéíóúñ]", nombre, re.I) is not None
+        and not nombre.rstrip().endswith(("?", "."))
+    )
+
+
+def _producto_csv(linea: str) -> Optional[Dict]:
+    """'Toner HP 85A;4;Original' -> producto (una sola columna numérica)."""
+    campos = [c.strip() for c in PATRON_SEPARADOR_CSV.split(linea) if c.strip()]
+    cantidades = [c for c in campos if PATRON_CANTIDAD_SOLA.match(c)]
+    textos = [c for c in campos if not PATRON_CANTIDAD_SOLA.match(c)]
+    if len(cantidades) != 1 or not textos or not _nombre_valido(textos[0]):
+        return None
+
+    return {
+        "nombre": textos[0],
+        "cantidad": _entero(re.match(_CANTIDAD, cantidades[0]).group(0)),
+        "especificaciones": ", ".join(textos[1:]),
+    }
+
+
+def _producto_linea(linea: str) -> Optional[Dict]:
+    """'5 x PLC Siemens' o 'PLC Siemens x 5' -> producto."""
+    coincidencia = PATRON_CANTIDAD_PRIMERO.match(linea)
+    if coincidencia is None:
+        coincidencia = PATRON_CANTIDAD_AL_FINAL.match(linea)
+        # "Pantalla 1920 x 1080" o "Tornillos M8 x 20" son medidas, no cantidades
+        if coincidencia is not None and (
+            PATRON_MEDIDA.match(coincidencia.group("nombre").split()[-1])
+            and coincidencia.group("separador").strip() in "x×*"
+        ):
+            return None
+    if coincidencia is None:
+        return None
+    # "Código: 64000123" es un dato, no una cantidad
+    if (
+        coincidencia.groupdict().get("separador", "").strip() == ":"
+        and _entero(coincidencia.group("cantidad")) > MAX_CANTIDAD_DOS_PUNTOS
+    ):
+        return None
+
+    nombre = coincidencia.group("nombre").strip(" .,;:")
+    especificaciones = ""
+    parentesis = re.search(r"\(([^)]*)\)\s*$", nombre)
+    if parentesis:
+        especificaciones = parentesis.group(1).strip()
+        nombre = nombre[:parentesis.start()].strip()
+
+    if not _nombre_valido(nombre):
+        return None
+    return {
+        "nombre": nombre,
+        "cantidad": _entero(coincidencia.group("cantidad")),
+        "especificaciones": especificaciones,
+    }
+
+
+def _es_encabezado(linea: str) -> bool:
+    """Saludos, despedidas, 'Necesito:' o la fila de títulos de un CSV."""
+    if PATRON_SALUDO.match(linea) and len(linea.split()) <= 6:
+        return True
+    if linea.endswith(":") and not re.search(r"\d", linea):
+        return True
+    campos = [_sin_acentos(c.strip()) for c in PATRON_SEPARADOR_CSV.split(linea)]
+    return len(campos) > 1 and "cantidad" in campos
+
+
+class ParserReglas:
+    """
+    Extrae solicitudes estructuradas sin LLM y cuenta su tasa de aciertos.
+
+    Uso típico:
+        >>> datos = parser_reglas.parsear("URGENTE\\n- 5 x PLC Siemens S7-1200")
+        >>> datos["productos"][0]["cantidad"], datos["urgencia"]
+        (5, 'urgente')
+    """
+
+    def __init__(self, confianza_minima: float = 0.9):
+        """
+        Inicializa el parser.
+
+        Args:
+            confianza_minima: Confianza (0-1) desde la que no se usa el LLM
+        """
+        self.confianza_minima = confianza_minima
+        self._intentos = 0
+        self._aciertos = 0
+        self._lock = threading.Lock()
+
+    def analizar(self, texto: str) -> Tuple[Dict, float]:
+        """
+        Extrae lo que las reglas reconocen del texto.
+
+        Args:
+            texto: Texto de la solicitud
+
+        Returns:
+            (datos con el formato de `SolicitudProcesada`, confianza 0-1)
+        """
+        productos: List[Dict] = []
+        notas: List[str] = []
+        presupuesto: Optional[float] = None
+        puntaje = 0.0
+        lineas_contenido = 0
+
+        for linea_original in texto.splitlines():
+            linea = PATRON_VINETA.sub("", linea_original).strip()
+            if not linea or _es_encabezado(linea):
+                continue
+
+            monto = PATRON_PRESUPUESTO.match(_sin_acentos(linea))
+            if monto:
+                escala = ESCALAS_PRESUPUESTO.get(monto.group("escala") or "", 1)
+                presupuesto = float(_entero(monto.group("monto")) * escala)
+                continue
+            if PATRON_NOTA.match(linea) or PATRON_DATO_CONTACTO.match(linea):
+                notas.append(linea)
+                continue
+
+            linea_producto = _quitar_urgencia(linea)
+            if not linea_producto:
+                continue  # "URGENTE!"
+            if detectar_urgencia(linea) != "normal" and not re.search(r"\d", linea_producto):
+                notas.append(linea)  # "Urgente: para el viernes"
+                continue
+
+            lineas_contenido += 1
+            producto = None
+            if PATRON_SEPARADOR_CSV.search(linea_producto):
+                producto = _producto_csv(linea_producto)
+            if producto is None:
+                producto = _producto_linea(linea_producto)
+            if producto is None:
+                continue
+
+            categoria = categorizar(f"{producto['nombre']} {producto['especificaciones']}")
+            puntaje += 1.0 if categoria else 0.5
+            productos.append({**producto, "categoria": categoria or "otros"})
+
+        confianza = puntaje / lineas_contenido if productos else 0.0
+        datos = {
+            "productos": productos,
+            "urgencia": detectar_urgencia(texto),
+            "presupuesto_estimado": presupuesto,
+            "notas_adicionales": "\n".join(notas),
+        }
+        return datos, confianza
+
+    def parsear(self, texto: str) -> Optional[Dict]:
+        """
+        Extrae la solicitud si las reglas alcanzan la confianza mínima.
+
+        Args:
+            texto: Texto de la solicitud
+
+        Returns:
+            Datos con el formato de `SolicitudProcesada`, o None si hay que
+            usar el LLM
+        """
+        datos, confianza = self.analizar(texto)
+        acierto = confianza >= self.confianza_minima
+
+        with self._lock:
+            self._intentos += 1
+            self._aciertos += int(acierto)
+        return datos if acierto else None
+
+    def estado(self) -> Dict:
+        """
+        Solicitudes resueltas sin LLM desde el arranque.
+
+        Returns:
+            {"intentos": int, "aciertos": int, "tasa_aciertos": float,
+             "confianza_minima": float}
+        """
+        with self._lock:
+            intentos, aciertos = self._intentos, self._aciertos
+        return {
+            "intentos": intentos,
+            "aciertos": aciertos,
+            "tasa_aciertos": round(aciertos / intentos, 3) if intentos else 0.0,
+            "confianza_minima": self.confianza_minima,
+        }
+
+    def reiniciar(self) -> None:
+        """Borra los contadores."""
+        with self._lock:
+            self._intentos = 0
+            self._aciertos = 0
+
+
+# Instancia global del parser
+parser_reglas = ParserReglas(confianza_minima=settings.RECEPTOR_REGLAS_CONFIANZA_MINIMA)
@@ -0,0 +1,218 @@
+"""
+Registro de agentes: clientes de OpenAI y prompts compartidos por el proceso.
+
+Construir un `ReceptorAgent` por llamada abría un cliente de OpenAI nuevo
+(con su propio pool de conexiones y handshake TLS) y releía el prompt del
+disco. El registro mantiene en memoria, una sola vez por proceso:
+
+- Los clientes síncrono y asíncrono de `openai_service`, que reutilizan sus
+  conexiones HTTP entre llamadas de todos los agentes.
+- Los prompts de receptor, investigador, generador y comparador.
+- Las plantillas Jinja2 ya compiladas (personalización de RFQs).
+- La instancia del Agente Receptor.
+
+`precargar()` se llama al arrancar la API para que la primera solicitud no
+pague la carga; `recargar()` vuelve a leer los prompts (y opcionalmente
+recrea los clientes) sin reiniciar el proceso.
+"""
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, Template
+from openai import AsyncOpenAI, OpenAI
+
+from config.logging_config import logger
+from src.agents.receptor import ReceptorAgent
+from src.services.openai_service import OpenAIService, openai_service
+
+# Directorio de los prompts de los agentes
+DIRECTORIO_PROMPTS = Path(__file__).parent.parent / "prompts"
+
+# Prompt de cada agente que vive en un archivo
+ARCHIVOS_PROMPT = {
+    "receptor": "receptor_prompt.txt",
+    "investigador": "investigador_prompt.txt",
+    "generador": "generador_rfq_prompt.txt",
+    "comparador": "comparador_prompt.txt",
+}
+
+# Plantillas Jinja2 (texto plano, sin autoescape) del mismo directorio
+ARCHIVOS_PLANTILLA = {
+    "rfq": "rfq_personalizado.j2",
+}
+
+
+class RegistroAgentes:
+    """
+    Dueño de los clientes de OpenAI, los prompts y las instancias de agentes.
+
+    Uso típico:
+        >>> prompt = registro_agentes.prompt("investigador")
+        >>> agente = registro_agentes.receptor()
+    """
+
+    def __init__(
+        self,
+        servicio: Optional[OpenAIService] = None,
+        directorio_prompts: Optional[Path] = None,
+    ):
+        """
+        Args:
+            servicio: Servicio cuyos clientes se comparten (global por defecto)
+            directorio_prompts: Directorio de los archivos de prompt
+        """
+        self.servicio = servicio or openai_service
+        self.directorio_prompts = Path(directorio_prompts or DIRECTORIO_PROMPTS)
+        self._prompts: Dict[str, str] = {}
+        self._plantillas: Dict[str, Template] = {}
+        self._entorno = Environment(
+            loader=FileSystemLoader(self.directorio_prompts),
+            trim_blocks=True,
+            lstrip_blocks=True,
+            undefined=StrictUndefined,
+            autoescape=False,
+        )
+        self._receptor: Optional[ReceptorAgent] = None
+        self._lock = threading.RLock()
+
+    @property
+    def client(self) -> OpenAI:
+        """Cliente síncrono compartido."""
+        return self.servicio.client
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """Cliente asíncrono compartido."""
+        return self.servicio.async_client
+
+    def prompt(self, nombre: str) -> str:
+        """
+        Prompt del sistema de un agente (se lee del disco solo la primera vez).
+
+        Args:
+            nombre: receptor, investigador, generador o comparador
+
+        Returns:
+            Texto del prompt
+
+        Raises:
+            KeyError: Si el agente no tiene prompt registrado
+            FileNotFoundError: Si el archivo del prompt no existe
+        """
+        texto = self._prompts.get(nombre)
+        if texto is not None:
+            return texto
+
+        with self._lock:
+            if nombre not in self._prompts:
+                self._prompts[nombre] = self._leer_prompt(nombre)
+            return self._prompts[nombre]
+
+    def _leer_prompt(self, nombre: str) -> str:
+        """Lee del disco el prompt de un agente."""
+        if nombre not in ARCHIVOS_PROMPT:
+            raise KeyError(f"No hay prompt registrado para el agente '{nombre}'")
+
+        ruta = self.directorio_prompts / ARCHIVOS_PROMPT[nombre]
+        logger.info(f"📄 Cargando prompt de {nombre} desde {ruta}")
+        return ruta.read_text(encoding="utf-8")
+
+    def plantilla(self, nombre: str) -> Template:
+        """
+        Plantilla Jinja2 compilada (se lee y compila solo la primera vez).
+
+        Args:
+            nombre: Nombre registrado de la plantilla (p. ej. "rfq")
+
+        Returns:
+            Plantilla lista para `render`
+
+        Raises:
+            KeyError: Si la plantilla no está registrada
+            TemplateNotFound: Si el archivo de la plantilla no existe
+        """
+        plantilla = self._plantillas.get(nombre)
+        if plantilla is not None:
+            return plantilla
+
+        if nombre not in ARCHIVOS_PLANTILLA:
+            raise KeyError(f"No hay plantilla registrada con el nombre '{nombre}'")
+
+        with self._lock:
+            if nombre not in self._plantillas:
+                archivo = ARCHIVOS_PLANTILLA[nombre]
+                logger.info(f"📄 Compilando plantilla {nombre} desde {archivo}")
+                self._plantillas[nombre] = self._entorno.get_template(archivo)
+            return self._plantillas[nombre]
+
+    def receptor(self) -> ReceptorAgent:
+        """
+        Agente Receptor del proceso, con los clientes y el prompt compartidos.
+
+        Returns:
+            Instancia reutilizable de ReceptorAgent
+        """
+        agente = self._receptor
+        if agente is not None:
+            return agente
+
+        with self._lock:
+            if self._receptor is None:
+                try:
+                    prompt = self.prompt("receptor")
+                except FileNotFoundError:
+                    prompt = None  # El agente usa su prompt por defecto
+
+                # Sin modelo fijo: el Receptor usa el enrutador como los demás agentes
+                self._receptor = ReceptorAgent(
+                    client=self.client,
+                    async_client=self.async_client,
+                    system_prompt=prompt,
+                )
+            return self._receptor
+
+    def precargar(self) -> None:
+        """Carga todos los prompts y construye los agentes por adelantado."""
+        for nombre in ARCHIVOS_PROMPT:
+            self.prompt(nombre)
+        for nombre in ARCHIVOS_PLANTILLA:
+            self.plantilla(nombre)
+        self.receptor()
+        logger.info(f"🔥 Agentes precargados - Prompts: {', '.join(sorted(self._prompts))}")
+
+    def recargar(self, clientes: bool = False) -> None:
+        """
+        Vuelve a leer los prompts y reconstruye los agentes.
+
+        Args:
+            clientes: Si True, también recrea los clientes de OpenAI (p. ej.
+                tras rotar la API key)
+        """
+        with self._lock:
+            if clientes:
+                self.servicio.reiniciar_clientes()
+            self._prompts = {}
+            self._plantillas = {}
+            self._entorno.cache.clear()
+            self._receptor = None
+
+        self.precargar()
+        logger.info("♻️  Registro de agentes recargado")
+
+    def estado(self) -> Dict:
+        """
+        Prompts cargados y agentes construidos.
+
+        Returns:
+            {"prompts": [str], "plantillas": [str], "receptor": bool}
+        """
+        return {
+            "prompts": sorted(self._prompts),
+            "plantillas": sorted(self._plantillas),
+            "receptor": self._receptor is not None,
+        }
+
+
+# Instancia global del registro
+registro_agentes = RegistroAgentes()
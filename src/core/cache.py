@@ -0,0 +1,529 @@
+"""
+Caché persistente de respuestas del LLM.
+
+Las mismas peticiones a OpenAI se repiten con frecuencia: pestañas de
+Streamlit que se vuelven a ejecutar, búsquedas del Investigador sobre el
+mismo conjunto de proveedores, re-análisis de una cotización. `CacheLLM`
+guarda el contenido de cada respuesta con una clave derivada de modelo,
+mensajes, temperatura y response_format, y lo reutiliza mientras no expire.
+
+El almacenamiento es intercambiable (`BackendCache`):
+
+- `BackendSQLite`: archivo SQLite en disco, sobrevive a reinicios y se
+  comparte entre procesos. Expira por TTL y desaloja las entradas usadas
+  hace más tiempo (LRU) al superar `max_entradas`.
+- `BackendMemoria`: diccionario LRU en memoria, útil para tests o para
+  desplegar sin disco.
+
+Las generaciones creativas (RFQs, comparaciones) deben llamar con
+`usar_cache=False`.
+
+`CacheBusquedas` usa los mismos backends para las respuestas de Serper, con
+stale-while-revalidate: una respuesta vencida se sigue sirviendo durante
+una ventana extra mientras se vuelve a consultar en segundo plano.
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config.logging_config import logger
+from config.settings import settings
+
+# Parámetros de chat completions que determinan la respuesta
+PARAMETROS_CLAVE = ("model", "messages", "temperature", "response_format")
+
+# Parámetros de una consulta a Serper que determinan la respuesta
+PARAMETROS_CLAVE_BUSQUEDA = ("q", "gl", "hl", "num")
+
+
+class BackendCache(ABC):
+    """Interfaz de almacenamiento clave → texto con expiración."""
+
+    @abstractmethod
+    def obtener(self, clave: str) -> Optional[str]:
+        """Valor vigente de la clave, o None."""
+
+    @abstractmethod
+    def guardar(self, clave: str, valor: str, ttl_seg: float) -> None:
+        """Guarda el valor durante `ttl_seg` segundos."""
+
+    @abstractmethod
+    def limpiar(self) -> None:
+        """Elimina todas las entradas."""
+
+    @abstractmethod
+    def tamano(self) -> int:
+        """Número de entradas almacenadas."""
+
+
+class BackendMemoria(BackendCache):
+    """Caché LRU en memoria del proceso."""
+
+    def __init__(self, max_entradas: int = 1000):
+        """
+        Args:
+            max_entradas: Entradas máximas antes de desalojar la menos reciente
+        """
+        self.max_entradas = max_entradas
+        self._entradas: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave: str) -> Optional[str]:
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            valor, expira = entrada
+            if expira <= time.time():
+                del self._entradas[clave]
+                return None
+            self._entradas.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave: str, valor: str, ttl_seg: float) -> None:
+        with self._lock:
+            self._entradas[clave] = (valor, time.time() + ttl_seg)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+
+    def tamano(self) -> int:
+        with self._lock:
+            return len(self._entradas)
+
+
+class BackendSQLite(BackendCache):
+    """
+    Caché en un archivo SQLite con TTL y desalojo LRU.
+
+    Usa una conexión por instancia protegida con un lock (los agentes la
+    usan desde hilos) y modo WAL para que varios procesos compartan el
+    archivo.
+    """
+
+    def __init__(self, ruta: str, max_entradas: int = 5000):
+        """
+        Args:
+            ruta: Ruta del archivo SQLite (se crea el directorio si no existe)
+            max_entradas: Entradas máximas antes de desalojar las menos usadas
+        """
+        self.ruta = ruta
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+
+        Path(ruta).parent.mkdir(parents=True, exist_ok=True)
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False, timeout=5)
+        with self._lock, self._conexion:
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+            self._conexion.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cache (
+                    clave TEXT PRIMARY KEY,
+                    valor TEXT NOT NULL,
+                    expira REAL NOT NULL,
+                    ultimo_acceso REAL NOT NULL
+                )
+                """
+            )
+            self._conexion.execute(
+                "CREATE INDEX IF NOT EXISTS ix_cache_ultimo_acceso ON cache (ultimo_acceso)"
+            )
+
+    def obtener(self, clave: str) -> Optional[str]:
+        ahora = time.time()
+        with self._lock, self._conexion:
+            fila = self._conexion.execute(
+                "SELECT valor, expira FROM cache WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila is None:
+                return None
+            if fila[1] <= ahora:
+                self._conexion.execute("DELETE FROM cache WHERE clave = ?", (clave,))
+                return None
+            self._conexion.execute(
+                "UPDATE cache SET ultimo_acceso = ? WHERE clave = ?", (ahora, clave)
+            )
+            return fila[0]
+
+    def guardar(self, clave: str, valor: str, ttl_seg: float) -> None:
+        ahora = time.time()
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO cache (clave, valor, expira, ultimo_acceso) "
+                "VALUES (?, ?, ?, ?)",
+                (clave, valor, ahora + ttl_seg, ahora),
+            )
+            self._conexion.execute("DELETE FROM cache WHERE expira <= ?", (ahora,))
+
+            (total,) = self._conexion.execute("SELECT COUNT(*) FROM cache").fetchone()
+            if total > self.max_entradas:
+                self._conexion.execute(
+                    "DELETE FROM cache WHERE clave IN "
+                    "(SELECT clave FROM cache ORDER BY ultimo_acceso ASC LIMIT ?)",
+                    (total - self.max_entradas,),
+                )
+
+    def limpiar(self) -> None:
+        with self._lock, self._conexion:
+            self._conexion.execute("DELETE FROM cache")
+
+    def tamano(self) -> int:
+        with self._lock:
+            return self._conexion.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+class CacheLLM:
+    """
+    Caché de respuestas de chat completions con conteo de aciertos.
+
+    Uso típico:
+        >>> contenido = cache_llm.obtener(kwargs)
+        >>> if contenido is None:
+        ...     contenido = client.chat.completions.create(**kwargs).choices[0].message.content
+        ...     cache_llm.guardar(kwargs, contenido)
+    """
+
+    def __init__(self, backend: Optional[BackendCache], ttl_seg: float = 86400):
+        """
+        Args:
+            backend: Almacenamiento; None desactiva la caché
+            ttl_seg: Segundos que una respuesta se considera vigente
+        """
+        self.backend = backend
+        self.ttl_seg = ttl_seg
+        self._aciertos = 0
+        self._fallos = 0
+        self._lock = threading.Lock()
+
+    @property
+    def habilitada(self) -> bool:
+        """True si hay backend configurado."""
+        return self.backend is not None
+
+    @staticmethod
+    def calcular_clave(kwargs: Dict[str, Any]) -> str:
+        """
+        Clave de una petición: hash de modelo, mensajes, temperatura y formato.
+
+        Args:
+            kwargs: Parámetros de `chat.completions.create`
+
+        Returns:
+            SHA-256 hexadecimal
+        """
+        datos = {parametro: kwargs.get(parametro) for parametro in PARAMETROS_CLAVE}
+        contenido = json.dumps(datos, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+    def obtener(self, kwargs: Dict[str, Any]) -> Optional[str]:
+        """
+        Respuesta guardada para la petición, contando acierto o fallo.
+
+        Un error del backend se registra y se trata como fallo: la caché
+        nunca impide llamar a OpenAI.
+
+        Args:
+            kwargs: Parámetros de `chat.completions.create`
+
+        Returns:
+            Contenido de la respuesta o None
+        """
+        if not self.habilitada:
+            return None
+
+        try:
+            valor = self.backend.obtener(self.calcular_clave(kwargs))
+        except Exception as e:
+            logger.warning(f"⚠️  Error leyendo caché LLM: {e}")
+            valor = None
+
+        with self._lock:
+            if valor is None:
+                self._fallos += 1
+            else:
+                self._aciertos += 1
+
+        if valor is not None:
+            logger.debug(f"💾 Respuesta LLM desde caché ({kwargs.get('model')})")
+        return valor
+
+    def guardar(self, kwargs: Dict[str, Any], contenido: str) -> None:
+        """
+        Guarda la respuesta de una petición.
+
+        Args:
+            kwargs: Parámetros de `chat.completions.create`
+            contenido: Contenido de la respuesta
+        """
+        if not self.habilitada or not contenido:
+            return
+
+        try:
+            self.backend.guardar(self.calcular_clave(kwargs), contenido, self.ttl_seg)
+        except Exception as e:
+            logger.warning(f"⚠️  Error guardando en caché LLM: {e}")
+
+    def estadisticas(self) -> Dict:
+        """
+        Aciertos, fallos y tamaño de la caché.
+
+        Returns:
+            {"habilitada", "aciertos", "fallos", "tasa_aciertos", "entradas"}
+        """
+        with self._lock:
+            aciertos, fallos = self._aciertos, self._fallos
+
+        total = aciertos + fallos
+        return {
+            "habilitada": self.habilitada,
+            "aciertos": aciertos,
+            "fallos": fallos,
+            "tasa_aciertos": round(aciertos / total, 3) if total else 0.0,
+            "entradas": self.backend.tamano() if self.habilitada else 0,
+        }
+
+    def reiniciar_estadisticas(self) -> None:
+        """Pone a cero los contadores."""
+        with self._lock:
+            self._aciertos = 0
+            self._fallos = 0
+
+
+def _crear_cache_llm() -> CacheLLM:
+    """Crea la caché global según settings (SQLite en disco por defecto)."""
+    ttl_seg = settings.LLM_CACHE_TTL_HORAS * 3600
+    if not settings.LLM_CACHE_HABILITADA:
+        return CacheLLM(None, ttl_seg)
+
+    try:
+        backend = BackendSQLite(settings.LLM_CACHE_RUTA, settings.LLM_CACHE_MAX_ENTRADAS)
+    except Exception as e:
+        logger.warning(f"⚠️  No se pudo abrir la caché LLM en disco, se usa memoria: {e}")
+        backend = BackendMemoria(settings.LLM_CACHE_MAX_ENTRADAS)
+
+    return CacheLLM(backend, ttl_seg)
+
+
+# Instancia global de la caché
+cache_llm = _crear_cache_llm()
+
+
+class CacheBusquedas:
+    """
+    Caché de respuestas de Serper con stale-while-revalidate.
+
+    Cada respuesta se guarda en el backend por `ttl_seg + obsoleta_seg`
+    junto con el momento en que deja de estar fresca. Mientras está fresca
+    se sirve tal cual; después, y hasta que el backend la expira, se sirve
+    igual (sin esperar a Serper) y `revalidar` la vuelve a consultar en un
+    hilo aparte, una vez por clave.
+
+    Uso típico:
+        >>> datos, obsoleta = cache_busquedas.obtener(payload)
+        >>> if datos is None:
+        ...     datos = consultar(payload)
+        ...     cache_busquedas.guardar(payload, datos)
+        ... elif obsoleta:
+        ...     cache_busquedas.revalidar(payload, lambda: consultar(payload))
+    """
+
+    def __init__(
+        self, backend: Optional[BackendCache], ttl_seg: float = 86400, obsoleta_seg: float = 0
+    ):
+        """
+        Args:
+            backend: Almacenamiento; None desactiva la caché
+            ttl_seg: Segundos que una respuesta se considera fresca
+            obsoleta_seg: Segundos extra en que una respuesta vencida se
+                sirve mientras se revalida (0 = no se sirven vencidas)
+        """
+        self.backend = backend
+        self.ttl_seg = ttl_seg
+        self.obsoleta_seg = obsoleta_seg
+        self._aciertos = 0
+        self._obsoletos = 0
+        self._fallos = 0
+        self._revalidaciones = 0
+        self._revalidando: set = set()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def habilitada(self) -> bool:
+        """True si hay backend configurado."""
+        return self.backend is not None
+
+    @staticmethod
+    def calcular_clave(payload: Dict[str, Any]) -> str:
+        """
+        Clave de una consulta: hash de la consulta normalizada, gl, hl y num.
+
+        La consulta se normaliza a minúsculas y espacios simples, así que
+        "PLC  Siemens" y "plc siemens" comparten entrada.
+
+        Args:
+            payload: Cuerpo de la consulta a Serper
+
+        Returns:
+            SHA-256 hexadecimal
+        """
+        datos = {parametro: payload.get(parametro) for parametro in PARAMETROS_CLAVE_BUSQUEDA}
+        if isinstance(datos["q"], str):
+            datos["q"] = re.sub(r"\s+", " ", datos["q"]).strip().lower()
+        contenido = json.dumps(datos, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+    def obtener(self, payload: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """
+        Respuesta guardada para la consulta, contando acierto, obsoleto o fallo.
+
+        Un error del backend se registra y se trata como fallo: la caché
+        nunca impide consultar a Serper.
+
+        Args:
+            payload: Cuerpo de la consulta a Serper
+
+        Returns:
+            Tupla (respuesta o None, True si está vencida y hay que revalidar)
+        """
+        if not self.habilitada:
+            return None, False
+
+        try:
+            valor = self.backend.obtener(self.calcular_clave(payload))
+            entrada = json.loads(valor) if valor is not None else None
+        except Exception as e:
+            logger.warning(f"⚠️  Error leyendo caché de búsquedas: {e}")
+            entrada = None
+
+        obsoleta = entrada is not None and entrada["fresca_hasta"] <= time.time()
+        with self._lock:
+            if entrada is None:
+                self._fallos += 1
+            elif obsoleta:
+                self._obsoletos += 1
+            else:
+                self._aciertos += 1
+
+        if entrada is None:
+            return None, False
+        logger.debug(f"💾 Búsqueda desde caché{' (vencida)' if obsoleta else ''}: {payload.get('q')}")
+        return entrada["datos"], obsoleta
+
+    def guardar(self, payload: Dict[str, Any], datos: Dict[str, Any]) -> None:
+        """
+        Guarda la respuesta de una consulta.
+
+        Args:
+            payload: Cuerpo de la consulta a Serper
+            datos: Respuesta (JSON) de Serper
+        """
+        if not self.habilitada:
+            return
+
+        entrada = {"fresca_hasta": time.time() + self.ttl_seg, "datos": datos}
+        try:
+            self.backend.guardar(
+                self.calcular_clave(payload),
+                json.dumps(entrada, ensure_ascii=False),
+                self.ttl_seg + self.obsoleta_seg,
+            )
+        except Exception as e:
+            logger.warning(f"⚠️  Error guardando en caché de búsquedas: {e}")
+
+    def revalidar(self, payload: Dict[str, Any], consultar: Callable[[], Dict[str, Any]]) -> None:
+        """
+        Vuelve a consultar una respuesta vencida en segundo plano.
+
+        Si la clave ya se está revalidando no hace nada; si la consulta
+        falla se conserva la respuesta vencida.
+
+        Args:
+            payload: Cuerpo de la consulta a Serper
+            consultar: Función síncrona que consulta a Serper
+        """
+        clave = self.calcular_clave(payload)
+        with self._lock:
+            if clave in self._revalidando:
+                return
+            self._revalidando.add(clave)
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=2, thread_name_prefix="cache-busquedas"
+                )
+
+        def tarea() -> None:
+            try:
+                self.guardar(payload, consultar())
+                with self._lock:
+                    self._revalidaciones += 1
+            except Exception as e:
+                logger.warning(f"⚠️  No se pudo revalidar la búsqueda {payload.get('q')}: {e}")
+            finally:
+                with self._lock:
+                    self._revalidando.discard(clave)
+
+        self._pool.submit(tarea)
+
+    def estadisticas(self) -> Dict:
+        """
+        Aciertos (frescos y vencidos), fallos, revalidaciones y tamaño.
+
+        Returns:
+            {"habilitada", "aciertos", "obsoletos", "fallos", "tasa_aciertos",
+             "revalidaciones", "entradas"}
+        """
+        with self._lock:
+            aciertos, obsoletos, fallos = self._aciertos, self._obsoletos, self._fallos
+            revalidaciones = self._revalidaciones
+
+        total = aciertos + obsoletos + fallos
+        return {
+            "habilitada": self.habilitada,
+            "aciertos": aciertos,
+            "obsoletos": obsoletos,
+            "fallos": fallos,
+            "tasa_aciertos": round((aciertos + obsoletos) / total, 3) if total else 0.0,
+            "revalidaciones": revalidaciones,
+            "entradas": self.backend.tamano() if self.habilitada else 0,
+        }
+
+    def reiniciar_estadisticas(self) -> None:
+        """Pone a cero los contadores."""
+        with self._lock:
+            self._aciertos = 0
+            self._obsoletos = 0
+            self._fallos = 0
+            self._revalidaciones = 0
+
+
+def _crear_cache_busquedas() -> CacheBusquedas:
+    """Crea la caché global de búsquedas según settings (SQLite en disco por defecto)."""
+    ttl_seg = settings.BUSQUEDA_CACHE_TTL_HORAS * 3600
+    obsoleta_seg = settings.BUSQUEDA_CACHE_OBSOLETA_HORAS * 3600
+    if not settings.BUSQUEDA_CACHE_HABILITADA:
+        return CacheBusquedas(None, ttl_seg, obsoleta_seg)
+
+    try:
+        backend = BackendSQLite(settings.BUSQUEDA_CACHE_RUTA, settings.BUSQUEDA_CACHE_MAX_ENTRADAS)
+    except Exception as e:
+        logger.warning(f"⚠️  No se pudo abrir la caché de búsquedas en disco, se usa memoria: {e}")
+        backend = BackendMemoria(settings.BUSQUEDA_CACHE_MAX_ENTRADAS)
+
+    return CacheBusquedas(backend, ttl_seg, obsoleta_seg)
+
+
+# Instancia global de la caché de búsquedas
+cache_busquedas = _crear_cache_busquedas()
@@ -0,0 +1,611 @@
+"""
+Despachador central de llamadas al LLM con límites de cuota.
+
+Todas las llamadas de los agentes a `chat.completions.create` pasan por
+`despachador_llm`, que:
+
+- Limita por modelo las solicitudes por minuto (RPM) y los tokens estimados
+  por minuto (TPM) con dos cubetas de tokens. Quien excede la cuota espera
+  su turno en lugar de recibir un 429.
+- Limita las llamadas en vuelo a la vez (`max_concurrencia`).
+- Reintenta 429, timeouts, errores de conexión y 5xx con backoff
+  exponencial con jitter, respetando `Retry-After`. Un 429 también pausa la
+  cubeta del modelo para el resto de llamadas.
+
+Los tokens reservados se corrigen con el uso real de cada respuesta y se
+devuelven si el intento falla (la solicitud sigue contando en el RPM).
+
+Las llamadas en streaming usan `stream`/`stream_async`, que conservan el
+cupo de concurrencia hasta que el stream se termina de leer o se cierra, y
+ajustan la reserva con el chunk de uso al cerrarlo.
+
+La espera en cola se registra como span `llm.espera.<modelo>` y cada intento
+como `llm.<modelo>` (en streaming, hasta el cierre del stream) con resultado
+ok, rate_limit, reintento o error en `src.core.metricas`. Los tokens y el
+costo de cada respuesta se guardan con `src.core.uso_llm`, atribuidos al
+`agente` que hace la llamada.
+
+Los clientes de OpenAI se crean con `max_retries=0`: los reintentos son
+responsabilidad del despachador.
+"""
+import asyncio
+import inspect
+import random
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
+
+from config.logging_config import logger
+from config.settings import settings
+from src.core.metricas import RESULTADO_ERROR, medir
+from src.core.uso_llm import AGENTE_DESCONOCIDO, registrar_uso
+
+# Errores transitorios que vale la pena reintentar
+ERRORES_REINTENTABLES = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+# Caracteres por token para estimar el tamaño de una petición
+CARACTERES_POR_TOKEN = 4
+
+RESULTADO_RATE_LIMIT = "rate_limit"
+RESULTADO_REINTENTO = "reintento"
+
+
+class CubetaTokens:
+    """
+    Cubeta de tokens con reserva anticipada (segura entre hilos).
+
+    `reservar` descuenta la cantidad aunque la cubeta quede en negativo y
+    devuelve cuánto debe esperar quien reservó: las reservas se atienden en
+    orden de llegada y la espera no depende de volver a consultar.
+    """
+
+    def __init__(self, capacidad_por_minuto: float):
+        """
+        Args:
+            capacidad_por_minuto: Tokens que se reponen por minuto (y
+                capacidad máxima de la cubeta)
+        """
+        self.capacidad = float(capacidad_por_minuto)
+        self.tasa_por_seg = self.capacidad / 60
+        self._nivel = self.capacidad
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reponer(self) -> None:
+        ahora = time.monotonic()
+        self._nivel = min(self.capacidad, self._nivel + (ahora - self._ultimo) * self.tasa_por_seg)
+        self._ultimo = ahora
+
+    def reservar(self, cantidad: float) -> float:
+        """
+        Reserva tokens.
+
+        Args:
+            cantidad: Tokens a consumir (se limita a la capacidad)
+
+        Returns:
+            Segundos a esperar antes de usar lo reservado
+        """
+        with self._lock:
+            self._reponer()
+            self._nivel -= min(cantidad, self.capacidad)
+            return max(0.0, -self._nivel / self.tasa_por_seg)
+
+    def devolver(self, cantidad: float) -> None:
+        """Devuelve tokens reservados y no usados (o sobreestimados)."""
+        with self._lock:
+            self._reponer()
+            self._nivel = min(self.capacidad, self._nivel + cantidad)
+
+    def pausar(self, segundos: float) -> None:
+        """Vacía la cubeta para que nadie consuma durante `segundos`."""
+        with self._lock:
+            self._reponer()
+            self._nivel = min(self._nivel, 0.0) - segundos * self.tasa_por_seg
+
+    def disponible(self) -> float:
+        """Tokens disponibles ahora (negativo si hay reservas en espera)."""
+        with self._lock:
+            self._reponer()
+            return self._nivel
+
+
+class LimiteModelo:
+    """Cubetas de solicitudes y tokens por minuto de un modelo."""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.solicitudes = CubetaTokens(rpm)
+        self.tokens = CubetaTokens(tpm)
+
+    def reservar(self, tokens: int) -> float:
+        """Reserva una solicitud y `tokens`; devuelve la espera en segundos."""
+        return max(self.solicitudes.reservar(1), self.tokens.reservar(tokens))
+
+    def devolver(self, tokens: int) -> None:
+        """Devuelve una reserva que no llegó a usarse."""
+        self.solicitudes.devolver(1)
+        self.tokens.devolver(tokens)
+
+    def pausar(self, segundos: float) -> None:
+        """Detiene el consumo del modelo tras un 429."""
+        self.solicitudes.pausar(segundos)
+        self.tokens.pausar(segundos)
+
+
+def estimar_tokens(kwargs: Dict[str, Any], tokens_respuesta: int) -> int:
+    """
+    Estima los tokens de una petición de chat completion.
+
+    Args:
+        kwargs: Parámetros de `chat.completions.create`
+        tokens_respuesta: Tokens de respuesta supuestos si no hay max_tokens
+
+    Returns:
+        Tokens del prompt (≈ caracteres / 4) más los de la respuesta
+    """
+    caracteres = sum(len(str(m.get("content") or "")) for m in kwargs.get("messages", []))
+    return caracteres // CARACTERES_POR_TOKEN + int(kwargs.get("max_tokens") or tokens_respuesta)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Segundos indicados por el servidor en Retry-After (si los hay)."""
+    respuesta = getattr(error, "response", None)
+    if respuesta is None:
+        return None
+
+    cabeceras = respuesta.headers
+    try:
+        if "retry-after-ms" in cabeceras:
+            return float(cabeceras["retry-after-ms"]) / 1000
+        if "retry-after" in cabeceras:
+            return float(cabeceras["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+def _cerrar_stream(stream: Any) -> None:
+    """Cierra un stream síncrono de OpenAI (si expone `close`)."""
+    cerrar = getattr(stream, "close", None)
+    if cerrar is not None:
+        cerrar()
+
+
+async def _cerrar_stream_async(stream: Any) -> None:
+    """Cierra un stream asíncrono de OpenAI (`close` o `aclose`)."""
+    cerrar = getattr(stream, "close", None) or getattr(stream, "aclose", None)
+    if cerrar is not None:
+        cerrado = cerrar()
+        if inspect.isawaitable(cerrado):
+            await cerrado
+
+
+class _StreamConUso:
+    """Envuelve un stream de OpenAI y recuerda el uso del chunk que lo trae."""
+
+    def __init__(self, stream: Any):
+        self._stream = stream
+        self.usage = None
+
+    def __iter__(self) -> Iterator[Any]:
+        for chunk in self._stream:
+            self._anotar(chunk)
+            yield chunk
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        async for chunk in self._stream:
+            self._anotar(chunk)
+            yield chunk
+
+    def __getattr__(self, nombre: str) -> Any:
+        return getattr(self._stream, nombre)
+
+    def _anotar(self, chunk: Any) -> None:
+        uso = getattr(chunk, "usage", None)
+        if uso is not None:
+            self.usage = uso
+
+
+def _resultado_error(error: Exception) -> str:
+    """Resultado del span para un error transitorio."""
+    return RESULTADO_RATE_LIMIT if isinstance(error, RateLimitError) else RESULTADO_ERROR
+
+
+class DespachadorLLM:
+    """
+    Punto único de salida de las llamadas al LLM.
+
+    Uso típico:
+        >>> respuesta = despachador_llm.ejecutar(client.chat.completions.create, **kwargs)
+        >>> respuesta = await despachador_llm.ejecutar_async(
+        ...     async_client.chat.completions.create, **kwargs
+        ... )
+        >>> with despachador_llm.stream(client.chat.completions.create, **kwargs) as stream:
+        ...     for chunk in stream:
+        ...         ...
+    """
+
+    def __init__(
+        self,
+        limites: Optional[Dict[str, Dict[str, int]]] = None,
+        max_concurrencia: int = 16,
+        max_reintentos: int = 5,
+        backoff_base_seg: float = 0.5,
+        backoff_max_seg: float = 30.0,
+        tokens_respuesta: int = 500,
+    ):
+        """
+        Inicializa el despachador.
+
+        Args:
+            limites: {modelo: {"rpm": int, "tpm": int}}; los modelos sin
+                entrada solo se limitan por concurrencia
+            max_concurrencia: Llamadas en vuelo a la vez (por modo: hilos y
+                event loop tienen cada uno su cupo)
+            max_reintentos: Reintentos ante errores transitorios
+            backoff_base_seg: Espera del primer reintento (se duplica)
+            backoff_max_seg: Espera máxima entre reintentos
+            tokens_respuesta: Tokens de respuesta supuestos al estimar
+        """
+        self.limites = {
+            modelo: LimiteModelo(limite["rpm"], limite["tpm"])
+            for modelo, limite in (limites or {}).items()
+        }
+        self.max_concurrencia = max_concurrencia
+        self.max_reintentos = max_reintentos
+        self.backoff_base_seg = backoff_base_seg
+        self.backoff_max_seg = backoff_max_seg
+        self.tokens_respuesta = tokens_respuesta
+
+        self._semaforo = threading.BoundedSemaphore(max_concurrencia)
+        self._semaforos_async: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._en_vuelo = 0
+        self._reintentos = 0
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    def ejecutar(
+        self, crear: Callable[..., Any], agente: str = AGENTE_DESCONOCIDO, **kwargs
+    ) -> Any:
+        """
+        Ejecuta una llamada síncrona respetando cuotas y reintentando.
+
+        Args:
+            crear: Función del cliente (p. ej. `client.chat.completions.create`)
+            agente: Agente al que se atribuye el consumo
+            **kwargs: Parámetros de la llamada (debe incluir model y messages)
+
+        Returns:
+            Lo que devuelva `crear`
+
+        Raises:
+            OpenAIError: Si el error no es transitorio o se agotan los reintentos
+        """
+        modelo = kwargs.get("model", "")
+        for intento in range(self.max_reintentos + 1):
+            tokens = self._esperar_cuota(modelo, kwargs, time.sleep)
+            with self._semaforo, self._en_curso():
+                try:
+                    with medir(f"llm.{modelo}") as span:
+                        respuesta = self._intentar(crear, kwargs, span, intento, tokens)
+                except ERRORES_REINTENTABLES as e:
+                    espera = self._preparar_reintento(e, modelo, intento)
+                else:
+                    self._ajustar_tokens(modelo, tokens, respuesta)
+                    registrar_uso(agente, modelo, respuesta, span.duracion_ms)
+                    return respuesta
+            time.sleep(espera)
+
+    async def ejecutar_async(
+        self, crear: Callable[..., Any], agente: str = AGENTE_DESCONOCIDO, **kwargs
+    ) -> Any:
+        """
+        Versión asíncrona de `ejecutar` (las esperas no bloquean el loop).
+
+        Args:
+            crear: Corrutina del cliente (p. ej. `async_client.chat.completions.create`)
+            agente: Agente al que se atribuye el consumo
+            **kwargs: Parámetros de la llamada (debe incluir model y messages)
+
+        Returns:
+            Lo que devuelva `crear`
+
+        Raises:
+            OpenAIError: Si el error no es transitorio o se agotan los reintentos
+        """
+        modelo = kwargs.get("model", "")
+        for intento in range(self.max_reintentos + 1):
+            tokens = await self._esperar_cuota_async(modelo, kwargs)
+            async with self._semaforo_async():
+                with self._en_curso():
+                    try:
+                        with medir(f"llm.{modelo}") as span:
+                            respuesta = await self._intentar_async(
+                                crear, kwargs, span, intento, tokens
+                            )
+                    except ERRORES_REINTENTABLES as e:
+                        espera = self._preparar_reintento(e, modelo, intento)
+                    else:
+                        self._ajustar_tokens(modelo, tokens, respuesta)
+                        if getattr(respuesta, "usage", None) is not None:
+                            await asyncio.to_thread(
+                                registrar_uso, agente, modelo, respuesta, span.duracion_ms
+                            )
+                        return respuesta
+            await asyncio.sleep(espera)
+
+    @contextmanager
+    def stream(self, crear: Callable[..., Any], **kwargs) -> Iterator[Any]:
+        """
+        Abre una llamada en streaming y conserva su cupo mientras se lee.
+
+        Las cuotas y reintentos aplican hasta que OpenAI acepta la llamada;
+        un error a mitad del stream se propaga sin reintentar. El cupo de
+        concurrencia y el span `llm.<modelo>` duran hasta salir del bloque,
+        y al salir el stream se cierra y la reserva de tokens se ajusta con
+        el chunk de uso (si llegó a leerse). El uso de tokens lo registra
+        quien lee el stream, atribuido a su agente.
+
+        Args:
+            crear: Función del cliente (p. ej. `client.chat.completions.create`)
+            **kwargs: Parámetros de la llamada (con `stream=True`)
+
+        Yields:
+            El stream devuelto por `crear` (iterable igual que el original)
+
+        Raises:
+            OpenAIError: Si el error no es transitorio o se agotan los reintentos
+        """
+        modelo = kwargs.get("model", "")
+        for intento in range(self.max_reintentos + 1):
+            tokens = self._esperar_cuota(modelo, kwargs, time.sleep)
+            with self._semaforo, self._en_curso(), medir(f"llm.{modelo}") as span:
+                try:
+                    stream = self._intentar(crear, kwargs, span, intento, tokens)
+                except ERRORES_REINTENTABLES as e:
+                    espera = self._preparar_reintento(e, modelo, intento)
+                else:
+                    envoltorio = _StreamConUso(stream)
+                    try:
+                        yield envoltorio
+                    finally:
+                        _cerrar_stream(stream)
+                        self._ajustar_tokens(modelo, tokens, envoltorio)
+                    return
+            time.sleep(espera)
+
+    @asynccontextmanager
+    async def stream_async(self, crear: Callable[..., Any], **kwargs) -> AsyncIterator[Any]:
+        """
+        Versión asíncrona de `stream`.
+
+        Args:
+            crear: Corrutina del cliente (p. ej. `async_client.chat.completions.create`)
+            **kwargs: Parámetros de la llamada (con `stream=True`)
+
+        Yields:
+            El stream asíncrono devuelto por `crear` (iterable igual que el original)
+
+        Raises:
+            OpenAIError: Si el error no es transitorio o se agotan los reintentos
+        """
+        modelo = kwargs.get("model", "")
+        for intento in range(self.max_reintentos + 1):
+            tokens = await self._esperar_cuota_async(modelo, kwargs)
+            async with self._semaforo_async():
+                with self._en_curso(), medir(f"llm.{modelo}") as span:
+                    try:
+                        stream = await self._intentar_async(crear, kwargs, span, intento, tokens)
+                    except ERRORES_REINTENTABLES as e:
+                        espera = self._preparar_reintento(e, modelo, intento)
+                    else:
+                        envoltorio = _StreamConUso(stream)
+                        try:
+                            yield envoltorio
+                        finally:
+                            await _cerrar_stream_async(stream)
+                            self._ajustar_tokens(modelo, tokens, envoltorio)
+                        return
+            await asyncio.sleep(espera)
+
+    def estado(self) -> Dict:
+        """
+        Ocupación y cuota disponible por modelo.
+
+        Returns:
+            {
+                "en_vuelo": int,
+                "max_concurrencia": int,
+                "reintentos": int,
+                "modelos": {modelo: {"solicitudes_disponibles": float,
+                                     "tokens_disponibles": float}}
+            }
+        """
+        return {
+            "en_vuelo": self._en_vuelo,
+            "max_concurrencia": self.max_concurrencia,
+            "reintentos": self._reintentos,
+            "modelos": {
+                modelo: {
+                    "solicitudes_disponibles": round(limite.solicitudes.disponible(), 1),
+                    "tokens_disponibles": round(limite.tokens.disponible()),
+                }
+                for modelo, limite in self.limites.items()
+            },
+        }
+
+    # ------------------------------------------------------------------
+    # Cuotas
+    # ------------------------------------------------------------------
+
+    def _esperar_cuota(self, modelo: str, kwargs: Dict, dormir: Callable[[float], None]) -> int:
+        """Reserva cuota del modelo y duerme lo necesario; devuelve los tokens reservados."""
+        tokens = estimar_tokens(kwargs, self.tokens_respuesta)
+        limite = self.limites.get(modelo)
+        if limite is None:
+            return tokens
+
+        with medir(f"llm.espera.{modelo}"):
+            espera = limite.reservar(tokens)
+            if espera > 0:
+                dormir(espera)
+        return tokens
+
+    async def _esperar_cuota_async(self, modelo: str, kwargs: Dict) -> int:
+        """Versión asíncrona de `_esperar_cuota` (devuelve la reserva si se cancela)."""
+        tokens = estimar_tokens(kwargs, self.tokens_respuesta)
+        limite = self.limites.get(modelo)
+        if limite is None:
+            return tokens
+
+        with medir(f"llm.espera.{modelo}"):
+            espera = limite.reservar(tokens)
+            if espera > 0:
+                try:
+                    await asyncio.sleep(espera)
+                except asyncio.CancelledError:
+                    limite.devolver(tokens)
+                    raise
+        return tokens
+
+    def _ajustar_tokens(self, modelo: str, estimados: int, respuesta: Any) -> None:
+        """Corrige la cubeta con los tokens reales de la respuesta (si los reporta)."""
+        limite = self.limites.get(modelo)
+        usados = getattr(getattr(respuesta, "usage", None), "total_tokens", None)
+        if limite is None or not isinstance(usados, int):
+            return
+
+        if usados < estimados:
+            limite.tokens.devolver(estimados - usados)
+        elif usados > estimados:
+            limite.tokens.reservar(usados - estimados)
+
+    def _devolver_tokens(self, modelo: str, tokens: int) -> None:
+        """Devuelve los tokens de un intento fallido (la solicitud sigue contando en el RPM)."""
+        limite = self.limites.get(modelo)
+        if limite is not None:
+            limite.tokens.devolver(tokens)
+
+    # ------------------------------------------------------------------
+    # Intentos y reintentos
+    # ------------------------------------------------------------------
+
+    def _intentar(
+        self, crear: Callable[..., Any], kwargs: Dict, span, intento: int, tokens: int
+    ) -> Any:
+        """
+        Un intento de la llamada; marca el span según el resultado.
+
+        Si falla, los `tokens` reservados para el intento vuelven a la cubeta
+        antes de reintentar o propagar el error.
+        """
+        try:
+            respuesta = crear(**kwargs)
+        except Exception as e:
+            self._devolver_tokens(kwargs.get("model", ""), tokens)
+            if isinstance(e, ERRORES_REINTENTABLES):
+                span.resultado = _resultado_error(e)
+            raise
+        if intento:
+            span.resultado = RESULTADO_REINTENTO
+        return respuesta
+
+    async def _intentar_async(
+        self, crear: Callable[..., Any], kwargs: Dict, span, intento: int, tokens: int
+    ) -> Any:
+        """Versión asíncrona de `_intentar`."""
+        try:
+            respuesta = await crear(**kwargs)
+        except Exception as e:
+            self._devolver_tokens(kwargs.get("model", ""), tokens)
+            if isinstance(e, ERRORES_REINTENTABLES):
+                span.resultado = _resultado_error(e)
+            raise
+        if intento:
+            span.resultado = RESULTADO_REINTENTO
+        return respuesta
+
+    def _preparar_reintento(self, error: Exception, modelo: str, intento: int) -> float:
+        """
+        Decide si reintentar y cuánto esperar.
+
+        Un 429 por cuota agotada (insufficient_quota) no se reintenta: no se
+        resolverá esperando.
+
+        Returns:
+            Segundos a esperar antes del siguiente intento
+
+        Raises:
+            El error original si no procede reintentar
+        """
+        if intento >= self.max_reintentos or getattr(error, "code", None) == "insufficient_quota":
+            logger.error(f"❌ LLM {modelo} falló tras {intento + 1} intento(s): {error}")
+            raise error
+
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            espera = retry_after + random.uniform(0, self.backoff_base_seg)
+        else:
+            espera = random.uniform(0.5, 1.0) * min(
+                self.backoff_max_seg, self.backoff_base_seg * 2**intento
+            )
+
+        limite = self.limites.get(modelo)
+        if isinstance(error, RateLimitError) and limite is not None:
+            limite.pausar(espera)
+
+        with self._lock:
+            self._reintentos += 1
+        logger.warning(
+            f"⏳ LLM {modelo}: {type(error).__name__}, reintento {intento + 1}/"
+            f"{self.max_reintentos} en {espera:.1f}s"
+        )
+        return espera
+
+    # ------------------------------------------------------------------
+    # Concurrencia
+    # ------------------------------------------------------------------
+
+    def _semaforo_async(self) -> asyncio.Semaphore:
+        """Semáforo del event loop actual (cada loop tiene su cupo)."""
+        loop = asyncio.get_running_loop()
+        semaforo = self._semaforos_async.get(loop)
+        if semaforo is None:
+            semaforo = asyncio.Semaphore(self.max_concurrencia)
+            self._semaforos_async[loop] = semaforo
+        return semaforo
+
+    @contextmanager
+    def _en_curso(self) -> Iterator[None]:
+        """Cuenta la llamada como en vuelo mientras dura el bloque."""
+        with self._lock:
+            self._en_vuelo += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._en_vuelo -= 1
+
+
+# Instancia global del despachador
+despachador_llm = DespachadorLLM(
+    limites=settings.LLM_LIMITES_POR_MODELO,
+    max_concurrencia=settings.LLM_MAX_CONCURRENCIA,
+    max_reintentos=settings.LLM_MAX_REINTENTOS,
+    backoff_base_seg=settings.LLM_BACKOFF_BASE_SEG,
+    backoff_max_seg=settings.LLM_BACKOFF_MAX_SEG,
+)
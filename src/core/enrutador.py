@@ -0,0 +1,275 @@
+"""
+Enrutamiento de llamadas al LLM por tipo de tarea, con escalamiento.
+
+Los agentes no eligen el modelo: declaran la tarea (`TAREA_GENERAR_RFQ`,
+`TAREA_ANALIZAR_COTIZACION`...) y `enrutador_modelos` la resuelve con la
+lista de modelos de `LLM_MODELOS_POR_TAREA`, del más barato y rápido al más
+capaz:
+
+1. Se llama al primer modelo de la lista.
+2. La respuesta pasa por el `validar` de quien llama (parseo del JSON,
+   esquema, revisión de calidad). Si lanza `ValueError`, se escala al
+   siguiente modelo.
+3. Si el último modelo tampoco pasa la validación, se propaga el error.
+
+Los errores de la API no escalan: sus reintentos son del despachador.
+
+La política (`LLM_POLITICA_ENRUTAMIENTO`) permite comparar estrategias:
+"escalonada" (la descrita), "economica" (solo el primer modelo) y "maxima"
+(solo el último, como antes del enrutador). Cada intento se mide como span
+`enrutador.<tarea>` (resultado ok, escalado o error) y cada decisión se
+registra en el log.
+"""
+import re
+import threading
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from config.logging_config import logger
+from config.settings import settings
+from src.core.metricas import RESULTADO_ERROR, medir
+
+T = TypeVar("T")
+
+# Tipos de tarea que declaran los agentes
+TAREA_ANALIZAR_SOLICITUD = "analizar_solicitud"
+TAREA_INVESTIGAR = "investigar"
+TAREA_GENERAR_RFQ = "generar_rfq"
+TAREA_ANALIZAR_COTIZACION = "analizar_cotizacion"
+TAREA_COMPARAR_COTIZACIONES = "comparar_cotizaciones"
+TAREA_COMPARAR_PRECIOS = "comparar_precios"
+TAREA_EXTRAER_JSON = "extraer_json"
+
+POLITICA_ESCALONADA = "escalonada"
+POLITICA_ECONOMICA = "economica"
+POLITICA_MAXIMA = "maxima"
+POLITICAS = (POLITICA_ESCALONADA, POLITICA_ECONOMICA, POLITICA_MAXIMA)
+
+RESULTADO_ESCALADO = "escalado"
+
+# Un correo de RFQ más corto que esto está truncado o vacío
+MIN_CARACTERES_REDACCION = 40
+
+# Campos de plantilla sin rellenar: [Tu Nombre], [Nombre de la empresa]...
+PATRON_PLACEHOLDER = re.compile(r"\[\s*(tu|su|nombre|empresa|fecha|cargo)\b[^\]]*\]", re.I)
+
+
+def validar_redaccion(contenido: Optional[str]) -> str:
+    """
+    Revisa un texto redactado (RFQ, análisis comparativo).
+
+    Args:
+        contenido: Respuesta del modelo
+
+    Returns:
+        El mismo contenido
+
+    Raises:
+        ValueError: Si está vacío, es demasiado corto o deja placeholders
+    """
+    if not contenido:
+        raise ValueError("Respuesta vacía de OpenAI")
+    if len(contenido.strip()) < MIN_CARACTERES_REDACCION:
+        raise ValueError(f"Redacción demasiado corta ({len(contenido.strip())} caracteres)")
+
+    placeholder = PATRON_PLACEHOLDER.search(contenido)
+    if placeholder:
+        raise ValueError(f"La redacción deja un placeholder: {placeholder.group(0)}")
+    return contenido
+
+
+def validar_no_vacio(contenido: Optional[str]) -> str:
+    """Validación mínima: el modelo devolvió texto."""
+    if not contenido:
+        raise ValueError("Respuesta vacía de OpenAI")
+    return contenido
+
+
+class EnrutadorModelos:
+    """
+    Elige el modelo de cada tarea y escala cuando la respuesta no valida.
+
+    Uso típico:
+        >>> analisis = enrutador_modelos.ejecutar(
+        ...     TAREA_ANALIZAR_COTIZACION,
+        ...     lambda modelo: servicio.completar({**kwargs, "model": modelo}),
+        ...     validar=parsear_cotizacion,
+        ... )
+    """
+
+    def __init__(
+        self,
+        modelos_por_tarea: Optional[Dict[str, List[str]]] = None,
+        modelos_por_defecto: Optional[List[str]] = None,
+        politica: str = POLITICA_ESCALONADA,
+    ):
+        """
+        Inicializa el enrutador.
+
+        Args:
+            modelos_por_tarea: {tarea: [modelo barato, ..., modelo capaz]}
+            modelos_por_defecto: Lista para tareas sin entrada propia
+            politica: "escalonada", "economica" o "maxima"
+
+        Raises:
+            ValueError: Si la política no existe
+        """
+        if politica not in POLITICAS:
+            raise ValueError(f"Política de enrutamiento desconocida: {politica}")
+
+        self.modelos_por_tarea = modelos_por_tarea or {}
+        self.modelos_por_defecto = modelos_por_defecto or [
+            settings.OPENAI_MODEL_MINI,
+            settings.OPENAI_MODEL_FULL,
+        ]
+        self.politica = politica
+
+        self._decisiones: Dict[str, Counter] = {}
+        self._lock = threading.Lock()
+
+    def modelos(self, tarea: str) -> List[str]:
+        """
+        Modelos a intentar para una tarea según la política.
+
+        Args:
+            tarea: Tipo de tarea
+
+        Returns:
+            Lista de modelos en orden de intento
+        """
+        escalera = self.modelos_por_tarea.get(tarea) or self.modelos_por_defecto
+        if self.politica == POLITICA_ECONOMICA:
+            return escalera[:1]
+        if self.politica == POLITICA_MAXIMA:
+            return escalera[-1:]
+        return list(escalera)
+
+    def ejecutar(
+        self,
+        tarea: str,
+        llamar: Callable[[str], Any],
+        validar: Callable[[Any], T] = validar_no_vacio,
+    ) -> T:
+        """
+        Ejecuta una tarea escalando de modelo mientras la respuesta no valide.
+
+        Args:
+            tarea: Tipo de tarea
+            llamar: Recibe el modelo y devuelve la respuesta cruda
+            validar: Convierte/revisa la respuesta; lanza ValueError para escalar
+
+        Returns:
+            Lo que devuelva `validar` con la primera respuesta válida
+
+        Raises:
+            ValueError: Si ningún modelo devuelve una respuesta válida
+        """
+        modelos = self.modelos(tarea)
+        for nivel, modelo in enumerate(modelos):
+            with medir(f"enrutador.{tarea}") as span:
+                try:
+                    resultado = validar(llamar(modelo))
+                except ValueError as e:
+                    self._registrar_fallo(tarea, nivel, modelos, e, span)
+                    continue
+            self._registrar_exito(tarea, modelo, nivel)
+            return resultado
+
+    async def ejecutar_async(
+        self,
+        tarea: str,
+        llamar: Callable[[str], Awaitable[Any]],
+        validar: Callable[[Any], T] = validar_no_vacio,
+    ) -> T:
+        """
+        Versión asíncrona de `ejecutar` (`llamar` es una corrutina).
+
+        Args:
+            tarea: Tipo de tarea
+            llamar: Recibe el modelo y devuelve la respuesta cruda
+            validar: Convierte/revisa la respuesta; lanza ValueError para escalar
+
+        Returns:
+            Lo que devuelva `validar` con la primera respuesta válida
+
+        Raises:
+            ValueError: Si ningún modelo devuelve una respuesta válida
+        """
+        modelos = self.modelos(tarea)
+        for nivel, modelo in enumerate(modelos):
+            with medir(f"enrutador.{tarea}") as span:
+                try:
+                    resultado = validar(await llamar(modelo))
+                except ValueError as e:
+                    self._registrar_fallo(tarea, nivel, modelos, e, span)
+                    continue
+            self._registrar_exito(tarea, modelo, nivel)
+            return resultado
+
+    def estado(self) -> Dict[str, Any]:
+        """
+        Política y decisiones tomadas desde el arranque.
+
+        Returns:
+            {"politica": str, "tareas": {tarea: {"modelos": [...],
+             "respuestas": {modelo: int}, "escalamientos": int,
+             "sin_respuesta_valida": int}}}
+        """
+        with self._lock:
+            decisiones = {tarea: dict(conteo) for tarea, conteo in self._decisiones.items()}
+
+        tareas = {}
+        for tarea, conteo in decisiones.items():
+            tareas[tarea] = {
+                "modelos": self.modelos(tarea),
+                "respuestas": {
+                    clave.split(":", 1)[1]: valor
+                    for clave, valor in conteo.items()
+                    if clave.startswith("ok:")
+                },
+                "escalamientos": conteo.get("escalamientos", 0),
+                "sin_respuesta_valida": conteo.get("sin_respuesta_valida", 0),
+            }
+        return {"politica": self.politica, "tareas": tareas}
+
+    def reiniciar(self) -> None:
+        """Borra los conteos de decisiones."""
+        with self._lock:
+            self._decisiones.clear()
+
+    def _contar(self, tarea: str, clave: str) -> None:
+        with self._lock:
+            self._decisiones.setdefault(tarea, Counter())[clave] += 1
+
+    def _registrar_exito(self, tarea: str, modelo: str, nivel: int) -> None:
+        self._contar(tarea, f"ok:{modelo}")
+        if nivel:
+            logger.info(f"🧭 {tarea}: respuesta válida de {modelo} tras escalar {nivel} nivel(es)")
+        else:
+            logger.debug(f"🧭 {tarea}: resuelta con {modelo}")
+
+    def _registrar_fallo(
+        self, tarea: str, nivel: int, modelos: List[str], error: ValueError, span
+    ) -> None:
+        """Cuenta y registra una respuesta inválida; la propaga si no hay a quién escalar."""
+        modelo = modelos[nivel]
+        if nivel + 1 < len(modelos):
+            span.resultado = RESULTADO_ESCALADO
+            self._contar(tarea, "escalamientos")
+            logger.warning(
+                f"⤴️  {tarea}: {modelo} no pasó la validación ({error}); "
+                f"escalando a {modelos[nivel + 1]}"
+            )
+            return
+
+        span.resultado = RESULTADO_ERROR
+        self._contar(tarea, "sin_respuesta_valida")
+        logger.error(f"❌ {tarea}: {modelo} tampoco devolvió una respuesta válida ({error})")
+        raise error
+
+
+# Instancia global del enrutador
+enrutador_modelos = EnrutadorModelos(
+    modelos_por_tarea=settings.LLM_MODELOS_POR_TAREA,
+    politica=settings.LLM_POLITICA_ENRUTAMIENTO,
+)
@@ -0,0 +1,207 @@
+"""
+Bus de eventos en memoria para el progreso de las solicitudes.
+
+El orquestador y el generador de RFQs publican aquí las transiciones de
+etapa y el resultado de cada RFQ mientras ocurren; el endpoint SSE
+`GET /solicitud/{id}/events` se suscribe y los reenvía al cliente, que así
+no necesita consultar la BD periódicamente.
+
+Cada solicitud guarda un buffer acotado con sus últimos eventos para que un
+cliente que se conecta tarde (o reconecta con `Last-Event-ID`) reciba lo que
+se perdió. El buffer solo cubre la ejecución actual: el orquestador lo
+reinicia al arrancar cada flujo, así un cliente que se conecta tras una
+reanudación no recibe el "finalizado" de la ejecución anterior.
+
+`publicar` es seguro desde cualquier hilo: el envío de RFQs corre en hilos
+de `asyncio.to_thread` y de un ThreadPoolExecutor.
+"""
+import asyncio
+import itertools
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from config.logging_config import logger
+
+# Tipo de evento que cierra el stream de una solicitud
+EVENTO_FINALIZADO = "finalizado"
+
+
+class BusEventos:
+    """
+    Publicación/suscripción de eventos por solicitud.
+
+    Uso típico:
+        >>> bus_eventos.publicar(123, "etapa", {"etapa": "investigador", "progreso": 40})
+        >>> async for evento in bus_eventos.suscribir(123):
+        ...     print(evento["tipo"], evento["datos"])
+    """
+
+    def __init__(self, max_eventos: int = 200, max_solicitudes: int = 1000):
+        """
+        Inicializa el bus.
+
+        Args:
+            max_eventos: Eventos retenidos por solicitud para replay
+            max_solicitudes: Solicitudes con buffer en memoria; al superarlo se
+                descarta el buffer de la menos reciente
+        """
+        self.max_eventos = max_eventos
+        self.max_solicitudes = max_solicitudes
+        self._buffers: "OrderedDict[int, Deque[Dict]]" = OrderedDict()
+        self._suscriptores: Dict[int, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._secuencia = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def publicar(self, solicitud_id: int, tipo: str, datos: Optional[Dict] = None) -> Dict:
+        """
+        Publica un evento de una solicitud.
+
+        Args:
+            solicitud_id: ID de la solicitud
+            tipo: Tipo de evento (etapa, proveedores, rfq, finalizado...)
+            datos: Contenido del evento, serializable a JSON
+
+        Returns:
+            El evento publicado (con id y timestamp)
+        """
+        evento = {
+            "id": next(self._secuencia),
+            "solicitud_id": solicitud_id,
+            "tipo": tipo,
+            "datos": datos or {},
+            "timestamp": datetime.utcnow().isoformat(),
+        }
+
+        with self._lock:
+            buffer = self._buffers.get(solicitud_id)
+            if buffer is None:
+                buffer = deque(maxlen=self.max_eventos)
+                self._buffers[solicitud_id] = buffer
+                while len(self._buffers) > self.max_solicitudes:
+                    self._buffers.popitem(last=False)
+            else:
+                self._buffers.move_to_end(solicitud_id)
+
+            buffer.append(evento)
+            suscriptores = list(self._suscriptores.get(solicitud_id, []))
+
+        for loop, cola in suscriptores:
+            try:
+                loop.call_soon_threadsafe(cola.put_nowait, evento)
+            except RuntimeError:
+                # El loop del suscriptor ya se cerró
+                pass
+
+        return evento
+
+    def reiniciar(self, solicitud_id: int) -> None:
+        """
+        Descarta los eventos retenidos de una solicitud.
+
+        Se llama al iniciar un nuevo flujo de la solicitud (por ejemplo, al
+        reanudarla) para que el replay empiece en la ejecución actual. Los
+        suscriptores conectados siguen recibiendo los eventos nuevos.
+
+        Args:
+            solicitud_id: ID de la solicitud
+        """
+        with self._lock:
+            self._buffers.pop(solicitud_id, None)
+
+    def eventos(self, solicitud_id: int, desde_id: int = 0) -> List[Dict]:
+        """
+        Eventos retenidos de una solicitud posteriores a `desde_id`.
+
+        Args:
+            solicitud_id: ID de la solicitud
+            desde_id: Último ID ya recibido por el cliente
+
+        Returns:
+            Lista de eventos en orden de publicación
+        """
+        with self._lock:
+            buffer = self._buffers.get(solicitud_id, ())
+            return [e for e in buffer if e["id"] > desde_id]
+
+    async def suscribir(
+        self,
+        solicitud_id: int,
+        desde_id: int = 0,
+        intervalo_latido: Optional[float] = None,
+    ) -> AsyncIterator[Optional[Dict]]:
+        """
+        Itera los eventos de una solicitud: primero el replay y luego en vivo.
+
+        Termina después de entregar el evento "finalizado".
+
+        Args:
+            solicitud_id: ID de la solicitud
+            desde_id: Último ID ya recibido (para reconexiones)
+            intervalo_latido: Si se indica, produce None tras ese número de
+                segundos sin eventos (el endpoint SSE lo usa para keep-alive)
+
+        Yields:
+            Eventos (dict) o None como latido
+        """
+        loop = asyncio.get_running_loop()
+        cola: asyncio.Queue = asyncio.Queue()
+
+        # Replay y registro bajo el mismo lock: no se pierde ningún evento
+        with self._lock:
+            pendientes = [e for e in self._buffers.get(solicitud_id, ()) if e["id"] > desde_id]
+            self._suscriptores.setdefault(solicitud_id, []).append((loop, cola))
+
+        try:
+            for evento in pendientes:
+                yield evento
+                if evento["tipo"] == EVENTO_FINALIZADO:
+                    return
+
+            ultimo_id = pendientes[-1]["id"] if pendientes else desde_id
+
+            while True:
+                try:
+                    evento = await asyncio.wait_for(cola.get(), timeout=intervalo_latido)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+
+                if evento["id"] <= ultimo_id:
+                    continue
+
+                ultimo_id = evento["id"]
+                yield evento
+                if evento["tipo"] == EVENTO_FINALIZADO:
+                    return
+
+        finally:
+            with self._lock:
+                suscriptores = self._suscriptores.get(solicitud_id, [])
+                if (loop, cola) in suscriptores:
+                    suscriptores.remove((loop, cola))
+                if not suscriptores:
+                    self._suscriptores.pop(solicitud_id, None)
+
+
+def publicar_evento(solicitud_id: Optional[int], tipo: str, datos: Optional[Dict] = None) -> None:
+    """
+    Publica un evento en el bus global sin dejar que un error rompa el flujo.
+
+    Args:
+        solicitud_id: ID de la solicitud (si es None no se publica nada)
+        tipo: Tipo de evento
+        datos: Contenido del evento
+    """
+    if solicitud_id is None:
+        return
+
+    try:
+        bus_eventos.publicar(solicitud_id, tipo, datos)
+    except Exception as e:
+        logger.warning(f"⚠️  Error publicando evento {tipo} de solicitud {solicitud_id}: {e}")
+
+
+# Instancia global del bus
+bus_eventos = BusEventos()
@@ -0,0 +1,255 @@
+"""
+Idempotencia y deduplicación en vuelo de los envíos a la API.
+
+Los reintentos de webhooks de WhatsApp, el doble clic en un formulario o un
+cliente que reintenta tras un timeout reenvían el mismo texto; sin control,
+cada reenvío ejecuta el flujo completo (varias llamadas a OpenAI) y manda
+RFQs duplicados a los mismos proveedores.
+
+`GestorIdempotencia.ejecutar` resuelve cada envío por su clave:
+
+- Single-flight: los envíos concurrentes con la misma clave esperan a la
+  única ejecución en curso y reciben su respuesta.
+- Respuesta guardada: al terminar con éxito (2xx), la respuesta se persiste
+  en la tabla `claves_idempotencia`; los envíos posteriores (incluso desde
+  otro proceso o tras un reinicio) la reciben sin volver a ejecutar el flujo.
+- Las respuestas de error (4xx/5xx, p. ej. un flujo que falló por un error
+  transitorio de OpenAI o SMTP) y las excepciones no se guardan: la clave se
+  libera para que el cliente pueda reintentar.
+
+La clave viene del header `Idempotency-Key`; sin header se deriva del cuerpo
+del envío y sólo se deduplican los envíos en vuelo (sin respuesta guardada),
+así dos envíos idénticos pero intencionales en momentos distintos se
+ejecutan ambos.
+"""
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from config.logging_config import logger
+from src.database.crud import clave_idempotencia as crud_clave
+from src.database.models import EstadoIdempotencia
+from src.database.session import SessionLocal
+
+# Vigencia de una reserva en proceso; si el proceso muere a mitad del flujo,
+# la clave vuelve a estar disponible pasado este tiempo
+BLOQUEO_EN_PROCESO = timedelta(hours=1)
+
+# Largo máximo aceptado para el header Idempotency-Key
+MAX_LARGO_CLAVE = 255
+
+# (código HTTP, cuerpo JSON de la respuesta)
+Respuesta = Tuple[int, Dict]
+
+
+class ConflictoIdempotencia(Exception):
+    """
+    El envío no puede resolverse con su clave de idempotencia.
+
+    Attributes:
+        codigo_http: 422 si la clave se reutilizó con otro cuerpo, 409 si la
+            ejecución original sigue en curso en otro proceso
+    """
+
+    def __init__(self, mensaje: str, codigo_http: int):
+        super().__init__(mensaje)
+        self.codigo_http = codigo_http
+
+
+def calcular_huella(ruta: str, cuerpo: Dict) -> str:
+    """
+    Huella SHA-256 de un envío.
+
+    Los textos se normalizan (espacios repetidos y en los extremos) para que
+    un reenvío con espacios de más se reconozca como el mismo envío.
+
+    Args:
+        ruta: Ruta del endpoint
+        cuerpo: Cuerpo del envío
+
+    Returns:
+        Hash hexadecimal de 64 caracteres
+
+    Example:
+        >>> calcular_huella("/solicitud/procesar-completa", {"texto": "Necesito 5 PLCs"})
+        '3f1c...'
+    """
+    contenido = json.dumps(
+        {"ruta": ruta, "cuerpo": _normalizar(cuerpo)}, sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+def _normalizar(valor):
+    """Normaliza espacios en los textos de un cuerpo JSON."""
+    if isinstance(valor, str):
+        return " ".join(valor.split())
+    if isinstance(valor, list):
+        return [_normalizar(v) for v in valor]
+    if isinstance(valor, dict):
+        return {k: _normalizar(v) for k, v in valor.items()}
+    return valor
+
+
+class GestorIdempotencia:
+    """
+    Resuelve envíos por clave: ejecución única, respuesta guardada y replay.
+
+    Uso típico (desde un endpoint):
+        >>> codigo, cuerpo, repetida = await gestor_idempotencia.ejecutar(
+        ...     clave, huella, lambda: procesar(data), ttl=timedelta(hours=24)
+        ... )
+        >>> # Solo deduplicación en vuelo, sin respuesta guardada
+        >>> codigo, cuerpo, repetida = await gestor_idempotencia.ejecutar(
+        ...     clave, huella, lambda: procesar(data), ttl=None
+        ... )
+    """
+
+    def __init__(self):
+        """Inicializa el gestor sin ejecuciones en curso."""
+        self._en_curso: Dict[str, Tuple[str, asyncio.Task]] = {}
+
+    async def ejecutar(
+        self,
+        clave: str,
+        huella: str,
+        funcion: Callable[[], Awaitable[Respuesta]],
+        ttl: Optional[timedelta],
+    ) -> Tuple[int, Dict, bool]:
+        """
+        Ejecuta `funcion` una sola vez por clave y repite su respuesta.
+
+        Args:
+            clave: Clave de idempotencia
+            huella: Huella del cuerpo (ver `calcular_huella`)
+            funcion: Corrutina sin argumentos que retorna (código HTTP, cuerpo)
+            ttl: Tiempo durante el cual se repite la respuesta guardada; None
+                solo agrupa los envíos en vuelo (no toca la BD)
+
+        Returns:
+            Tupla (código HTTP, cuerpo, repetida). `repetida` es True si la
+            respuesta viene de otra ejecución (en curso o guardada).
+
+        Raises:
+            ConflictoIdempotencia: Si la clave se usó con otro cuerpo o su
+                ejecución sigue en curso en otro proceso
+        """
+        en_curso = self._en_curso.get(clave)
+        propia = en_curso is None
+
+        if propia:
+            # Registrar la tarea antes de cualquier await: los envíos que
+            # lleguen mientras tanto la encuentran y esperan su resultado
+            tarea = asyncio.create_task(self._resolver(clave, huella, funcion, ttl))
+            en_curso = (huella, tarea)
+            self._en_curso[clave] = en_curso
+            tarea.add_done_callback(lambda _: self._quitar(clave, en_curso))
+        elif en_curso[0] != huella:
+            raise ConflictoIdempotencia(
+                "La clave de idempotencia ya se usó con otro contenido", 422
+            )
+        else:
+            logger.info(f"🔁 Envío duplicado en vuelo, esperando ejecución original ({clave[:40]})")
+
+        # shield: si el cliente que espera se desconecta, el flujo no se cancela
+        codigo, cuerpo, repetida = await asyncio.shield(en_curso[1])
+        return codigo, cuerpo, repetida or not propia
+
+    def _quitar(self, clave: str, en_curso: Tuple[str, asyncio.Task]) -> None:
+        """Olvida la ejecución terminada (y marca su excepción como consumida)."""
+        if self._en_curso.get(clave) is en_curso:
+            del self._en_curso[clave]
+        tarea = en_curso[1]
+        if not tarea.cancelled():
+            tarea.exception()
+
+    async def _resolver(
+        self,
+        clave: str,
+        huella: str,
+        funcion: Callable[[], Awaitable[Respuesta]],
+        ttl: Optional[timedelta],
+    ) -> Tuple[int, Dict, bool]:
+        """Reserva la clave en BD, ejecuta y guarda la respuesta si fue exitosa."""
+        if ttl is None:
+            codigo, cuerpo = await funcion()
+            return codigo, cuerpo, False
+
+        reservada, guardada = await asyncio.to_thread(_reservar, clave, huella)
+
+        if not reservada:
+            if guardada["huella"] != huella:
+                raise ConflictoIdempotencia(
+                    "La clave de idempotencia ya se usó con otro contenido", 422
+                )
+            if guardada["estado"] == EstadoIdempotencia.EN_PROCESO:
+                raise ConflictoIdempotencia(
+                    "Hay una ejecución en curso con la misma clave de idempotencia", 409
+                )
+            logger.info(f"🔁 Respuesta guardada repetida para clave {clave[:40]}")
+            return guardada["codigo_http"], guardada["respuesta"], True
+
+        try:
+            codigo, cuerpo = await funcion()
+        except BaseException:
+            # Llamada síncrona: también debe correr si la tarea fue cancelada
+            _liberar(clave)
+            raise
+
+        if 200 <= codigo < 300:
+            await asyncio.to_thread(_completar, clave, codigo, cuerpo, ttl)
+        else:
+            await asyncio.to_thread(_liberar, clave)
+
+        return codigo, cuerpo, False
+
+
+# ============================================================================
+# OPERACIONES DE BD (síncronas, se ejecutan en hilos)
+# ============================================================================
+
+
+def _reservar(clave: str, huella: str) -> Tuple[bool, Optional[Dict]]:
+    """Reserva la clave; si ya existe retorna sus datos."""
+    db = SessionLocal()
+    try:
+        reservada, registro = crud_clave.reservar(
+            db, clave, huella, datetime.utcnow() + BLOQUEO_EN_PROCESO
+        )
+        if reservada:
+            return True, None
+        if registro is None:
+            # La reserva concurrente que ganó ya se liberó: tratar como en curso
+            return False, {"huella": huella, "estado": EstadoIdempotencia.EN_PROCESO}
+        return False, {
+            "huella": registro.huella,
+            "estado": registro.estado,
+            "codigo_http": registro.codigo_http,
+            "respuesta": registro.respuesta,
+        }
+    finally:
+        db.close()
+
+
+def _completar(clave: str, codigo: int, cuerpo: Dict, ttl: timedelta) -> None:
+    """Guarda la respuesta de la clave."""
+    db = SessionLocal()
+    try:
+        crud_clave.completar(db, clave, codigo, cuerpo, datetime.utcnow() + ttl)
+    finally:
+        db.close()
+
+
+def _liberar(clave: str) -> None:
+    """Elimina la clave para permitir un nuevo intento."""
+    db = SessionLocal()
+    try:
+        crud_clave.liberar(db, clave)
+    finally:
+        db.close()
+
+
+# Instancia global del gestor
+gestor_idempotencia = GestorIdempotencia()
@@ -0,0 +1,343 @@
+"""
+Índice invertido en memoria del catálogo de proveedores.
+
+El Investigador necesita, por cada producto, los proveedores de la BD con
+más términos en común. Recorrer la tabla completa en cada búsqueda (un
+`SELECT` de todo el catálogo y la hidratación ORM de cada fila) escala con
+el tamaño del catálogo; `IndiceProveedores` mantiene en memoria, por cada
+término (en minúsculas y sin acentos), los proveedores que lo contienen en
+`nombre`, `categoria`, `subcategorias`, `notas` o `ciudad`, y responde los
+mejores candidatos de un producto sin tocar la BD.
+
+El índice se construye la primera vez que se consulta y se mantiene al día
+con los eventos de la sesión de SQLAlchemy: los proveedores creados,
+modificados o eliminados se aplican al confirmarse la transacción (los de
+un rollback se descartan). Los cambios hechos por otros procesos se
+recogen al reconstruirlo cada `INDICE_PROVEEDORES_MAX_ANTIGUEDAD_SEG`.
+
+Otros catálogos en memoria (p. ej. el motor de similitud) reciben los
+mismos cambios registrándose con `suscribir_cambios`.
+"""
+import json
+import re
+import threading
+import time
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Protocol, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config.logging_config import logger
+from config.settings import settings
+from src.database.models import Proveedor
+
+# Peso de un término según el campo en que aparece (se toma el mayor)
+PESOS_CAMPOS = {
+    "nombre": 3.0,
+    "categoria": 3.0,
+    "subcategorias": 2.0,
+    "notas": 1.0,
+    "ciudad": 1.0,
+}
+
+# Palabras que no distinguen un producto de otro
+PALABRAS_VACIAS = {
+    "para", "con", "los", "las", "del", "por", "una", "unos", "unas", "que",
+    "sin", "como", "mas", "unidad", "unidades", "pieza", "piezas",
+}
+
+# Clave de `Session.info` con los cambios de proveedores aún sin confirmar
+_CLAVE_CAMBIOS = "indice_proveedores.cambios"
+
+
+def palabras_clave(texto) -> Set[str]:
+    """Palabras significativas de un texto, en minúsculas y sin acentos."""
+    if isinstance(texto, (list, tuple)):
+        texto = " ".join(str(t) for t in texto)
+    if not isinstance(texto, str):
+        return set()
+
+    normalizado = unicodedata.normalize("NFKD", texto.lower())
+    sin_acentos = "".join(c for c in normalizado if not unicodedata.combining(c))
+    return {
+        palabra
+        for palabra in re.findall(r"[a-z0-9]+", sin_acentos)
+        if len(palabra) >= 3 and palabra not in PALABRAS_VACIAS
+    }
+
+
+def datos_proveedor(proveedor: Proveedor) -> dict:
+    """Proveedor en el formato que recibe el Investigador."""
+    return {
+        "id": proveedor.id,
+        "nombre": proveedor.nombre,
+        "categoria": proveedor.categoria,
+        "subcategorias": _subcategorias(proveedor.subcategorias),
+        "ciudad": proveedor.ciudad,
+        "rating": proveedor.rating,
+        "email": proveedor.email,
+        "telefono": proveedor.telefono,
+        "notas": proveedor.notas,
+        "es_verificado": proveedor.es_verificado,
+        "fuente": "base_de_datos",
+    }
+
+
+def _subcategorias(valor) -> List[str]:
+    """Subcategorías guardadas como JSON (o texto separado por comas)."""
+    if not valor:
+        return []
+    try:
+        lista = json.loads(valor)
+    except (TypeError, ValueError):
+        lista = valor.split(",")
+    if not isinstance(lista, list):
+        lista = [lista]
+    return [str(s).strip() for s in lista if str(s).strip()]
+
+
+class IndiceProveedores:
+    """
+    Índice invertido término → proveedores, con actualizaciones incrementales.
+
+    Es seguro entre hilos: las consultas y las actualizaciones comparten un
+    lock y las búsquedas retornan copias de los proveedores.
+
+    Uso típico:
+        >>> candidatos = indice_proveedores.buscar(db, {"plc", "siemens"}, top_k=20)
+    """
+
+    def __init__(self, max_antiguedad_seg: Optional[float] = None):
+        """
+        Inicializa un índice vacío (se construye en la primera consulta).
+
+        Args:
+            max_antiguedad_seg: Segundos tras los que se reconstruye desde la
+                BD; 0 = solo con `invalidar()`
+                (settings.INDICE_PROVEEDORES_MAX_ANTIGUEDAD_SEG)
+        """
+        self.max_antiguedad_seg = (
+            settings.INDICE_PROVEEDORES_MAX_ANTIGUEDAD_SEG
+            if max_antiguedad_seg is None else max_antiguedad_seg
+        )
+        self._lock = threading.RLock()
+        self._proveedores: Dict[int, dict] = {}
+        self._pesos: Dict[int, Dict[str, float]] = {}  # id → término → peso
+        self._postings: Dict[str, Set[int]] = {}  # término → ids
+        self._construido_en: Optional[float] = None
+        self._construcciones = 0
+        self._actualizaciones = 0
+        self._consultas = 0
+
+    def construir(self, db) -> None:
+        """
+        Carga todo el catálogo desde la BD y reemplaza el índice.
+
+        Args:
+            db: Sesión de SQLAlchemy
+        """
+        inicio = time.perf_counter()
+        proveedores = [datos_proveedor(p) for p in db.query(Proveedor).all()]
+
+        with self._lock:
+            self._proveedores.clear()
+            self._pesos.clear()
+            self._postings.clear()
+            for datos in proveedores:
+                self._agregar(datos)
+            self._construido_en = time.monotonic()
+            self._construcciones += 1
+
+        logger.info(
+            f"🗂️ Índice de proveedores construido: {len(proveedores)} proveedor(es), "
+            f"{len(self._postings)} término(s) en {(time.perf_counter() - inicio) * 1000:.0f} ms"
+        )
+
+    def actualizar(self, datos: dict) -> None:
+        """
+        Agrega o reemplaza un proveedor (formato de `datos_proveedor`).
+
+        Si el índice aún no se construyó no hace nada: la construcción ya
+        leerá el proveedor de la BD.
+        """
+        with self._lock:
+            if self._construido_en is None:
+                return
+            self._quitar(datos["id"])
+            self._agregar(datos)
+            self._actualizaciones += 1
+
+    def eliminar(self, proveedor_id: int) -> None:
+        """Quita un proveedor del índice."""
+        with self._lock:
+            if self._quitar(proveedor_id):
+                self._actualizaciones += 1
+
+    def invalidar(self) -> None:
+        """Descarta el índice; la próxima consulta lo reconstruye."""
+        with self._lock:
+            self._proveedores.clear()
+            self._pesos.clear()
+            self._postings.clear()
+            self._construido_en = None
+
+    def buscar(self, db, terminos: Iterable[str], top_k: int) -> List[dict]:
+        """
+        Los `top_k` proveedores con más términos en común.
+
+        El puntaje es la suma de los pesos de los términos encontrados (por
+        el campo en que aparecen) más rating/10 y 0.5 si está verificado;
+        los proveedores sin términos en común no se retornan.
+
+        Args:
+            db: Sesión de SQLAlchemy (solo se usa si hay que construir el índice)
+            terminos: Términos ya normalizados (ver `palabras_clave`)
+            top_k: Máximo de candidatos
+
+        Returns:
+            Copias de los proveedores, del más al menos relevante
+        """
+        self._asegurar_construido(db)
+
+        with self._lock:
+            self._consultas += 1
+            puntajes: Dict[int, float] = {}
+            for termino in set(terminos):
+                for proveedor_id in self._postings.get(termino, ()):
+                    puntajes[proveedor_id] = (
+                        puntajes.get(proveedor_id, 0.0) + self._pesos[proveedor_id][termino]
+                    )
+
+            ordenados = sorted(
+                puntajes,
+                key=lambda i: (puntajes[i] + self._extra(self._proveedores[i]), -i),
+                reverse=True,
+            )
+            return [dict(self._proveedores[i]) for i in ordenados[:top_k]]
+
+    def estado(self) -> Dict:
+        """
+        Tamaño y antigüedad del índice.
+
+        Returns:
+            {"construido": bool, "proveedores": int, "terminos": int,
+             "antiguedad_seg": float | None, "construcciones": int,
+             "actualizaciones": int, "consultas": int}
+        """
+        with self._lock:
+            return {
+                "construido": self._construido_en is not None,
+                "proveedores": len(self._proveedores),
+                "terminos": len(self._postings),
+                "antiguedad_seg": (
+                    round(time.monotonic() - self._construido_en, 1)
+                    if self._construido_en is not None else None
+                ),
+                "construcciones": self._construcciones,
+                "actualizaciones": self._actualizaciones,
+                "consultas": self._consultas,
+            }
+
+    def _asegurar_construido(self, db) -> None:
+        """Construye el índice si no existe o superó la antigüedad máxima."""
+        with self._lock:
+            construido_en = self._construido_en
+        if construido_en is None or (
+            self.max_antiguedad_seg
+            and time.monotonic() - construido_en > self.max_antiguedad_seg
+        ):
+            self.construir(db)
+
+    def _agregar(self, datos: dict) -> None:
+        """Indexa un proveedor (con el lock tomado)."""
+        pesos: Dict[str, float] = {}
+        for campo, peso in PESOS_CAMPOS.items():
+            for termino in palabras_clave(datos.get(campo)):
+                pesos[termino] = max(pesos.get(termino, 0.0), peso)
+
+        proveedor_id = datos["id"]
+        self._proveedores[proveedor_id] = datos
+        self._pesos[proveedor_id] = pesos
+        for termino in pesos:
+            self._postings.setdefault(termino, set()).add(proveedor_id)
+
+    def _quitar(self, proveedor_id: int) -> bool:
+        """Quita un proveedor de los postings (con el lock tomado)."""
+        self._proveedores.pop(proveedor_id, None)
+        pesos = self._pesos.pop(proveedor_id, None)
+        if pesos is None:
+            return False
+        for termino in pesos:
+            ids = self._postings.get(termino)
+            if ids is not None:
+                ids.discard(proveedor_id)
+                if not ids:
+                    del self._postings[termino]
+        return True
+
+    @staticmethod
+    def _extra(datos: dict) -> float:
+        """Desempate: mejor calificados y verificados primero."""
+        return (datos.get("rating") or 0) / 10 + (0.5 if datos.get("es_verificado") else 0)
+
+
+# Instancia global
+indice_proveedores = IndiceProveedores()
+
+
+# =============================================================================
+# Actualización incremental con los eventos de la sesión
+# =============================================================================
+
+class CatalogoProveedores(Protocol):
+    """Estructura en memoria que se mantiene al día con los commits."""
+
+    def actualizar(self, datos: dict) -> None: ...
+
+    def eliminar(self, proveedor_id: int) -> None: ...
+
+
+_suscriptores: List[CatalogoProveedores] = [indice_proveedores]
+
+
+def suscribir_cambios(catalogo: CatalogoProveedores) -> None:
+    """
+    Registra un catálogo para recibir los proveedores confirmados.
+
+    Args:
+        catalogo: Objeto con `actualizar(datos)` y `eliminar(proveedor_id)`
+    """
+    if catalogo not in _suscriptores:
+        _suscriptores.append(catalogo)
+
+
+@event.listens_for(Session, "after_flush")
+def _registrar_cambios(session, contexto_flush) -> None:
+    """Guarda los proveedores escritos en el flush hasta que se confirme."""
+    cambios = None
+    for proveedor in (*session.new, *session.dirty):
+        if isinstance(proveedor, Proveedor):
+            cambios = session.info.setdefault(_CLAVE_CAMBIOS, {})
+            cambios[proveedor.id] = datos_proveedor(proveedor)
+    for proveedor in session.deleted:
+        if isinstance(proveedor, Proveedor):
+            cambios = session.info.setdefault(_CLAVE_CAMBIOS, {})
+            cambios[proveedor.id] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _aplicar_cambios(session) -> None:
+    """Aplica al índice los proveedores de la transacción confirmada."""
+    for proveedor_id, datos in session.info.pop(_CLAVE_CAMBIOS, {}).items():
+        for catalogo in _suscriptores:
+            if datos is None:
+                catalogo.eliminar(proveedor_id)
+            else:
+                catalogo.actualizar(datos)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_cambios(session) -> None:
+    """Los cambios de una transacción revertida no llegan al índice."""
+    session.info.pop(_CLAVE_CAMBIOS, None)
@@ -0,0 +1,515 @@
+"""
+Gestor de jobs en segundo plano para el flujo completo de solicitudes.
+
+Permite el modo "enviar y consultar": la API encola la solicitud, responde
+de inmediato con el ID del job y un pool acotado de workers ejecuta
+`procesar_solicitud_completa`. El estado de cada job se persiste en la tabla
+`jobs`, por lo que el trabajo pendiente se re-encola al reiniciar el servidor;
+un job que ya había creado su solicitud se retoma con `reanudar_solicitud`,
+sin volver a llamar al Receptor ni reenviar los RFQs ya enviados.
+
+Varios procesos pueden compartir la tabla: un worker toma el job con un
+UPDATE condicional (solo si sigue en cola o su lease venció) y renueva el
+lease mientras lo ejecuta. Un job "ejecutando" solo se retoma cuando su
+lease vence, es decir, cuando el proceso que lo tenía dejó de renovarlo.
+
+Los lotes (`encolar_lote`) comparten el mismo pool de workers; antes de
+encolarlos, la extracción del Receptor se hace en bloques con pocas
+llamadas a OpenAI en lugar de una por solicitud.
+
+La cola de jobs es por prioridad: la urgencia sale de la extracción en
+bloque si el job la tiene, o de las frases de urgencia del texto
+(`detectar_urgencia`) si no. Así un job urgente no espera detrás de un lote
+grande de solicitudes normales antes de llegar a `planificador_flujos`.
+"""
+import asyncio
+import itertools
+import json
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+from config.logging_config import logger
+from config.settings import settings
+from src.agents.orquestador import procesar_solicitud_completa, reanudar_solicitud
+from src.agents.receptor import procesar_lote_async
+from src.agents.receptor_reglas import detectar_urgencia
+from src.core.planificador import prioridad_de
+from src.database.crud import job as crud_job
+from src.database.models import EstadoJob, Job
+from src.database.session import SessionLocal
+
+
+class GestorJobs:
+    """
+    Pool acotado de workers asíncronos que procesan jobs persistidos.
+
+    Uso típico (desde el ciclo de vida de FastAPI):
+        >>> await gestor_jobs.iniciar()
+        >>> job_id = await gestor_jobs.encolar("Necesito 5 PLCs", origen="api")
+        >>> estado = await gestor_jobs.obtener(job_id)
+        >>> await gestor_jobs.detener()
+    """
+
+    def __init__(self, max_workers: int = 4, lease_seg: float = 120.0):
+        """
+        Inicializa el gestor.
+
+        Args:
+            max_workers: Número máximo de jobs ejecutándose a la vez
+            lease_seg: Segundos que un worker conserva un job sin renovarlo;
+                también es el intervalo con que se buscan jobs abandonados
+        """
+        self.max_workers = max_workers
+        self.lease_seg = lease_seg
+        self._cola: Optional[asyncio.PriorityQueue] = None
+        self._secuencia = itertools.count()
+        self._encolados: Set[int] = set()
+        self._workers: List[asyncio.Task] = []
+        self._recuperador: Optional[asyncio.Task] = None
+        self._preparando_lotes: Set[asyncio.Task] = set()
+        self._lotes_en_extraccion: Set[str] = set()
+
+    @property
+    def activo(self) -> bool:
+        """True si los workers están corriendo."""
+        return bool(self._workers)
+
+    async def iniciar(self) -> None:
+        """
+        Arranca los workers y re-encola los jobs que quedaron pendientes.
+
+        Los jobs "ejecutando" cuyo lease venció (su proceso dejó de
+        renovarlo) se reanudan desde el checkpoint de su solicitud si ya la
+        habían creado; si no, se vuelven a ejecutar desde el inicio. La
+        búsqueda se repite cada `lease_seg` segundos, así también se retoman
+        los jobs cuyo lease vence después del arranque.
+        """
+        if self.activo:
+            return
+
+        self._cola = asyncio.PriorityQueue()
+        self._workers = [
+            asyncio.create_task(self._worker(numero), name=f"job-worker-{numero}")
+            for numero in range(1, self.max_workers + 1)
+        ]
+
+        recuperados = await self._recuperar_pendientes()
+        self._recuperador = asyncio.create_task(
+            self._recuperar_periodicamente(), name="job-recuperador"
+        )
+
+        logger.info(
+            f"🧵 Gestor de jobs iniciado: {self.max_workers} worker(s), "
+            f"{recuperados} job(s) pendiente(s) re-encolado(s)"
+        )
+
+    async def detener(self) -> None:
+        """Detiene los workers. Los jobs en curso quedan pendientes en BD."""
+        tareas = [*self._workers, *self._preparando_lotes]
+        if self._recuperador is not None:
+            tareas.append(self._recuperador)
+        for tarea in tareas:
+            tarea.cancel()
+
+        await asyncio.gather(*tareas, return_exceptions=True)
+        self._workers = []
+        self._preparando_lotes = set()
+        self._lotes_en_extraccion = set()
+        self._recuperador = None
+        self._encolados = set()
+        self._cola = None
+        logger.info("🧵 Gestor de jobs detenido")
+
+    async def encolar(self, texto: str, origen: str = "api") -> int:
+        """
+        Persiste un nuevo job y lo agrega a la cola.
+
+        Args:
+            texto: Texto de la solicitud
+            origen: Origen de la solicitud
+
+        Returns:
+            ID del job creado
+
+        Raises:
+            RuntimeError: Si el gestor no fue iniciado
+        """
+        if not self.activo:
+            raise RuntimeError("El gestor de jobs no está iniciado")
+
+        job_id = await asyncio.to_thread(_crear_job, texto, origen)
+        urgencia = detectar_urgencia(texto)
+        self._poner_en_cola(job_id, urgencia)
+        logger.info(f"📥 Job {job_id} encolado (origen: {origen}, urgencia: {urgencia})")
+        return job_id
+
+    async def encolar_lote(
+        self, textos: List[str], origen: str = "api"
+    ) -> Tuple[str, List[int]]:
+        """
+        Persiste un lote de jobs y los encola tras extraerlos en bloque.
+
+        Los jobs se crean de inmediato (en cola) y la extracción del Receptor
+        corre en segundo plano; luego los jobs pasan a los mismos workers que
+        los individuales, así el lote respeta `JOBS_MAX_WORKERS`. Mientras se
+        extrae, la búsqueda de jobs pendientes no los toma.
+
+        Args:
+            textos: Textos de las solicitudes
+            origen: Origen común de las solicitudes
+
+        Returns:
+            Tupla (lote_id, IDs de los jobs en el orden de `textos`)
+
+        Raises:
+            RuntimeError: Si el gestor no fue iniciado
+        """
+        if not self.activo:
+            raise RuntimeError("El gestor de jobs no está iniciado")
+
+        lote_id = uuid.uuid4().hex
+        # Registrado antes de crear los jobs: la recuperación periódica no
+        # debe encolarlos sin su extracción
+        self._lotes_en_extraccion.add(lote_id)
+        try:
+            job_ids = await asyncio.to_thread(_crear_jobs_lote, lote_id, textos, origen)
+        except Exception:
+            self._lotes_en_extraccion.discard(lote_id)
+            raise
+
+        tarea = asyncio.create_task(
+            self._preparar_lote(lote_id, job_ids, textos, origen),
+            name=f"lote-{lote_id}",
+        )
+        self._preparando_lotes.add(tarea)
+        tarea.add_done_callback(self._preparando_lotes.discard)
+
+        logger.info(f"📦 Lote {lote_id} recibido: {len(job_ids)} solicitud(es)")
+        return lote_id, job_ids
+
+    async def obtener_lote(self, lote_id: str) -> Optional[Dict]:
+        """
+        Obtiene el estado agregado de un lote.
+
+        Args:
+            lote_id: Identificador retornado por `encolar_lote`
+
+        Returns:
+            Diccionario con conteos por estado, progreso promedio y el estado
+            resumido de cada job, o None si el lote no existe
+        """
+        return await asyncio.to_thread(_lote_a_dict, lote_id)
+
+    async def obtener(self, job_id: int) -> Optional[Dict]:
+        """
+        Obtiene el estado de un job.
+
+        Args:
+            job_id: ID del job
+
+        Returns:
+            Diccionario con estado, etapa, progreso y resultado, o None si no existe
+        """
+        return await asyncio.to_thread(_job_a_dict, job_id)
+
+    async def _preparar_lote(
+        self, lote_id: str, job_ids: List[int], textos: List[str], origen: str
+    ) -> None:
+        """Extrae el lote con el Receptor en bloques y encola sus jobs."""
+        extracciones: List[Optional[Dict]] = [None] * len(job_ids)
+        try:
+            extraidas_en_bloque = await procesar_lote_async(textos, origen)
+            await asyncio.to_thread(_guardar_extracciones, job_ids, extraidas_en_bloque)
+            extracciones = extraidas_en_bloque
+            extraidas = sum(1 for e in extracciones if e is not None)
+            logger.info(
+                f"🧾 Lote {lote_id}: {extraidas}/{len(textos)} extraída(s) en bloque"
+            )
+        except Exception as e:
+            # Sin extracción previa cada job llama al Receptor por su cuenta
+            logger.warning(f"⚠️  Extracción en bloque del lote {lote_id} falló: {e}")
+
+        for job_id, texto, extraccion in zip(job_ids, textos, extracciones, strict=True):
+            self._poner_en_cola(job_id, _urgencia_job(texto, extraccion))
+        self._lotes_en_extraccion.discard(lote_id)
+
+    def _poner_en_cola(self, job_id: int, urgencia: str) -> None:
+        """Encola un job por prioridad; a igual prioridad, por orden de llegada."""
+        self._encolados.add(job_id)
+        self._cola.put_nowait((-prioridad_de(urgencia), next(self._secuencia), job_id))
+
+    async def _recuperar_pendientes(self) -> int:
+        """
+        Encola los jobs disponibles en BD que no estén ya en la cola local.
+
+        Se omiten los de lotes que aún se están extrayendo en bloque;
+        `_preparar_lote` los encola con su extracción.
+        """
+        pendientes = await asyncio.to_thread(_pendientes)
+        nuevos = [
+            (j, u) for j, u, lote_id in pendientes
+            if j not in self._encolados and lote_id not in self._lotes_en_extraccion
+        ]
+        for job_id, urgencia in nuevos:
+            self._poner_en_cola(job_id, urgencia)
+        return len(nuevos)
+
+    async def _recuperar_periodicamente(self) -> None:
+        """Retoma cada `lease_seg` los jobs cuyo lease venció."""
+        while True:
+            await asyncio.sleep(self.lease_seg)
+            try:
+                recuperados = await self._recuperar_pendientes()
+                if recuperados:
+                    logger.info(f"♻️  {recuperados} job(s) abandonado(s) re-encolado(s)")
+            except Exception as e:
+                logger.warning(f"⚠️  Error buscando jobs abandonados: {e}")
+
+    async def _renovar_lease(self, job_id: int) -> None:
+        """Renueva el lease del job mientras el worker lo ejecuta."""
+        while True:
+            await asyncio.sleep(self.lease_seg / 3)
+            try:
+                await asyncio.to_thread(_renovar_lease_job, job_id, self.lease_seg)
+            except Exception as e:
+                logger.warning(f"⚠️  No se pudo renovar el lease del job {job_id}: {e}")
+
+    async def _worker(self, numero: int) -> None:
+        """Toma jobs de la cola y los ejecuta uno a la vez."""
+        while True:
+            _, _, job_id = await self._cola.get()
+            self._encolados.discard(job_id)
+            try:
+                await self._ejecutar(job_id)
+            except Exception as e:
+                logger.error(f"💥 Worker {numero}: error ejecutando job {job_id}: {e}")
+                try:
+                    await asyncio.to_thread(
+                        _finalizar_job, job_id, {"exito": False, "error": str(e)}
+                    )
+                except Exception as e_bd:
+                    logger.error(f"💥 No se pudo cerrar el job {job_id}: {e_bd}")
+            finally:
+                self._cola.task_done()
+
+    async def _ejecutar(self, job_id: int) -> None:
+        """Ejecuta el flujo completo para un job y persiste su resultado."""
+        job_obj = await asyncio.to_thread(_tomar_job, job_id, self.lease_seg)
+        if job_obj is None:
+            logger.info(f"⏭️  Job {job_id} no disponible (inexistente o tomado por otro worker)")
+            return
+
+        latido = asyncio.create_task(self._renovar_lease(job_id), name=f"lease-job-{job_id}")
+        try:
+            await self._ejecutar_tomado(job_id, *job_obj)
+        finally:
+            latido.cancel()
+
+    async def _ejecutar_tomado(
+        self,
+        job_id: int,
+        texto: str,
+        origen: str,
+        extraccion: Optional[Dict],
+        solicitud_id: Optional[int],
+    ) -> None:
+        """Ejecuta (o reanuda) el flujo de un job ya tomado por este worker."""
+
+        async def al_avanzar(etapa: str, progreso: int, solicitud_id: Optional[int]):
+            await asyncio.to_thread(
+                _actualizar_progreso, job_id, etapa, progreso, solicitud_id
+            )
+
+        if solicitud_id is not None:
+            # Interrumpido tras guardar la solicitud: se retoma desde sus checkpoints
+            logger.info(f"♻️  Reanudando job {job_id} (solicitud {solicitud_id})")
+            resultado = await reanudar_solicitud(solicitud_id, al_avanzar)
+        else:
+            logger.info(f"▶️  Ejecutando job {job_id}")
+            resultado = await procesar_solicitud_completa(
+                texto_solicitud=texto,
+                origen=origen,
+                al_avanzar=al_avanzar,
+                resultado_receptor=extraccion,
+            )
+
+        await asyncio.to_thread(_finalizar_job, job_id, resultado)
+        logger.info(
+            f"{'✅' if resultado.get('exito') else '❌'} Job {job_id} terminado "
+            f"(etapa: {resultado.get('etapa')})"
+        )
+
+
+# ============================================================================
+# OPERACIONES DE BD (síncronas, se ejecutan en hilos)
+# ============================================================================
+
+
+def _urgencia_job(texto: str, extraccion: Optional[Dict]) -> str:
+    """Urgencia de un job: la de su extracción previa o la detectada en el texto."""
+    if extraccion and extraccion.get("urgencia"):
+        return extraccion["urgencia"]
+    return detectar_urgencia(texto)
+
+
+def _pendientes() -> List[Tuple[int, str, Optional[str]]]:
+    """(ID, urgencia, lote) de los jobs en cola o ejecutándose con el lease vencido."""
+    db = SessionLocal()
+    try:
+        return [
+            (j.id, _urgencia_job(j.texto, j.extraccion), j.lote_id)
+            for j in crud_job.get_pendientes(db)
+        ]
+    finally:
+        db.close()
+
+
+def _crear_job(texto: str, origen: str) -> int:
+    """Crea un job en estado EN_COLA."""
+    db = SessionLocal()
+    try:
+        nuevo_job = crud_job.create(
+            db, obj_in={"texto": texto, "origen": origen, "estado": EstadoJob.EN_COLA}
+        )
+        return nuevo_job.id
+    finally:
+        db.close()
+
+
+def _crear_jobs_lote(lote_id: str, textos: List[str], origen: str) -> List[int]:
+    """Crea todos los jobs de un lote en una sola transacción."""
+    db = SessionLocal()
+    try:
+        jobs = [
+            Job(texto=texto, origen=origen, lote_id=lote_id, estado=EstadoJob.EN_COLA)
+            for texto in textos
+        ]
+        db.add_all(jobs)
+        db.commit()
+        return [j.id for j in jobs]
+    finally:
+        db.close()
+
+
+def _guardar_extracciones(job_ids: List[int], extracciones: List[Optional[Dict]]) -> None:
+    """Guarda la extracción en bloque de cada job del lote."""
+    db = SessionLocal()
+    try:
+        for job_id, extraccion in zip(job_ids, extracciones, strict=True):
+            if extraccion is not None:
+                db.query(Job).filter(Job.id == job_id).update({"extraccion": extraccion})
+        db.commit()
+    finally:
+        db.close()
+
+
+def _tomar_job(job_id: int, lease_seg: float) -> Optional[tuple]:
+    """
+    Toma el job si está disponible.
+
+    Returns:
+        (texto, origen, extraccion, solicitud_id), o None si otro worker lo tiene
+    """
+    db = SessionLocal()
+    try:
+        job_obj = crud_job.marcar_ejecutando(db, job_id, lease_seg)
+        if job_obj is None:
+            return None
+        return job_obj.texto, job_obj.origen, job_obj.extraccion, job_obj.solicitud_id
+    finally:
+        db.close()
+
+
+def _renovar_lease_job(job_id: int, lease_seg: float) -> None:
+    """Extiende el lease de un job en ejecución."""
+    db = SessionLocal()
+    try:
+        crud_job.renovar_lease(db, job_id, lease_seg)
+    finally:
+        db.close()
+
+
+def _actualizar_progreso(
+    job_id: int, etapa: str, progreso: int, solicitud_id: Optional[int]
+) -> None:
+    """Persiste la etapa y el progreso del job."""
+    db = SessionLocal()
+    try:
+        crud_job.actualizar_progreso(db, job_id, etapa, progreso, solicitud_id)
+    finally:
+        db.close()
+
+
+def _finalizar_job(job_id: int, resultado: Dict) -> None:
+    """Persiste el resultado final (convertido a JSON serializable)."""
+    db = SessionLocal()
+    try:
+        crud_job.finalizar(db, job_id, json.loads(json.dumps(resultado, default=str)))
+    finally:
+        db.close()
+
+
+def _job_a_dict(job_id: int) -> Optional[Dict]:
+    """Representación de un job para la API."""
+    db = SessionLocal()
+    try:
+        job_obj: Optional[Job] = crud_job.get(db, job_id)
+        if job_obj is None:
+            return None
+
+        return {
+            "job_id": job_obj.id,
+            "estado": job_obj.estado.value,
+            "etapa": job_obj.etapa,
+            "progreso": job_obj.progreso,
+            "solicitud_id": job_obj.solicitud_id,
+            "lote_id": job_obj.lote_id,
+            "origen": job_obj.origen,
+            "resultado": job_obj.resultado,
+            "error": job_obj.error,
+            "created_at": job_obj.created_at.isoformat(),
+            "fecha_inicio": job_obj.fecha_inicio.isoformat() if job_obj.fecha_inicio else None,
+            "fecha_fin": job_obj.fecha_fin.isoformat() if job_obj.fecha_fin else None,
+        }
+    finally:
+        db.close()
+
+
+def _lote_a_dict(lote_id: str) -> Optional[Dict]:
+    """Vista agregada de un lote para la API."""
+    db = SessionLocal()
+    try:
+        jobs = crud_job.get_by_lote(db, lote_id)
+        if not jobs:
+            return None
+
+        por_estado = Counter(j.estado.value for j in jobs)
+        terminados = por_estado[EstadoJob.COMPLETADO.value] + por_estado[EstadoJob.ERROR.value]
+
+        return {
+            "lote_id": lote_id,
+            "total": len(jobs),
+            "terminado": terminados == len(jobs),
+            "progreso": round(sum(j.progreso for j in jobs) / len(jobs)),
+            "por_estado": {estado.value: por_estado[estado.value] for estado in EstadoJob},
+            "jobs": [
+                {
+                    "job_id": j.id,
+                    "estado": j.estado.value,
+                    "etapa": j.etapa,
+                    "progreso": j.progreso,
+                    "solicitud_id": j.solicitud_id,
+                    "error": j.error,
+                }
+                for j in jobs
+            ],
+        }
+    finally:
+        db.close()
+
+
+# Instancia global del gestor
+gestor_jobs = GestorJobs(
+    max_workers=settings.JOBS_MAX_WORKERS, lease_seg=settings.JOBS_LEASE_SEG
+)
@@ -0,0 +1,156 @@
+"""
+Lectura incremental de respuestas JSON que llegan en streaming.
+
+Un agente que responde `{"proveedores_recomendados": [{...}, {...}]}` tarda
+lo mismo en escribir el primer proveedor que en escribir todos; con
+`LectorArregloJSON` quien consume el stream recibe cada objeto del arreglo
+en cuanto se cierra su llave, sin esperar al resto de la respuesta, y las
+etapas siguientes pueden empezar con los primeros elementos.
+
+Solo se emiten los objetos (y arreglos) completos del arreglo indicado; los
+valores escalares del arreglo y los elementos que no son JSON válido se
+ignoran. El JSON completo se sigue pudiendo parsear al final con `texto`.
+
+El Receptor lo usa para avisar cada producto extraído en cuanto aparece
+(`ParserProductosIncremental`).
+"""
+import json
+import re
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional
+
+
+class LectorArregloJSON:
+    """
+    Extrae los elementos de un arreglo JSON a medida que llegan fragmentos.
+
+    Uso típico:
+        >>> lector = LectorArregloJSON("proveedores_recomendados")
+        >>> for fragmento in llamar_agente_stream(...):
+        ...     for proveedor in lector.alimentar(fragmento):
+        ...         procesar(proveedor)
+    """
+
+    def __init__(self, clave: str):
+        """
+        Inicializa el lector.
+
+        Args:
+            clave: Clave del objeto raíz cuyo valor es el arreglo a leer
+        """
+        self.clave = clave
+        self._patron = re.compile(r'"%s"\s*:\s*\[' % re.escape(clave))
+        self._texto: List[str] = []
+        self._buffer = ""
+        self._posicion: Optional[int] = None  # Primer carácter sin leer del arreglo
+        self._profundidad = 0
+        self._inicio_elemento: Optional[int] = None
+        self._en_cadena = False
+        self._escape = False
+        self.terminado = False
+
+    @property
+    def texto(self) -> str:
+        """Todo lo recibido hasta ahora."""
+        return "".join(self._texto)
+
+    def alimentar(self, fragmento: str) -> List[Dict[str, Any]]:
+        """
+        Agrega un fragmento y retorna los elementos que completó.
+
+        Args:
+            fragmento: Texto recibido del stream
+
+        Returns:
+            Elementos del arreglo cerrados con este fragmento (puede ser vacía)
+        """
+        self._texto.append(fragmento)
+        if self.terminado:
+            return []
+
+        self._buffer += fragmento
+        if self._posicion is None:
+            inicio = self._patron.search(self._buffer)
+            if inicio is None:
+                return []
+            self._posicion = inicio.end()
+
+        return self._leer()
+
+    def _leer(self) -> List[Dict[str, Any]]:
+        """Avanza sobre el buffer desde la última posición leída."""
+        completos = []
+        buffer = self._buffer
+        posicion = self._posicion
+
+        while posicion < len(buffer):
+            caracter = buffer[posicion]
+
+            if self._en_cadena:
+                if self._escape:
+                    self._escape = False
+                elif caracter == "\\":
+                    self._escape = True
+                elif caracter == '"':
+                    self._en_cadena = False
+            elif caracter == '"':
+                self._en_cadena = True
+            elif caracter in "{[":
+                if self._profundidad == 0:
+                    self._inicio_elemento = posicion
+                self._profundidad += 1
+            elif caracter in "}]":
+                if self._profundidad == 0:
+                    self.terminado = True
+                    break
+                self._profundidad -= 1
+                if self._profundidad == 0:
+                    try:
+                        completos.append(json.loads(buffer[self._inicio_elemento:posicion + 1]))
+                    except json.JSONDecodeError:
+                        pass  # Elemento mal formado: se valida al final con el texto completo
+                    self._inicio_elemento = None
+
+            posicion += 1
+
+        # Lo ya emitido no hace falta: el buffer solo guarda el elemento en curso
+        corte = self._inicio_elemento if self._inicio_elemento is not None else posicion
+        self._buffer = buffer[corte:]
+        self._posicion = posicion - corte
+        if self._inicio_elemento is not None:
+            self._inicio_elemento = 0
+        return completos
+
+
+def elementos_en_stream(fragmentos: Iterable[str], clave: str) -> Iterator[Dict[str, Any]]:
+    """
+    Itera los elementos del arreglo `clave` de un stream de texto JSON.
+
+    Args:
+        fragmentos: Fragmentos de texto (p. ej. de `llamar_agente_stream`)
+        clave: Clave del arreglo en el objeto raíz
+
+    Yields:
+        Cada elemento del arreglo en cuanto está completo
+    """
+    lector = LectorArregloJSON(clave)
+    for fragmento in fragmentos:
+        yield from lector.alimentar(fragmento)
+
+
+async def elementos_en_stream_async(
+    fragmentos: AsyncIterator[str], clave: str
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Versión asíncrona de `elementos_en_stream`.
+
+    Args:
+        fragmentos: Fragmentos de texto (p. ej. de `llamar_agente_stream_async`)
+        clave: Clave del arreglo en el objeto raíz
+
+    Yields:
+        Cada elemento del arreglo en cuanto está completo
+    """
+    lector = LectorArregloJSON(clave)
+    async for fragmento in fragmentos:
+        for elemento in lector.alimentar(fragmento):
+            yield elemento
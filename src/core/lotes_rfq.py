@@ -0,0 +1,432 @@
+"""
+Generación de RFQs en lote con la Batch API de OpenAI.
+
+Los RFQs de urgencia normal dan 5 días al proveedor para responder, así que
+no necesitan generarse en el momento. `generar_borrador_rfq` puede dejarlos
+aquí en lugar de llamar al modelo una vez por proveedor:
+
+1. `agregar` crea el RFQ como BORRADOR pendiente de generación y añade la
+   solicitud de chat completion al archivo JSONL del lote abierto.
+2. El lote se envía al llenarse (`RFQ_LOTE_MAX_SOLICITUDES`) o cuando su
+   solicitud más antigua lleva `RFQ_LOTE_MAX_ESPERA_SEG` esperando.
+3. `sondear` consulta los lotes enviados y, al terminar, escribe cada
+   resultado en su borrador. Lo que el lote no devolvió se genera con una
+   llamada directa.
+
+El ciclo de envío y sondeo corre en segundo plano (`iniciar`/`detener`
+desde el ciclo de vida de FastAPI). Lotes y borradores se persisten, así
+que un reinicio retoma los lotes pendientes.
+"""
+import asyncio
+import json
+import threading
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from config.logging_config import logger
+from config.settings import settings
+from src.core.uso_llm import iniciar_cuenta, registrar_uso, terminar_cuenta
+from src.database.crud import crear_rfq
+from src.database.crud import lote_rfq as crud_lote_rfq
+from src.database.crud import rfq as crud_rfq
+from src.database.models import EstadoLoteRFQ, LoteRFQ
+from src.database.session import SessionLocal
+from src.services.batch_service import (
+    AGENTE_LOTE,
+    ENDPOINT_CHAT,
+    ESTADOS_TERMINALES,
+    BackendBatch,
+    crear_backend,
+    leer_jsonl,
+)
+
+# La Batch API cobra la mitad del precio de lista
+FACTOR_COSTO_LOTE = 0.5
+
+PREFIJO_CUSTOM_ID = "rfq-"
+
+
+class GestorLotesRFQ:
+    """
+    Acumula, envía y sondea lotes de generación de RFQs.
+
+    Uso típico:
+        >>> info = gestor_lotes_rfq.agregar(solicitud_id=1, proveedor_id=5, kwargs=kwargs)
+        >>> gestor_lotes_rfq.procesar()  # envía lotes listos y escribe resultados
+    """
+
+    def __init__(
+        self,
+        backend: Optional[BackendBatch] = None,
+        directorio: Optional[Path] = None,
+        max_solicitudes: Optional[int] = None,
+        max_espera_seg: Optional[float] = None,
+        intervalo_sondeo_seg: Optional[float] = None,
+    ):
+        """
+        Inicializa el gestor.
+
+        Args:
+            backend: Backend de lotes (por defecto el de `RFQ_LOTE_BACKEND`)
+            directorio: Carpeta para los archivos JSONL de entrada
+            max_solicitudes: Solicitudes a partir de las cuales el lote se envía
+            max_espera_seg: Segundos máximos que un lote acumula antes de enviarse
+            intervalo_sondeo_seg: Segundos entre ciclos de envío y sondeo
+        """
+        self.directorio = Path(directorio or settings.RFQ_LOTE_DIRECTORIO)
+        self.max_solicitudes = max_solicitudes or settings.RFQ_LOTE_MAX_SOLICITUDES
+        self.max_espera_seg = (
+            settings.RFQ_LOTE_MAX_ESPERA_SEG if max_espera_seg is None else max_espera_seg
+        )
+        self.intervalo_sondeo_seg = (
+            intervalo_sondeo_seg or settings.RFQ_LOTE_INTERVALO_SONDEO_SEG
+        )
+        self._backend = backend
+        # Serializa las escrituras al lote abierto (borradores en paralelo)
+        self._lock = threading.Lock()
+        self._tarea: Optional[asyncio.Task] = None
+
+    @property
+    def backend(self) -> BackendBatch:
+        """Backend configurado (se crea al primer uso)."""
+        if self._backend is None:
+            self._backend = crear_backend(settings.RFQ_LOTE_BACKEND, self.directorio)
+        return self._backend
+
+    # ------------------------------------------------------------------
+    # Acumulación y envío
+    # ------------------------------------------------------------------
+
+    def agregar(self, solicitud_id: int, proveedor_id: int, kwargs: Dict[str, Any]) -> Dict:
+        """
+        Crea un borrador pendiente y agrega su generación al lote abierto.
+
+        Args:
+            solicitud_id: ID de la solicitud de compra
+            proveedor_id: ID del proveedor destinatario
+            kwargs: Parámetros de `chat.completions.create` para el RFQ
+
+        Returns:
+            {"rfq_id", "numero_rfq", "lote_id"}
+        """
+        with self._lock:
+            db = SessionLocal()
+            try:
+                lote = crud_lote_rfq.get_abierto(db, self.backend.nombre) or self._abrir_lote(db)
+                rfq_obj = crear_rfq(
+                    db=db,
+                    solicitud_id=solicitud_id,
+                    proveedor_id=proveedor_id,
+                    contenido="",
+                    lote_id=lote.id,
+                )
+
+                linea = {
+                    "custom_id": f"{PREFIJO_CUSTOM_ID}{rfq_obj.id}",
+                    "method": "POST",
+                    "url": ENDPOINT_CHAT,
+                    "body": kwargs,
+                }
+                with open(lote.archivo_entrada, "a", encoding="utf-8") as archivo:
+                    archivo.write(json.dumps(linea, ensure_ascii=False) + "\n")
+
+                crud_lote_rfq.update(db, db_obj=lote, obj_in={"total": lote.total + 1})
+                logger.info(
+                    f"📦 RFQ {rfq_obj.numero_rfq} agregado al lote {lote.id} "
+                    f"({lote.total}/{self.max_solicitudes})"
+                )
+
+                # Se envía dentro del lock: nadie más escribe en el archivo mientras sube
+                if lote.total >= self.max_solicitudes:
+                    self._enviar(db, lote)
+
+                return {
+                    "rfq_id": rfq_obj.id,
+                    "numero_rfq": rfq_obj.numero_rfq,
+                    "lote_id": lote.id,
+                }
+            finally:
+                db.close()
+
+    def _abrir_lote(self, db) -> LoteRFQ:
+        """Crea un lote nuevo con su archivo JSONL vacío."""
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        ruta = self.directorio / f"lote-{uuid.uuid4().hex[:12]}.jsonl"
+        ruta.touch()
+
+        return crud_lote_rfq.create(
+            db,
+            obj_in={
+                "estado": EstadoLoteRFQ.ACUMULANDO,
+                "backend": self.backend.nombre,
+                "archivo_entrada": str(ruta),
+            },
+        )
+
+    def _enviar(self, db, lote: LoteRFQ) -> bool:
+        """Sube el archivo del lote; si falla, el lote sigue abierto y se reintenta."""
+        try:
+            batch_id = self.backend.enviar(Path(lote.archivo_entrada))
+        except Exception as e:
+            logger.error(f"❌ No se pudo enviar el lote {lote.id}: {e}")
+            return False
+
+        crud_lote_rfq.update(
+            db,
+            db_obj=lote,
+            obj_in={
+                "estado": EstadoLoteRFQ.ENVIADO,
+                "batch_id": batch_id,
+                "fecha_envio": datetime.utcnow(),
+            },
+        )
+        logger.info(f"📤 Lote {lote.id} enviado ({lote.total} RFQs, batch {batch_id})")
+        return True
+
+    def enviar_pendientes(self, forzar: bool = False) -> int:
+        """
+        Envía los lotes abiertos que ya esperaron `max_espera_seg`.
+
+        Args:
+            forzar: Si True, envía los lotes abiertos sin importar su antigüedad
+
+        Returns:
+            Número de lotes enviados
+        """
+        limite = datetime.utcnow() - timedelta(seconds=self.max_espera_seg)
+        enviados = 0
+
+        with self._lock:
+            db = SessionLocal()
+            try:
+                for lote in crud_lote_rfq.get_by_estado(db, EstadoLoteRFQ.ACUMULANDO):
+                    if lote.total == 0 or (not forzar and lote.created_at > limite):
+                        continue
+                    if self._enviar(db, lote):
+                        enviados += 1
+            finally:
+                db.close()
+
+        return enviados
+
+    # ------------------------------------------------------------------
+    # Sondeo y escritura de resultados
+    # ------------------------------------------------------------------
+
+    def sondear(self) -> int:
+        """
+        Consulta los lotes enviados y escribe los resultados de los terminados.
+
+        Returns:
+            Número de lotes terminados en esta consulta
+        """
+        db = SessionLocal()
+        try:
+            terminados = 0
+            for lote in crud_lote_rfq.get_by_estado(db, EstadoLoteRFQ.ENVIADO):
+                try:
+                    if self._sondear_lote(db, lote):
+                        terminados += 1
+                except Exception as e:
+                    db.rollback()
+                    logger.error(f"❌ Error consultando el lote {lote.id}: {e}")
+            return terminados
+        finally:
+            db.close()
+
+    def _sondear_lote(self, db, lote: LoteRFQ) -> bool:
+        """Procesa un lote si el backend ya lo terminó."""
+        estado = self.backend.consultar(lote.batch_id)
+        if estado["estado"] not in ESTADOS_TERMINALES:
+            return False
+
+        resultados: List[Dict] = []
+        for archivo_id in (estado["archivo_salida_id"], estado["archivo_errores_id"]):
+            if archivo_id:
+                resultados.extend(self.backend.descargar(archivo_id))
+
+        completados = self._escribir_resultados(db, lote, resultados)
+
+        # Lo que el lote no generó (errores, expiración) se genera directo
+        pendientes = crud_lote_rfq.get_rfqs_pendientes(db, lote.id)
+        sin_generar = self._generar_directo(db, lote, pendientes) if pendientes else 0
+
+        crud_lote_rfq.update(
+            db,
+            db_obj=lote,
+            obj_in={
+                "estado": EstadoLoteRFQ.FALLIDO if sin_generar else EstadoLoteRFQ.COMPLETADO,
+                "completados": completados,
+                "fallidos": len(pendientes),
+                "error": estado["error"]
+                or (f"{sin_generar} RFQ(s) sin generar" if sin_generar else None),
+                "fecha_fin": datetime.utcnow(),
+            },
+        )
+        logger.info(
+            f"📬 Lote {lote.id} terminado ({estado['estado']}): {completados} generados "
+            f"en lote, {len(pendientes) - sin_generar} directos, {sin_generar} sin generar"
+        )
+        return True
+
+    def _escribir_resultados(self, db, lote: LoteRFQ, resultados: List[Dict]) -> int:
+        """Escribe en cada borrador pendiente el contenido devuelto por el lote."""
+        pendientes = {
+            f"{PREFIJO_CUSTOM_ID}{r.id}": r for r in crud_lote_rfq.get_rfqs_pendientes(db, lote.id)
+        }
+        escritos = 0
+
+        for linea in resultados:
+            rfq_obj = pendientes.get(linea.get("custom_id"))
+            respuesta = linea.get("response") or {}
+            if rfq_obj is None or respuesta.get("status_code") != 200:
+                continue
+
+            cuerpo = respuesta.get("body") or {}
+            try:
+                contenido = cuerpo["choices"][0]["message"]["content"]
+            except (KeyError, IndexError, TypeError):
+                contenido = None
+            if not contenido:
+                continue
+
+            crud_rfq.update(
+                db,
+                db_obj=rfq_obj,
+                obj_in={"contenido": contenido, "pendiente_generacion": False},
+            )
+            escritos += 1
+
+            # El backend local ya registró el uso en el despachador (a precio normal)
+            if cuerpo.get("usage") and not self.backend.registra_uso:
+                token = iniciar_cuenta(rfq_obj.solicitud_id)
+                try:
+                    registrar_uso(
+                        AGENTE_LOTE,
+                        cuerpo.get("model", ""),
+                        SimpleNamespace(usage=SimpleNamespace(**cuerpo["usage"])),
+                        0.0,
+                        factor_costo=FACTOR_COSTO_LOTE,
+                    )
+                finally:
+                    terminar_cuenta(token)
+
+        return escritos
+
+    def _generar_directo(self, db, lote: LoteRFQ, pendientes: List) -> int:
+        """
+        Genera con una llamada normal los RFQs que el lote no devolvió.
+
+        Returns:
+            Número de RFQs que tampoco se pudieron generar así
+        """
+        from src.services.openai_service import openai_service
+
+        solicitudes = {
+            linea["custom_id"]: linea["body"]
+            for linea in leer_jsonl(Path(lote.archivo_entrada).read_text(encoding="utf-8"))
+        }
+        sin_generar = 0
+
+        for rfq_obj in pendientes:
+            kwargs = solicitudes.get(f"{PREFIJO_CUSTOM_ID}{rfq_obj.id}")
+            token = iniciar_cuenta(rfq_obj.solicitud_id)
+            try:
+                contenido = (
+                    openai_service.completar(kwargs, usar_cache=False, agente="generador")
+                    if kwargs
+                    else None
+                )
+            except Exception as e:
+                logger.error(f"❌ No se pudo generar el RFQ {rfq_obj.numero_rfq}: {e}")
+                contenido = None
+            finally:
+                terminar_cuenta(token)
+
+            if not contenido:
+                sin_generar += 1
+                continue
+
+            crud_rfq.update(
+                db,
+                db_obj=rfq_obj,
+                obj_in={"contenido": contenido, "pendiente_generacion": False},
+            )
+
+        return sin_generar
+
+    # ------------------------------------------------------------------
+    # Ciclo en segundo plano
+    # ------------------------------------------------------------------
+
+    def procesar(self, forzar_envio: bool = False) -> Dict[str, int]:
+        """
+        Envía los lotes listos y escribe los resultados de los terminados.
+
+        Args:
+            forzar_envio: Enviar los lotes abiertos aunque no hayan esperado
+
+        Returns:
+            {"enviados": int, "terminados": int}
+        """
+        return {
+            "enviados": self.enviar_pendientes(forzar=forzar_envio),
+            "terminados": self.sondear(),
+        }
+
+    async def iniciar(self) -> None:
+        """Arranca el ciclo de envío y sondeo si el modo lote está habilitado."""
+        if self._tarea is not None or not settings.RFQ_LOTE_HABILITADO:
+            return
+
+        self._tarea = asyncio.create_task(self._ciclo(), name="lotes-rfq")
+        logger.info(
+            f"📦 Lotes de RFQ activos (backend {settings.RFQ_LOTE_BACKEND}, "
+            f"sondeo cada {self.intervalo_sondeo_seg:.0f}s)"
+        )
+
+    async def detener(self) -> None:
+        """Detiene el ciclo; los lotes pendientes se retoman al reiniciar."""
+        if self._tarea is None:
+            return
+
+        self._tarea.cancel()
+        await asyncio.gather(self._tarea, return_exceptions=True)
+        self._tarea = None
+
+    async def _ciclo(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.procesar)
+            except Exception as e:
+                logger.error(f"❌ Error en el ciclo de lotes de RFQ: {e}")
+            await asyncio.sleep(self.intervalo_sondeo_seg)
+
+    def estado(self) -> Dict[str, Any]:
+        """
+        Lotes por estado (hace E/S de BD; desde código async usar `asyncio.to_thread`).
+
+        Returns:
+            {"habilitado": bool, "backend": str, "lotes": {estado: cantidad}}
+        """
+        db = SessionLocal()
+        try:
+            lotes = {
+                estado.value: len(crud_lote_rfq.get_by_estado(db, estado))
+                for estado in (EstadoLoteRFQ.ACUMULANDO, EstadoLoteRFQ.ENVIADO)
+            }
+        finally:
+            db.close()
+
+        return {
+            "habilitado": settings.RFQ_LOTE_HABILITADO,
+            "backend": settings.RFQ_LOTE_BACKEND,
+            "lotes": lotes,
+        }
+
+
+# Instancia global del gestor
+gestor_lotes_rfq = GestorLotesRFQ()
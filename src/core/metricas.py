@@ -0,0 +1,232 @@
+"""
+Métricas de latencia y throughput del flujo de solicitudes.
+
+Cada etapa y sub-llamada del flujo (Receptor, carga de proveedores, Serper,
+LLM, BD, SMTP...) se envuelve en un span con `medir`. Cada span:
+
+- Se agrega al registro global, que mantiene una ventana de duraciones por
+  span para calcular percentiles (p50/p95/p99) y conteos por resultado.
+- Se anota en la lista de tiempos de la solicitud en curso (una variable de
+  contexto), que el orquestador devuelve en `resultado_final["tiempos"]`.
+
+Las variables de contexto se propagan a tareas de asyncio y a
+`asyncio.to_thread`; para hilos de un ThreadPoolExecutor se usa
+`contextvars.copy_context().run`.
+"""
+import contextvars
+import math
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, List, Optional
+
+# Resultados de span más comunes
+RESULTADO_OK = "ok"
+RESULTADO_ERROR = "error"
+
+# Span que mide el flujo completo; se usa para el throughput
+SPAN_TOTAL = "orquestador.total"
+
+# Tiempos de la solicitud en curso (None fuera de una solicitud)
+_tiempos_solicitud: contextvars.ContextVar[Optional[List[Dict]]] = contextvars.ContextVar(
+    "tiempos_solicitud", default=None
+)
+
+
+class Span:
+    """Medición en curso; el código medido puede cambiar su `resultado`."""
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self.resultado = RESULTADO_OK
+        self.duracion_ms: Optional[float] = None
+
+
+class RegistroMetricas:
+    """
+    Agregador thread-safe de duraciones por span.
+
+    Guarda las últimas `ventana` duraciones de cada span (suficiente para
+    percentiles estables sin crecer sin límite) y conteos acumulados por
+    resultado.
+    """
+
+    def __init__(self, ventana: int = 1000):
+        """
+        Inicializa el registro.
+
+        Args:
+            ventana: Duraciones retenidas por span para calcular percentiles
+        """
+        self.ventana = ventana
+        self._lock = threading.Lock()
+        self._reiniciar_sin_lock()
+
+    def _reiniciar_sin_lock(self) -> None:
+        self._duraciones: Dict[str, Deque[float]] = {}
+        self._resultados: Dict[str, Counter] = {}
+        self._fin_solicitudes: Deque[float] = deque(maxlen=self.ventana)
+
+    def registrar(self, nombre: str, duracion_ms: float, resultado: str = RESULTADO_OK) -> None:
+        """
+        Registra una duración.
+
+        Args:
+            nombre: Nombre del span (ej: "investigador.llm")
+            duracion_ms: Duración en milisegundos
+            resultado: Resultado del span (ok, error, sin_proveedores...)
+        """
+        with self._lock:
+            duraciones = self._duraciones.setdefault(nombre, deque(maxlen=self.ventana))
+            duraciones.append(duracion_ms)
+            self._resultados.setdefault(nombre, Counter())[resultado] += 1
+            if nombre == SPAN_TOTAL:
+                self._fin_solicitudes.append(time.monotonic())
+
+    def resumen(self) -> Dict:
+        """
+        Resumen de todas las métricas.
+
+        Returns:
+            {
+                "spans": {nombre: {"conteo", "p50_ms", "p95_ms", "p99_ms",
+                                   "max_ms", "promedio_ms", "resultados"}},
+                "solicitudes_por_minuto": float  # completadas en el último minuto
+            }
+        """
+        with self._lock:
+            spans = {
+                nombre: _estadisticas(list(duraciones), dict(self._resultados[nombre]))
+                for nombre, duraciones in sorted(self._duraciones.items())
+            }
+            limite = time.monotonic() - 60
+            ultimo_minuto = sum(1 for fin in self._fin_solicitudes if fin >= limite)
+
+        return {"spans": spans, "solicitudes_por_minuto": float(ultimo_minuto)}
+
+    def reiniciar(self) -> None:
+        """Descarta todas las métricas acumuladas."""
+        with self._lock:
+            self._reiniciar_sin_lock()
+
+
+def _percentil(ordenadas: List[float], percentil: float) -> float:
+    """Percentil por el método del rango más cercano."""
+    indice = max(0, math.ceil(percentil / 100 * len(ordenadas)) - 1)
+    return ordenadas[indice]
+
+
+def _estadisticas(duraciones: List[float], resultados: Dict[str, int]) -> Dict:
+    """Percentiles y conteos de un span."""
+    ordenadas = sorted(duraciones)
+    return {
+        "conteo": sum(resultados.values()),
+        "p50_ms": round(_percentil(ordenadas, 50), 2),
+        "p95_ms": round(_percentil(ordenadas, 95), 2),
+        "p99_ms": round(_percentil(ordenadas, 99), 2),
+        "max_ms": round(ordenadas[-1], 2),
+        "promedio_ms": round(sum(ordenadas) / len(ordenadas), 2),
+        "resultados": resultados,
+    }
+
+
+@contextmanager
+def medir(nombre: str) -> Iterator[Span]:
+    """
+    Mide la duración de un bloque como un span.
+
+    Si el bloque lanza una excepción el resultado es "error" (salvo que el
+    bloque ya haya fijado otro); el bloque también puede fijar
+    `span.resultado` explícitamente. Funciona dentro de
+    funciones async (el bloque puede contener `await`).
+
+    Args:
+        nombre: Nombre del span, con el prefijo de su módulo
+
+    Example:
+        >>> with medir("investigador.llm") as span:
+        ...     respuesta = await llamar_agente_async(...)
+        ...     if not respuesta:
+        ...         span.resultado = "vacio"
+    """
+    span = Span(nombre)
+    inicio = time.perf_counter()
+
+    try:
+        yield span
+    except BaseException:
+        if span.resultado == RESULTADO_OK:
+            span.resultado = RESULTADO_ERROR
+        raise
+    finally:
+        span.duracion_ms = (time.perf_counter() - inicio) * 1000
+        registrar_duracion(nombre, span.duracion_ms, span.resultado)
+
+
+def registrar_duracion(nombre: str, duracion_ms: float, resultado: str = RESULTADO_OK) -> None:
+    """
+    Registra un span medido fuera de un bloque `with medir(...)`.
+
+    Para duraciones que no corresponden a un bloque de código, como el
+    tiempo hasta el primer token de un stream. Se agrega al registro global
+    y a los tiempos de la solicitud en curso, igual que `medir`.
+
+    Args:
+        nombre: Nombre del span, con el prefijo de su módulo
+        duracion_ms: Duración en milisegundos
+        resultado: Resultado del span
+    """
+    registro_metricas.registrar(nombre, duracion_ms, resultado)
+
+    tiempos = _tiempos_solicitud.get()
+    if tiempos is not None:
+        tiempos.append({
+            "span": nombre,
+            "ms": round(duracion_ms, 2),
+            "resultado": resultado,
+        })
+
+
+def iniciar_tiempos() -> contextvars.Token:
+    """
+    Empieza a acumular los spans de una solicitud en el contexto actual.
+
+    Returns:
+        Token para restaurar el contexto con `terminar_tiempos`
+    """
+    return _tiempos_solicitud.set([])
+
+
+def terminar_tiempos(token: contextvars.Token) -> Dict:
+    """
+    Deja de acumular spans y retorna el desglose de la solicitud.
+
+    Args:
+        token: Token retornado por `iniciar_tiempos`
+
+    Returns:
+        {"total_ms": float, "spans": {nombre: {"ms", "llamadas", "resultados"}}}
+        Los spans repetidos (un LLM o SMTP por proveedor) se suman.
+    """
+    tiempos = _tiempos_solicitud.get() or []
+    _tiempos_solicitud.reset(token)
+
+    spans: Dict[str, Dict] = {}
+    for tiempo in tiempos:
+        span = spans.setdefault(
+            tiempo["span"], {"ms": 0.0, "llamadas": 0, "resultados": Counter()}
+        )
+        span["ms"] = round(span["ms"] + tiempo["ms"], 2)
+        span["llamadas"] += 1
+        span["resultados"][tiempo["resultado"]] += 1
+
+    for span in spans.values():
+        span["resultados"] = dict(span["resultados"])
+
+    total = spans.get(SPAN_TOTAL, {}).get("ms", 0.0)
+    return {"total_ms": total, "spans": spans}
+
+
+# Instancia global del registro
+registro_metricas = RegistroMetricas()
@@ -0,0 +1,190 @@
+"""
+Planificación por prioridad del trabajo del flujo de solicitudes.
+
+El Receptor clasifica cada solicitud como normal, alta o urgente. Cuando el
+sistema está saturado, una solicitud urgente no debe esperar detrás de una
+fila de solicitudes normales: los turnos para ejecutar las etapas costosas
+(Investigador + Generador RFQ) y para cada envío de RFQ se asignan por
+prioridad en lugar de por orden de llegada.
+
+Para que el trabajo normal no se quede sin turno (starvation), la prioridad
+efectiva de quien espera crece con el tiempo de espera: cada
+`envejecimiento_seg` segundos equivale a un nivel más de urgencia.
+
+El tiempo de espera de cada turno se registra como span
+`planificador.<nombre>.espera.<nivel>` en `src.core.metricas` (p50/p95/p99
+por nivel) y `estado()` expone la profundidad de la cola por nivel.
+"""
+import asyncio
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List
+
+from config.settings import settings
+from src.core.metricas import medir
+from src.database.models import PRIORIDAD_POR_URGENCIA
+
+# Nombre de cada nivel de prioridad (para métricas)
+NIVEL_POR_PRIORIDAD = {prioridad: nivel for nivel, prioridad in PRIORIDAD_POR_URGENCIA.items()}
+
+
+def prioridad_de(urgencia: str) -> int:
+    """
+    Prioridad numérica de una urgencia (normal si es desconocida).
+
+    Args:
+        urgencia: normal, alta o urgente
+
+    Returns:
+        Prioridad de 3 (normal) a 5 (urgente)
+    """
+    return PRIORIDAD_POR_URGENCIA.get(urgencia, PRIORIDAD_POR_URGENCIA["normal"])
+
+
+class _Espera:
+    """Turno solicitado y pendiente de asignar."""
+
+    __slots__ = ("prioridad", "llegada", "secuencia", "futuro")
+
+    def __init__(self, prioridad: int, secuencia: int, futuro: asyncio.Future):
+        self.prioridad = prioridad
+        self.llegada = time.monotonic()
+        self.secuencia = secuencia
+        self.futuro = futuro
+
+
+class PlanificadorPrioridad:
+    """
+    Semáforo asíncrono que asigna los turnos libres por prioridad.
+
+    Uso típico:
+        >>> async with planificador_flujos.turno(prioridad_de("urgente")):
+        ...     await buscar_proveedores_async(productos)
+    """
+
+    def __init__(self, capacidad: int, envejecimiento_seg: float = 30.0, nombre: str = "flujos"):
+        """
+        Inicializa el planificador.
+
+        Args:
+            capacidad: Turnos que pueden estar en uso a la vez
+            envejecimiento_seg: Segundos de espera que suben un nivel la
+                prioridad efectiva (protege al trabajo normal de esperar
+                indefinidamente)
+            nombre: Nombre usado en las métricas
+        """
+        if capacidad < 1:
+            raise ValueError("La capacidad del planificador debe ser al menos 1")
+
+        self.capacidad = capacidad
+        self.envejecimiento_seg = envejecimiento_seg
+        self.nombre = nombre
+        self._libres = capacidad
+        self._esperando: List[_Espera] = []
+        self._secuencia = itertools.count()
+
+    @asynccontextmanager
+    async def turno(self, prioridad: int) -> AsyncIterator[None]:
+        """
+        Espera un turno, ejecuta el bloque y lo libera.
+
+        Args:
+            prioridad: Prioridad numérica (ver `prioridad_de`)
+        """
+        nivel = NIVEL_POR_PRIORIDAD.get(prioridad, str(prioridad))
+        with medir(f"planificador.{self.nombre}.espera.{nivel}"):
+            await self.adquirir(prioridad)
+
+        try:
+            yield
+        finally:
+            self.liberar()
+
+    async def adquirir(self, prioridad: int) -> None:
+        """
+        Toma un turno; si no hay libres, espera a que se le asigne uno.
+
+        Args:
+            prioridad: Prioridad numérica
+        """
+        if self._libres > 0 and not self._esperando:
+            self._libres -= 1
+            return
+
+        espera = _Espera(
+            prioridad, next(self._secuencia), asyncio.get_running_loop().create_future()
+        )
+        self._esperando.append(espera)
+
+        try:
+            await espera.futuro
+        except asyncio.CancelledError:
+            if espera.futuro.done() and not espera.futuro.cancelled():
+                # El turno ya se había asignado: devolverlo a la cola
+                self.liberar()
+            elif espera in self._esperando:
+                self._esperando.remove(espera)
+            raise
+
+    def liberar(self) -> None:
+        """Devuelve un turno y lo asigna a la espera de mayor prioridad efectiva."""
+        self._libres += 1
+        self._despachar()
+
+    def _despachar(self) -> None:
+        """Asigna turnos libres mientras haya esperas pendientes."""
+        while self._libres > 0 and self._esperando:
+            ahora = time.monotonic()
+            siguiente = max(
+                self._esperando,
+                key=lambda e: (self._prioridad_efectiva(e, ahora), -e.secuencia),
+            )
+            self._esperando.remove(siguiente)
+
+            if siguiente.futuro.done():
+                # Cancelada mientras esperaba
+                continue
+
+            self._libres -= 1
+            siguiente.futuro.set_result(None)
+
+    def _prioridad_efectiva(self, espera: _Espera, ahora: float) -> float:
+        """Prioridad más un nivel por cada `envejecimiento_seg` de espera."""
+        return espera.prioridad + (ahora - espera.llegada) / self.envejecimiento_seg
+
+    def estado(self) -> Dict:
+        """
+        Ocupación y profundidad de la cola por nivel.
+
+        Returns:
+            {
+                "capacidad": int,
+                "en_uso": int,
+                "en_cola": {nivel: int},
+                "espera_maxima_s": float  # espera más antigua aún sin turno
+            }
+        """
+        ahora = time.monotonic()
+        en_cola = dict.fromkeys(PRIORIDAD_POR_URGENCIA, 0)
+        for espera in self._esperando:
+            nivel = NIVEL_POR_PRIORIDAD.get(espera.prioridad, str(espera.prioridad))
+            en_cola[nivel] = en_cola.get(nivel, 0) + 1
+
+        return {
+            "capacidad": self.capacidad,
+            "en_uso": self.capacidad - self._libres,
+            "en_cola": en_cola,
+            "espera_maxima_s": round(
+                max((ahora - e.llegada for e in self._esperando), default=0.0), 3
+            ),
+        }
+
+
+# Instancias globales: etapas costosas del flujo y envíos de RFQ
+planificador_flujos = PlanificadorPrioridad(
+    settings.PLANIFICADOR_MAX_FLUJOS, settings.PLANIFICADOR_ENVEJECIMIENTO_SEG, "flujos"
+)
+planificador_rfqs = PlanificadorPrioridad(
+    settings.PLANIFICADOR_MAX_RFQS, settings.PLANIFICADOR_ENVEJECIMIENTO_SEG, "rfqs"
+)
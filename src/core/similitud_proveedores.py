@@ -0,0 +1,380 @@
+"""
+Motor local de similitud entre productos y proveedores (TF-IDF de n-gramas).
+
+El índice de términos (`indice_proveedores`) solo encuentra proveedores que
+comparten palabras exactas con el producto: "variadores" no encuentra a
+quien tiene "variador", ni "automatización" a "automatizacion industrial".
+`MotorSimilitud` representa cada proveedor como un vector TF-IDF de
+trigramas de caracteres de sus palabras (`nombre`, `categoria`,
+`subcategorias` y `notas`) y ordena el catálogo por similitud coseno con
+el producto, sin red ni LLM.
+
+Los trigramas se proyectan con hashing a `DIMENSION` columnas. La matriz
+proveedores × columnas es muy dispersa, así que se guarda por columnas en
+arreglos de NumPy (por cada columna, las filas que la tienen y su peso): el
+coseno de una consulta es un `np.bincount` sobre las columnas de sus
+trigramas y el top-K un `np.argpartition`, del orden de milisegundos con
+decenas de miles de proveedores. Cada proveedor creado, modificado o
+eliminado actualiza solo sus filas (ver `suscribir_cambios`); el IDF de
+las columnas se recalcula al reconstruir el motor.
+"""
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config.logging_config import logger
+from config.settings import settings
+from src.core.indice_proveedores import (
+    datos_proveedor,
+    palabras_clave,
+    suscribir_cambios,
+)
+from src.database.models import Proveedor
+
+# Columnas de la matriz (potencia de 2); con menos hay más colisiones de hash
+DIMENSION = 2 ** 18
+
+# Largo de los n-gramas de caracteres
+LARGO_NGRAMA = 3
+
+# Peso de los trigramas según el campo del proveedor
+PESOS_CAMPOS = {
+    "nombre": 2.0,
+    "categoria": 2.0,
+    "subcategorias": 2.0,
+    "notas": 1.0,
+}
+
+# Filas reservadas al construir (crece al doble cuando se llena)
+CAPACIDAD_INICIAL = 1024
+
+
+def ngramas(palabras: Iterable[str]) -> List[str]:
+    """Trigramas de cada palabra con bordes (" plc " → " pl", "plc", "lc ")."""
+    resultado = []
+    for palabra in palabras:
+        con_bordes = f" {palabra} "
+        resultado.extend(
+            con_bordes[i:i + LARGO_NGRAMA]
+            for i in range(len(con_bordes) - LARGO_NGRAMA + 1)
+        )
+    return resultado
+
+
+def _columna(ngrama: str) -> int:
+    return zlib.crc32(ngrama.encode()) & (DIMENSION - 1)
+
+
+def _vector_tf(frecuencias: Dict[int, float]) -> Tuple[np.ndarray, np.ndarray]:
+    """Columnas y pesos TF (sublineal) de un vector disperso."""
+    columnas = np.fromiter(frecuencias.keys(), dtype=np.int32, count=len(frecuencias))
+    pesos = np.fromiter(frecuencias.values(), dtype=np.float32, count=len(frecuencias))
+    return columnas, (1 + np.log(pesos)).astype(np.float32)
+
+
+class MotorSimilitud:
+    """
+    Similitud coseno TF-IDF entre textos de productos y el catálogo.
+
+    Es seguro entre hilos y tiene la misma interfaz que `IndiceProveedores`
+    (`construir`, `actualizar`, `eliminar`, `buscar`, `estado`).
+
+    Uso típico:
+        >>> similares = motor_similitud.buscar(db, palabras_clave("Variador de frecuencia"), 10)
+        >>> similares[0]["similitud"]
+        0.41
+    """
+
+    def __init__(
+        self,
+        similitud_minima: Optional[float] = None,
+        max_antiguedad_seg: Optional[float] = None,
+    ):
+        """
+        Inicializa un motor vacío (se construye en la primera consulta).
+
+        Args:
+            similitud_minima: Coseno mínimo (0-1) para retornar un proveedor
+                (settings.SIMILITUD_PROVEEDORES_MINIMA)
+            max_antiguedad_seg: Segundos tras los que se reconstruye desde la
+                BD; 0 = solo con `invalidar()`
+                (settings.INDICE_PROVEEDORES_MAX_ANTIGUEDAD_SEG)
+        """
+        self.similitud_minima = (
+            settings.SIMILITUD_PROVEEDORES_MINIMA
+            if similitud_minima is None else similitud_minima
+        )
+        self.max_antiguedad_seg = (
+            settings.INDICE_PROVEEDORES_MAX_ANTIGUEDAD_SEG
+            if max_antiguedad_seg is None else max_antiguedad_seg
+        )
+        self._lock = threading.RLock()
+        self._construido_en: Optional[float] = None
+        self._construcciones = 0
+        self._actualizaciones = 0
+        self._consultas = 0
+        self._reiniciar(CAPACIDAD_INICIAL)
+
+    def _reiniciar(self, capacidad: int) -> None:
+        """Deja el motor vacío con `capacidad` filas (con el lock tomado)."""
+        self._proveedores: Dict[int, dict] = {}
+        self._fila_de: Dict[int, int] = {}  # id de proveedor → fila
+        self._filas_libres: List[int] = []
+        self._ids = np.full(capacidad, -1, dtype=np.int64)  # fila → id
+        self._normas = np.zeros(capacidad, dtype=np.float32)  # Norma TF-IDF por fila
+        self._columnas_fila: Dict[int, np.ndarray] = {}  # fila → columnas
+        # Matriz por columnas: columna → (filas, pesos TF)
+        self._matriz: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self._df = np.zeros(DIMENSION, dtype=np.int32)  # Filas con cada columna
+        self._idf = np.ones(DIMENSION, dtype=np.float32)
+        self._filas_usadas = 0
+
+    def construir(self, db) -> None:
+        """
+        Carga todo el catálogo desde la BD y reemplaza la matriz.
+
+        Args:
+            db: Sesión de SQLAlchemy
+        """
+        inicio = time.perf_counter()
+        proveedores = [datos_proveedor(p) for p in db.query(Proveedor).all()]
+        vectores = [_vector_tf(self._frecuencias(p)) for p in proveedores]
+
+        with self._lock:
+            self._reiniciar(max(CAPACIDAD_INICIAL, 2 * len(proveedores)))
+            n = len(proveedores)
+            if n:
+                filas = np.repeat(
+                    np.arange(n, dtype=np.int32), [len(c) for c, _ in vectores]
+                )
+                columnas = np.concatenate([c for c, _ in vectores])
+                pesos = np.concatenate([p for _, p in vectores])
+
+                self._df = np.bincount(columnas, minlength=DIMENSION).astype(np.int32)
+                self._idf = self._calcular_idf(self._df, n)
+                self._normas[:n] = np.sqrt(np.bincount(
+                    filas, weights=(pesos * self._idf[columnas]) ** 2, minlength=n
+                ))
+
+                # Agrupar por columna: un arreglo de filas y pesos por columna
+                # (sin columnas, p.ej. proveedores sin texto, la matriz queda vacía)
+                if columnas.size:
+                    orden = np.argsort(columnas, kind="stable")
+                    columnas, filas, pesos = columnas[orden], filas[orden], pesos[orden]
+                    cortes = np.flatnonzero(np.diff(columnas)) + 1
+                    for col, f, p in zip(
+                        columnas[np.r_[0, cortes]],
+                        np.split(filas, cortes),
+                        np.split(pesos, cortes),
+                        strict=True,
+                    ):
+                        self._matriz[int(col)] = (f, p)
+
+                for fila, (datos, (cols, _)) in enumerate(zip(proveedores, vectores, strict=True)):
+                    self._proveedores[datos["id"]] = datos
+                    self._fila_de[datos["id"]] = fila
+                    self._ids[fila] = datos["id"]
+                    self._columnas_fila[fila] = cols
+                self._filas_usadas = n
+
+            self._construido_en = time.monotonic()
+            self._construcciones += 1
+
+        logger.info(
+            f"🧭 Motor de similitud construido: {len(proveedores)} proveedor(es), "
+            f"{len(self._matriz)} columna(s) en {(time.perf_counter() - inicio) * 1000:.0f} ms"
+        )
+
+    def actualizar(self, datos: dict) -> None:
+        """
+        Agrega o reemplaza un proveedor (formato de `datos_proveedor`).
+
+        Si el motor aún no se construyó no hace nada: la construcción ya
+        leerá el proveedor de la BD.
+        """
+        columnas, pesos = _vector_tf(self._frecuencias(datos))
+
+        with self._lock:
+            if self._construido_en is None:
+                return
+            self._quitar(datos["id"])
+
+            fila = self._fila_libre()
+            for col, peso in zip(columnas.tolist(), pesos.tolist(), strict=True):
+                filas_col, pesos_col = self._matriz.get(col, (None, None))
+                if filas_col is None:
+                    self._matriz[col] = (
+                        np.array([fila], dtype=np.int32), np.array([peso], dtype=np.float32)
+                    )
+                else:
+                    self._matriz[col] = (np.append(filas_col, fila), np.append(pesos_col, peso))
+            self._df[columnas] += 1
+
+            self._proveedores[datos["id"]] = datos
+            self._fila_de[datos["id"]] = fila
+            self._ids[fila] = datos["id"]
+            self._columnas_fila[fila] = columnas
+            self._normas[fila] = np.sqrt(np.sum((pesos * self._idf[columnas]) ** 2))
+            self._actualizaciones += 1
+
+    def eliminar(self, proveedor_id: int) -> None:
+        """Quita un proveedor de la matriz."""
+        with self._lock:
+            if self._quitar(proveedor_id):
+                self._actualizaciones += 1
+
+    def invalidar(self) -> None:
+        """Descarta la matriz; la próxima consulta la reconstruye."""
+        with self._lock:
+            self._reiniciar(CAPACIDAD_INICIAL)
+            self._construido_en = None
+
+    def buscar(self, db, terminos: Iterable[str], top_k: int) -> List[dict]:
+        """
+        Los `top_k` proveedores más similares a los términos de un producto.
+
+        Args:
+            db: Sesión de SQLAlchemy (solo se usa si hay que construir el motor)
+            terminos: Palabras ya normalizadas (ver `palabras_clave`)
+            top_k: Máximo de candidatos
+
+        Returns:
+            Copias de los proveedores con la clave "similitud" (coseno
+            redondeado), de mayor a menor y sobre `similitud_minima`
+        """
+        self._asegurar_construido(db)
+        frecuencias = Counter(_columna(g) for g in ngramas(sorted(set(terminos))))
+
+        with self._lock:
+            self._consultas += 1
+            if not frecuencias or not self._filas_usadas:
+                return []
+
+            columnas, pesos = _vector_tf(frecuencias)
+            pesos = pesos * self._idf[columnas]
+            norma_consulta = float(np.sqrt(np.sum(pesos ** 2)))
+
+            filas, productos = [], []
+            for col, peso in zip(columnas.tolist(), pesos.tolist(), strict=True):
+                filas_col, pesos_col = self._matriz.get(col, (None, None))
+                if filas_col is not None:
+                    filas.append(filas_col)
+                    productos.append(pesos_col * (peso * self._idf[col]))
+            if not filas:
+                return []
+
+            puntos = np.bincount(
+                np.concatenate(filas), weights=np.concatenate(productos),
+                minlength=self._filas_usadas,
+            )
+            normas = self._normas[:self._filas_usadas] * norma_consulta
+            similitudes = np.divide(
+                puntos, normas, out=np.zeros_like(puntos), where=normas > 0
+            )
+
+            k = min(top_k, len(similitudes))
+            mejores = np.argpartition(-similitudes, k - 1)[:k]
+            mejores = mejores[np.argsort(-similitudes[mejores], kind="stable")]
+
+            resultado = []
+            for fila in mejores.tolist():
+                if similitudes[fila] < self.similitud_minima:
+                    break
+                if self._ids[fila] < 0:  # Fila libre
+                    continue
+                proveedor = dict(self._proveedores[int(self._ids[fila])])
+                proveedor["similitud"] = round(float(similitudes[fila]), 3)
+                resultado.append(proveedor)
+            return resultado
+
+    def estado(self) -> Dict:
+        """
+        Tamaño y antigüedad del motor.
+
+        Returns:
+            {"construido": bool, "proveedores": int, "columnas": int,
+             "antiguedad_seg": float | None, "construcciones": int,
+             "actualizaciones": int, "consultas": int}
+        """
+        with self._lock:
+            return {
+                "construido": self._construido_en is not None,
+                "proveedores": len(self._proveedores),
+                "columnas": len(self._matriz),
+                "antiguedad_seg": (
+                    round(time.monotonic() - self._construido_en, 1)
+                    if self._construido_en is not None else None
+                ),
+                "construcciones": self._construcciones,
+                "actualizaciones": self._actualizaciones,
+                "consultas": self._consultas,
+            }
+
+    def _asegurar_construido(self, db) -> None:
+        """Construye el motor si no existe o superó la antigüedad máxima."""
+        with self._lock:
+            construido_en = self._construido_en
+        if construido_en is None or (
+            self.max_antiguedad_seg
+            and time.monotonic() - construido_en > self.max_antiguedad_seg
+        ):
+            self.construir(db)
+
+    @staticmethod
+    def _frecuencias(datos: dict) -> Dict[int, float]:
+        """Frecuencia ponderada por campo de cada columna del proveedor."""
+        frecuencias: Dict[int, float] = {}
+        for campo, peso in PESOS_CAMPOS.items():
+            for ngrama in ngramas(sorted(palabras_clave(datos.get(campo)))):
+                columna = _columna(ngrama)
+                frecuencias[columna] = frecuencias.get(columna, 0.0) + peso
+        return frecuencias
+
+    @staticmethod
+    def _calcular_idf(df: np.ndarray, n: int) -> np.ndarray:
+        """IDF suavizado: log((1 + n) / (1 + df)) + 1."""
+        return (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+
+    def _fila_libre(self) -> int:
+        """Fila para un proveedor nuevo; duplica la capacidad si hace falta."""
+        if self._filas_libres:
+            return self._filas_libres.pop()
+        if self._filas_usadas == len(self._ids):
+            capacidad = 2 * len(self._ids)
+            self._ids = np.concatenate([self._ids, np.full(len(self._ids), -1, dtype=np.int64)])
+            self._normas = np.concatenate([self._normas, np.zeros(len(self._normas), np.float32)])
+            logger.debug(f"Motor de similitud ampliado a {capacidad} filas")
+        fila = self._filas_usadas
+        self._filas_usadas += 1
+        return fila
+
+    def _quitar(self, proveedor_id: int) -> bool:
+        """Quita las entradas del proveedor de sus columnas (con el lock tomado)."""
+        fila = self._fila_de.pop(proveedor_id, None)
+        if fila is None:
+            return False
+
+        columnas = self._columnas_fila.pop(fila)
+        for col in columnas.tolist():
+            filas_col, pesos_col = self._matriz[col]
+            conservar = filas_col != fila
+            if conservar.any():
+                self._matriz[col] = (filas_col[conservar], pesos_col[conservar])
+            else:
+                del self._matriz[col]
+        self._df[columnas] -= 1
+
+        del self._proveedores[proveedor_id]
+        self._ids[fila] = -1
+        self._normas[fila] = 0.0
+        self._filas_libres.append(fila)
+        return True
+
+
+# Instancia global
+motor_similitud = MotorSimilitud()
+suscribir_cambios(motor_similitud)
@@ -0,0 +1,59 @@
+"""
+Conteo de tokens para presupuestar prompts.
+
+Usa el tokenizador de OpenAI (`tiktoken`) con la codificación del modelo.
+Si `tiktoken` no está instalado o no puede cargar la codificación (versión
+sin o200k_base, sin red para descargar el BPE) se usa la misma aproximación
+que el despachador (≈ 4 caracteres por token), suficiente para no pasar del
+presupuesto por mucho.
+"""
+from functools import lru_cache
+from typing import Optional
+
+from config.logging_config import logger
+from src.core.despachador import CARACTERES_POR_TOKEN
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - depende del entorno
+    tiktoken = None
+
+# Codificación de los modelos gpt-4o*, usada si tiktoken no conoce el modelo
+CODIFICACION_POR_DEFECTO = "o200k_base"
+
+
+@lru_cache(maxsize=8)
+def _codificador(modelo: str) -> Optional["tiktoken.Encoding"]:
+    """Codificador de un modelo (se carga una vez por modelo; None si no hay)."""
+    if tiktoken is None:
+        logger.warning("⚠️  tiktoken no está instalado; los tokens se estiman por caracteres")
+        return None
+
+    try:
+        try:
+            return tiktoken.encoding_for_model(modelo)
+        except KeyError:
+            return tiktoken.get_encoding(CODIFICACION_POR_DEFECTO)
+    except Exception as e:
+        logger.warning(
+            f"⚠️  No se pudo cargar el tokenizador de {modelo} ({e}); "
+            f"los tokens se estiman por caracteres"
+        )
+        return None
+
+
+def contar_tokens(texto: str, modelo: str = "gpt-4o-mini") -> int:
+    """
+    Cuenta los tokens de un texto para un modelo.
+
+    Args:
+        texto: Texto a medir
+        modelo: Modelo cuyo tokenizador se usa
+
+    Returns:
+        Número de tokens (estimado si no hay tokenizador)
+    """
+    codificador = _codificador(modelo)
+    if codificador is None:
+        return -(-len(texto) // CARACTERES_POR_TOKEN)  # Redondeo hacia arriba
+    return len(codificador.encode(texto, disallowed_special=()))
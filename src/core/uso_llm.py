@@ -0,0 +1,210 @@
+"""
+Contabilidad de tokens y costo de las llamadas al LLM.
+
+`despachador_llm` llama a `registrar_uso` tras cada respuesta con los tokens
+que reporta OpenAI. Cada registro (tabla `uso_llm`) queda atribuido a:
+
+- El agente que hizo la llamada (argumento `agente` del despachador).
+- La solicitud en curso: el orquestador abre una cuenta por flujo con
+  `iniciar_cuenta` (variable de contexto, igual que los tiempos de
+  `src.core.metricas`) y fija el ID con `asignar_solicitud` al guardarla.
+  Las llamadas hechas antes de existir la solicitud (el Receptor) se
+  asignan en ese momento.
+
+El costo se estima con `settings.LLM_PRECIOS_POR_MODELO` (USD por millón de
+tokens de entrada y salida). Los resúmenes por día, agente, solicitud o
+modelo están en `crud.uso_llm.resumen` y en GET /uso-llm.
+"""
+import contextvars
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config.logging_config import logger
+from config.settings import settings
+from src.database.crud import uso_llm as crud_uso_llm
+from src.database.session import SessionLocal
+
+# Agente usado cuando quien llama no se identifica
+AGENTE_DESCONOCIDO = "sin_agente"
+
+
+class CuentaFlujo:
+    """Solicitud a la que se atribuyen las llamadas de un flujo."""
+
+    def __init__(self, solicitud_id: Optional[int] = None):
+        self.solicitud_id = solicitud_id
+        self.pendientes: List[int] = []  # Registros hechos sin solicitud_id
+
+
+# Cuenta del flujo en curso (None fuera del orquestador)
+_cuenta_flujo: contextvars.ContextVar[Optional[CuentaFlujo]] = contextvars.ContextVar(
+    "cuenta_flujo", default=None
+)
+
+
+def iniciar_cuenta(solicitud_id: Optional[int] = None) -> contextvars.Token:
+    """
+    Empieza a atribuir las llamadas del contexto actual a una solicitud.
+
+    Args:
+        solicitud_id: ID si ya se conoce (reanudación)
+
+    Returns:
+        Token para `terminar_cuenta`
+    """
+    return _cuenta_flujo.set(CuentaFlujo(solicitud_id))
+
+
+def terminar_cuenta(token: contextvars.Token) -> None:
+    """Cierra la cuenta abierta con `iniciar_cuenta`."""
+    _cuenta_flujo.reset(token)
+
+
+def asignar_solicitud(solicitud_id: int) -> None:
+    """
+    Fija la solicitud de la cuenta en curso y le asigna las llamadas previas.
+
+    Hace E/S de BD; desde código async usar `asyncio.to_thread`.
+
+    Args:
+        solicitud_id: ID de la solicitud recién guardada
+    """
+    cuenta = _cuenta_flujo.get()
+    if cuenta is None:
+        return
+
+    cuenta.solicitud_id = solicitud_id
+    pendientes, cuenta.pendientes = cuenta.pendientes, []
+    if not pendientes:
+        return
+
+    db = SessionLocal()
+    try:
+        crud_uso_llm.asignar_solicitud(db, pendientes, solicitud_id)
+    except Exception as e:
+        logger.warning(f"⚠️  No se pudo asignar el uso del LLM a la solicitud {solicitud_id}: {e}")
+    finally:
+        db.close()
+
+
+def calcular_costo(modelo: str, tokens_prompt: int, tokens_respuesta: int) -> float:
+    """
+    Costo estimado de una llamada.
+
+    Args:
+        modelo: Modelo usado (se busca también por prefijo, p. ej.
+            "gpt-4o-mini-2024-07-18" usa el precio de "gpt-4o-mini")
+        tokens_prompt: Tokens de entrada
+        tokens_respuesta: Tokens de salida
+
+    Returns:
+        Costo en USD (0 si el modelo no tiene precio configurado)
+    """
+    precios = settings.LLM_PRECIOS_POR_MODELO
+    precio = precios.get(modelo)
+    if precio is None:
+        candidatos = [nombre for nombre in precios if modelo.startswith(nombre)]
+        if not candidatos:
+            return 0.0
+        precio = precios[max(candidatos, key=len)]
+
+    return (
+        tokens_prompt * precio["entrada"] + tokens_respuesta * precio["salida"]
+    ) / 1_000_000
+
+
+def registrar_uso(
+    agente: str,
+    modelo: str,
+    respuesta: Any,
+    latencia_ms: float,
+    factor_costo: float = 1.0,
+) -> None:
+    """
+    Guarda el consumo de una respuesta de chat completion.
+
+    No hace nada si la respuesta no reporta `usage` (streaming sin
+    `include_usage`, dobles de test). Los errores se registran en el log: la
+    contabilidad nunca hace fallar una llamada. Hace E/S de BD; desde código
+    async usar `asyncio.to_thread`.
+
+    Args:
+        agente: Agente que hizo la llamada
+        modelo: Modelo usado
+        respuesta: Respuesta (o último chunk) de OpenAI
+        latencia_ms: Duración de la llamada
+        factor_costo: Multiplicador sobre el precio de lista (0.5 en la
+            Batch API)
+    """
+    uso = getattr(respuesta, "usage", None)
+    tokens_prompt = getattr(uso, "prompt_tokens", None)
+    tokens_respuesta = getattr(uso, "completion_tokens", None)
+    if not isinstance(tokens_prompt, int) or not isinstance(tokens_respuesta, int):
+        return
+
+    cuenta = _cuenta_flujo.get()
+    solicitud_id = cuenta.solicitud_id if cuenta else None
+
+    db = SessionLocal()
+    try:
+        registro = crud_uso_llm.create(
+            db,
+            obj_in={
+                "solicitud_id": solicitud_id,
+                "agente": agente,
+                "modelo": modelo,
+                "tokens_prompt": tokens_prompt,
+                "tokens_respuesta": tokens_respuesta,
+                "latencia_ms": round(latencia_ms, 2),
+                "costo_usd": calcular_costo(modelo, tokens_prompt, tokens_respuesta)
+                * factor_costo,
+            },
+        )
+        if cuenta is not None and solicitud_id is None:
+            cuenta.pendientes.append(registro.id)
+    except Exception as e:
+        logger.warning(f"⚠️  No se pudo registrar el uso del LLM ({agente}): {e}")
+    finally:
+        db.close()
+
+
+def resumir_uso(
+    agrupar_por: str = "agente",
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    solicitud_id: Optional[int] = None,
+) -> Dict:
+    """
+    Resumen del consumo del LLM con totales (abre su propia sesión de BD).
+
+    Args:
+        agrupar_por: dia, agente, solicitud o modelo
+        desde: Fecha mínima (inclusive)
+        hasta: Fecha máxima (exclusiva)
+        solicitud_id: Limitar a una solicitud
+
+    Returns:
+        {"agrupar_por": str, "grupos": [...], "total": {"llamadas",
+         "tokens_prompt", "tokens_respuesta", "costo_usd"}}
+
+    Raises:
+        ValueError: Si `agrupar_por` no es válido
+    """
+    db = SessionLocal()
+    try:
+        grupos = crud_uso_llm.resumen(
+            db, agrupar_por=agrupar_por, desde=desde, hasta=hasta, solicitud_id=solicitud_id
+        )
+    finally:
+        db.close()
+
+    return {
+        "agrupar_por": agrupar_por,
+        "grupos": grupos,
+        "total": {
+            "llamadas": sum(g["llamadas"] for g in grupos),
+            "tokens_prompt": sum(g["tokens_prompt"] for g in grupos),
+            "tokens_respuesta": sum(g["tokens_respuesta"] for g in grupos),
+            "costo_usd": round(sum(g["costo_usd"] for g in grupos), 6),
+        },
+    }
@@ -8,9 +8,12 @@ from src.database.models import (
     RFQ,
     Cotizacion,
     OrdenCompra,
+    Job,
+    CheckpointSolicitud,
     EstadoSolicitud,
     EstadoRFQ,
     EstadoOrdenCompra,
+    EstadoJob,
 )
 from src.database.session import engine, SessionLocal, get_db, create_tables, drop_tables
 from src.database import crud
@@ -22,9 +25,12 @@ __all__ = [
     "RFQ",
     "Cotizacion",
     "OrdenCompra",
+    "Job",
+    "CheckpointSolicitud",
     "EstadoSolicitud",
     "EstadoRFQ",
     "EstadoOrdenCompra",
+    "EstadoJob",
     "engine",
     "SessionLocal",
     "get_db",
@@ -4,11 +4,12 @@ Operaciones CRUD (Create, Read, Update, Delete) para todos los modelos.
 Este módulo proporciona funciones para interactuar con la base de datos
 de manera consistente y segura.
 """
-from datetime import datetime
-from typing import List, Optional, Type, TypeVar, Generic
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple, Type, TypeVar, Generic
 
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, asc
+from sqlalchemy import and_, asc, desc, func, or_
 
 from src.database.models import (
     Solicitud,
@@ -17,16 +18,28 @@ from src.database.models import (
     Cotizacion,
     OrdenCompra,
     EnvioTracking,
+    Job,
+    CheckpointSolicitud,
+    ClaveIdempotencia,
+    UsoLLM,
+    LoteRFQ,
     EstadoSolicitud,
     EstadoRFQ,
     EstadoOrdenCompra,
     EstadoEnvio,
+    EstadoJob,
+    EstadoIdempotencia,
+    EstadoLoteRFQ,
+    PRIORIDAD_POR_URGENCIA,
 )
 from config.logging_config import logger
 
 # Type variable para operaciones genéricas
 ModelType = TypeVar("ModelType")
 
+# Reintentos al generar un número de RFQ que colisiona con otro concurrente
+MAX_REINTENTOS_NUMERO_RFQ = 5
+
 
 class CRUDBase(Generic[ModelType]):
     """
@@ -779,6 +792,502 @@ class CRUDEnvioTracking(CRUDBase[EnvioTracking]):
         return None
 
 
+class CRUDJob(CRUDBase[Job]):
+    """Operaciones CRUD específicas para Job."""
+
+    def get_pendientes(self, db: Session) -> List[Job]:
+        """
+        Obtiene jobs que pueden tomarse: en cola o ejecutándose con el lease vencido.
+
+        Se usa al iniciar el servidor y periódicamente para re-encolar el
+        trabajo que quedó pendiente; un job cuyo worker sigue renovando el
+        lease (en este u otro proceso) no se incluye.
+
+        Args:
+            db: Sesión de base de datos
+
+        Returns:
+            Lista de jobs ordenados por antigüedad
+        """
+        return (
+            db.query(Job)
+            .filter(_job_disponible(datetime.utcnow()))
+            .order_by(asc(Job.created_at))
+            .all()
+        )
+
+    def get_by_lote(self, db: Session, lote_id: str) -> List[Job]:
+        """
+        Obtiene los jobs de un lote en el orden en que se recibieron.
+
+        Args:
+            db: Sesión de base de datos
+            lote_id: Identificador del lote
+
+        Returns:
+            Lista de jobs
+        """
+        return db.query(Job).filter(Job.lote_id == lote_id).order_by(asc(Job.id)).all()
+
+    def marcar_ejecutando(
+        self, db: Session, job_id: int, lease_seg: float
+    ) -> Optional[Job]:
+        """
+        Toma un job para un worker de forma atómica.
+
+        El UPDATE solo afecta al job si sigue en cola o si su lease venció,
+        así dos procesos que encolaron el mismo job no lo ejecutan ambos.
+
+        Args:
+            db: Sesión de base de datos
+            job_id: ID del job
+            lease_seg: Segundos que el worker conserva el job sin renovarlo
+
+        Returns:
+            Job tomado, o None si no existe o ya lo tiene otro worker
+        """
+        ahora = datetime.utcnow()
+        tomados = (
+            db.query(Job)
+            .filter(Job.id == job_id, _job_disponible(ahora))
+            .update(
+                {
+                    "estado": EstadoJob.EJECUTANDO,
+                    "fecha_inicio": ahora,
+                    "lease_hasta": ahora + timedelta(seconds=lease_seg),
+                },
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+
+        if tomados != 1:
+            return None
+        return self.get(db, job_id)
+
+    def renovar_lease(self, db: Session, job_id: int, lease_seg: float) -> bool:
+        """
+        Extiende el lease de un job que el worker sigue ejecutando.
+
+        Args:
+            db: Sesión de base de datos
+            job_id: ID del job
+            lease_seg: Segundos adicionales a partir de ahora
+
+        Returns:
+            True si el job seguía ejecutándose y se renovó
+        """
+        renovados = (
+            db.query(Job)
+            .filter(Job.id == job_id, Job.estado == EstadoJob.EJECUTANDO)
+            .update(
+                {"lease_hasta": datetime.utcnow() + timedelta(seconds=lease_seg)},
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        return renovados == 1
+
+    def actualizar_progreso(
+        self,
+        db: Session,
+        job_id: int,
+        etapa: str,
+        progreso: int,
+        solicitud_id: Optional[int] = None,
+    ) -> Optional[Job]:
+        """
+        Registra la etapa y el porcentaje de avance de un job.
+
+        Args:
+            db: Sesión de base de datos
+            job_id: ID del job
+            etapa: Etapa actual del orquestador
+            progreso: Porcentaje de avance (0-100)
+            solicitud_id: ID de la solicitud, si ya fue creada
+
+        Returns:
+            Job actualizado o None
+        """
+        job_obj = self.get(db, job_id)
+        if job_obj:
+            datos_actualizar = {"etapa": etapa, "progreso": progreso}
+            if solicitud_id is not None:
+                datos_actualizar["solicitud_id"] = solicitud_id
+            return self.update(db, db_obj=job_obj, obj_in=datos_actualizar)
+        return None
+
+    def finalizar(
+        self, db: Session, job_id: int, resultado: dict
+    ) -> Optional[Job]:
+        """
+        Guarda el resultado del orquestador y cierra el job.
+
+        Args:
+            db: Sesión de base de datos
+            job_id: ID del job
+            resultado: Resultado de `procesar_solicitud_completa`
+
+        Returns:
+            Job actualizado o None
+        """
+        job_obj = self.get(db, job_id)
+        if job_obj:
+            exito = bool(resultado.get("exito"))
+            return self.update(
+                db,
+                db_obj=job_obj,
+                obj_in={
+                    "estado": EstadoJob.COMPLETADO if exito else EstadoJob.ERROR,
+                    "etapa": resultado.get("etapa"),
+                    "progreso": 100 if exito else job_obj.progreso,
+                    "solicitud_id": resultado.get("solicitud_id", job_obj.solicitud_id),
+                    "resultado": resultado,
+                    "error": resultado.get("error"),
+                    "fecha_fin": datetime.utcnow(),
+                },
+            )
+        return None
+
+
+def _job_disponible(ahora: datetime):
+    """
+    Condición de un job que un worker puede tomar.
+
+    En cola, o "ejecutando" con el lease vencido (su worker dejó de
+    renovarlo). Un lease nulo corresponde a jobs tomados antes de que
+    existiera la columna y se trata como vencido.
+    """
+    return or_(
+        Job.estado == EstadoJob.EN_COLA,
+        and_(
+            Job.estado == EstadoJob.EJECUTANDO,
+            or_(Job.lease_hasta.is_(None), Job.lease_hasta < ahora),
+        ),
+    )
+
+
+class CRUDCheckpoint(CRUDBase[CheckpointSolicitud]):
+    """Operaciones CRUD específicas para checkpoints del orquestador."""
+
+    def get_by_solicitud(self, db: Session, solicitud_id: int) -> Dict[str, dict]:
+        """
+        Obtiene los checkpoints de una solicitud indexados por etapa.
+
+        Args:
+            db: Sesión de base de datos
+            solicitud_id: ID de la solicitud
+
+        Returns:
+            Diccionario {etapa: datos}
+        """
+        checkpoints = (
+            db.query(CheckpointSolicitud)
+            .filter(CheckpointSolicitud.solicitud_id == solicitud_id)
+            .all()
+        )
+        return {c.etapa: c.datos for c in checkpoints}
+
+    def guardar(
+        self, db: Session, solicitud_id: int, etapa: str, datos: dict
+    ) -> CheckpointSolicitud:
+        """
+        Guarda (o reemplaza) el checkpoint de una etapa.
+
+        Args:
+            db: Sesión de base de datos
+            solicitud_id: ID de la solicitud
+            etapa: Etapa del orquestador (receptor, investigador)
+            datos: Salida de la etapa, serializable a JSON
+
+        Returns:
+            Checkpoint guardado
+        """
+        existente = (
+            db.query(CheckpointSolicitud)
+            .filter(
+                CheckpointSolicitud.solicitud_id == solicitud_id,
+                CheckpointSolicitud.etapa == etapa,
+            )
+            .first()
+        )
+        if existente:
+            return self.update(db, db_obj=existente, obj_in={"datos": datos})
+
+        return self.create(
+            db, obj_in={"solicitud_id": solicitud_id, "etapa": etapa, "datos": datos}
+        )
+
+
+class CRUDClaveIdempotencia(CRUDBase[ClaveIdempotencia]):
+    """Operaciones CRUD específicas para claves de idempotencia."""
+
+    def get_by_clave(self, db: Session, clave: str) -> Optional[ClaveIdempotencia]:
+        """
+        Obtiene el registro de una clave.
+
+        Args:
+            db: Sesión de base de datos
+            clave: Clave de idempotencia
+
+        Returns:
+            Registro encontrado o None
+        """
+        return db.query(ClaveIdempotencia).filter(ClaveIdempotencia.clave == clave).first()
+
+    def reservar(
+        self, db: Session, clave: str, huella: str, fecha_expiracion: datetime
+    ) -> Tuple[bool, ClaveIdempotencia]:
+        """
+        Reserva una clave para una nueva ejecución.
+
+        Si la clave ya existe y no ha expirado, no se modifica. Una clave
+        expirada se reemplaza. Si otro proceso la reserva a la vez, gana el
+        primero gracias a la restricción única de `clave`.
+
+        Args:
+            db: Sesión de base de datos
+            clave: Clave de idempotencia
+            huella: Huella del cuerpo del envío
+            fecha_expiracion: Vigencia de la reserva
+
+        Returns:
+            Tupla (reservada, registro). Si `reservada` es False el registro es
+            el existente (en proceso o con la respuesta guardada).
+        """
+        existente = self.get_by_clave(db, clave)
+        if existente is not None:
+            if existente.fecha_expiracion > datetime.utcnow():
+                return False, existente
+            db.delete(existente)
+            db.commit()
+
+        try:
+            nuevo = self.create(
+                db,
+                obj_in={
+                    "clave": clave,
+                    "huella": huella,
+                    "estado": EstadoIdempotencia.EN_PROCESO,
+                    "fecha_expiracion": fecha_expiracion,
+                },
+            )
+            return True, nuevo
+        except IntegrityError:
+            return False, self.get_by_clave(db, clave)
+
+    def completar(
+        self,
+        db: Session,
+        clave: str,
+        codigo_http: int,
+        respuesta: dict,
+        fecha_expiracion: datetime,
+    ) -> Optional[ClaveIdempotencia]:
+        """
+        Guarda la respuesta de la ejecución asociada a una clave.
+
+        Args:
+            db: Sesión de base de datos
+            clave: Clave de idempotencia
+            codigo_http: Código HTTP de la respuesta
+            respuesta: Cuerpo de la respuesta, serializable a JSON
+            fecha_expiracion: Hasta cuándo se repite la respuesta
+
+        Returns:
+            Registro actualizado o None
+        """
+        registro = self.get_by_clave(db, clave)
+        if registro:
+            return self.update(
+                db,
+                db_obj=registro,
+                obj_in={
+                    "estado": EstadoIdempotencia.COMPLETADA,
+                    "codigo_http": codigo_http,
+                    "respuesta": respuesta,
+                    "fecha_expiracion": fecha_expiracion,
+                },
+            )
+        return None
+
+    def liberar(self, db: Session, clave: str) -> None:
+        """
+        Elimina una clave para que el siguiente envío se ejecute de nuevo.
+
+        Args:
+            db: Sesión de base de datos
+            clave: Clave de idempotencia
+        """
+        db.query(ClaveIdempotencia).filter(ClaveIdempotencia.clave == clave).delete()
+        db.commit()
+
+
+class CRUDUsoLLM(CRUDBase[UsoLLM]):
+    """Operaciones CRUD específicas para el consumo del LLM."""
+
+    # Columna por la que se agrupa cada tipo de resumen
+    AGRUPACIONES = {
+        "dia": func.date(UsoLLM.created_at),
+        "agente": UsoLLM.agente,
+        "solicitud": UsoLLM.solicitud_id,
+        "modelo": UsoLLM.modelo,
+    }
+
+    def asignar_solicitud(self, db: Session, ids: List[int], solicitud_id: int) -> int:
+        """
+        Atribuye a una solicitud llamadas registradas antes de que existiera.
+
+        El Receptor se ejecuta antes de guardar la solicitud; sus llamadas se
+        asignan cuando se conoce el ID.
+
+        Args:
+            db: Sesión de base de datos
+            ids: IDs de los registros de uso
+            solicitud_id: ID de la solicitud
+
+        Returns:
+            Número de registros actualizados
+        """
+        if not ids:
+            return 0
+
+        actualizados = (
+            db.query(UsoLLM)
+            .filter(UsoLLM.id.in_(ids))
+            .update({UsoLLM.solicitud_id: solicitud_id}, synchronize_session=False)
+        )
+        db.commit()
+        return actualizados
+
+    def resumen(
+        self,
+        db: Session,
+        agrupar_por: str = "agente",
+        desde: Optional[datetime] = None,
+        hasta: Optional[datetime] = None,
+        solicitud_id: Optional[int] = None,
+    ) -> List[Dict]:
+        """
+        Totales de llamadas, tokens, costo y latencia agrupados.
+
+        Args:
+            db: Sesión de base de datos
+            agrupar_por: dia, agente, solicitud o modelo
+            desde: Fecha mínima (inclusive)
+            hasta: Fecha máxima (exclusiva)
+            solicitud_id: Limitar a una solicitud
+
+        Returns:
+            Lista ordenada por costo descendente:
+            [{"grupo", "llamadas", "tokens_prompt", "tokens_respuesta",
+              "costo_usd", "latencia_promedio_ms"}]
+
+        Raises:
+            ValueError: Si `agrupar_por` no es válido
+
+        Example:
+            >>> uso_llm.resumen(db, agrupar_por="agente", desde=datetime(2025, 1, 1))
+            [{"grupo": "investigador", "llamadas": 120, "costo_usd": 1.84, ...}]
+        """
+        if agrupar_por not in self.AGRUPACIONES:
+            raise ValueError(
+                f"agrupar_por debe ser uno de: {', '.join(self.AGRUPACIONES)}"
+            )
+
+        grupo = self.AGRUPACIONES[agrupar_por].label("grupo")
+        costo = func.sum(UsoLLM.costo_usd).label("costo_usd")
+        query = db.query(
+            grupo,
+            func.count(UsoLLM.id).label("llamadas"),
+            func.sum(UsoLLM.tokens_prompt).label("tokens_prompt"),
+            func.sum(UsoLLM.tokens_respuesta).label("tokens_respuesta"),
+            costo,
+            func.avg(UsoLLM.latencia_ms).label("latencia_promedio_ms"),
+        )
+
+        if desde is not None:
+            query = query.filter(UsoLLM.created_at >= desde)
+        if hasta is not None:
+            query = query.filter(UsoLLM.created_at < hasta)
+        if solicitud_id is not None:
+            query = query.filter(UsoLLM.solicitud_id == solicitud_id)
+
+        filas = query.group_by(grupo).order_by(desc(costo)).all()
+        return [
+            {
+                "grupo": str(fila.grupo) if agrupar_por == "dia" else fila.grupo,
+                "llamadas": fila.llamadas,
+                "tokens_prompt": int(fila.tokens_prompt or 0),
+                "tokens_respuesta": int(fila.tokens_respuesta or 0),
+                "costo_usd": round(fila.costo_usd or 0.0, 6),
+                "latencia_promedio_ms": round(fila.latencia_promedio_ms or 0.0, 1),
+            }
+            for fila in filas
+        ]
+
+
+class CRUDLoteRFQ(CRUDBase[LoteRFQ]):
+    """Operaciones CRUD específicas para lotes de generación de RFQs."""
+
+    def get_abierto(self, db: Session, backend: str) -> Optional[LoteRFQ]:
+        """
+        Obtiene el lote que sigue acumulando solicitudes para un backend.
+
+        Args:
+            db: Sesión de base de datos
+            backend: Backend del lote ("openai" o "local")
+
+        Returns:
+            Lote abierto más antiguo o None
+        """
+        return (
+            db.query(LoteRFQ)
+            .filter(
+                LoteRFQ.estado == EstadoLoteRFQ.ACUMULANDO,
+                LoteRFQ.backend == backend,
+            )
+            .order_by(asc(LoteRFQ.id))
+            .first()
+        )
+
+    def get_by_estado(self, db: Session, estado: EstadoLoteRFQ) -> List[LoteRFQ]:
+        """
+        Obtiene lotes por estado, del más antiguo al más reciente.
+
+        Args:
+            db: Sesión de base de datos
+            estado: Estado del lote
+
+        Returns:
+            Lista de lotes
+        """
+        return (
+            db.query(LoteRFQ)
+            .filter(LoteRFQ.estado == estado)
+            .order_by(asc(LoteRFQ.id))
+            .all()
+        )
+
+    def get_rfqs_pendientes(self, db: Session, lote_id: int) -> List[RFQ]:
+        """
+        Obtiene los RFQs de un lote que aún no tienen contenido.
+
+        Args:
+            db: Sesión de base de datos
+            lote_id: ID del lote
+
+        Returns:
+            Lista de RFQs pendientes de generación
+        """
+        return (
+            db.query(RFQ)
+            .filter(RFQ.lote_id == lote_id, RFQ.pendiente_generacion.is_(True))
+            .order_by(asc(RFQ.id))
+            .all()
+        )
+
+
 def consultar_historial(db: Session, solicitud_id: int) -> dict:
     """
     Obtiene el historial completo de una solicitud con todas sus relaciones.
@@ -961,12 +1470,7 @@ def crear_solicitud(
     descripcion_completa = f"{contenido}\n\nProductos:\n{descripcion_productos}"
 
     # Mapear urgencia a prioridad numérica
-    urgencia_a_prioridad = {
-        "normal": 3,
-        "alta": 4,
-        "urgente": 5,
-    }
-    prioridad = urgencia_a_prioridad.get(urgencia, 3)
+    prioridad = PRIORIDAD_POR_URGENCIA.get(urgencia, PRIORIDAD_POR_URGENCIA["normal"])
 
     # Crear solicitud
     solicitud_data = {
@@ -993,6 +1497,7 @@ def crear_rfq(
     proveedor_id: int,
     contenido: str,
     asunto: str = None,
+    lote_id: Optional[int] = None,
 ) -> RFQ:
     """
     Crea un nuevo RFQ con número automático.
@@ -1003,6 +1508,8 @@ def crear_rfq(
         proveedor_id: ID del proveedor destinatario
         contenido: Contenido del RFQ generado
         asunto: Asunto del email (opcional, se genera automáticamente)
+        lote_id: Lote que generará el contenido (el RFQ queda pendiente de
+            generación hasta que el lote devuelva el resultado)
 
     Returns:
         RFQ creado
@@ -1010,31 +1517,37 @@ def crear_rfq(
     Example:
         >>> rfq = crear_rfq(db, solicitud_id=1, proveedor_id=5, contenido="Estimado proveedor...")
     """
-    # Generar número de RFQ único
-    from datetime import datetime
-
     year = datetime.now().year
-    # Contar RFQs de este año
-    count = db.query(RFQ).filter(
-        RFQ.numero_rfq.like(f"RFQ-{year}-%")
-    ).count()
-    numero_rfq = f"RFQ-{year}-{count + 1:04d}"
-
-    # Generar asunto si no se proporciona
-    if not asunto:
-        asunto = f"Solicitud de Cotización - {numero_rfq}"
-
-    # Crear RFQ
-    rfq_data = {
-        "solicitud_id": solicitud_id,
-        "proveedor_id": proveedor_id,
-        "numero_rfq": numero_rfq,
-        "asunto": asunto,
-        "contenido": contenido,
-        "estado": EstadoRFQ.BORRADOR,
-    }
 
-    nuevo_rfq = rfq.create(db, obj_in=rfq_data)
+    # El número se calcula contando RFQs del año; con envíos concurrentes dos
+    # inserciones pueden calcular el mismo número, así que se reintenta si el
+    # índice único lo rechaza.
+    for intento in range(1, MAX_REINTENTOS_NUMERO_RFQ + 1):
+        count = db.query(RFQ).filter(
+            RFQ.numero_rfq.like(f"RFQ-{year}-%")
+        ).count()
+        numero_rfq = f"RFQ-{year}-{count + intento:04d}"
+
+        rfq_data = {
+            "solicitud_id": solicitud_id,
+            "proveedor_id": proveedor_id,
+            "numero_rfq": numero_rfq,
+            # Generar asunto si no se proporciona
+            "asunto": asunto or f"Solicitud de Cotización - {numero_rfq}",
+            "contenido": contenido,
+            "estado": EstadoRFQ.BORRADOR,
+            "lote_id": lote_id,
+            "pendiente_generacion": lote_id is not None,
+        }
+
+        try:
+            nuevo_rfq = rfq.create(db, obj_in=rfq_data)
+            break
+        except IntegrityError:
+            if intento == MAX_REINTENTOS_NUMERO_RFQ:
+                raise
+            logger.warning(f"Número {numero_rfq} ya existe, reintentando ({intento})")
+
     logger.info(f"RFQ creado: {numero_rfq}, Proveedor ID={proveedor_id}")
 
     return nuevo_rfq
@@ -1090,3 +1603,8 @@ rfq = CRUDRFQ(RFQ)
 cotizacion = CRUDCotizacion(Cotizacion)
 orden_compra = CRUDOrdenCompra(OrdenCompra)
 envio_tracking = CRUDEnvioTracking(EnvioTracking)
+job = CRUDJob(Job)
+checkpoint = CRUDCheckpoint(CheckpointSolicitud)
+clave_idempotencia = CRUDClaveIdempotencia(ClaveIdempotencia)
+uso_llm = CRUDUsoLLM(UsoLLM)
+lote_rfq = CRUDLoteRFQ(LoteRFQ)
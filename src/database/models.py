@@ -18,6 +18,8 @@ from sqlalchemy import (
     ForeignKey,
     Boolean,
     JSON,
+    UniqueConstraint,
+    false,
 )
 from sqlalchemy.orm import relationship
 import enum
@@ -36,6 +38,14 @@ class EstadoSolicitud(str, enum.Enum):
     CANCELADA = "cancelada"
 
 
+# Prioridad numérica de una solicitud según la urgencia detectada por el Receptor
+PRIORIDAD_POR_URGENCIA = {
+    "normal": 3,
+    "alta": 4,
+    "urgente": 5,
+}
+
+
 class EstadoRFQ(str, enum.Enum):
     """Estados posibles de un RFQ (Request for Quotation)."""
 
@@ -70,6 +80,31 @@ class EstadoEnvio(str, enum.Enum):
     CANCELADO = "cancelado"
 
 
+class EstadoJob(str, enum.Enum):
+    """Estados posibles de un job de procesamiento en segundo plano."""
+
+    EN_COLA = "en_cola"
+    EJECUTANDO = "ejecutando"
+    COMPLETADO = "completado"
+    ERROR = "error"
+
+
+class EstadoLoteRFQ(str, enum.Enum):
+    """Estados de un lote de generación de RFQs (OpenAI Batch API)."""
+
+    ACUMULANDO = "acumulando"
+    ENVIADO = "enviado"
+    COMPLETADO = "completado"
+    FALLIDO = "fallido"
+
+
+class EstadoIdempotencia(str, enum.Enum):
+    """Estados de una clave de idempotencia."""
+
+    EN_PROCESO = "en_proceso"
+    COMPLETADA = "completada"
+
+
 class Solicitud(Base):
     """
     Modelo de Solicitud de Compra.
@@ -128,6 +163,9 @@ class Solicitud(Base):
 
     # Relaciones
     rfqs = relationship("RFQ", back_populates="solicitud", cascade="all, delete-orphan")
+    checkpoints = relationship(
+        "CheckpointSolicitud", back_populates="solicitud", cascade="all, delete-orphan"
+    )
     ordenes_compra = relationship(
         "OrdenCompra", back_populates="solicitud", cascade="all, delete-orphan"
     )
@@ -218,6 +256,8 @@ class RFQ(Base):
         fecha_envio: Fecha en que se envió
         fecha_respuesta: Fecha de respuesta del proveedor
         numero_rfq: Número único de RFQ (ej: RFQ-2024-001)
+        lote_id: Lote de la Batch API que genera el contenido (opcional)
+        pendiente_generacion: True mientras el lote no haya devuelto el contenido
         created_at: Fecha de creación
         updated_at: Fecha de última actualización
     """
@@ -241,6 +281,12 @@ class RFQ(Base):
     fecha_envio = Column(DateTime, nullable=True)
     fecha_respuesta = Column(DateTime, nullable=True)
 
+    # Generación en lote
+    lote_id = Column(Integer, ForeignKey("lotes_rfq.id"), nullable=True, index=True)
+    pendiente_generacion = Column(
+        Boolean, default=False, server_default=false(), nullable=False
+    )
+
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(
@@ -250,6 +296,7 @@ class RFQ(Base):
     # Relaciones
     solicitud = relationship("Solicitud", back_populates="rfqs")
     proveedor = relationship("Proveedor", back_populates="rfqs")
+    lote = relationship("LoteRFQ", back_populates="rfqs")
     cotizaciones = relationship(
         "Cotizacion", back_populates="rfq", cascade="all, delete-orphan"
     )
@@ -476,3 +523,268 @@ class EnvioTracking(Base):
     def __repr__(self) -> str:
         """Representación en string del modelo."""
         return f"<EnvioTracking(id={self.id}, orden_id={self.orden_compra_id}, estado={self.estado})>"
+
+
+class Job(Base):
+    """
+    Modelo de Job de procesamiento en segundo plano.
+
+    Representa una ejecución del flujo completo (Receptor → Investigador → RFQs)
+    encolada desde la API. Se persiste para que el trabajo pendiente sobreviva
+    a un reinicio del servidor.
+
+    Attributes:
+        id: Identificador único del job
+        solicitud_id: ID de la solicitud creada por el flujo (cuando ya existe)
+        lote_id: Identificador del lote si el job llegó por POST /solicitudes/batch
+        texto: Texto original de la solicitud
+        origen: Origen de la solicitud (api, formulario, whatsapp, email)
+        extraccion: Salida del Receptor obtenida en lote (JSON, opcional)
+        estado: Estado actual del job
+        etapa: Última etapa alcanzada por el orquestador
+        progreso: Porcentaje de avance (0-100)
+        resultado: Resultado final del orquestador (JSON)
+        error: Mensaje de error si el job falló
+        fecha_inicio: Fecha en que un worker tomó el job
+        lease_hasta: Hasta cuándo el job pertenece al worker que lo tomó; el
+            worker la renueva mientras corre y, si vence, otro proceso lo retoma
+        fecha_fin: Fecha en que terminó
+        created_at: Fecha de creación
+        updated_at: Fecha de última actualización
+    """
+
+    __tablename__ = "jobs"
+
+    # Campos principales
+    id = Column(Integer, primary_key=True, index=True)
+    solicitud_id = Column(Integer, ForeignKey("solicitudes.id"), nullable=True, index=True)
+    lote_id = Column(String(32), nullable=True, index=True)
+    texto = Column(Text, nullable=False)
+    origen = Column(String(50), default="api", nullable=False)
+    extraccion = Column(JSON, nullable=True)
+
+    # Estado y progreso
+    estado = Column(
+        Enum(EstadoJob), default=EstadoJob.EN_COLA, nullable=False, index=True
+    )
+    etapa = Column(String(50), nullable=True)
+    progreso = Column(Integer, default=0, nullable=False)  # 0-100
+    resultado = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+
+    # Fechas de ejecución
+    fecha_inicio = Column(DateTime, nullable=True)
+    lease_hasta = Column(DateTime, nullable=True)
+    fecha_fin = Column(DateTime, nullable=True)
+
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
+
+    # Relación
+    solicitud = relationship("Solicitud")
+
+    def __repr__(self) -> str:
+        """Representación en string del modelo."""
+        return f"<Job(id={self.id}, estado={self.estado}, etapa={self.etapa})>"
+
+
+class CheckpointSolicitud(Base):
+    """
+    Modelo de checkpoint de una etapa del orquestador.
+
+    Guarda la salida de las etapas costosas (Receptor e Investigador) ligada
+    a la solicitud, para que un reintento tras un error transitorio (SMTP,
+    OpenAI) retome desde la primera etapa incompleta en lugar de repetir
+    todo el flujo.
+
+    Attributes:
+        id: Identificador único del checkpoint
+        solicitud_id: ID de la solicitud
+        etapa: Etapa que produjo los datos (receptor, investigador)
+        datos: Salida de la etapa (JSON)
+        created_at: Fecha de creación
+        updated_at: Fecha de última actualización
+    """
+
+    __tablename__ = "checkpoints_solicitud"
+    __table_args__ = (
+        UniqueConstraint("solicitud_id", "etapa", name="uq_checkpoint_solicitud_etapa"),
+    )
+
+    # Campos principales
+    id = Column(Integer, primary_key=True, index=True)
+    solicitud_id = Column(Integer, ForeignKey("solicitudes.id"), nullable=False, index=True)
+    etapa = Column(String(50), nullable=False)
+    datos = Column(JSON, nullable=False)
+
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
+
+    # Relación
+    solicitud = relationship("Solicitud", back_populates="checkpoints")
+
+    def __repr__(self) -> str:
+        """Representación en string del modelo."""
+        return f"<CheckpointSolicitud(solicitud_id={self.solicitud_id}, etapa={self.etapa})>"
+
+
+class ClaveIdempotencia(Base):
+    """
+    Modelo de clave de idempotencia de la API.
+
+    Registra cada envío a los endpoints que disparan el flujo completo
+    (procesar-completa, batch) para que los reintentos del mismo envío
+    (webhooks de WhatsApp, doble clic, timeouts del cliente) reciban la
+    respuesta guardada en lugar de volver a ejecutar el flujo y reenviar
+    RFQs a los mismos proveedores.
+
+    Attributes:
+        id: Identificador único del registro
+        clave: Clave de idempotencia (header `Idempotency-Key` o derivada del cuerpo)
+        huella: SHA-256 del cuerpo del envío, para detectar claves reutilizadas
+        estado: Estado de la ejecución asociada a la clave
+        codigo_http: Código HTTP de la respuesta guardada
+        respuesta: Cuerpo de la respuesta guardada (JSON)
+        fecha_expiracion: Fecha a partir de la cual la clave deja de aplicar
+        created_at: Fecha de creación
+        updated_at: Fecha de última actualización
+    """
+
+    __tablename__ = "claves_idempotencia"
+
+    # Campos principales
+    id = Column(Integer, primary_key=True, index=True)
+    clave = Column(String(300), unique=True, nullable=False, index=True)
+    huella = Column(String(64), nullable=False)
+
+    # Respuesta
+    estado = Column(
+        Enum(EstadoIdempotencia), default=EstadoIdempotencia.EN_PROCESO, nullable=False
+    )
+    codigo_http = Column(Integer, nullable=True)
+    respuesta = Column(JSON, nullable=True)
+    fecha_expiracion = Column(DateTime, nullable=False)
+
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
+
+    def __repr__(self) -> str:
+        """Representación en string del modelo."""
+        return f"<ClaveIdempotencia(clave={self.clave}, estado={self.estado})>"
+
+
+class UsoLLM(Base):
+    """
+    Modelo de consumo de una llamada al LLM.
+
+    Cada llamada que pasa por el despachador registra sus tokens, latencia y
+    costo estimado, atribuidos al agente que la hizo y a la solicitud en
+    curso. Permite saber qué etapa domina la factura de OpenAI y dónde
+    conviene reducir prompts.
+
+    Attributes:
+        id: Identificador único del registro
+        solicitud_id: Solicitud en curso (None si la llamada fue fuera de un
+            flujo, p. ej. extracción de un lote)
+        agente: Agente o función que hizo la llamada (receptor, investigador...)
+        modelo: Modelo usado
+        tokens_prompt: Tokens de entrada
+        tokens_respuesta: Tokens de salida
+        latencia_ms: Duración de la llamada en milisegundos
+        costo_usd: Costo estimado en dólares según los precios configurados
+        created_at: Fecha de la llamada
+    """
+
+    __tablename__ = "uso_llm"
+
+    # Campos principales
+    id = Column(Integer, primary_key=True, index=True)
+    solicitud_id = Column(Integer, ForeignKey("solicitudes.id"), nullable=True, index=True)
+    agente = Column(String(50), nullable=False, index=True)
+    modelo = Column(String(50), nullable=False)
+
+    # Consumo
+    tokens_prompt = Column(Integer, default=0, nullable=False)
+    tokens_respuesta = Column(Integer, default=0, nullable=False)
+    latencia_ms = Column(Float, nullable=False)
+    costo_usd = Column(Float, default=0.0, nullable=False)
+
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self) -> str:
+        """Representación en string del modelo."""
+        return (
+            f"<UsoLLM(agente={self.agente}, modelo={self.modelo}, "
+            f"tokens={self.tokens_prompt}+{self.tokens_respuesta})>"
+        )
+
+
+class LoteRFQ(Base):
+    """
+    Modelo de lote de generación de RFQs.
+
+    Los RFQs de urgencia normal se pueden generar con la Batch API de OpenAI
+    (más barata y sin consumir la cuota por minuto) en lugar de una llamada
+    por proveedor. Las solicitudes se acumulan en un archivo JSONL mientras
+    el lote está abierto; al enviarlo se sube el archivo y se consulta
+    periódicamente hasta que los resultados se escriben en los borradores.
+
+    Attributes:
+        id: Identificador único del lote
+        estado: Estado actual del lote
+        backend: Backend que procesa el lote ("openai" o "local")
+        batch_id: ID del batch en el backend (cuando ya se envió)
+        archivo_entrada: Ruta local del archivo JSONL con las solicitudes
+        total: Solicitudes en el lote
+        completados: RFQs generados por el lote
+        fallidos: RFQs que el lote no generó (se generan de forma directa)
+        error: Mensaje de error si el lote falló completo
+        fecha_envio: Fecha en que se envió el lote
+        fecha_fin: Fecha en que se escribieron los resultados
+        created_at: Fecha de creación
+        updated_at: Fecha de última actualización
+    """
+
+    __tablename__ = "lotes_rfq"
+
+    # Campos principales
+    id = Column(Integer, primary_key=True, index=True)
+    estado = Column(
+        Enum(EstadoLoteRFQ), default=EstadoLoteRFQ.ACUMULANDO, nullable=False, index=True
+    )
+    backend = Column(String(20), nullable=False)
+    batch_id = Column(String(100), nullable=True, index=True)
+    archivo_entrada = Column(String(300), nullable=False)
+
+    # Resultados
+    total = Column(Integer, default=0, nullable=False)
+    completados = Column(Integer, default=0, nullable=False)
+    fallidos = Column(Integer, default=0, nullable=False)
+    error = Column(Text, nullable=True)
+
+    # Fechas de ejecución
+    fecha_envio = Column(DateTime, nullable=True)
+    fecha_fin = Column(DateTime, nullable=True)
+
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
+
+    # Relaciones
+    rfqs = relationship("RFQ", back_populates="lote")
+
+    def __repr__(self) -> str:
+        """Representación en string del modelo."""
+        return f"<LoteRFQ(id={self.id}, estado={self.estado}, total={self.total})>"
@@ -0,0 +1,268 @@
+"""
+Servicio de procesamiento por lotes de OpenAI (Batch API).
+
+Este servicio proporciona funcionalidades para:
+- Subir un archivo JSONL de solicitudes y crear el batch
+- Consultar el estado de un batch
+- Descargar los resultados (y errores) de un batch terminado
+
+`BackendBatchOpenAI` usa la API real. `BackendBatchLocal` imita el mismo
+contrato con archivos en disco y procesa el lote en el proceso al
+consultarlo; permite probar el modo lote sin red y en desarrollo. Sus
+llamadas a OpenAI pasan por `despachador_llm` como las de cualquier agente.
+
+Formato de cada línea de entrada (igual que la Batch API):
+    {"custom_id": "rfq-12", "method": "POST", "url": "/v1/chat/completions",
+     "body": {...parámetros de chat.completions.create...}}
+"""
+import json
+import logging
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from openai import OpenAI
+
+from src.core.despachador import despachador_llm
+
+logger = logging.getLogger(__name__)
+
+ENDPOINT_CHAT = "/v1/chat/completions"
+
+# Agente al que se atribuye el consumo de los lotes
+AGENTE_LOTE = "generador_lote"
+
+# Estados de un batch tras los cuales no habrá más resultados
+ESTADOS_TERMINALES = {"completed", "failed", "expired", "cancelled"}
+
+# Recibe el `body` de una línea y devuelve la respuesta de chat completion como dict
+Responder = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+
+def leer_jsonl(texto: str) -> List[Dict[str, Any]]:
+    """Convierte el contenido de un archivo JSONL en una lista de dicts."""
+    return [json.loads(linea) for linea in texto.splitlines() if linea.strip()]
+
+
+class BackendBatch(ABC):
+    """Interfaz de un backend de procesamiento por lotes."""
+
+    nombre = "base"
+
+    # True si el uso de tokens ya se registró al resolver cada línea (y no
+    # debe volver a registrarse al leer los resultados)
+    registra_uso = False
+
+    @abstractmethod
+    def enviar(self, ruta: Path) -> str:
+        """
+        Sube el archivo de solicitudes y crea el batch.
+
+        Args:
+            ruta: Archivo JSONL con una solicitud por línea
+
+        Returns:
+            ID del batch
+        """
+
+    @abstractmethod
+    def consultar(self, batch_id: str) -> Dict[str, Optional[str]]:
+        """
+        Consulta el estado de un batch.
+
+        Args:
+            batch_id: ID devuelto por `enviar`
+
+        Returns:
+            {"estado": str, "archivo_salida_id": str | None,
+             "archivo_errores_id": str | None, "error": str | None}
+        """
+
+    @abstractmethod
+    def descargar(self, archivo_id: str) -> List[Dict[str, Any]]:
+        """
+        Descarga un archivo de resultados o errores.
+
+        Args:
+            archivo_id: ID de archivo devuelto por `consultar`
+
+        Returns:
+            Líneas del archivo ({"custom_id", "response", "error"})
+        """
+
+
+class BackendBatchOpenAI(BackendBatch):
+    """Batch API de OpenAI (ventana de 24 h, mitad de precio)."""
+
+    nombre = "openai"
+
+    def __init__(self, client: Optional[OpenAI] = None):
+        """
+        Inicializa el backend.
+
+        Args:
+            client: Cliente de OpenAI (usa el de `openai_service` si no se proporciona)
+        """
+        self._client = client
+
+    @property
+    def client(self) -> OpenAI:
+        """Cliente compartido con el resto de agentes."""
+        if self._client is None:
+            from src.services.openai_service import openai_service
+
+            return openai_service.client
+        return self._client
+
+    def enviar(self, ruta: Path) -> str:
+        with open(ruta, "rb") as archivo:
+            subido = self.client.files.create(file=archivo, purpose="batch")
+
+        batch = self.client.batches.create(
+            input_file_id=subido.id,
+            endpoint=ENDPOINT_CHAT,
+            completion_window="24h",
+        )
+        logger.info(f"Batch {batch.id} creado desde {ruta.name}")
+        return batch.id
+
+    def consultar(self, batch_id: str) -> Dict[str, Optional[str]]:
+        batch = self.client.batches.retrieve(batch_id)
+        errores = getattr(batch.errors, "data", None) or []
+
+        return {
+            "estado": batch.status,
+            "archivo_salida_id": batch.output_file_id,
+            "archivo_errores_id": batch.error_file_id,
+            "error": "; ".join(e.message or e.code or "" for e in errores) or None,
+        }
+
+    def descargar(self, archivo_id: str) -> List[Dict[str, Any]]:
+        return leer_jsonl(self.client.files.content(archivo_id).text)
+
+
+def _responder_con_api(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Responde una línea con una llamada normal a chat completions (vía el despachador)."""
+    from src.services.openai_service import openai_service
+
+    return despachador_llm.ejecutar(
+        openai_service.client.chat.completions.create, agente=AGENTE_LOTE, **body
+    ).model_dump()
+
+
+class BackendBatchLocal(BackendBatch):
+    """
+    Sustituto local de la Batch API.
+
+    Guarda el estado de cada batch en `directorio` y lo procesa completo la
+    primera vez que se consulta, escribiendo archivos de salida y errores
+    con el mismo formato que OpenAI.
+    """
+
+    nombre = "local"
+
+    def __init__(self, directorio: Path, responder: Optional[Responder] = None):
+        """
+        Inicializa el backend.
+
+        Args:
+            directorio: Carpeta para el estado y los resultados de los batches
+            responder: Función que resuelve cada línea (por defecto llama a
+                OpenAI sin pasar por la Batch API, con cuotas, reintentos y
+                registro de uso del despachador)
+        """
+        self.directorio = Path(directorio)
+        self.responder = responder or _responder_con_api
+        self.registra_uso = responder is None
+
+    def _ruta(self, nombre: str) -> Path:
+        return self.directorio / nombre
+
+    def enviar(self, ruta: Path) -> str:
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        batch_id = f"batch_local_{uuid.uuid4().hex[:12]}"
+        estado = {"estado": "validating", "entrada": str(ruta)}
+        self._ruta(f"{batch_id}.json").write_text(json.dumps(estado), encoding="utf-8")
+        return batch_id
+
+    def consultar(self, batch_id: str) -> Dict[str, Optional[str]]:
+        ruta_estado = self._ruta(f"{batch_id}.json")
+        estado = json.loads(ruta_estado.read_text(encoding="utf-8"))
+
+        if estado["estado"] not in ESTADOS_TERMINALES:
+            estado.update(self._procesar(batch_id, Path(estado["entrada"])))
+            ruta_estado.write_text(json.dumps(estado), encoding="utf-8")
+
+        return {
+            "estado": estado["estado"],
+            "archivo_salida_id": estado.get("archivo_salida_id"),
+            "archivo_errores_id": estado.get("archivo_errores_id"),
+            "error": estado.get("error"),
+        }
+
+    def descargar(self, archivo_id: str) -> List[Dict[str, Any]]:
+        return leer_jsonl(self._ruta(archivo_id).read_text(encoding="utf-8"))
+
+    def _procesar(self, batch_id: str, entrada: Path) -> Dict[str, Optional[str]]:
+        """Resuelve todas las líneas de un batch y escribe sus resultados."""
+        try:
+            solicitudes = leer_jsonl(entrada.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            return {"estado": "failed", "error": f"Archivo de entrada inválido: {e}"}
+
+        salida, errores = [], []
+        for numero, solicitud in enumerate(solicitudes, start=1):
+            linea = {"id": f"{batch_id}_{numero}", "custom_id": solicitud["custom_id"]}
+            try:
+                cuerpo = self.responder(solicitud["body"])
+                salida.append(
+                    {**linea, "response": {"status_code": 200, "body": cuerpo}, "error": None}
+                )
+            except Exception as e:
+                errores.append(
+                    {
+                        **linea,
+                        "response": None,
+                        "error": {"code": type(e).__name__, "message": str(e)},
+                    }
+                )
+
+        resultado: Dict[str, Optional[str]] = {"estado": "completed"}
+        for clave, lineas, sufijo in (
+            ("archivo_salida_id", salida, "salida"),
+            ("archivo_errores_id", errores, "errores"),
+        ):
+            if lineas:
+                nombre = f"{batch_id}_{sufijo}.jsonl"
+                self._ruta(nombre).write_text(
+                    "".join(json.dumps(linea, ensure_ascii=False) + "\n" for linea in lineas),
+                    encoding="utf-8",
+                )
+                resultado[clave] = nombre
+
+        logger.info(
+            f"Batch local {batch_id}: {len(salida)} resultado(s), {len(errores)} error(es)"
+        )
+        return resultado
+
+
+def crear_backend(nombre: str, directorio: Path) -> BackendBatch:
+    """
+    Crea el backend configurado.
+
+    Args:
+        nombre: "openai" o "local"
+        directorio: Carpeta de trabajo del backend local
+
+    Returns:
+        Backend de lotes
+
+    Raises:
+        ValueError: Si el nombre no corresponde a ningún backend
+    """
+    if nombre == BackendBatchOpenAI.nombre:
+        return BackendBatchOpenAI()
+    if nombre == BackendBatchLocal.nombre:
+        return BackendBatchLocal(directorio / "local")
+    raise ValueError(f"Backend de lotes desconocido: {nombre}")
@@ -6,18 +6,53 @@ Este servicio proporciona funcionalidades para:
 - Generación de RFQs personalizados
 - Análisis y comparación de cotizaciones
 - Chat genérico con GPT
+
+Las extracciones deterministas (análisis de solicitudes y cotizaciones,
+`extraer_json`, `llamar_agente`) pasan por la caché de respuestas de
+`src.core.cache`; las generaciones creativas no se cachean.
+
+El modelo de cada tarea lo elige `src.core.enrutador`: se empieza por el
+más barato y se escala si la respuesta no pasa la validación de la tarea.
+
+Las variantes `*_stream` (`completar_stream`, `chat_completion_stream`,
+`llamar_agente_stream` y sus versiones async) devuelven el texto en
+fragmentos a medida que el modelo lo genera. Miden el tiempo hasta el primer
+token (`llm.primer_token.<modelo>`) y la duración total del stream
+(`llm.stream.<modelo>`); los tokens se contabilizan con el último chunk
+(`stream_options.include_usage`).
 """
+import asyncio
 import json
 import logging
-from typing import Any, Dict, List, Optional
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, TypeVar
 
-from openai import OpenAI, OpenAIError
+from openai import AsyncOpenAI, OpenAI, OpenAIError
 from pydantic import BaseModel
 
 from config.settings import settings
+from src.core.cache import cache_llm
+from src.core.despachador import despachador_llm
+from src.core.enrutador import (
+    TAREA_ANALIZAR_COTIZACION,
+    TAREA_ANALIZAR_SOLICITUD,
+    TAREA_COMPARAR_COTIZACIONES,
+    TAREA_EXTRAER_JSON,
+    TAREA_GENERAR_RFQ,
+    enrutador_modelos,
+    validar_no_vacio,
+    validar_redaccion,
+)
+from src.core.metricas import RESULTADO_ERROR, RESULTADO_OK, registrar_duracion
+from src.core.uso_llm import AGENTE_DESCONOCIDO, registrar_uso
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# Resultado del span de un stream que el consumidor dejó de leer
+RESULTADO_INTERRUMPIDO = "interrumpido"
+
 
 class SolicitudAnalizada(BaseModel):
     """Modelo para solicitud analizada por IA."""
@@ -43,6 +78,98 @@ class CotizacionAnalizada(BaseModel):
     recomendacion: str
 
 
+def _parsear_solicitud(content: Optional[str]) -> SolicitudAnalizada:
+    """Convierte la respuesta en `SolicitudAnalizada` (ValueError si no se puede)."""
+    return SolicitudAnalizada(**json.loads(validar_no_vacio(content)))
+
+
+def _parsear_cotizacion(content: Optional[str]) -> CotizacionAnalizada:
+    """
+    Convierte la respuesta en `CotizacionAnalizada` y revisa que sea creíble.
+
+    Un precio no positivo o un score fuera de 0-10 indican que el modelo no
+    entendió el email; se trata como respuesta inválida para escalar.
+    """
+    resultado = CotizacionAnalizada(**json.loads(validar_no_vacio(content)))
+    if resultado.precio_total <= 0:
+        raise ValueError(f"Precio total no válido: {resultado.precio_total}")
+    if not 0 <= resultado.calidad_score <= 10:
+        raise ValueError(f"Score de calidad fuera de rango: {resultado.calidad_score}")
+    return resultado
+
+
+def _parsear_json(content: Optional[str]) -> Dict[str, Any]:
+    """Convierte la respuesta en dict (ValueError si no es un objeto JSON)."""
+    data = json.loads(validar_no_vacio(content))
+    if not isinstance(data, dict):
+        raise ValueError("La respuesta no es un objeto JSON")
+    return data
+
+
+def _es_valida(content: Optional[str], validar: Optional[Callable[[Optional[str]], Any]]) -> bool:
+    """True si no hay validación o la respuesta la pasa (no lanza ValueError)."""
+    if validar is None:
+        return True
+    try:
+        validar(content)
+    except ValueError:
+        return False
+    return True
+
+
+class _MedicionStream:
+    """Tiempo al primer token, duración total y chunk de uso de un stream."""
+
+    def __init__(self, agente: str, modelo: str):
+        self.agente = agente
+        self.modelo = modelo
+        self.inicio = time.perf_counter()
+        self.primer_token_ms: Optional[float] = None
+        self.chunk_uso: Any = None
+        self.partes: List[str] = []
+
+    def leer(self, chunk: Any) -> Optional[str]:
+        """Texto nuevo de un chunk (None si no trae); registra el primer token."""
+        if getattr(chunk, "usage", None) is not None:
+            self.chunk_uso = chunk
+
+        choices = getattr(chunk, "choices", None)
+        fragmento = choices[0].delta.content if choices else None
+        if not fragmento:
+            return None
+
+        if self.primer_token_ms is None:
+            self.primer_token_ms = self._transcurrido_ms()
+            registrar_duracion(f"llm.primer_token.{self.modelo}", self.primer_token_ms)
+        self.partes.append(fragmento)
+        return fragmento
+
+    def terminar(self, resultado: str) -> float:
+        """Registra la duración total del stream y la retorna."""
+        duracion_ms = self._transcurrido_ms()
+        registrar_duracion(f"llm.stream.{self.modelo}", duracion_ms, resultado)
+        primer_token = (
+            f"{self.primer_token_ms:.0f}ms" if self.primer_token_ms is not None else "-"
+        )
+        logger.debug(
+            f"Stream {self.modelo} ({self.agente}): primer token {primer_token}, "
+            f"total {duracion_ms:.0f}ms, resultado {resultado}"
+        )
+        return duracion_ms
+
+    @property
+    def texto(self) -> str:
+        return "".join(self.partes)
+
+    def _transcurrido_ms(self) -> float:
+        return (time.perf_counter() - self.inicio) * 1000
+
+
+def _kwargs_stream(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Parámetros de la llamada en streaming, con el uso en el último chunk."""
+    return {**kwargs, "stream": True, "stream_options": {"include_usage": True}}
+
+
 class OpenAIService:
     """
     Servicio para interactuar con la API de OpenAI.
@@ -69,16 +196,286 @@ class OpenAIService:
         self.model_mini = model_mini or settings.OPENAI_MODEL_MINI
         self.model_full = model_full or settings.OPENAI_MODEL_FULL
 
-        self.client = OpenAI(api_key=self.api_key)
+        self.reiniciar_clientes()
         logger.info(
             f"OpenAI Service inicializado - Mini: {self.model_mini}, "
             f"Full: {self.model_full}"
         )
 
+    def reiniciar_clientes(self) -> None:
+        """
+        Crea los clientes síncrono y asíncrono.
+
+        Cada cliente mantiene su pool de conexiones HTTP; todos los agentes
+        los comparten a través de `src.agents.registro`. Los reintentos los
+        hace `despachador_llm`, no el SDK.
+        """
+        self.client = OpenAI(api_key=self.api_key, max_retries=0)
+        self.async_client = AsyncOpenAI(api_key=self.api_key, max_retries=0)
+
+    def completar(
+        self,
+        kwargs: Dict[str, Any],
+        usar_cache: bool = True,
+        agente: str = AGENTE_DESCONOCIDO,
+        validar: Optional[Callable[[Optional[str]], Any]] = None,
+    ) -> Optional[str]:
+        """
+        Ejecuta un chat completion, reutilizando la respuesta cacheada si existe.
+
+        Args:
+            kwargs: Parámetros de `chat.completions.create`
+            usar_cache: Si False, siempre llama a OpenAI y no guarda la
+                respuesta (generaciones creativas)
+            agente: Agente al que se atribuye el consumo de tokens
+            validar: Si se indica, solo se guarda (y se reutiliza) una
+                respuesta que la pase; así una respuesta que hace escalar
+                de modelo no se sirve desde la caché en cada llamada
+
+        Returns:
+            Contenido de la respuesta (None si el modelo no devolvió texto)
+
+        Raises:
+            OpenAIError: Si hay error en la llamada a OpenAI
+        """
+        if usar_cache:
+            cacheado = cache_llm.obtener(kwargs)
+            if cacheado is not None and _es_valida(cacheado, validar):
+                return cacheado
+
+        response = despachador_llm.ejecutar(
+            self.client.chat.completions.create, agente=agente, **kwargs
+        )
+        content = response.choices[0].message.content
+
+        if usar_cache and content and _es_valida(content, validar):
+            cache_llm.guardar(kwargs, content)
+        return content
+
+    async def completar_async(
+        self,
+        kwargs: Dict[str, Any],
+        usar_cache: bool = True,
+        agente: str = AGENTE_DESCONOCIDO,
+        validar: Optional[Callable[[Optional[str]], Any]] = None,
+    ) -> Optional[str]:
+        """
+        Versión asíncrona de `completar` (la caché en disco se consulta en un hilo).
+
+        Args:
+            kwargs: Parámetros de `chat.completions.create`
+            usar_cache: Si False, siempre llama a OpenAI y no guarda la respuesta
+            agente: Agente al que se atribuye el consumo de tokens
+            validar: Solo se guarda y reutiliza una respuesta que la pase
+
+        Returns:
+            Contenido de la respuesta (None si el modelo no devolvió texto)
+
+        Raises:
+            OpenAIError: Si hay error en la llamada a OpenAI
+        """
+        usar_cache = usar_cache and cache_llm.habilitada
+        if usar_cache:
+            cacheado = await asyncio.to_thread(cache_llm.obtener, kwargs)
+            if cacheado is not None and _es_valida(cacheado, validar):
+                return cacheado
+
+        response = await despachador_llm.ejecutar_async(
+            self.async_client.chat.completions.create, agente=agente, **kwargs
+        )
+        content = response.choices[0].message.content
+
+        if usar_cache and content and _es_valida(content, validar):
+            await asyncio.to_thread(cache_llm.guardar, kwargs, content)
+        return content
+
+    def completar_stream(
+        self,
+        kwargs: Dict[str, Any],
+        usar_cache: bool = False,
+        agente: str = AGENTE_DESCONOCIDO,
+    ) -> Iterator[str]:
+        """
+        Ejecuta un chat completion en streaming y entrega el texto por fragmentos.
+
+        El despachador aplica cuotas y reintentos hasta que OpenAI acepta la
+        llamada y conserva el cupo de concurrencia hasta que el stream se
+        termina de leer; un error a mitad del stream se propaga a quien itera.
+        Si el consumidor deja de iterar, el stream se cierra, se libera el
+        cupo y su span queda como "interrumpido".
+
+        Args:
+            kwargs: Parámetros de `chat.completions.create` (sin `stream`)
+            usar_cache: Si True, una respuesta cacheada se entrega en un solo
+                fragmento y la respuesta completa se guarda al terminar
+            agente: Agente al que se atribuye el consumo de tokens
+
+        Yields:
+            Fragmentos de texto en el orden en que los genera el modelo
+
+        Raises:
+            OpenAIError: Si hay error en la llamada a OpenAI
+        """
+        if usar_cache:
+            cacheado = cache_llm.obtener(kwargs)
+            if cacheado is not None:
+                yield cacheado
+                return
+
+        medicion = _MedicionStream(agente, kwargs.get("model", ""))
+        resultado = RESULTADO_ERROR
+        try:
+            with despachador_llm.stream(
+                self.client.chat.completions.create, **_kwargs_stream(kwargs)
+            ) as stream:
+                for chunk in stream:
+                    fragmento = medicion.leer(chunk)
+                    if fragmento:
+                        yield fragmento
+            resultado = RESULTADO_OK
+        except GeneratorExit:
+            resultado = RESULTADO_INTERRUMPIDO
+            raise
+        finally:
+            duracion_ms = medicion.terminar(resultado)
+
+        registrar_uso(agente, medicion.modelo, medicion.chunk_uso, duracion_ms)
+        if usar_cache and medicion.texto:
+            cache_llm.guardar(kwargs, medicion.texto)
+
+    async def completar_stream_async(
+        self,
+        kwargs: Dict[str, Any],
+        usar_cache: bool = False,
+        agente: str = AGENTE_DESCONOCIDO,
+    ) -> AsyncIterator[str]:
+        """
+        Versión asíncrona de `completar_stream` (usa `AsyncOpenAI`).
+
+        Args:
+            kwargs: Parámetros de `chat.completions.create` (sin `stream`)
+            usar_cache: Si True, una respuesta cacheada se entrega en un solo
+                fragmento y la respuesta completa se guarda al terminar
+            agente: Agente al que se atribuye el consumo de tokens
+
+        Yields:
+            Fragmentos de texto en el orden en que los genera el modelo
+
+        Raises:
+            OpenAIError: Si hay error en la llamada a OpenAI
+        """
+        usar_cache = usar_cache and cache_llm.habilitada
+        if usar_cache:
+            cacheado = await asyncio.to_thread(cache_llm.obtener, kwargs)
+            if cacheado is not None:
+                yield cacheado
+                return
+
+        medicion = _MedicionStream(agente, kwargs.get("model", ""))
+        resultado = RESULTADO_ERROR
+        try:
+            async with despachador_llm.stream_async(
+                self.async_client.chat.completions.create, **_kwargs_stream(kwargs)
+            ) as stream:
+                async for chunk in stream:
+                    fragmento = medicion.leer(chunk)
+                    if fragmento:
+                        yield fragmento
+            resultado = RESULTADO_OK
+        except GeneratorExit:
+            resultado = RESULTADO_INTERRUMPIDO
+            raise
+        finally:
+            duracion_ms = medicion.terminar(resultado)
+
+        if medicion.chunk_uso is not None:
+            await asyncio.to_thread(
+                registrar_uso, agente, medicion.modelo, medicion.chunk_uso, duracion_ms
+            )
+        if usar_cache and medicion.texto:
+            await asyncio.to_thread(cache_llm.guardar, kwargs, medicion.texto)
+
+    def completar_tarea(
+        self,
+        tarea: str,
+        kwargs: Dict[str, Any],
+        validar: Callable[[Optional[str]], T] = validar_no_vacio,
+        usar_cache: bool = True,
+        agente: str = AGENTE_DESCONOCIDO,
+    ) -> T:
+        """
+        Ejecuta un chat completion con el modelo que el enrutador elige para la tarea.
+
+        Args:
+            tarea: Tipo de tarea (constantes `TAREA_*` de `src.core.enrutador`)
+            kwargs: Parámetros de `chat.completions.create` (`model` lo pone
+                el enrutador)
+            validar: Convierte/revisa la respuesta; si lanza ValueError se
+                escala al siguiente modelo
+            usar_cache: Si False, siempre llama a OpenAI y no guarda la respuesta
+            agente: Agente al que se atribuye el consumo de tokens
+
+        Returns:
+            Lo que devuelva `validar` con la primera respuesta válida
+
+        Raises:
+            OpenAIError: Si hay error en la llamada a OpenAI
+            ValueError: Si ningún modelo devuelve una respuesta válida
+        """
+        return enrutador_modelos.ejecutar(
+            tarea,
+            lambda modelo: self.completar(
+                {**kwargs, "model": modelo},
+                usar_cache=usar_cache,
+                agente=agente,
+                validar=validar,
+            ),
+            validar,
+        )
+
+    async def completar_tarea_async(
+        self,
+        tarea: str,
+        kwargs: Dict[str, Any],
+        validar: Callable[[Optional[str]], T] = validar_no_vacio,
+        usar_cache: bool = True,
+        agente: str = AGENTE_DESCONOCIDO,
+    ) -> T:
+        """
+        Versión asíncrona de `completar_tarea`.
+
+        Args:
+            tarea: Tipo de tarea (constantes `TAREA_*` de `src.core.enrutador`)
+            kwargs: Parámetros de `chat.completions.create` (`model` lo pone
+                el enrutador)
+            validar: Convierte/revisa la respuesta; si lanza ValueError se
+                escala al siguiente modelo
+            usar_cache: Si False, siempre llama a OpenAI y no guarda la respuesta
+            agente: Agente al que se atribuye el consumo de tokens
+
+        Returns:
+            Lo que devuelva `validar` con la primera respuesta válida
+
+        Raises:
+            OpenAIError: Si hay error en la llamada a OpenAI
+            ValueError: Si ningún modelo devuelve una respuesta válida
+        """
+        return await enrutador_modelos.ejecutar_async(
+            tarea,
+            lambda modelo: self.completar_async(
+                {**kwargs, "model": modelo},
+                usar_cache=usar_cache,
+                agente=agente,
+                validar=validar,
+            ),
+            validar,
+        )
+
     def analizar_solicitud(
         self,
         descripcion: str,
         usuario_nombre: Optional[str] = None,
+        usar_cache: bool = True,
     ) -> SolicitudAnalizada:
         """
         Analiza una solicitud de compra usando IA.
@@ -88,6 +485,7 @@ class OpenAIService:
         Args:
             descripcion: Descripción de la solicitud en lenguaje natural
             usuario_nombre: Nombre del usuario que hace la solicitud
+            usar_cache: Si False, ignora la caché de respuestas
 
         Returns:
             SolicitudAnalizada con la información extraída
@@ -120,23 +518,21 @@ Responde SOLO con un JSON válido siguiendo este formato exacto:
             user_prompt = f"Usuario: {usuario_nombre}\n{user_prompt}"
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_mini,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0.3,  # Más determinístico para extracción
-                response_format={"type": "json_object"},
+            resultado = self.completar_tarea(
+                TAREA_ANALIZAR_SOLICITUD,
+                {
+                    "messages": [
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt},
+                    ],
+                    "temperature": 0.3,  # Más determinístico para extracción
+                    "response_format": {"type": "json_object"},
+                },
+                validar=_parsear_solicitud,
+                usar_cache=usar_cache,
+                agente="analizar_solicitud",
             )
 
-            content = response.choices[0].message.content
-            if not content:
-                raise ValueError("Respuesta vacía de OpenAI")
-
-            data = json.loads(content)
-            resultado = SolicitudAnalizada(**data)
-
             logger.info(
                 f"Solicitud analizada - Categoría: {resultado.categoria}, "
                 f"Productos: {len(resultado.productos)}"
@@ -210,16 +606,19 @@ Información a solicitar:
 - Cualquier información adicional relevante"""
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_mini,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0.7,  # Más creativo para redacción
+            rfq = self.completar_tarea(
+                TAREA_GENERAR_RFQ,
+                {
+                    "messages": [
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt},
+                    ],
+                    "temperature": 0.7,  # Más creativo para redacción
+                },
+                validar=validar_redaccion,
+                usar_cache=False,
+                agente="generar_rfq",
             )
-
-            rfq = response.choices[0].message.content or ""
             logger.info(f"RFQ generado - {len(rfq)} caracteres")
             return rfq
 
@@ -232,6 +631,7 @@ Información a solicitar:
         contenido_email: str,
         proveedor_nombre: str,
         solicitud_descripcion: str,
+        usar_cache: bool = True,
     ) -> CotizacionAnalizada:
         """
         Analiza una cotización recibida por email.
@@ -242,6 +642,7 @@ Información a solicitar:
             contenido_email: Contenido del email con la cotización
             proveedor_nombre: Nombre del proveedor
             solicitud_descripcion: Descripción de la solicitud original
+            usar_cache: Si False, ignora la caché de respuestas
 
         Returns:
             CotizacionAnalizada con la información extraída
@@ -283,23 +684,22 @@ Email de cotización:
 Extrae: precio total, tiempo de entrega, ventajas, desventajas, y califica la calidad."""
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_full,  # Usamos modelo completo para análisis
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0.3,
-                response_format={"type": "json_object"},
+            # Se escala al modelo completo si el mini no da un análisis creíble
+            resultado = self.completar_tarea(
+                TAREA_ANALIZAR_COTIZACION,
+                {
+                    "messages": [
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt},
+                    ],
+                    "temperature": 0.3,
+                    "response_format": {"type": "json_object"},
+                },
+                validar=_parsear_cotizacion,
+                usar_cache=usar_cache,
+                agente="analizar_cotizacion",
             )
 
-            content = response.choices[0].message.content
-            if not content:
-                raise ValueError("Respuesta vacía de OpenAI")
-
-            data = json.loads(content)
-            resultado = CotizacionAnalizada(**data)
-
             logger.info(
                 f"Cotización analizada - Precio: ${resultado.precio_total}, "
                 f"Score: {resultado.calidad_score}/10"
@@ -362,17 +762,20 @@ Criterios de evaluación (pesos):
 Genera un análisis comparativo y recomienda la mejor opción."""
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_full,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0.5,
+            analisis = self.completar_tarea(
+                TAREA_COMPARAR_COTIZACIONES,
+                {
+                    "messages": [
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt},
+                    ],
+                    "temperature": 0.5,
+                },
+                validar=validar_redaccion,
+                usar_cache=False,
+                agente="comparar_cotizaciones",
             )
 
-            analisis = response.choices[0].message.content or ""
-
             logger.info(f"Comparación completada - {len(analisis)} caracteres")
             return {
                 "analisis": analisis,
@@ -420,19 +823,53 @@ Genera un análisis comparativo y recomienda la mejor opción."""
             if max_tokens:
                 params["max_tokens"] = max_tokens
 
-            response = self.client.chat.completions.create(**params)
-
-            content = response.choices[0].message.content or ""
-            return content
+            return self.completar(params, usar_cache=False, agente="chat_completion") or ""
 
         except OpenAIError as e:
             logger.error(f"Error en chat completion: {e}")
             raise
 
+    def chat_completion_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        use_full_model: bool = False,
+    ) -> Iterator[str]:
+        """
+        Variante en streaming de `chat_completion`.
+
+        Args:
+            messages: Lista de mensajes en formato OpenAI
+            temperature: Temperatura para la generación (0-2)
+            max_tokens: Máximo de tokens en la respuesta
+            use_full_model: Si True, usa modelo completo, sino mini
+
+        Yields:
+            Fragmentos de la respuesta a medida que se generan
+
+        Raises:
+            OpenAIError: Si hay error en la llamada a OpenAI
+
+        Example:
+            >>> for fragmento in openai_service.chat_completion_stream(mensajes):
+            ...     print(fragmento, end="", flush=True)
+        """
+        params: Dict[str, Any] = {
+            "model": self.model_full if use_full_model else self.model_mini,
+            "messages": messages,
+            "temperature": temperature,
+        }
+        if max_tokens:
+            params["max_tokens"] = max_tokens
+
+        return self.completar_stream(params, agente="chat_completion")
+
     def extraer_json(
         self,
         prompt: str,
         schema_ejemplo: Optional[Dict[str, Any]] = None,
+        usar_cache: bool = True,
     ) -> Dict[str, Any]:
         """
         Extrae información estructurada en formato JSON.
@@ -442,6 +879,7 @@ Genera un análisis comparativo y recomienda la mejor opción."""
         Args:
             prompt: Prompt describiendo qué extraer
             schema_ejemplo: Ejemplo del schema JSON esperado
+            usar_cache: Si False, ignora la caché de respuestas
 
         Returns:
             Dict con los datos extraídos
@@ -459,22 +897,21 @@ Genera un análisis comparativo y recomienda la mejor opción."""
             system_prompt += f"\n\nEjemplo del formato esperado:\n{schema_text}"
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_mini,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.3,
-                response_format={"type": "json_object"},
+            return self.completar_tarea(
+                TAREA_EXTRAER_JSON,
+                {
+                    "messages": [
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": prompt},
+                    ],
+                    "temperature": 0.3,
+                    "response_format": {"type": "json_object"},
+                },
+                validar=_parsear_json,
+                usar_cache=usar_cache,
+                agente="extraer_json",
             )
 
-            content = response.choices[0].message.content
-            if not content:
-                raise ValueError("Respuesta vacía de OpenAI")
-
-            return json.loads(content)
-
         except OpenAIError as e:
             logger.error(f"Error extrayendo JSON: {e}")
             raise
@@ -487,13 +924,52 @@ Genera un análisis comparativo y recomienda la mejor opción."""
 openai_service = OpenAIService()
 
 
+def construir_kwargs_agente(
+    prompt_sistema: str,
+    mensaje_usuario: str,
+    modelo: str,
+    temperatura: float,
+    formato_json: bool,
+) -> Dict[str, Any]:
+    """Construye los parámetros de chat completion usados por los agentes."""
+    kwargs: Dict[str, Any] = {
+        "model": modelo,
+        "messages": [
+            {"role": "system", "content": prompt_sistema},
+            {"role": "user", "content": mensaje_usuario},
+        ],
+        "temperature": temperatura,
+    }
+
+    if formato_json:
+        kwargs["response_format"] = {"type": "json_object"}
+
+    return kwargs
+
+
+def _revision_agente(validar: Optional[Callable[[str], Any]]) -> Callable[[Optional[str]], str]:
+    """Validación de `llamar_agente`: texto no vacío más la revisión del agente."""
+
+    def revisar(content: Optional[str]) -> str:
+        validar_no_vacio(content)
+        if validar is not None:
+            validar(content)
+        return content
+
+    return revisar
+
+
 # Helper function para compatibilidad con agentes
 def llamar_agente(
     prompt_sistema: str,
     mensaje_usuario: str,
     modelo: str = "gpt-4o-mini",
     temperatura: float = 0.7,
-    formato_json: bool = False
+    formato_json: bool = False,
+    usar_cache: bool = True,
+    agente: str = AGENTE_DESCONOCIDO,
+    tarea: Optional[str] = None,
+    validar: Optional[Callable[[str], Any]] = None,
 ) -> str:
     """
     Función helper para llamar al agente de OpenAI.
@@ -505,6 +981,13 @@ def llamar_agente(
         modelo: Modelo a usar (gpt-4o-mini o gpt-4o)
         temperatura: Temperatura (0.0-1.0)
         formato_json: Si True, fuerza respuesta en formato JSON
+        usar_cache: Si False, no reutiliza ni guarda la respuesta en la
+            caché (usar en generaciones creativas)
+        agente: Agente al que se atribuye el consumo de tokens
+        tarea: Tipo de tarea; si se indica, el enrutador elige el modelo
+            (se ignora `modelo`) y escala si la respuesta no valida
+        validar: Revisión de la respuesta para escalar (lanza ValueError);
+            solo se usa con `tarea`
 
     Returns:
         Respuesta del modelo como string
@@ -513,23 +996,79 @@ def llamar_agente(
         OpenAIError: Si hay error en la llamada a OpenAI
     """
     try:
-        messages = [
-            {"role": "system", "content": prompt_sistema},
-            {"role": "user", "content": mensaje_usuario}
-        ]
+        kwargs = construir_kwargs_agente(
+            prompt_sistema, mensaje_usuario, modelo, temperatura, formato_json
+        )
 
-        kwargs = {
-            "model": modelo,
-            "messages": messages,
-            "temperature": temperatura
-        }
+        if tarea is not None:
+            return openai_service.completar_tarea(
+                tarea, kwargs, _revision_agente(validar), usar_cache=usar_cache, agente=agente
+            )
 
-        if formato_json:
-            kwargs["response_format"] = {"type": "json_object"}
+        content = openai_service.completar(kwargs, usar_cache=usar_cache, agente=agente)
+        if not content:
+            raise ValueError("Respuesta vacía de OpenAI")
 
-        response = openai_service.client.chat.completions.create(**kwargs)
+        return content
 
-        content = response.choices[0].message.content
+    except OpenAIError as e:
+        logger.error(f"Error llamando al agente: {e}")
+        raise
+    except Exception as e:
+        logger.error(f"Error inesperado: {e}")
+        raise
+
+
+async def llamar_agente_async(
+    prompt_sistema: str,
+    mensaje_usuario: str,
+    modelo: str = "gpt-4o-mini",
+    temperatura: float = 0.7,
+    formato_json: bool = False,
+    usar_cache: bool = True,
+    agente: str = AGENTE_DESCONOCIDO,
+    tarea: Optional[str] = None,
+    validar: Optional[Callable[[str], Any]] = None,
+) -> str:
+    """
+    Versión asíncrona de `llamar_agente`.
+
+    Usa el cliente `AsyncOpenAI` para no bloquear el event loop mientras
+    se espera la respuesta del modelo.
+
+    Args:
+        prompt_sistema: Prompt del sistema (instrucciones del agente)
+        mensaje_usuario: Mensaje del usuario
+        modelo: Modelo a usar (gpt-4o-mini o gpt-4o)
+        temperatura: Temperatura (0.0-1.0)
+        formato_json: Si True, fuerza respuesta en formato JSON
+        usar_cache: Si False, no reutiliza ni guarda la respuesta en la
+            caché (usar en generaciones creativas)
+        agente: Agente al que se atribuye el consumo de tokens
+        tarea: Tipo de tarea; si se indica, el enrutador elige el modelo
+            (se ignora `modelo`) y escala si la respuesta no valida
+        validar: Revisión de la respuesta para escalar (lanza ValueError);
+            solo se usa con `tarea`
+
+    Returns:
+        Respuesta del modelo como string
+
+    Raises:
+        OpenAIError: Si hay error en la llamada a OpenAI
+    """
+    try:
+        kwargs = construir_kwargs_agente(
+            prompt_sistema, mensaje_usuario, modelo, temperatura, formato_json
+        )
+
+        if tarea is not None:
+            return await openai_service.completar_tarea_async(
+                tarea, kwargs, _revision_agente(validar), usar_cache=usar_cache, agente=agente
+            )
+
+        content = await openai_service.completar_async(
+            kwargs, usar_cache=usar_cache, agente=agente
+        )
         if not content:
             raise ValueError("Respuesta vacía de OpenAI")
 
@@ -541,3 +1080,91 @@ def llamar_agente(
     except Exception as e:
         logger.error(f"Error inesperado: {e}")
         raise
+
+
+def _modelo_stream(modelo: str, tarea: Optional[str]) -> str:
+    """Modelo de una llamada en streaming: el primero de la tarea si se indica."""
+    # Un stream no puede escalar: el texto ya se entregó a quien lo consume
+    return enrutador_modelos.modelos(tarea)[0] if tarea is not None else modelo
+
+
+def llamar_agente_stream(
+    prompt_sistema: str,
+    mensaje_usuario: str,
+    modelo: str = "gpt-4o-mini",
+    temperatura: float = 0.7,
+    formato_json: bool = False,
+    usar_cache: bool = False,
+    agente: str = AGENTE_DESCONOCIDO,
+    tarea: Optional[str] = None,
+) -> Iterator[str]:
+    """
+    Variante en streaming de `llamar_agente`.
+
+    Entrega la respuesta por fragmentos para mostrar borradores mientras se
+    redactan o empezar a procesar una respuesta JSON parcial (ver
+    `src.core.json_incremental`). Con `tarea` se usa el primer modelo del
+    enrutador sin escalamiento: validar el texto completo y decidir si
+    regenerarlo es responsabilidad de quien llama.
+
+    Args:
+        prompt_sistema: Prompt del sistema (instrucciones del agente)
+        mensaje_usuario: Mensaje del usuario
+        modelo: Modelo a usar (gpt-4o-mini o gpt-4o)
+        temperatura: Temperatura (0.0-1.0)
+        formato_json: Si True, fuerza respuesta en formato JSON
+        usar_cache: Si True, reutiliza y guarda la respuesta completa en la caché
+        agente: Agente al que se atribuye el consumo de tokens
+        tarea: Tipo de tarea; si se indica, el modelo lo elige el enrutador
+
+    Yields:
+        Fragmentos de texto de la respuesta
+
+    Raises:
+        OpenAIError: Si hay error en la llamada a OpenAI
+
+    Example:
+        >>> borrador = ""
+        >>> for fragmento in llamar_agente_stream(prompt, mensaje, agente="generador"):
+        ...     borrador += fragmento
+        ...     placeholder.text(borrador)
+    """
+    kwargs = construir_kwargs_agente(
+        prompt_sistema, mensaje_usuario, _modelo_stream(modelo, tarea), temperatura, formato_json
+    )
+    return openai_service.completar_stream(kwargs, usar_cache=usar_cache, agente=agente)
+
+
+def llamar_agente_stream_async(
+    prompt_sistema: str,
+    mensaje_usuario: str,
+    modelo: str = "gpt-4o-mini",
+    temperatura: float = 0.7,
+    formato_json: bool = False,
+    usar_cache: bool = False,
+    agente: str = AGENTE_DESCONOCIDO,
+    tarea: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """
+    Versión asíncrona de `llamar_agente_stream` (se itera con `async for`).
+
+    Args:
+        prompt_sistema: Prompt del sistema (instrucciones del agente)
+        mensaje_usuario: Mensaje del usuario
+        modelo: Modelo a usar (gpt-4o-mini o gpt-4o)
+        temperatura: Temperatura (0.0-1.0)
+        formato_json: Si True, fuerza respuesta en formato JSON
+        usar_cache: Si True, reutiliza y guarda la respuesta completa en la caché
+        agente: Agente al que se atribuye el consumo de tokens
+        tarea: Tipo de tarea; si se indica, el modelo lo elige el enrutador
+
+    Returns:
+        Iterador asíncrono de fragmentos de texto de la respuesta
+
+    Raises:
+        OpenAIError: Si hay error en la llamada a OpenAI
+    """
+    kwargs = construir_kwargs_agente(
+        prompt_sistema, mensaje_usuario, _modelo_stream(modelo, tarea), temperatura, formato_json
+    )
+    return openai_service.completar_stream_async(kwargs, usar_cache=usar_cache, agente=agente)
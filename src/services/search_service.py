@@ -5,17 +5,28 @@ Este servicio proporciona funcionalidades para:
 - Búsqueda de proveedores en Google
 - Búsqueda de productos y precios
 - Extracción de información de contacto
+
+Las respuestas de Serper se guardan en `cache_busquedas` (ver
+`src.core.cache`): las consultas repetidas entre solicitudes no vuelven a
+pagar ni a esperar a la API.
 """
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import Any, Dict, List, Optional
 
+import aiohttp
 import requests
 from pydantic import BaseModel
 
 from config.settings import settings
+from src.core.cache import CacheBusquedas, cache_busquedas
 
 logger = logging.getLogger(__name__)
 
+# Marketplaces en que se busca cada producto por defecto
+MARKETPLACES = ["amazon.com.mx", "mercadolibre.com.mx", "liverpool.com.mx"]
+
 
 class SearchResult(BaseModel):
     """Modelo para un resultado de búsqueda."""
@@ -44,15 +55,17 @@ class SearchService:
     Serper API: https://serper.dev
     """
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, cache: Optional[CacheBusquedas] = None):
         """
         Inicializa el servicio de búsqueda.
 
         Args:
             api_key: API key de Serper (usa settings si no se proporciona)
+            cache: Caché de respuestas (usa `cache_busquedas` si no se proporciona)
         """
         self.api_key = api_key or settings.SERPER_API_KEY
         self.api_url = "https://google.serper.dev/search"
+        self.cache = cache or cache_busquedas
 
         self.headers = {
             "X-API-KEY": self.api_key or "",
@@ -100,15 +113,7 @@ class SearchService:
         }
 
         try:
-            response = requests.post(
-                self.api_url,
-                json=payload,
-                headers=self.headers,
-                timeout=30,
-            )
-            response.raise_for_status()
-
-            data = response.json()
+            data = self._consultar(payload)
             organic_results = data.get("organic", [])
 
             results = []
@@ -336,38 +341,56 @@ class SearchService:
             return []
 
         try:
-            query = f"{producto} proveedor mayoreo distribuidor {ubicacion}"
+            payload = self._payload_proveedores_web(producto, ubicacion, num_resultados)
+            proveedores_web = self._parsear_proveedores_web(self._consultar(payload))
 
-            payload = {
-                "q": query,
-                "num": num_resultados,
-                "gl": "mx",  # Geolocalización México
-                "hl": "es"   # Idioma español
-            }
+            logger.info(f"✓ Encontrados {len(proveedores_web)} proveedores web para {producto}")
+            return proveedores_web
 
-            response = requests.post(
-                self.api_url,
-                json=payload,
-                headers=self.headers,
-                timeout=30
-            )
-            response.raise_for_status()
+        except Exception as e:
+            logger.error(f"❌ Error buscando proveedores web: {e}")
+            return []
+
+    async def buscar_proveedores_web_async(
+        self,
+        producto: str,
+        ubicacion: str = "México",
+        num_resultados: int = 10,
+        session: Optional[aiohttp.ClientSession] = None,
+    ) -> List[Dict]:
+        """
+        Versión asíncrona de `buscar_proveedores_web`.
+
+        Args:
+            producto: Nombre del producto a buscar
+            ubicacion: País o ciudad para filtrar resultados
+            num_resultados: Número máximo de resultados
+            session: Sesión aiohttp a reutilizar (opcional)
 
-            resultados = response.json()
+        Returns:
+            Lista de proveedores encontrados en web
+        """
+        if not self.is_available():
+            return []
 
-            proveedores_web = []
-            for item in resultados.get("organic", []):
-                proveedores_web.append({
-                    "nombre": item.get("title"),
-                    "url": item.get("link"),
-                    "descripcion": item.get("snippet"),
-                    "fuente": "web_search",
-                    "score_relevancia": item.get("position", 100)
-                })
+        try:
+            payload = self._payload_proveedores_web(producto, ubicacion, num_resultados)
+            proveedores_web = self._parsear_proveedores_web(
+                await asyncio.wait_for(
+                    self._consultar_async(payload, session), settings.BUSQUEDA_TIMEOUT_SEG
+                )
+            )
 
             logger.info(f"✓ Encontrados {len(proveedores_web)} proveedores web para {producto}")
             return proveedores_web
 
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"⏱️ Búsqueda web de {producto} sin respuesta en "
+                f"{settings.BUSQUEDA_TIMEOUT_SEG}s"
+            )
+            return []
+
         except Exception as e:
             logger.error(f"❌ Error buscando proveedores web: {e}")
             return []
@@ -381,63 +404,270 @@ class SearchService:
         Busca producto en marketplaces (Amazon, MercadoLibre, etc.) - FASE 3
         Devuelve enlaces directos para compra manual
 
+        Los marketplaces se consultan a la vez (un hilo cada uno); los que no
+        responden en `BUSQUEDA_TIMEOUT_SEG` se omiten y se retorna lo que
+        trajeron los demás.
+
         Args:
             producto: Nombre del producto
             marketplaces: Lista de marketplaces a buscar (None = todos)
 
         Returns:
-            Lista de productos encontrados con enlaces de compra
+            Lista de productos encontrados con enlaces de compra, en el orden
+            de `marketplaces`
         """
         if not self.is_available():
             return []
 
         if marketplaces is None:
-            marketplaces = ["amazon.com.mx", "mercadolibre.com.mx", "liverpool.com.mx"]
+            marketplaces = MARKETPLACES
 
-        resultados_ecommerce = []
+        pool = ThreadPoolExecutor(
+            max_workers=max(1, len(marketplaces)), thread_name_prefix="ecommerce"
+        )
+        try:
+            futuros = [
+                pool.submit(self._buscar_marketplace, producto, marketplace)
+                for marketplace in marketplaces
+            ]
+            _, pendientes = wait(futuros, timeout=settings.BUSQUEDA_TIMEOUT_SEG)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
 
-        for marketplace in marketplaces:
-            try:
-                query = f"{producto} site:{marketplace}"
-
-                payload = {
-                    "q": query,
-                    "num": 5,
-                    "gl": "mx",
-                    "hl": "es"
-                }
-
-                response = requests.post(
-                    self.api_url,
-                    json=payload,
-                    headers=self.headers,
-                    timeout=30
+        resultados_ecommerce = []
+        for marketplace, futuro in zip(marketplaces, futuros, strict=True):
+            if futuro in pendientes:
+                logger.warning(
+                    f"⏱️ {marketplace} sin respuesta en {settings.BUSQUEDA_TIMEOUT_SEG}s"
                 )
-                response.raise_for_status()
+                continue
+            resultados_ecommerce.extend(futuro.result())
 
-                data = response.json()
+        return resultados_ecommerce
 
-                marketplace_name = self._get_marketplace_name(marketplace)
+    def _buscar_marketplace(self, producto: str, marketplace: str) -> List[Dict]:
+        """Busca un producto en un marketplace; ante error retorna lista vacía."""
+        try:
+            data = self._consultar(self._payload_ecommerce(producto, marketplace))
+            resultados = self._parsear_ecommerce(data, marketplace)
+            logger.info(
+                f"✓ Encontrados {len(resultados)} productos en "
+                f"{self._get_marketplace_name(marketplace)}"
+            )
+            return resultados
 
-                for item in data.get("organic", []):
-                    precio_aprox = self._extraer_precio(item.get("snippet", ""))
+        except Exception as e:
+            logger.error(f"❌ Error buscando en {marketplace}: {e}")
+            return []
 
-                    resultados_ecommerce.append({
-                        "marketplace": marketplace_name,
-                        "producto": item.get("title"),
-                        "url_compra": item.get("link"),
-                        "precio_aprox": precio_aprox,
-                        "descripcion": item.get("snippet"),
-                        "disponible_compra_directa": True
-                    })
+    async def buscar_en_ecommerce_async(
+        self,
+        producto: str,
+        marketplaces: List[str] = None,
+        session: Optional[aiohttp.ClientSession] = None,
+    ) -> List[Dict]:
+        """
+        Versión asíncrona de `buscar_en_ecommerce`.
 
-                logger.info(f"✓ Encontrados {len(resultados_ecommerce)} productos en {marketplace_name}")
+        Los marketplaces se consultan a la vez; los que no responden en
+        `BUSQUEDA_TIMEOUT_SEG` se omiten.
 
-            except Exception as e:
-                logger.error(f"❌ Error buscando en {marketplace}: {e}")
-                continue
+        Args:
+            producto: Nombre del producto
+            marketplaces: Lista de marketplaces a buscar (None = todos)
+            session: Sesión aiohttp a reutilizar (opcional)
 
-        return resultados_ecommerce
+        Returns:
+            Lista de productos encontrados con enlaces de compra, en el orden
+            de `marketplaces`
+        """
+        if not self.is_available():
+            return []
+
+        if marketplaces is None:
+            marketplaces = MARKETPLACES
+
+        por_marketplace = await asyncio.gather(*(
+            self._buscar_marketplace_async(producto, marketplace, session)
+            for marketplace in marketplaces
+        ))
+        return [resultado for resultados in por_marketplace for resultado in resultados]
+
+    async def _buscar_marketplace_async(
+        self,
+        producto: str,
+        marketplace: str,
+        session: Optional[aiohttp.ClientSession] = None,
+    ) -> List[Dict]:
+        """Versión asíncrona de `_buscar_marketplace`."""
+        try:
+            data = await asyncio.wait_for(
+                self._consultar_async(self._payload_ecommerce(producto, marketplace), session),
+                settings.BUSQUEDA_TIMEOUT_SEG,
+            )
+            resultados = self._parsear_ecommerce(data, marketplace)
+            logger.info(
+                f"✓ Encontrados {len(resultados)} productos en "
+                f"{self._get_marketplace_name(marketplace)}"
+            )
+            return resultados
+
+        except asyncio.TimeoutError:
+            logger.warning(f"⏱️ {marketplace} sin respuesta en {settings.BUSQUEDA_TIMEOUT_SEG}s")
+            return []
+
+        except Exception as e:
+            logger.error(f"❌ Error buscando en {marketplace}: {e}")
+            return []
+
+    def _consultar(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Respuesta de Serper para la consulta, desde la caché si está.
+
+        Una respuesta vencida (dentro de la ventana de obsoletas) se retorna
+        igual y se revalida en segundo plano.
+
+        Args:
+            payload: Cuerpo de la consulta (q, num, gl, hl)
+
+        Returns:
+            JSON de respuesta de Serper (solo los resultados orgánicos)
+
+        Raises:
+            requests.RequestException: Si hay error HTTP o de conexión
+        """
+        datos, obsoleta = self.cache.obtener(payload)
+        if datos is None:
+            datos = self._post(payload)
+            self.cache.guardar(payload, datos)
+        elif obsoleta:
+            self.cache.revalidar(payload, lambda: self._post(payload))
+        return datos
+
+    async def _consultar_async(
+        self,
+        payload: Dict[str, Any],
+        session: Optional[aiohttp.ClientSession] = None,
+    ) -> Dict[str, Any]:
+        """
+        Versión asíncrona de `_consultar`.
+
+        La caché (SQLite) se lee y escribe en un hilo aparte; la
+        revalidación de una respuesta vencida usa la consulta síncrona, así
+        no depende de que `session` siga abierta.
+        """
+        if not self.cache.habilitada:
+            return await self._post_async(payload, session)
+
+        datos, obsoleta = await asyncio.to_thread(self.cache.obtener, payload)
+        if datos is None:
+            datos = await self._post_async(payload, session)
+            await asyncio.to_thread(self.cache.guardar, payload, datos)
+        elif obsoleta:
+            self.cache.revalidar(payload, lambda: self._post(payload))
+        return datos
+
+    def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Envía una consulta a Serper.
+
+        Args:
+            payload: Cuerpo de la consulta (q, num, gl, hl)
+
+        Returns:
+            JSON de respuesta de Serper (solo los resultados orgánicos)
+
+        Raises:
+            requests.RequestException: Si hay error HTTP o de conexión
+        """
+        response = requests.post(
+            self.api_url,
+            json=payload,
+            headers=self.headers,
+            timeout=settings.BUSQUEDA_TIMEOUT_SEG,
+        )
+        response.raise_for_status()
+        return {"organic": response.json().get("organic", [])}
+
+    async def _post_async(
+        self,
+        payload: Dict[str, Any],
+        session: Optional[aiohttp.ClientSession] = None,
+    ) -> Dict[str, Any]:
+        """
+        Envía una consulta a Serper sin bloquear el event loop.
+
+        Args:
+            payload: Cuerpo de la consulta (q, num, gl, hl)
+            session: Sesión aiohttp a reutilizar; si es None se crea una temporal
+
+        Returns:
+            JSON de respuesta de Serper (solo los resultados orgánicos)
+
+        Raises:
+            aiohttp.ClientError: Si hay error HTTP o de conexión
+        """
+        if session is None:
+            async with aiohttp.ClientSession() as nueva_session:
+                return await self._post_async(payload, nueva_session)
+
+        async with session.post(
+            self.api_url,
+            json=payload,
+            headers=self.headers,
+            timeout=aiohttp.ClientTimeout(total=settings.BUSQUEDA_TIMEOUT_SEG),
+        ) as response:
+            response.raise_for_status()
+            return {"organic": (await response.json()).get("organic", [])}
+
+    def _payload_proveedores_web(
+        self, producto: str, ubicacion: str, num_resultados: int
+    ) -> Dict[str, Any]:
+        """Construye la consulta de proveedores web."""
+        return {
+            "q": f"{producto} proveedor mayoreo distribuidor {ubicacion}",
+            "num": num_resultados,
+            "gl": "mx",  # Geolocalización México
+            "hl": "es"   # Idioma español
+        }
+
+    def _payload_ecommerce(self, producto: str, marketplace: str) -> Dict[str, Any]:
+        """Construye la consulta de un marketplace."""
+        return {
+            "q": f"{producto} site:{marketplace}",
+            "num": 5,
+            "gl": "mx",
+            "hl": "es"
+        }
+
+    def _parsear_proveedores_web(self, resultados: Dict[str, Any]) -> List[Dict]:
+        """Convierte la respuesta de Serper en proveedores web."""
+        return [
+            {
+                "nombre": item.get("title"),
+                "url": item.get("link"),
+                "descripcion": item.get("snippet"),
+                "fuente": "web_search",
+                "score_relevancia": item.get("position", 100)
+            }
+            for item in resultados.get("organic", [])
+        ]
+
+    def _parsear_ecommerce(self, data: Dict[str, Any], marketplace: str) -> List[Dict]:
+        """Convierte la respuesta de Serper en productos de un marketplace."""
+        marketplace_name = self._get_marketplace_name(marketplace)
+
+        return [
+            {
+                "marketplace": marketplace_name,
+                "producto": item.get("title"),
+                "url_compra": item.get("link"),
+                "precio_aprox": self._extraer_precio(item.get("snippet", "")),
+                "descripcion": item.get("snippet"),
+                "disponible_compra_directa": True
+            }
+            for item in data.get("organic", [])
+        ]
 
     def buscar_mejores_precios(self, producto: str) -> Dict:
         """
@@ -1,9 +1,22 @@
 """
 Configuración de fixtures compartidas para pytest.
 """
+import os
+
 import pytest
 from pathlib import Path
 
+# Sin caché LLM en disco: los tests mockean OpenAI con respuestas distintas
+# para los mismos prompts y no deben verse entre sí
+os.environ.setdefault("LLM_CACHE_HABILITADA", "false")
+# Ni de búsquedas web: los tests mockean Serper con resultados distintos
+# para las mismas consultas
+os.environ.setdefault("BUSQUEDA_CACHE_HABILITADA", "false")
+# Sin cuotas por modelo y con backoff corto: los tests simulan muchas
+# llamadas simultáneas y algunos fallan contra una API inalcanzable
+os.environ.setdefault("LLM_LIMITES_POR_MODELO", "{}")
+os.environ.setdefault("LLM_BACKOFF_BASE_SEG", "0.01")
+
 
 @pytest.fixture
 def project_root() -> Path:
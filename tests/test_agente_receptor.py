@@ -8,6 +8,7 @@ import pytest
 from unittest.mock import Mock, patch
 
 from src.agents.receptor import (
+    ParserProductosIncremental,
     ReceptorAgent,
     procesar_solicitud,
     validar_solicitud,
@@ -446,6 +447,138 @@ def test_procesar_solicitud_respuesta_invalida(mock_openai_class):
         agente.procesar_solicitud("Necesito laptops")
 
 
+@patch("src.agents.receptor.OpenAI")
+def test_procesar_solicitud_escala_de_modelo(mock_openai_class):
+    """Test: sin modelo fijo, una respuesta inválida del mini escala al modelo completo."""
+    valida = (
+        '{"productos": [{"nombre": "Laptop HP", "cantidad": 5, "categoria": "tecnologia"}], '
+        '"urgencia": "normal"}'
+    )
+    modelos = []
+
+    def crear(**kwargs):
+        modelos.append(kwargs["model"])
+        respuesta = Mock()
+        respuesta.choices = [Mock()]
+        respuesta.choices[0].message.content = (
+            "Esto no es JSON válido" if kwargs["model"] == "gpt-4o-mini" else valida
+        )
+        return respuesta
+
+    mock_openai_class.return_value.chat.completions.create.side_effect = crear
+
+    resultado = ReceptorAgent().procesar_solicitud("oye necesito unas laptops HP, como 5")
+
+    assert modelos == ["gpt-4o-mini", "gpt-4o"]
+    assert resultado["productos"][0]["nombre"] == "Laptop HP"
+
+
+@patch("src.agents.receptor.settings.RECEPTOR_TAMANO_LOTE", 2)
+@patch("src.agents.receptor.AsyncOpenAI")
+async def test_procesar_lote_agrupa_llamadas(mock_async_openai_class):
+    """Test: el lote se extrae con una llamada por bloque y tolera faltantes."""
+    import json
+    from unittest.mock import AsyncMock
+
+    def responder(**kwargs):
+        # Bloque 1: ambas solicitudes; bloque 2: omite la segunda
+        prompt = kwargs["messages"][1]["content"]
+        indices = [0, 1] if "PLCs" in prompt else [0]
+        contenido = json.dumps({
+            "solicitudes": [
+                {
+                    "indice": i,
+                    "productos": [{"nombre": f"Producto {i}", "cantidad": 1, "categoria": "otros"}],
+                    "urgencia": "normal",
+                }
+                for i in indices
+            ]
+        })
+        return Mock(choices=[Mock(message=Mock(content=contenido))])
+
+    mock_client = Mock()
+    mock_client.chat.completions.create = AsyncMock(side_effect=responder)
+    mock_async_openai_class.return_value = mock_client
+
+    agente = ReceptorAgent()
+    resultados = await agente.procesar_lote_async(
+        ["Necesito 5 PLCs", "Necesito 2 sensores", "Necesito sillas", "Necesito mesas", ""]
+    )
+
+    assert mock_client.chat.completions.create.await_count == 2
+    assert resultados[0]["productos"][0]["nombre"] == "Producto 0"
+    assert resultados[1]["productos"][0]["nombre"] == "Producto 1"
+    assert resultados[2] is not None
+    assert resultados[3] is None  # El modelo no la devolvió
+    assert resultados[4] is None  # Texto vacío: no se envía
+
+
+def test_parser_incremental_emite_productos_al_cerrarse():
+    """Test: cada producto se emite en cuanto se cierra su objeto."""
+    import json
+
+    respuesta = json.dumps({
+        "productos": [
+            {"nombre": "PLC \"S7-1200\" {rack}", "cantidad": 5, "categoria": "tecnologia",
+             "especificaciones": "Marca [Siemens], 24V"},
+            {"nombre": "Sensor", "cantidad": 10, "categoria": "equipamiento"},
+        ],
+        "urgencia": "alta",
+        "notas_adicionales": "Ver {productos: [...]}",
+    })
+
+    parser = ParserProductosIncremental()
+    emitidos = []
+    posiciones = []
+    for posicion, caracter in enumerate(respuesta):
+        nuevos = parser.alimentar(caracter)
+        emitidos.extend(nuevos)
+        posiciones.extend([posicion] * len(nuevos))
+
+    assert [p["nombre"] for p in emitidos] == ['PLC "S7-1200" {rack}', "Sensor"]
+    # El primer producto se emite antes de que llegue el segundo
+    assert posiciones[0] < respuesta.index('"Sensor"')
+
+
+@patch("src.agents.receptor.AsyncOpenAI")
+async def test_procesar_solicitud_streaming_avisa_productos(mock_async_openai_class):
+    """Test: el modo streaming avisa cada producto antes del final y valida al terminar."""
+    import json
+    from types import SimpleNamespace
+    from unittest.mock import AsyncMock
+
+    respuesta = json.dumps({
+        "productos": [
+            {"nombre": "Laptop HP", "cantidad": 5, "categoria": "tecnologia"},
+            {"nombre": "Mouse", "cantidad": 5, "categoria": "tecnologia"},
+        ],
+        "urgencia": "normal",
+    })
+    fragmentos = [respuesta[i:i + 20] for i in range(0, len(respuesta), 20)]
+    recibidos = []
+    detectados = []
+
+    async def stream():
+        for fragmento in fragmentos:
+            recibidos.append(fragmento)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=fragmento))])
+
+    mock_client = Mock()
+    mock_client.chat.completions.create = AsyncMock(return_value=stream())
+    mock_async_openai_class.return_value = mock_client
+
+    agente = ReceptorAgent()
+    resultado = await agente.procesar_solicitud_streaming_async(
+        "Necesito 5 laptops HP con mouse",
+        al_detectar_producto=lambda p: detectados.append((p["nombre"], len(recibidos))),
+    )
+
+    assert mock_client.chat.completions.create.call_args.kwargs["stream"] is True
+    assert [nombre for nombre, _ in detectados] == ["Laptop HP", "Mouse"]
+    assert detectados[0][1] < len(fragmentos)
+    assert resultado["productos"][1]["nombre"] == "Mouse"
+
+
 # =============================================================================
 # TESTS DE INTEGRACIÓN COMPLETOS (REQUIEREN API KEY)
 # =============================================================================
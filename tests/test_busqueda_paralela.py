@@ -0,0 +1,114 @@
+"""
+Tests de las búsquedas web y ecommerce en paralelo, con timeout por fuente.
+"""
+import asyncio
+import time
+from unittest.mock import Mock, patch
+
+from src.agents import investigador
+from src.agents.investigador import _buscar_producto_web, _buscar_web_en_paralelo
+from src.services.search_service import SearchService
+
+LATENCIA = 0.2
+
+PRODUCTOS = [{"nombre": "PLC Siemens"}, {"nombre": "Sensor PT100"}, {"nombre": "Variador"}]
+
+
+def respuesta_serper(titulo: str) -> Mock:
+    respuesta = Mock()
+    respuesta.json.return_value = {"organic": [{"title": titulo, "link": "https://x.mx"}]}
+    return respuesta
+
+
+def test_investigador_busca_productos_y_fuentes_a_la_vez():
+    """Test: 3 productos × 2 fuentes tardan una sola latencia, en el orden de los productos."""
+    def web(nombre, **kwargs):
+        time.sleep(LATENCIA)
+        return [{"nombre": f"web {nombre}"}]
+
+    def ecommerce(nombre):
+        time.sleep(LATENCIA)
+        return [{"producto": f"ecommerce {nombre}"}]
+
+    with patch.object(investigador.search_service, "buscar_proveedores_web", side_effect=web), \
+            patch.object(investigador.search_service, "buscar_en_ecommerce", side_effect=ecommerce):
+        inicio = time.perf_counter()
+        proveedores_web, enlaces = _buscar_web_en_paralelo(PRODUCTOS)
+        duracion = time.perf_counter() - inicio
+
+    assert duracion < 2 * LATENCIA
+    assert [p["nombre"] for p in proveedores_web] == [
+        "web PLC Siemens", "web Sensor PT100", "web Variador"
+    ]
+    assert len(enlaces) == 3
+
+
+def test_investigador_omite_la_fuente_que_no_responde():
+    """Test: una búsqueda colgada no bloquea; se sigue con el resto."""
+    def ecommerce(nombre):
+        time.sleep(1 if nombre == "Variador" else 0)
+        return [{"producto": nombre}]
+
+    with patch.object(investigador.search_service, "buscar_proveedores_web", return_value=[]), \
+            patch.object(investigador.search_service, "buscar_en_ecommerce", side_effect=ecommerce), \
+            patch.object(investigador.settings, "BUSQUEDA_TIMEOUT_SEG", 0.1), \
+            patch.object(investigador, "MARGEN_TIMEOUT_SEG", 0.1):
+        inicio = time.perf_counter()
+        _, enlaces = _buscar_web_en_paralelo(PRODUCTOS)
+        duracion = time.perf_counter() - inicio
+
+    assert duracion < 0.5
+    assert [e["producto"] for e in enlaces] == ["PLC Siemens", "Sensor PT100"]
+
+
+def test_marketplaces_en_paralelo_con_resultados_parciales():
+    """Test: los marketplaces se consultan a la vez y el que no responde se omite."""
+    def post(url, json, **kwargs):
+        if "liverpool" in json["q"]:
+            time.sleep(1)
+        else:
+            time.sleep(LATENCIA)
+        return respuesta_serper(json["q"])
+
+    servicio = SearchService(api_key="test-key")
+    with patch("src.services.search_service.requests.post", side_effect=post), \
+            patch("src.services.search_service.settings.BUSQUEDA_TIMEOUT_SEG", 2 * LATENCIA):
+        inicio = time.perf_counter()
+        resultados = servicio.buscar_en_ecommerce("Laptop HP")
+        duracion = time.perf_counter() - inicio
+
+    assert duracion < 3 * LATENCIA
+    assert [r["marketplace"] for r in resultados] == ["Amazon México", "MercadoLibre"]
+
+
+async def test_marketplaces_async_con_resultados_parciales():
+    """Test: versión asíncrona, con el mismo timeout por marketplace."""
+    async def post_async(payload, session=None):
+        await asyncio.sleep(1 if "amazon" in payload["q"] else LATENCIA)
+        return {"organic": [{"title": payload["q"], "link": "https://x.mx"}]}
+
+    servicio = SearchService(api_key="test-key")
+    with patch.object(servicio, "_post_async", side_effect=post_async), \
+            patch("src.services.search_service.settings.BUSQUEDA_TIMEOUT_SEG", 2 * LATENCIA):
+        inicio = time.perf_counter()
+        resultados = await servicio.buscar_en_ecommerce_async("Laptop HP")
+        duracion = time.perf_counter() - inicio
+
+    assert duracion < 3 * LATENCIA
+    assert [r["marketplace"] for r in resultados] == ["MercadoLibre", "Liverpool"]
+
+
+async def test_web_y_ecommerce_de_un_producto_a_la_vez():
+    """Test: la búsqueda asíncrona de un producto no suma web y ecommerce."""
+    async def buscar(*args, **kwargs):
+        await asyncio.sleep(LATENCIA)
+        return [{"nombre": "x"}]
+
+    with patch.object(investigador.search_service, "buscar_proveedores_web_async", side_effect=buscar), \
+            patch.object(investigador.search_service, "buscar_en_ecommerce_async", side_effect=buscar):
+        inicio = time.perf_counter()
+        web, ecommerce = await _buscar_producto_web("PLC Siemens", session=None)
+        duracion = time.perf_counter() - inicio
+
+    assert duracion < 1.5 * LATENCIA
+    assert len(web) == len(ecommerce) == 1
@@ -0,0 +1,210 @@
+"""
+Tests de la caché de respuestas del LLM.
+"""
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.core.cache import BackendCache, BackendMemoria, BackendSQLite, CacheLLM
+
+
+def kwargs_chat(mensaje: str = "Necesito 5 PLCs", temperatura: float = 0.3) -> dict:
+    """Parámetros de chat completion como los que arma llamar_agente."""
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": "Extrae productos"},
+            {"role": "user", "content": mensaje},
+        ],
+        "temperature": temperatura,
+        "response_format": {"type": "json_object"},
+    }
+
+
+def respuesta_openai(contenido: str) -> MagicMock:
+    """Respuesta falsa de chat.completions.create."""
+    respuesta = MagicMock()
+    respuesta.choices = [MagicMock()]
+    respuesta.choices[0].message.content = contenido
+    return respuesta
+
+
+# =============================================================================
+# TESTS DE BACKENDS
+# =============================================================================
+
+
+@pytest.mark.parametrize("crear_backend", ["memoria", "sqlite"])
+def test_backend_expira_y_desaloja_lru(crear_backend, tmp_path):
+    """Test: las entradas expiran por TTL y se desaloja la menos usada."""
+    if crear_backend == "memoria":
+        backend = BackendMemoria(max_entradas=2)
+    else:
+        backend = BackendSQLite(str(tmp_path / "cache.sqlite3"), max_entradas=2)
+
+    backend.guardar("caducada", "x", ttl_seg=-1)
+    assert backend.obtener("caducada") is None
+
+    backend.guardar("a", "1", ttl_seg=60)
+    time.sleep(0.01)
+    backend.guardar("b", "2", ttl_seg=60)
+    time.sleep(0.01)
+    assert backend.obtener("a") == "1"  # "a" pasa a ser la más reciente
+    time.sleep(0.01)
+    backend.guardar("c", "3", ttl_seg=60)
+
+    assert backend.obtener("b") is None
+    assert backend.obtener("a") == "1"
+    assert backend.obtener("c") == "3"
+    assert backend.tamano() == 2
+
+
+def test_sqlite_persiste_entre_instancias(tmp_path):
+    """Test: la caché en disco sobrevive a un reinicio del proceso."""
+    ruta = str(tmp_path / "sub" / "cache.sqlite3")
+    BackendSQLite(ruta).guardar("clave", "respuesta", ttl_seg=60)
+
+    assert BackendSQLite(ruta).obtener("clave") == "respuesta"
+
+
+# =============================================================================
+# TESTS DE CacheLLM
+# =============================================================================
+
+
+def test_clave_depende_de_modelo_mensajes_temperatura_y_formato():
+    """Test: cambiar cualquiera de los parámetros relevantes cambia la clave."""
+    base = kwargs_chat()
+    clave = CacheLLM.calcular_clave(base)
+
+    assert CacheLLM.calcular_clave(kwargs_chat()) == clave
+    assert CacheLLM.calcular_clave({**base, "model": "gpt-4o"}) != clave
+    assert CacheLLM.calcular_clave(kwargs_chat("Necesito 6 PLCs")) != clave
+    assert CacheLLM.calcular_clave(kwargs_chat(temperatura=0.7)) != clave
+    sin_formato = {k: v for k, v in base.items() if k != "response_format"}
+    assert CacheLLM.calcular_clave(sin_formato) != clave
+
+
+def test_cuenta_aciertos_y_fallos():
+    """Test: estadisticas() refleja aciertos, fallos y entradas."""
+    cache = CacheLLM(BackendMemoria(), ttl_seg=60)
+
+    assert cache.obtener(kwargs_chat()) is None
+    cache.guardar(kwargs_chat(), '{"productos": []}')
+    assert cache.obtener(kwargs_chat()) == '{"productos": []}'
+
+    assert cache.estadisticas() == {
+        "habilitada": True,
+        "aciertos": 1,
+        "fallos": 1,
+        "tasa_aciertos": 0.5,
+        "entradas": 1,
+    }
+
+
+def test_cache_deshabilitada_no_guarda():
+    """Test: sin backend la caché no guarda ni cuenta."""
+    cache = CacheLLM(None)
+    cache.guardar(kwargs_chat(), "respuesta")
+
+    assert cache.obtener(kwargs_chat()) is None
+    assert cache.estadisticas()["fallos"] == 0
+
+
+# =============================================================================
+# TESTS DE INTEGRACIÓN CON llamar_agente
+# =============================================================================
+
+
+def test_llamar_agente_reutiliza_respuesta():
+    """Test: la segunda llamada idéntica no llega a OpenAI; usar_cache=False sí."""
+    from src.services.openai_service import llamar_agente, openai_service
+
+    cache = CacheLLM(BackendMemoria(), ttl_seg=60)
+    create = MagicMock(return_value=respuesta_openai('{"ok": true}'))
+
+    with patch("src.services.openai_service.cache_llm", cache), patch.object(
+        openai_service.client.chat.completions, "create", create
+    ):
+        primera = llamar_agente("Sistema", "Usuario", formato_json=True)
+        segunda = llamar_agente("Sistema", "Usuario", formato_json=True)
+        creativa = llamar_agente("Sistema", "Usuario", formato_json=True, usar_cache=False)
+
+    assert primera == segunda == creativa == '{"ok": true}'
+    assert create.call_count == 2
+    assert cache.estadisticas()["aciertos"] == 1
+
+
+@pytest.mark.asyncio
+async def test_llamar_agente_async_reutiliza_respuesta():
+    """Test: la versión asíncrona comparte la misma caché."""
+    from src.services.openai_service import llamar_agente, llamar_agente_async, openai_service
+
+    cache = CacheLLM(BackendMemoria(), ttl_seg=60)
+    create_async = AsyncMock(return_value=respuesta_openai("respuesta"))
+    create = MagicMock()
+
+    with patch("src.services.openai_service.cache_llm", cache), patch.object(
+        openai_service.async_client.chat.completions, "create", create_async
+    ), patch.object(openai_service.client.chat.completions, "create", create):
+        await llamar_agente_async("Sistema", "Usuario")
+        await llamar_agente_async("Sistema", "Usuario")
+        llamar_agente("Sistema", "Usuario")
+
+    assert create_async.await_count == 1
+    create.assert_not_called()
+
+
+def test_generador_rfq_no_usa_cache():
+    """Test: la redacción de RFQs desactiva la caché."""
+    from src.agents.generador_rfq import generar_rfq
+
+    with patch("src.agents.generador_rfq.llamar_agente", return_value="RFQ") as mock_llamar:
+        generar_rfq(
+            solicitud_id=1,
+            proveedor={"nombre": "Proveedor", "email": "p@x.com"},
+            productos=[{"nombre": "PLC", "cantidad": 1}],
+        )
+
+    assert mock_llamar.call_args.kwargs["usar_cache"] is False
+
+
+def test_comparador_de_precios_no_usa_cache():
+    """Test: las comparaciones de precios desactivan la caché."""
+    from src.agents import comparador_precios
+
+    analisis = '{"recomendacion_principal": {"accion": "cotizar"}}'
+    with patch.object(comparador_precios, "llamar_agente", return_value=analisis) as mock_llamar:
+        comparador_precios.comparar_precios_multiples_fuentes([], [], [], [])
+
+    assert mock_llamar.call_args.kwargs["usar_cache"] is False
+
+
+def test_backend_incompleto_falla_al_crearse():
+    """Test: un backend que no implementa toda la interfaz no se puede instanciar."""
+
+    class BackendSinTamano(BackendCache):
+        def obtener(self, clave):
+            return None
+
+        def guardar(self, clave, valor, ttl_seg):
+            pass
+
+        def limpiar(self):
+            pass
+
+    with pytest.raises(TypeError, match="tamano"):
+        BackendSinTamano()
+
+
+def test_endpoint_metricas_incluye_cache_llm():
+    """Test: GET /metricas expone las estadísticas de la caché."""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    respuesta = TestClient(app).get("/metricas").json()
+
+    assert set(respuesta["cache_llm"]) == {
+        "habilitada", "aciertos", "fallos", "tasa_aciertos", "entradas"
+    }
@@ -0,0 +1,132 @@
+"""
+Tests de la caché de resultados de búsqueda (Serper) del SearchService.
+"""
+import threading
+import time
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+import requests
+
+from src.core.cache import BackendMemoria, CacheBusquedas
+from src.services.search_service import SearchService
+
+
+def respuesta_serper(titulo: str) -> Mock:
+    respuesta = Mock()
+    respuesta.json.return_value = {
+        "organic": [{"title": titulo, "link": "https://x.mx", "snippet": "Tel: 81 1234 5678"}],
+        "searchParameters": {"q": titulo},
+    }
+    return respuesta
+
+
+def servicio_con_cache(ttl_seg: float = 3600, obsoleta_seg: float = 3600) -> SearchService:
+    cache = CacheBusquedas(BackendMemoria(max_entradas=100), ttl_seg, obsoleta_seg)
+    return SearchService(api_key="test-key", cache=cache)
+
+
+def esperar_revalidaciones(cache: CacheBusquedas, esperadas: int) -> None:
+    limite = time.monotonic() + 2
+    while cache.estadisticas()["revalidaciones"] < esperadas and time.monotonic() < limite:
+        time.sleep(0.01)
+
+
+def test_clave_normaliza_consulta_y_distingue_parametros():
+    """Test: mayúsculas y espacios no cambian la clave; gl, hl y num sí."""
+    payload = {"q": "PLC  Siemens ", "gl": "mx", "hl": "es", "num": 10}
+    clave = CacheBusquedas.calcular_clave(payload)
+
+    assert CacheBusquedas.calcular_clave({**payload, "q": "plc siemens"}) == clave
+    assert CacheBusquedas.calcular_clave({**payload, "gl": "us"}) != clave
+    assert CacheBusquedas.calcular_clave({**payload, "hl": "en"}) != clave
+    assert CacheBusquedas.calcular_clave({**payload, "num": 20}) != clave
+
+
+def test_consulta_repetida_no_llama_a_serper():
+    """Test: la segunda búsqueda igual sale de la caché y cuenta como acierto."""
+    servicio = servicio_con_cache()
+
+    with patch("src.services.search_service.requests.post",
+               return_value=respuesta_serper("PLC")) as mock_post:
+        primera = servicio.search("PLC Siemens")
+        segunda = servicio.search("plc  siemens")
+        servicio.buscar_proveedores_web("PLC Siemens")
+        servicio.buscar_proveedores_web("PLC Siemens")
+
+    assert mock_post.call_count == 2
+    assert primera == segunda
+    assert servicio.cache.estadisticas() == {
+        "habilitada": True, "aciertos": 2, "obsoletos": 0, "fallos": 2,
+        "tasa_aciertos": 0.5, "revalidaciones": 0, "entradas": 2,
+    }
+
+
+def test_respuesta_vencida_se_sirve_y_revalida_una_vez():
+    """Test: una entrada vencida se retorna al instante y se refresca en segundo plano."""
+    servicio = servicio_con_cache(ttl_seg=0)
+    liberar = threading.Event()
+    respuestas = iter([respuesta_serper("vieja"), respuesta_serper("nueva")])
+
+    def post(url, json, **kwargs):
+        respuesta = next(respuestas)
+        if respuesta.json()["organic"][0]["title"] == "nueva":
+            liberar.wait(2)  # La revalidación sigue en curso mientras se sirve la vieja
+        return respuesta
+
+    with patch("src.services.search_service.requests.post", side_effect=post) as mock_post:
+        servicio.search("Sensor PT100")
+        vencidas = [servicio.search("Sensor PT100") for _ in range(3)]
+        liberar.set()
+        esperar_revalidaciones(servicio.cache, 1)
+
+    assert all(r[0].title == "vieja" for r in vencidas)
+    assert mock_post.call_count == 2
+    assert servicio.cache.estadisticas()["obsoletos"] == 3
+    assert servicio.cache.estadisticas()["revalidaciones"] == 1
+
+    datos, _ = servicio.cache.obtener({"q": "sensor pt100", "num": 10, "gl": "Chile", "hl": "es"})
+    assert datos["organic"][0]["title"] == "nueva"
+
+
+def test_errores_no_se_guardan():
+    """Test: una consulta fallida no deja entrada y la siguiente reintenta."""
+    servicio = servicio_con_cache()
+    fallida = Mock()
+    fallida.raise_for_status.side_effect = requests.exceptions.HTTPError("500")
+
+    with patch("src.services.search_service.requests.post",
+               side_effect=[fallida, respuesta_serper("PLC")]) as mock_post:
+        with pytest.raises(requests.HTTPError):
+            servicio.search("PLC")
+        assert len(servicio.search("PLC")) == 1
+
+    assert mock_post.call_count == 2
+    assert servicio.cache.estadisticas()["entradas"] == 1
+
+
+async def test_ecommerce_async_reutiliza_resultados():
+    """Test: los marketplaces ya consultados no vuelven a Serper en la versión asíncrona."""
+    servicio = servicio_con_cache()
+    post_async = AsyncMock(return_value={"organic": [{"title": "Laptop", "link": "https://x.mx"}]})
+
+    with patch.object(servicio, "_post_async", post_async):
+        primera = await servicio.buscar_en_ecommerce_async("Laptop HP")
+        segunda = await servicio.buscar_en_ecommerce_async("Laptop HP")
+
+    assert post_async.await_count == 3
+    assert primera == segunda
+    assert servicio.cache.estadisticas()["aciertos"] == 3
+
+
+def test_cache_deshabilitada_siempre_consulta():
+    """Test: sin backend cada búsqueda va a Serper y no se cuentan fallos."""
+    servicio = SearchService(api_key="test-key", cache=CacheBusquedas(None))
+
+    with patch("src.services.search_service.requests.post",
+               return_value=respuesta_serper("PLC")) as mock_post:
+        servicio.search("PLC")
+        servicio.search("PLC")
+
+    assert mock_post.call_count == 2
+    assert servicio.cache.estadisticas()["fallos"] == 0
@@ -0,0 +1,268 @@
+"""
+Tests del despachador de llamadas al LLM (cuotas, concurrencia y reintentos).
+"""
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+from openai import APIConnectionError, RateLimitError
+
+from src.core.despachador import CubetaTokens, DespachadorLLM, estimar_tokens
+from src.core.metricas import registro_metricas
+
+URL_OPENAI = "https://api.openai.com/v1/chat/completions"
+
+
+def kwargs_chat(modelo: str = "modelo-test") -> dict:
+    return {"model": modelo, "messages": [{"role": "user", "content": "x" * 400}]}
+
+
+def error_429(retry_after: str = None, codigo: str = "rate_limit_exceeded") -> RateLimitError:
+    """RateLimitError como lo construye el SDK a partir de la respuesta HTTP."""
+    cabeceras = {"retry-after": retry_after} if retry_after else {}
+    respuesta = httpx.Response(429, headers=cabeceras, request=httpx.Request("POST", URL_OPENAI))
+    return RateLimitError("Rate limit", response=respuesta, body={"code": codigo})
+
+
+def test_estimar_tokens():
+    """Test: ~4 caracteres por token más la respuesta esperada."""
+    assert estimar_tokens(kwargs_chat(), tokens_respuesta=500) == 600
+    assert estimar_tokens({**kwargs_chat(), "max_tokens": 50}, tokens_respuesta=500) == 150
+
+
+def test_cubeta_reserva_anticipada():
+    """Test: al agotar la cubeta la espera crece con cada reserva."""
+    cubeta = CubetaTokens(capacidad_por_minuto=60)  # 1 token/s
+
+    assert cubeta.reservar(60) == 0
+    assert cubeta.reservar(1) == pytest.approx(1, abs=0.05)
+    assert cubeta.reservar(1) == pytest.approx(2, abs=0.05)
+
+    cubeta.devolver(2)
+    assert cubeta.reservar(1) == pytest.approx(1, abs=0.05)
+
+
+def test_cuota_rpm_espera_en_lugar_de_fallar():
+    """Test: superar las solicitudes por minuto hace esperar, no llamar."""
+    despachador = DespachadorLLM(limites={"modelo-test": {"rpm": 2, "tpm": 100000}})
+    crear = MagicMock(return_value="ok")
+
+    with patch("src.core.despachador.time.sleep") as mock_sleep:
+        for _ in range(3):
+            despachador.ejecutar(crear, **kwargs_chat())
+
+    assert crear.call_count == 3
+    mock_sleep.assert_called_once()
+    assert mock_sleep.call_args.args[0] == pytest.approx(30, abs=0.5)  # 2 por minuto
+
+
+def test_reintenta_429_respetando_retry_after():
+    """Test: un 429 se reintenta tras Retry-After y el span lo registra."""
+    despachador = DespachadorLLM(limites={"modelo-429": {"rpm": 600, "tpm": 100000}})
+    crear = MagicMock(side_effect=[error_429(retry_after="2"), "ok"])
+
+    with patch("src.core.despachador.time.sleep") as mock_sleep:
+        assert despachador.ejecutar(crear, **kwargs_chat("modelo-429")) == "ok"
+
+    esperas = [c.args[0] for c in mock_sleep.call_args_list]
+    assert max(esperas) >= 2
+    assert despachador.estado()["reintentos"] == 1
+    # El 429 también pausa la cuota del modelo para el resto de llamadas
+    assert despachador.estado()["modelos"]["modelo-429"]["solicitudes_disponibles"] < 0
+
+    resultados = registro_metricas.resumen()["spans"]["llm.modelo-429"]["resultados"]
+    assert resultados["rate_limit"] >= 1
+    assert resultados["reintento"] >= 1
+
+
+def test_backoff_exponencial_y_limite_de_reintentos():
+    """Test: sin Retry-After la espera se duplica y al final se propaga el error."""
+    despachador = DespachadorLLM(max_reintentos=3, backoff_base_seg=1, backoff_max_seg=100)
+    error = APIConnectionError(request=httpx.Request("POST", URL_OPENAI))
+    crear = MagicMock(side_effect=error)
+
+    with patch("src.core.despachador.time.sleep") as mock_sleep, pytest.raises(
+        APIConnectionError
+    ):
+        despachador.ejecutar(crear, **kwargs_chat())
+
+    esperas = [c.args[0] for c in mock_sleep.call_args_list]
+    assert crear.call_count == 4
+    for intento, espera in enumerate(esperas):
+        assert 0.5 * 2**intento <= espera <= 2**intento
+
+
+def test_cuota_agotada_no_se_reintenta():
+    """Test: insufficient_quota falla de inmediato."""
+    despachador = DespachadorLLM()
+    crear = MagicMock(side_effect=error_429(codigo="insufficient_quota"))
+
+    with pytest.raises(RateLimitError):
+        despachador.ejecutar(crear, **kwargs_chat())
+
+    assert crear.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_limite_de_concurrencia_async():
+    """Test: nunca hay más llamadas en vuelo que max_concurrencia."""
+    despachador = DespachadorLLM(max_concurrencia=2)
+    en_vuelo, maximo = 0, 0
+
+    async def crear(**kwargs):
+        nonlocal en_vuelo, maximo
+        en_vuelo += 1
+        maximo = max(maximo, en_vuelo)
+        await asyncio.sleep(0.02)
+        en_vuelo -= 1
+        return SimpleNamespace(usage=None)
+
+    await asyncio.gather(*(despachador.ejecutar_async(crear, **kwargs_chat()) for _ in range(6)))
+
+    assert maximo == 2
+    assert despachador.estado()["en_vuelo"] == 0
+
+
+@pytest.mark.asyncio
+async def test_reintento_async_no_bloquea_el_loop():
+    """Test: la espera entre reintentos usa asyncio.sleep."""
+    despachador = DespachadorLLM(backoff_base_seg=0.01)
+    llamadas = []
+
+    async def crear(**kwargs):
+        llamadas.append(kwargs["model"])
+        if len(llamadas) == 1:
+            raise error_429()
+        return "ok"
+
+    assert await despachador.ejecutar_async(crear, **kwargs_chat()) == "ok"
+    assert len(llamadas) == 2
+
+
+class StreamFalso:
+    """Stream asíncrono falso que tarda en entregar sus chunks."""
+
+    def __init__(self, chunks: int = 3, latencia: float = 0.02):
+        self.chunks = chunks
+        self.latencia = latencia
+        self.cerrado = False
+
+    def __aiter__(self):
+        return self._iterar()
+
+    async def _iterar(self):
+        for i in range(self.chunks):
+            await asyncio.sleep(self.latencia)
+            yield i
+
+    async def close(self):
+        self.cerrado = True
+
+
+@pytest.mark.asyncio
+async def test_stream_conserva_el_cupo_hasta_terminar_de_leer():
+    """Test: un stream cuenta como llamada en vuelo hasta que se lee o se cierra."""
+    despachador = DespachadorLLM(max_concurrencia=2)
+    streams, en_lectura, maximo = [], 0, 0
+
+    async def crear(**kwargs):
+        streams.append(StreamFalso())
+        return streams[-1]
+
+    async def leer():
+        nonlocal en_lectura, maximo
+        async with despachador.stream_async(crear, **kwargs_chat(), stream=True) as stream:
+            en_lectura += 1
+            maximo = max(maximo, en_lectura)
+            assert despachador.estado()["en_vuelo"] <= 2
+            async for _ in stream:
+                pass
+            en_lectura -= 1
+
+    await asyncio.gather(*(leer() for _ in range(6)))
+
+    assert maximo == 2
+    assert all(s.cerrado for s in streams)
+    assert despachador.estado()["en_vuelo"] == 0
+
+
+def test_stream_sincrono_se_cierra_y_libera_el_cupo_si_se_abandona():
+    """Test: salir del bloque a mitad del stream lo cierra y mide hasta ese punto."""
+    despachador = DespachadorLLM(max_concurrencia=1)
+    stream = MagicMock()
+    stream.__iter__.return_value = iter(range(5))
+
+    with despachador.stream(lambda **kwargs: stream, **kwargs_chat("modelo-stream")) as s:
+        for _ in s:
+            assert despachador.estado()["en_vuelo"] == 1
+            break
+
+    stream.close.assert_called_once()
+    assert despachador.estado()["en_vuelo"] == 0
+    assert despachador._semaforo.acquire(blocking=False)
+
+
+def test_uso_real_corrige_la_estimacion():
+    """Test: los tokens reportados por la API ajustan la cubeta."""
+    despachador = DespachadorLLM(limites={"modelo-uso": {"rpm": 600, "tpm": 6000}})
+    respuesta = SimpleNamespace(usage=SimpleNamespace(total_tokens=100))
+
+    despachador.ejecutar(lambda **kwargs: respuesta, **kwargs_chat("modelo-uso"))
+
+    disponibles = despachador.estado()["modelos"]["modelo-uso"]["tokens_disponibles"]
+    assert disponibles == pytest.approx(5900, abs=5)
+
+
+def test_intentos_fallidos_devuelven_sus_tokens():
+    """Test: cada reintento reserva de nuevo, pero la cubeta solo paga el intento que respondió."""
+    despachador = DespachadorLLM(
+        limites={"modelo-fallas": {"rpm": 600, "tpm": 6000}}, max_reintentos=3
+    )
+    error = APIConnectionError(request=httpx.Request("POST", URL_OPENAI))
+    crear = MagicMock(side_effect=[error, error, SimpleNamespace(usage=None)])
+
+    with patch("src.core.despachador.time.sleep"):
+        despachador.ejecutar(crear, **kwargs_chat("modelo-fallas"))
+
+    modelo = despachador.estado()["modelos"]["modelo-fallas"]
+    assert modelo["tokens_disponibles"] == pytest.approx(5400, abs=5)  # una sola reserva de 600
+    assert modelo["solicitudes_disponibles"] == pytest.approx(597, abs=0.5)
+
+    crear = MagicMock(side_effect=error_429(codigo="insufficient_quota"))
+    with pytest.raises(RateLimitError):
+        despachador.ejecutar(crear, **kwargs_chat("modelo-fallas"))
+    tokens = despachador.estado()["modelos"]["modelo-fallas"]["tokens_disponibles"]
+    assert tokens == pytest.approx(5400, abs=5)
+
+
+@pytest.mark.asyncio
+async def test_stream_ajusta_la_reserva_con_el_chunk_de_uso():
+    """Test: al cerrar un stream la cubeta se corrige con los tokens reales."""
+    despachador = DespachadorLLM(limites={"modelo-stream-uso": {"rpm": 600, "tpm": 6000}})
+    chunks = [SimpleNamespace(usage=None), SimpleNamespace(usage=SimpleNamespace(total_tokens=100))]
+
+    async def crear(**kwargs):
+        async def iterar():
+            for chunk in chunks:
+                yield chunk
+        return iterar()
+
+    async with despachador.stream_async(crear, **kwargs_chat("modelo-stream-uso")) as stream:
+        assert [chunk async for chunk in stream] == chunks
+
+    disponibles = despachador.estado()["modelos"]["modelo-stream-uso"]["tokens_disponibles"]
+    assert disponibles == pytest.approx(5900, abs=5)
+
+
+def test_endpoint_metricas_incluye_despachador():
+    """Test: GET /metricas expone el estado del despachador."""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    respuesta = TestClient(app).get("/metricas").json()
+
+    assert {"en_vuelo", "max_concurrencia", "reintentos", "modelos"} <= set(
+        respuesta["despachador_llm"]
+    )
@@ -0,0 +1,88 @@
+"""
+Tests del enriquecimiento de las recomendaciones de BD del Investigador
+(sin una consulta por recomendación).
+"""
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from src.agents import investigador
+from src.agents.investigador import _enriquecer_recomendaciones
+from src.database.models import Proveedor
+
+
+@contextmanager
+def contar_consultas():
+    """Cuenta las sentencias SQL ejecutadas con el engine del Investigador."""
+    sentencias = []
+
+    def registrar(conn, cursor, sentencia, *args):
+        sentencias.append(sentencia)
+
+    event.listen(investigador.engine, "before_cursor_execute", registrar)
+    try:
+        yield sentencias
+    finally:
+        event.remove(investigador.engine, "before_cursor_execute", registrar)
+
+
+@pytest.fixture
+def proveedores():
+    """Cinco proveedores en BD."""
+    db = investigador.SessionLocal()
+    try:
+        creados = [
+            Proveedor(nombre=f"Enriquecer {i}", email=f"enriquecer{i}@test.com",
+                      categoria="Metales", ciudad="Monterrey")
+            for i in range(5)
+        ]
+        db.add_all(creados)
+        db.commit()
+        yield [{"id": p.id, "nombre": p.nombre, "email": p.email,
+                "telefono": None, "ciudad": p.ciudad} for p in creados]
+    finally:
+        db.close()
+
+
+def recomendaciones_de(proveedores: list) -> dict:
+    return {"proveedores_recomendados": [
+        {"proveedor_id": str(p["id"]), "nombre": p["nombre"], "fuente": "base_de_datos"}
+        for p in proveedores
+    ] + [{"proveedor_id": None, "nombre": "Web", "fuente": "web"}]}
+
+
+def test_una_sola_consulta_para_todas_las_recomendaciones(proveedores):
+    """Test: N recomendaciones que no estaban cargadas se leen con un solo IN."""
+    recomendaciones = recomendaciones_de(proveedores)
+
+    with contar_consultas() as sentencias:
+        investigador._en_sesion(_enriquecer_recomendaciones, recomendaciones)
+
+    assert len(sentencias) == 1
+    assert " IN " in sentencias[0]
+    datos = [r.get("proveedor_data") for r in recomendaciones["proveedores_recomendados"]]
+    assert datos[:5] == proveedores
+    assert datos[5] is None
+
+
+def test_proveedores_cargados_no_se_consultan(proveedores):
+    """Test: los candidatos ya cargados para el prompt no vuelven a la BD."""
+    recomendaciones = recomendaciones_de(proveedores)
+    recomendaciones["proveedores_recomendados"].append(
+        {"proveedor_id": 10 ** 9, "nombre": "Inventado", "fuente": "base_de_datos"}
+    )
+
+    with contar_consultas() as sentencias:
+        investigador._en_sesion(_enriquecer_recomendaciones, recomendaciones, proveedores[:3])
+
+    assert len(sentencias) == 1  # Solo los dos faltantes y el inexistente
+    recomendados = recomendaciones["proveedores_recomendados"]
+    assert [r["proveedor_data"]["id"] for r in recomendados[:5]] == [p["id"] for p in proveedores]
+    assert "proveedor_data" not in recomendados[-1]
+
+    with contar_consultas() as sentencias:
+        investigador._en_sesion(
+            _enriquecer_recomendaciones, recomendaciones_de(proveedores), proveedores
+        )
+    assert sentencias == []
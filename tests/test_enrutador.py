@@ -0,0 +1,205 @@
+"""
+Tests del enrutamiento de modelos por tarea y su escalamiento.
+"""
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from src.agents import comparador_precios
+from src.core.enrutador import (
+    POLITICA_ECONOMICA,
+    POLITICA_MAXIMA,
+    EnrutadorModelos,
+    validar_redaccion,
+)
+from src.services.openai_service import OpenAIService, llamar_agente
+
+ESCALERA = {"tarea": ["mini", "full"]}
+
+
+def validar_bueno(contenido: str) -> str:
+    if contenido != "bueno":
+        raise ValueError(f"respuesta inválida: {contenido}")
+    return contenido.upper()
+
+
+def respuesta(content: str) -> SimpleNamespace:
+    """Respuesta de chat completion con lo mínimo que lee el servicio."""
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def test_primer_modelo_valido_no_escala():
+    """Test: si el modelo barato valida, no se llama al siguiente."""
+    enrutador = EnrutadorModelos(ESCALERA)
+    llamados = []
+
+    resultado = enrutador.ejecutar("tarea", lambda m: llamados.append(m) or "bueno", validar_bueno)
+
+    assert resultado == "BUENO"
+    assert llamados == ["mini"]
+    assert enrutador.estado()["tareas"]["tarea"]["respuestas"] == {"mini": 1}
+
+
+def test_escala_si_la_validacion_falla():
+    """Test: una respuesta inválida escala al siguiente modelo y se cuenta."""
+    enrutador = EnrutadorModelos(ESCALERA)
+    respuestas = {"mini": "malo", "full": "bueno"}
+    llamados = []
+
+    resultado = enrutador.ejecutar(
+        "tarea", lambda m: llamados.append(m) or respuestas[m], validar_bueno
+    )
+
+    assert resultado == "BUENO"
+    assert llamados == ["mini", "full"]
+    tarea = enrutador.estado()["tareas"]["tarea"]
+    assert tarea["escalamientos"] == 1
+    assert tarea["respuestas"] == {"full": 1}
+
+
+def test_sin_respuesta_valida_propaga_el_error():
+    """Test: si el último modelo tampoco valida, se propaga el ValueError."""
+    enrutador = EnrutadorModelos(ESCALERA)
+
+    with pytest.raises(ValueError, match="respuesta inválida"):
+        enrutador.ejecutar("tarea", lambda m: "malo", validar_bueno)
+
+    assert enrutador.estado()["tareas"]["tarea"]["sin_respuesta_valida"] == 1
+
+
+def test_errores_de_api_no_escalan():
+    """Test: los errores que no son de validación no cambian de modelo."""
+    enrutador = EnrutadorModelos(ESCALERA)
+    llamados = []
+
+    def llamar(modelo):
+        llamados.append(modelo)
+        raise RuntimeError("API caída")
+
+    with pytest.raises(RuntimeError):
+        enrutador.ejecutar("tarea", llamar, validar_bueno)
+    assert llamados == ["mini"]
+
+
+def test_politicas():
+    """Test: económica usa solo el primer modelo y máxima solo el último."""
+    assert EnrutadorModelos(ESCALERA).modelos("tarea") == ["mini", "full"]
+    assert EnrutadorModelos(ESCALERA, politica=POLITICA_ECONOMICA).modelos("tarea") == ["mini"]
+    assert EnrutadorModelos(ESCALERA, politica=POLITICA_MAXIMA).modelos("tarea") == ["full"]
+    assert EnrutadorModelos(ESCALERA, ["a", "b"]).modelos("otra") == ["a", "b"]
+
+    with pytest.raises(ValueError):
+        EnrutadorModelos(ESCALERA, politica="la_mas_cara")
+
+
+async def test_escalamiento_async():
+    """Test: la versión asíncrona escala igual."""
+    enrutador = EnrutadorModelos(ESCALERA)
+
+    async def llamar(modelo):
+        return {"mini": "malo", "full": "bueno"}[modelo]
+
+    assert await enrutador.ejecutar_async("tarea", llamar, validar_bueno) == "BUENO"
+
+
+def test_validar_redaccion():
+    """Test: se rechazan redacciones vacías, truncadas o con placeholders."""
+    texto = "Estimado proveedor, solicitamos su cotización para 50 placas de acero."
+    assert validar_redaccion(texto) == texto
+
+    for invalido in ("", "Estimado proveedor", texto + "\n\nAtentamente,\n[Tu Nombre]"):
+        with pytest.raises(ValueError):
+            validar_redaccion(invalido)
+
+
+def test_analizar_cotizacion_escala_con_analisis_no_creible():
+    """Test: un precio en cero del modelo mini escala al modelo completo."""
+    servicio = OpenAIService(api_key="test-key")
+    cotizacion = {
+        "proveedor": "Tech Solutions",
+        "tiempo_entrega_dias": 15,
+        "calidad_score": 8.0,
+        "ventajas": [],
+        "desventajas": [],
+        "recomendacion": "Buena opción",
+    }
+    modelos = []
+
+    def crear(**kwargs):
+        modelos.append(kwargs["model"])
+        precio = 0.0 if kwargs["model"] == "gpt-4o-mini" else 45000.0
+        return respuesta(json.dumps({**cotizacion, "precio_total": precio}))
+
+    with patch.object(servicio.client.chat.completions, "create", side_effect=crear):
+        resultado = servicio.analizar_cotizacion("Email", "Tech Solutions", "Laptops", usar_cache=False)
+
+    assert modelos == ["gpt-4o-mini", "gpt-4o"]
+    assert resultado.precio_total == 45000.0
+
+
+def test_respuesta_invalida_no_se_cachea():
+    """Test: la respuesta del mini que hace escalar no se guarda; la válida sí."""
+    from src.core.cache import BackendMemoria, CacheLLM
+
+    servicio = OpenAIService(api_key="test-key")
+    cache = CacheLLM(BackendMemoria(), ttl_seg=60)
+    modelos = []
+
+    def crear(**kwargs):
+        modelos.append(kwargs["model"])
+        return respuesta("malo" if kwargs["model"] == "gpt-4o-mini" else "bueno")
+
+    with patch("src.services.openai_service.cache_llm", cache), patch.object(
+        servicio.client.chat.completions, "create", side_effect=crear
+    ):
+        primera = servicio.completar_tarea("generar_rfq", {"messages": []}, validar_bueno)
+        segunda = servicio.completar_tarea("generar_rfq", {"messages": []}, validar_bueno)
+
+    assert primera == segunda == "BUENO"
+    # La segunda vez el mini se vuelve a consultar, pero el modelo completo sale de caché
+    assert modelos == ["gpt-4o-mini", "gpt-4o", "gpt-4o-mini"]
+    assert cache.obtener({"messages": [], "model": "gpt-4o-mini"}) is None
+
+
+def test_llamar_agente_con_tarea_elige_modelo():
+    """Test: con `tarea`, el modelo lo decide el enrutador y no el parámetro."""
+    rfq = "Estimado proveedor, solicitamos cotización de 50 placas de acero inoxidable."
+    modelos = []
+
+    def crear(**kwargs):
+        modelos.append(kwargs["model"])
+        if kwargs["model"] == "gpt-4o-mini":
+            return respuesta(rfq + "\n\n[Tu Nombre]")
+        return respuesta(rfq)
+
+    with patch(
+        "src.services.openai_service.openai_service.client.chat.completions.create",
+        side_effect=crear,
+    ):
+        resultado = llamar_agente(
+            "Sistema", "Usuario", modelo="modelo-ignorado", usar_cache=False,
+            tarea="generar_rfq", validar=validar_redaccion,
+        )
+
+    assert resultado == rfq
+    assert modelos == ["gpt-4o-mini", "gpt-4o"]
+
+
+def test_comparador_declara_tarea():
+    """Test: el comparador declara su tarea en lugar de fijar el modelo."""
+    analisis = {"recomendacion_principal": {"accion": "cotizar"}}
+
+    with patch.object(
+        comparador_precios, "llamar_agente", return_value=json.dumps(analisis)
+    ) as mock_llamar:
+        resultado = comparador_precios.comparar_precios_multiples_fuentes([], [], [], [])
+
+    assert resultado == {"exito": True, "analisis": analisis}
+    kwargs = mock_llamar.call_args.kwargs
+    assert kwargs["tarea"] == "comparar_precios"
+    assert "modelo" not in kwargs
+
+    with pytest.raises(ValueError):
+        kwargs["validar"](json.dumps({"alertas": []}))
@@ -0,0 +1,176 @@
+"""
+Tests del bus de eventos y del stream SSE de progreso por solicitud.
+"""
+import asyncio
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from src.core.eventos import EVENTO_FINALIZADO, BusEventos
+
+
+# =============================================================================
+# TESTS DEL BUS
+# =============================================================================
+
+
+@pytest.mark.asyncio
+async def test_suscriptor_recibe_replay_y_eventos_en_vivo():
+    """Test: un suscriptor tardío recibe lo ya publicado y lo que sigue."""
+    bus = BusEventos()
+    bus.publicar(1, "etapa", {"etapa": "investigador"})
+
+    async def consumir():
+        return [e["tipo"] async for e in bus.suscribir(1)]
+
+    tarea = asyncio.create_task(consumir())
+    await asyncio.sleep(0.01)
+
+    # Publicación desde otro hilo, como hace el envío de RFQs
+    hilo = threading.Thread(target=bus.publicar, args=(1, "rfq", {"exito": True}))
+    hilo.start()
+    hilo.join()
+    bus.publicar(1, EVENTO_FINALIZADO, {"exito": True})
+
+    tipos = await asyncio.wait_for(tarea, timeout=1)
+    assert tipos == ["etapa", "rfq", EVENTO_FINALIZADO]
+
+
+@pytest.mark.asyncio
+async def test_reconexion_con_desde_id():
+    """Test: al reconectar solo se reenvían los eventos posteriores."""
+    bus = BusEventos()
+    primero = bus.publicar(7, "etapa", {"etapa": "investigador"})
+    bus.publicar(7, "etapa", {"etapa": "generador_rfq"})
+    bus.publicar(7, EVENTO_FINALIZADO)
+
+    eventos = [e async for e in bus.suscribir(7, desde_id=primero["id"])]
+
+    assert [e["datos"].get("etapa") for e in eventos] == ["generador_rfq", None]
+
+
+@pytest.mark.asyncio
+async def test_latido_sin_eventos():
+    """Test: sin eventos, el suscriptor recibe None como keep-alive."""
+    bus = BusEventos()
+    suscripcion = bus.suscribir(3, intervalo_latido=0.01)
+
+    assert await asyncio.wait_for(suscripcion.__anext__(), timeout=1) is None
+    await suscripcion.aclose()
+
+
+def test_buffer_acotado():
+    """Test: el bus descarta eventos y solicitudes antiguas."""
+    bus = BusEventos(max_eventos=2, max_solicitudes=2)
+    for i in range(5):
+        bus.publicar(1, "etapa", {"n": i})
+
+    assert [e["datos"]["n"] for e in bus.eventos(1)] == [3, 4]
+
+    bus.publicar(2, "etapa")
+    bus.publicar(3, "etapa")
+
+    assert bus.eventos(1) == []
+    assert len(bus.eventos(3)) == 1
+
+
+
+@pytest.mark.asyncio
+async def test_reiniciar_replay_solo_de_la_ejecucion_actual():
+    """Test: tras reiniciar (reanudación), el replay no corta en el "finalizado" previo."""
+    bus = BusEventos()
+    bus.publicar(5, "etapa")
+    bus.publicar(5, EVENTO_FINALIZADO)
+
+    bus.reiniciar(5)
+    bus.publicar(5, "etapa")
+    bus.publicar(5, "rfq")
+    bus.publicar(5, EVENTO_FINALIZADO)
+
+    tipos = [e["tipo"] async for e in bus.suscribir(5)]
+
+    assert tipos == ["etapa", "rfq", EVENTO_FINALIZADO]
+
+
+# =============================================================================
+# TESTS DEL ENDPOINT SSE
+# =============================================================================
+
+
+def test_endpoint_events_transmite_hasta_finalizado():
+    """Test: GET /solicitud/{id}/events envía los eventos y cierra al final."""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    bus = BusEventos()
+    bus.publicar(55, "etapa", {"etapa": "generador_rfq", "progreso": 70})
+    bus.publicar(55, "rfq", {"proveedor": "Proveedor A", "exito": True})
+    bus.publicar(55, EVENTO_FINALIZADO, {"exito": True})
+
+    with patch("main.bus_eventos", bus):
+        response = TestClient(app).get("/solicitud/55/events")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert "event: etapa" in response.text
+    assert "event: rfq" in response.text
+    assert response.text.rstrip().split("\n")[-2] == f"event: {EVENTO_FINALIZADO}"
+
+
+def test_endpoint_events_solicitud_inexistente():
+    """Test: sin eventos ni solicitud en BD responde 404."""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with patch("main.bus_eventos", BusEventos()), patch(
+        "main.obtener_estado_solicitud",
+        return_value={"error": "Solicitud no encontrada", "solicitud_id": 404},
+    ):
+        response = TestClient(app).get("/solicitud/404/events")
+
+    assert response.status_code == 404
+
+
+def test_endpoint_events_solicitud_completada_cierra_tras_el_estado():
+    """Test: sin eventos en memoria ni flujo en curso, envía `estado` y cierra.
+
+    Un flujo exitoso deja la solicitud en "en_proceso" (RFQs enviados), así
+    que el estado en BD no basta para saber que ya no habrá más eventos.
+    """
+    from fastapi.testclient import TestClient
+    from main import app
+
+    bus = BusEventos()
+    with patch("main.bus_eventos", bus), patch(
+        "main.obtener_estado_solicitud",
+        return_value={"solicitud_id": 77, "estado": "en_proceso", "rfqs_enviados": 2},
+    ), patch.object(bus, "suscribir") as mock_suscribir:
+        response = TestClient(app).get("/solicitud/77/events")
+
+    assert response.status_code == 200
+    assert response.text.count("event: ") == 1
+    assert "event: estado" in response.text
+    assert '"estado": "en_proceso"' in response.text
+    mock_suscribir.assert_not_called()
+
+
+def test_endpoint_events_con_flujo_en_curso_sigue_suscrito():
+    """Test: si la solicitud se está reanudando, tras el `estado` llegan sus eventos."""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    async def suscribir(solicitud_id, desde_id=0, intervalo_latido=None):
+        yield {"id": 1, "tipo": EVENTO_FINALIZADO, "datos": {"exito": True}}
+
+    bus = BusEventos()
+    with patch("main.bus_eventos", bus), patch(
+        "main.obtener_estado_solicitud",
+        return_value={"solicitud_id": 78, "estado": "cancelada", "rfqs_enviados": 0},
+    ), patch("main.flujo_en_curso", return_value=True), patch.object(
+        bus, "suscribir", side_effect=suscribir
+    ):
+        response = TestClient(app).get("/solicitud/78/events")
+
+    assert "event: estado" in response.text
+    assert response.text.rstrip().split("\n")[-2] == f"event: {EVENTO_FINALIZADO}"
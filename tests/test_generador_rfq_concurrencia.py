@@ -0,0 +1,170 @@
+"""
+Tests del envío concurrente de RFQs a múltiples proveedores.
+
+Verifica que `enviar_rfqs_multiples` (hilos) y `enviar_rfqs_multiples_async`
+(semáforo) procesan los proveedores en paralelo, respetan el límite de
+concurrencia, aíslan los fallos y conservan el orden de los resultados.
+"""
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from src.agents.generador_rfq import enviar_rfqs_multiples, enviar_rfqs_multiples_async
+from src.database.models import EstadoSolicitud, Proveedor, Solicitud
+from src.database.session import SessionLocal
+
+
+LATENCIA = 0.1
+N_PROVEEDORES = 10
+
+
+# =============================================================================
+# FIXTURES
+# =============================================================================
+
+
+@pytest.fixture
+def solicitud_y_proveedores():
+    """Crea una solicitud y N proveedores en BD."""
+    db = SessionLocal()
+    solicitud = Solicitud(
+        usuario_nombre="Test",
+        usuario_contacto="test@test.com",
+        descripcion="Test concurrencia",
+        categoria="Metales",
+        estado=EstadoSolicitud.PENDIENTE,
+    )
+    db.add(solicitud)
+
+    proveedores = [
+        Proveedor(nombre=f"Proveedor {i}", email=f"p{i}@test.com", categoria="Metales")
+        for i in range(N_PROVEEDORES)
+    ]
+    db.add_all(proveedores)
+    db.commit()
+
+    recomendados = [
+        {"proveedor_data": {"id": p.id, "nombre": p.nombre, "email": p.email}}
+        for p in proveedores
+    ]
+    yield solicitud.id, recomendados
+    db.close()
+
+
+class MedidorConcurrencia:
+    """Cuenta cuántas llamadas están en curso a la vez."""
+
+    def __init__(self):
+        self.en_curso = 0
+        self.maximo = 0
+        self._lock = threading.Lock()
+
+    def entrar(self):
+        with self._lock:
+            self.en_curso += 1
+            self.maximo = max(self.maximo, self.en_curso)
+
+    def salir(self):
+        with self._lock:
+            self.en_curso -= 1
+
+
+PRODUCTOS = [{"nombre": "Placas de acero", "cantidad": "50"}]
+
+
+def email_falla_para(email_fallido: str):
+    """send_email falso que falla solo para un destinatario."""
+    def enviar(to, subject, body):
+        return to != email_fallido
+
+    return enviar
+
+
+# =============================================================================
+# TESTS
+# =============================================================================
+
+
+def test_enviar_rfqs_multiples_en_paralelo(solicitud_y_proveedores):
+    """Test: la versión síncrona tarda lo que el proveedor más lento."""
+    solicitud_id, recomendados = solicitud_y_proveedores
+    medidor = MedidorConcurrencia()
+
+    def llm_lento(**kwargs):
+        medidor.entrar()
+        time.sleep(LATENCIA)
+        medidor.salir()
+        return "RFQ de prueba"
+
+    with patch("src.agents.generador_rfq.llamar_agente", side_effect=llm_lento), patch(
+        "src.agents.generador_rfq.email_service.send_email",
+        side_effect=email_falla_para("p3@test.com"),
+    ):
+        inicio = time.perf_counter()
+        resultado = enviar_rfqs_multiples(
+            solicitud_id, recomendados, PRODUCTOS, max_concurrencia=N_PROVEEDORES
+        )
+        duracion = time.perf_counter() - inicio
+
+    assert duracion < N_PROVEEDORES * LATENCIA / 2
+    assert medidor.maximo > 1
+    assert resultado["total"] == N_PROVEEDORES
+    assert resultado["exitosos"] == N_PROVEEDORES - 1
+    assert resultado["fallidos"] == 1
+    assert resultado["detalles"][3]["exito"] is False
+    assert [d.get("proveedor") for d in resultado["detalles"] if d["exito"]] == [
+        r["proveedor_data"]["nombre"] for i, r in enumerate(recomendados) if i != 3
+    ]
+
+
+@pytest.mark.asyncio
+async def test_enviar_rfqs_multiples_async_respeta_limite(solicitud_y_proveedores):
+    """Test: la versión asíncrona no supera el límite de concurrencia."""
+    solicitud_id, recomendados = solicitud_y_proveedores
+    medidor = MedidorConcurrencia()
+
+    async def generar_lento(solicitud_id, proveedor, productos, urgencia):
+        medidor.entrar()
+        await asyncio.sleep(LATENCIA)
+        medidor.salir()
+        if proveedor["email"] == "p5@test.com":
+            raise RuntimeError("Timeout de OpenAI")
+        return {"exito": True, "contenido": "RFQ de prueba", "fecha_limite": None}
+
+    with patch(
+        "src.agents.generador_rfq.generar_rfq_async", side_effect=generar_lento
+    ), patch("src.agents.generador_rfq.email_service.send_email", return_value=True):
+        inicio = time.perf_counter()
+        resultado = await enviar_rfqs_multiples_async(
+            solicitud_id, recomendados, PRODUCTOS, max_concurrencia=5
+        )
+        duracion = time.perf_counter() - inicio
+
+    assert medidor.maximo == 5
+    assert duracion < N_PROVEEDORES * LATENCIA / 2
+    assert resultado["exitosos"] == N_PROVEEDORES - 1
+    assert resultado["fallidos"] == 1
+    assert resultado["detalles"][5] == {"exito": False, "error": "Timeout de OpenAI"}
+    assert resultado["detalles"][0]["proveedor"] == "Proveedor 0"
+    assert resultado["detalles"][9]["proveedor"] == "Proveedor 9"
+
+
+def test_metricas_se_conservan_en_hilos(solicitud_y_proveedores):
+    """Test: los spans de cada hilo del pool llegan a la solicitud en curso."""
+    from src.core.metricas import iniciar_tiempos, terminar_tiempos
+
+    solicitud_id, recomendados = solicitud_y_proveedores
+
+    with patch("src.agents.generador_rfq.llamar_agente", return_value="RFQ"), patch(
+        "src.agents.generador_rfq.email_service.send_email", return_value=True
+    ):
+        token = iniciar_tiempos()
+        enviar_rfqs_multiples(solicitud_id, recomendados, PRODUCTOS, max_concurrencia=4)
+        tiempos = terminar_tiempos(token)
+
+    assert tiempos["spans"]["generador_rfq.llm"]["llamadas"] == N_PROVEEDORES
+    assert tiempos["spans"]["generador_rfq.smtp"]["llamadas"] == N_PROVEEDORES
+    assert tiempos["spans"]["generador_rfq.proveedor"]["resultados"] == {"ok": N_PROVEEDORES}
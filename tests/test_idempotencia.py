@@ -0,0 +1,253 @@
+"""
+Tests de idempotencia y deduplicación en vuelo de los envíos a la API.
+"""
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.core.idempotencia import ConflictoIdempotencia, GestorIdempotencia, calcular_huella
+from src.database.crud import clave_idempotencia as crud_clave
+from src.database.session import SessionLocal
+
+
+TTL = timedelta(minutes=5)
+
+
+def clave_unica() -> str:
+    """Clave distinta por test (la BD de tests se comparte)."""
+    return f"test:{uuid.uuid4().hex}"
+
+
+class FlujoContado:
+    """Flujo falso que cuenta sus ejecuciones."""
+
+    def __init__(self, codigo: int = 200, latencia: float = 0.05):
+        self.codigo = codigo
+        self.latencia = latencia
+        self.ejecuciones = 0
+
+    async def __call__(self):
+        self.ejecuciones += 1
+        await asyncio.sleep(self.latencia)
+        return self.codigo, {"solicitud_id": 100 + self.ejecuciones}
+
+
+# =============================================================================
+# TESTS DEL GESTOR
+# =============================================================================
+
+
+def test_huella_normaliza_espacios():
+    """Test: reenvíos con espacios de más tienen la misma huella."""
+    ruta = "/solicitud/procesar-completa"
+    assert calcular_huella(ruta, {"texto": "Necesito  5 PLCs "}) == calcular_huella(
+        ruta, {"texto": "Necesito 5 PLCs"}
+    )
+    assert calcular_huella(ruta, {"texto": "Necesito 5 PLCs"}) != calcular_huella(
+        "/solicitudes/batch", {"texto": "Necesito 5 PLCs"}
+    )
+
+
+@pytest.mark.asyncio
+async def test_envios_concurrentes_se_ejecutan_una_vez():
+    """Test: N envíos simultáneos con la misma clave comparten una ejecución."""
+    gestor = GestorIdempotencia()
+    flujo = FlujoContado()
+    clave = clave_unica()
+
+    resultados = await asyncio.gather(
+        *(gestor.ejecutar(clave, "h1", flujo, TTL) for _ in range(5))
+    )
+
+    assert flujo.ejecuciones == 1
+    assert all(r[:2] == (200, {"solicitud_id": 101}) for r in resultados)
+    assert [r[2] for r in resultados].count(False) == 1
+
+
+@pytest.mark.asyncio
+async def test_envio_posterior_recibe_respuesta_guardada():
+    """Test: la respuesta persiste y se repite desde otro proceso."""
+    clave = clave_unica()
+    flujo = FlujoContado(codigo=202)
+
+    primero = await GestorIdempotencia().ejecutar(clave, "h1", flujo, TTL)
+    # Otro gestor simula otro worker o un reinicio del servidor
+    segundo = await GestorIdempotencia().ejecutar(clave, "h1", flujo, TTL)
+
+    assert flujo.ejecuciones == 1
+    assert primero == (202, {"solicitud_id": 101}, False)
+    assert segundo == (202, {"solicitud_id": 101}, True)
+
+
+@pytest.mark.asyncio
+async def test_clave_reutilizada_con_otro_cuerpo():
+    """Test: la misma clave con otro contenido responde 422."""
+    gestor = GestorIdempotencia()
+    clave = clave_unica()
+    await gestor.ejecutar(clave, "h1", FlujoContado(latencia=0), TTL)
+
+    with pytest.raises(ConflictoIdempotencia) as exc:
+        await gestor.ejecutar(clave, "h2", FlujoContado(), TTL)
+
+    assert exc.value.codigo_http == 422
+
+
+@pytest.mark.asyncio
+async def test_clave_en_proceso_en_otro_proceso():
+    """Test: si otro proceso tiene la clave en curso se responde 409."""
+    clave = clave_unica()
+    db = SessionLocal()
+    crud_clave.reservar(db, clave, "h1", datetime.utcnow() + TTL)
+    db.close()
+
+    flujo = FlujoContado()
+    with pytest.raises(ConflictoIdempotencia) as exc:
+        await GestorIdempotencia().ejecutar(clave, "h1", flujo, TTL)
+
+    assert exc.value.codigo_http == 409
+    assert flujo.ejecuciones == 0
+
+
+@pytest.mark.asyncio
+async def test_errores_no_se_guardan():
+    """Test: 4xx, 5xx y excepciones liberan la clave para reintentar."""
+    gestor = GestorIdempotencia()
+    clave = clave_unica()
+
+    async def falla():
+        raise RuntimeError("OpenAI caído")
+
+    with pytest.raises(RuntimeError):
+        await gestor.ejecutar(clave, "h1", falla, TTL)
+
+    flujo_400 = FlujoContado(codigo=400, latencia=0)
+    await gestor.ejecutar(clave, "h1", flujo_400, TTL)
+    flujo_500 = FlujoContado(codigo=500, latencia=0)
+    await gestor.ejecutar(clave, "h1", flujo_500, TTL)
+    flujo_ok = FlujoContado(latencia=0)
+    codigo, _, repetida = await gestor.ejecutar(clave, "h1", flujo_ok, TTL)
+
+    assert flujo_400.ejecuciones == flujo_500.ejecuciones == 1
+    assert flujo_ok.ejecuciones == 1
+    assert (codigo, repetida) == (200, False)
+
+
+@pytest.mark.asyncio
+async def test_sin_ttl_solo_deduplica_en_vuelo():
+    """Test: sin ttl los envíos concurrentes se agrupan pero no se guarda respuesta."""
+    gestor = GestorIdempotencia()
+    clave = clave_unica()
+    flujo = FlujoContado()
+
+    concurrentes = await asyncio.gather(
+        *(gestor.ejecutar(clave, "h1", flujo, None) for _ in range(3))
+    )
+    codigo, _, repetida = await gestor.ejecutar(clave, "h1", flujo, None)
+
+    assert flujo.ejecuciones == 2
+    assert [r[2] for r in concurrentes] == [False, True, True]
+    assert (codigo, repetida) == (200, False)
+
+
+@pytest.mark.asyncio
+async def test_clave_expirada_se_ejecuta_de_nuevo():
+    """Test: pasada la vigencia el envío vuelve a ejecutarse."""
+    clave = clave_unica()
+    flujo = FlujoContado(latencia=0)
+
+    await GestorIdempotencia().ejecutar(clave, "h1", flujo, timedelta(seconds=-1))
+    await GestorIdempotencia().ejecutar(clave, "h1", flujo, TTL)
+
+    assert flujo.ejecuciones == 2
+
+
+# =============================================================================
+# TESTS DE ENDPOINTS
+# =============================================================================
+
+
+def test_endpoint_repite_respuesta_con_idempotency_key():
+    """Test: el reenvío con la misma Idempotency-Key no re-ejecuta el flujo."""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    client = TestClient(app)
+    resultado = {
+        "exito": True,
+        "etapa": "completado",
+        "solicitud_id": 321,
+        "rfqs": {"total": 2, "exitosos": 2, "fallidos": 0},
+    }
+    cuerpo = {"texto": f"Necesito PLCs {uuid.uuid4().hex}", "origen": "whatsapp"}
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+
+    with patch(
+        "main.procesar_solicitud_completa", AsyncMock(return_value=resultado)
+    ) as mock_procesar:
+        primera = client.post("/solicitud/procesar-completa", json=cuerpo, headers=headers)
+        segunda = client.post("/solicitud/procesar-completa", json=cuerpo, headers=headers)
+        otra = client.post(
+            "/solicitud/procesar-completa",
+            json={**cuerpo, "texto": "Otro texto"},
+            headers=headers,
+        )
+
+    assert mock_procesar.await_count == 1
+    assert primera.status_code == segunda.status_code == 200
+    assert segunda.json() == primera.json()
+    assert segunda.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in primera.headers
+    assert otra.status_code == 422
+
+
+def test_endpoint_no_repite_flujo_fallido():
+    """Test: un flujo fallido (400) no se guarda; el reintento con la clave se ejecuta."""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    client = TestClient(app)
+    fallido = {"exito": False, "etapa": "generador_rfq", "error": "SMTP no disponible"}
+    exitoso = {"exito": True, "etapa": "completado", "solicitud_id": 322, "rfqs": {}}
+    cuerpo = {"texto": f"Necesito PLCs {uuid.uuid4().hex}", "origen": "whatsapp"}
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+
+    with patch(
+        "main.procesar_solicitud_completa", AsyncMock(side_effect=[fallido, exitoso])
+    ) as mock_procesar:
+        primera = client.post("/solicitud/procesar-completa", json=cuerpo, headers=headers)
+        segunda = client.post("/solicitud/procesar-completa", json=cuerpo, headers=headers)
+
+    assert mock_procesar.await_count == 2
+    assert (primera.status_code, segunda.status_code) == (400, 200)
+    assert "Idempotent-Replayed" not in segunda.headers
+
+
+@pytest.mark.asyncio
+async def test_endpoint_deduplica_envios_identicos_sin_clave_en_vuelo():
+    """Test: sin clave, solo un reenvío idéntico en vuelo reutiliza el mismo lote_id."""
+    import httpx
+    from main import app
+
+    cuerpo = {"textos": [f"Necesito sillas {uuid.uuid4().hex}"], "origen": "email"}
+
+    async def encolar_lento(textos, origen):
+        await asyncio.sleep(0.05)
+        return f"lote{mock_lote.await_count}", [5]
+
+    with patch("main.gestor_jobs.encolar_lote", AsyncMock(side_effect=encolar_lento)) as mock_lote:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            primera, segunda = await asyncio.gather(
+                client.post("/solicitudes/batch", json=cuerpo),
+                client.post("/solicitudes/batch", json=cuerpo),
+            )
+            posterior = await client.post("/solicitudes/batch", json=cuerpo)
+
+    assert mock_lote.await_count == 2
+    assert primera.status_code == segunda.status_code == posterior.status_code == 202
+    assert primera.json()["lote_id"] == segunda.json()["lote_id"] == "lote1"
+    assert posterior.json()["lote_id"] == "lote2"
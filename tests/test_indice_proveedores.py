@@ -0,0 +1,150 @@
+"""
+Tests del índice invertido en memoria del catálogo de proveedores.
+"""
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.agents import investigador
+from src.core.indice_proveedores import IndiceProveedores, indice_proveedores
+from src.database.models import Proveedor
+from src.database.session import SessionLocal
+
+
+def proveedor(id_: int, nombre: str, categoria: str, **extra) -> dict:
+    return {
+        "id": id_, "nombre": nombre, "categoria": categoria, "subcategorias": [],
+        "ciudad": None, "rating": 0.0, "email": f"p{id_}@test.com", "telefono": None,
+        "notas": None, "es_verificado": False, "fuente": "base_de_datos", **extra,
+    }
+
+
+def indice_con(*proveedores) -> IndiceProveedores:
+    """Índice construido con los proveedores dados, sin BD."""
+    indice = IndiceProveedores(max_antiguedad_seg=0)
+    with patch("src.core.indice_proveedores.datos_proveedor", side_effect=lambda p: p):
+        db = MagicMock()
+        db.query.return_value.all.return_value = list(proveedores)
+        indice.construir(db)
+    return indice
+
+
+def ids(candidatos: list) -> list:
+    return [c["id"] for c in candidatos]
+
+
+def test_busqueda_por_campo_sin_acentos():
+    """Test: se encuentran términos de todos los campos, sin acentos ni mayúsculas."""
+    indice = indice_con(
+        proveedor(1, "Automatización Industrial", "Equipamiento"),
+        proveedor(2, "Ferretería Central", "Herramientas", subcategorias=["Drives", "Variadores"]),
+        proveedor(3, "Papelería Sur", "Oficina", ciudad="Monterrey"),
+        proveedor(4, "Servicios Eléctricos", "Servicios", notas="Distribuidor de variadores"),
+    )
+
+    assert ids(indice.buscar(None, {"automatizacion"}, 10)) == [1]
+    assert ids(indice.buscar(None, {"monterrey"}, 10)) == [3]
+    # Subcategorías pesan más que notas
+    assert ids(indice.buscar(None, {"variadores"}, 10)) == [2, 4]
+    assert indice.buscar(None, {"inexistente"}, 10) == []
+
+
+def test_orden_por_coincidencias_rating_y_top_k():
+    """Test: más términos primero; a igualdad, mejor calificado y verificado."""
+    indice = indice_con(
+        proveedor(1, "PLC Siemens", "Automatizacion"),
+        proveedor(2, "Controles PLC", "Automatizacion", rating=4.0),
+        proveedor(3, "Distribuidora PLC", "Automatizacion", rating=4.0, es_verificado=True),
+        proveedor(4, "Papelería", "Oficina"),
+    )
+
+    assert ids(indice.buscar(None, {"plc", "siemens"}, 10)) == [1, 3, 2]
+    assert ids(indice.buscar(None, {"plc"}, 2)) == [3, 2]
+
+
+def test_actualizar_y_eliminar():
+    """Test: los cambios incrementales reemplazan los términos del proveedor."""
+    indice = indice_con(proveedor(1, "Aceros del Norte", "Metales"))
+
+    indice.actualizar(proveedor(1, "Aceros del Norte", "Plasticos"))
+    indice.actualizar(proveedor(2, "Metales Sur", "Metales"))
+    assert ids(indice.buscar(None, {"metales"}, 10)) == [2]
+    assert ids(indice.buscar(None, {"plasticos"}, 10)) == [1]
+
+    indice.eliminar(2)
+    assert indice.buscar(None, {"metales"}, 10) == []
+    assert indice.estado()["proveedores"] == 1
+    assert indice.estado()["actualizaciones"] == 3
+
+
+def test_busqueda_no_consulta_la_bd_despues_de_construir():
+    """Test: solo la primera búsqueda lee la tabla; reconstruye al vencer la antigüedad."""
+    indice = IndiceProveedores(max_antiguedad_seg=60)
+    db = MagicMock()
+    db.query.return_value.all.return_value = []
+
+    indice.buscar(db, {"plc"}, 5)
+    indice.buscar(db, {"plc"}, 5)
+    assert db.query.call_count == 1
+
+    with patch("src.core.indice_proveedores.time.monotonic", return_value=1e12):
+        indice.buscar(db, {"plc"}, 5)
+    assert db.query.call_count == 2
+
+
+@pytest.fixture
+def indice_global_construido():
+    """El índice global construido desde la BD de tests."""
+    db = SessionLocal()
+    try:
+        indice_proveedores.construir(db)
+        yield indice_proveedores
+    finally:
+        db.close()
+        indice_proveedores.invalidar()
+
+
+def test_se_actualiza_al_confirmar_la_sesion(indice_global_construido):
+    """Test: commits de la sesión se aplican al índice; un rollback no."""
+    db = SessionLocal()
+    try:
+        nuevo = Proveedor(
+            nombre="Indice Zeta", email="zeta@test.com", categoria="Hidraulica",
+            subcategorias=json.dumps(["Bombas sumergibles"]),
+        )
+        db.add(nuevo)
+        db.commit()
+        assert ids(indice_global_construido.buscar(db, {"sumergibles"}, 5)) == [nuevo.id]
+
+        nuevo.categoria = "Neumatica"
+        db.flush()
+        db.rollback()
+        assert indice_global_construido.buscar(db, {"neumatica"}, 5) == []
+
+        nuevo = db.get(Proveedor, nuevo.id)
+        db.delete(nuevo)
+        db.commit()
+        assert indice_global_construido.buscar(db, {"sumergibles"}, 5) == []
+    finally:
+        db.close()
+
+
+def test_investigador_recibe_candidatos_por_producto():
+    """Test: el Investigador toma del índice los candidatos de cada producto, sin repetir."""
+    indice = indice_con(
+        proveedor(1, "PLC Siemens", "Automatizacion"),
+        proveedor(2, "Sensores PT100", "Instrumentacion"),
+        proveedor(3, "Siemens Sensores", "Automatizacion"),
+        *(proveedor(10 + i, f"Papelería {i}", "Oficina") for i in range(50)),
+    )
+    productos = [{"nombre": "PLC Siemens"}, {"nombre": "Sensor PT100"}, "texto suelto"]
+
+    sin_similares = MagicMock()
+    sin_similares.buscar.return_value = []
+
+    with patch.object(investigador, "indice_proveedores", indice), \
+            patch.object(investigador, "motor_similitud", sin_similares):
+        candidatos = investigador._cargar_proveedores_bd(None, productos)
+
+    assert sorted(ids(candidatos)) == [1, 2, 3]
@@ -0,0 +1,414 @@
+"""
+Tests del gestor de jobs en segundo plano y sus endpoints.
+"""
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.core.jobs import GestorJobs
+from src.database.crud import job as crud_job
+from src.database.models import EstadoJob
+from src.database.session import SessionLocal
+
+
+# =============================================================================
+# FIXTURES
+# =============================================================================
+
+
+@pytest.fixture
+def db_session():
+    """Fixture que proporciona una sesión de base de datos."""
+    db = SessionLocal()
+    yield db
+    db.close()
+
+
+async def flujo_falso(
+    texto_solicitud, origen="formulario", al_avanzar=None, resultado_receptor=None
+):
+    """Orquestador falso que reporta avance y termina con éxito."""
+    await al_avanzar("receptor", 10, None)
+    await al_avanzar("investigador", 40, 999)
+    await asyncio.sleep(0.01)
+    return {
+        "exito": True,
+        "etapa": "completado",
+        "solicitud_id": None,
+        "texto": texto_solicitud,
+        "extraccion_previa": resultado_receptor is not None,
+    }
+
+
+async def esperar_job(gestor: GestorJobs, job_id: int, timeout: float = 5.0) -> dict:
+    """Espera a que el job termine y retorna su estado."""
+    async def _esperar():
+        while True:
+            estado = await gestor.obtener(job_id)
+            if estado["estado"] in ("completado", "error"):
+                return estado
+            await asyncio.sleep(0.02)
+
+    return await asyncio.wait_for(_esperar(), timeout)
+
+
+# =============================================================================
+# TESTS DEL GESTOR
+# =============================================================================
+
+
+@pytest.mark.asyncio
+async def test_encolar_y_completar_job():
+    """Test: un job encolado se ejecuta y persiste su resultado."""
+    gestor = GestorJobs(max_workers=2)
+
+    with patch("src.core.jobs.procesar_solicitud_completa", side_effect=flujo_falso):
+        await gestor.iniciar()
+        try:
+            job_id = await gestor.encolar("Necesito 5 PLCs", origen="api")
+            estado = await esperar_job(gestor, job_id)
+        finally:
+            await gestor.detener()
+
+    assert estado["estado"] == "completado"
+    assert estado["progreso"] == 100
+    assert estado["resultado"]["texto"] == "Necesito 5 PLCs"
+    assert estado["fecha_fin"] is not None
+
+
+@pytest.mark.asyncio
+async def test_job_fallido_queda_en_error():
+    """Test: si el orquestador falla, el job queda en estado error."""
+    gestor = GestorJobs(max_workers=1)
+    resultado_error = {"exito": False, "etapa": "receptor", "error": "Texto vacío"}
+
+    with patch(
+        "src.core.jobs.procesar_solicitud_completa",
+        AsyncMock(return_value=resultado_error),
+    ):
+        await gestor.iniciar()
+        try:
+            job_id = await gestor.encolar("", origen="api")
+            estado = await esperar_job(gestor, job_id)
+        finally:
+            await gestor.detener()
+
+    assert estado["estado"] == "error"
+    assert estado["error"] == "Texto vacío"
+
+
+@pytest.mark.asyncio
+async def test_excepcion_del_flujo_cierra_el_job_en_error():
+    """Test: si el flujo lanza una excepción, el job no queda "ejecutando"."""
+    gestor = GestorJobs(max_workers=1)
+
+    with patch(
+        "src.core.jobs.procesar_solicitud_completa",
+        AsyncMock(side_effect=RuntimeError("BD no disponible")),
+    ):
+        await gestor.iniciar()
+        try:
+            job_id = await gestor.encolar("Necesito 5 PLCs", origen="api")
+            estado = await esperar_job(gestor, job_id)
+        finally:
+            await gestor.detener()
+
+    assert estado["estado"] == "error"
+    assert estado["error"] == "BD no disponible"
+
+
+@pytest.mark.asyncio
+async def test_jobs_pendientes_se_reencolan_al_iniciar(db_session):
+    """Test: jobs que quedaron en cola antes de un reinicio se ejecutan."""
+    pendiente = crud_job.create(
+        db_session,
+        obj_in={"texto": "Job previo al reinicio", "origen": "api", "estado": EstadoJob.EN_COLA},
+    )
+    gestor = GestorJobs(max_workers=1)
+
+    with patch("src.core.jobs.procesar_solicitud_completa", side_effect=flujo_falso):
+        await gestor.iniciar()
+        try:
+            estado = await esperar_job(gestor, pendiente.id)
+        finally:
+            await gestor.detener()
+
+    assert estado["estado"] == "completado"
+
+
+@pytest.mark.asyncio
+async def test_job_urgente_adelanta_a_los_normales_en_cola():
+    """Test: con los workers ocupados, un job urgente se ejecuta antes que los normales."""
+    gestor = GestorJobs(max_workers=1)
+    liberar = asyncio.Event()
+    orden = []
+
+    async def flujo_registrado(texto_solicitud, origen="formulario", al_avanzar=None,
+                               resultado_receptor=None):
+        orden.append(texto_solicitud)
+        if texto_solicitud == "Job en curso":
+            await liberar.wait()
+        return {"exito": True, "etapa": "completado", "solicitud_id": None}
+
+    with patch("src.core.jobs.procesar_solicitud_completa", side_effect=flujo_registrado):
+        await gestor.iniciar()
+        try:
+            await gestor.encolar("Job en curso", origen="api")
+            while not orden:
+                await asyncio.sleep(0.01)
+
+            ids = [await gestor.encolar(f"Necesito {i} PLCs", origen="api") for i in range(3)]
+            ids.append(await gestor.encolar("URGENTE: necesito 2 sensores", origen="api"))
+            liberar.set()
+            for job_id in ids:
+                await esperar_job(gestor, job_id)
+        finally:
+            await gestor.detener()
+
+    assert orden[1] == "URGENTE: necesito 2 sensores"
+    assert orden[2:] == [f"Necesito {i} PLCs" for i in range(3)]
+
+
+def test_marcar_ejecutando_es_atomico(db_session):
+    """Test: un job en cola solo puede tomarlo un worker."""
+    pendiente = crud_job.create(
+        db_session,
+        obj_in={"texto": "Necesito 5 PLCs", "origen": "api", "estado": EstadoJob.EN_COLA},
+    )
+
+    tomado = crud_job.marcar_ejecutando(db_session, pendiente.id, lease_seg=60)
+    repetido = crud_job.marcar_ejecutando(db_session, pendiente.id, lease_seg=60)
+
+    assert tomado.estado == EstadoJob.EJECUTANDO
+    assert tomado.lease_hasta is not None
+    assert repetido is None
+
+
+@pytest.mark.asyncio
+async def test_job_con_lease_vigente_no_se_retoma_al_iniciar(db_session):
+    """Test: un job que otro proceso está ejecutando no se vuelve a ejecutar."""
+    pendiente = crud_job.create(
+        db_session,
+        obj_in={"texto": "Job de otro proceso", "origen": "api", "estado": EstadoJob.EN_COLA},
+    )
+    crud_job.marcar_ejecutando(db_session, pendiente.id, lease_seg=60)
+    gestor = GestorJobs(max_workers=1)
+
+    with patch(
+        "src.core.jobs.procesar_solicitud_completa",
+        AsyncMock(side_effect=AssertionError("El job no debe ejecutarse dos veces")),
+    ):
+        await gestor.iniciar()
+        try:
+            await asyncio.sleep(0.05)
+            await gestor._ejecutar(pendiente.id)
+        finally:
+            await gestor.detener()
+
+    assert (await gestor.obtener(pendiente.id))["estado"] == "ejecutando"
+
+
+@pytest.mark.asyncio
+async def test_job_con_lease_vencido_se_retoma(db_session):
+    """Test: si el proceso que tenía el job deja de renovar el lease, otro lo retoma."""
+    pendiente = crud_job.create(
+        db_session, obj_in={"texto": "Job abandonado", "origen": "api", "estado": EstadoJob.EN_COLA}
+    )
+    crud_job.marcar_ejecutando(db_session, pendiente.id, lease_seg=0.1)
+    gestor = GestorJobs(max_workers=1, lease_seg=0.2)
+
+    with patch("src.core.jobs.procesar_solicitud_completa", side_effect=flujo_falso):
+        await gestor.iniciar()
+        try:
+            estado = await esperar_job(gestor, pendiente.id)
+        finally:
+            await gestor.detener()
+
+    assert estado["estado"] == "completado"
+
+
+@pytest.mark.asyncio
+async def test_encolar_sin_iniciar_lanza_error():
+    """Test: no se puede encolar si los workers no están corriendo."""
+    with pytest.raises(RuntimeError):
+        await GestorJobs().encolar("Necesito 5 PLCs")
+
+
+@pytest.mark.asyncio
+async def test_encolar_lote_usa_extraccion_en_bloque():
+    """Test: los jobs del lote reciben la extracción hecha en bloque."""
+    gestor = GestorJobs(max_workers=2)
+    textos = ["Necesito 5 PLCs", "Necesito sillas", "Texto que el modelo no extrajo"]
+    extraccion = {"productos": [{"nombre": "PLC"}], "urgencia": "normal"}
+
+    with patch(
+        "src.core.jobs.procesar_lote_async",
+        AsyncMock(return_value=[extraccion, extraccion, None]),
+    ) as mock_lote, patch(
+        "src.core.jobs.procesar_solicitud_completa", side_effect=flujo_falso
+    ):
+        await gestor.iniciar()
+        try:
+            lote_id, job_ids = await gestor.encolar_lote(textos, origen="email")
+            estados = [await esperar_job(gestor, job_id) for job_id in job_ids]
+            lote = await gestor.obtener_lote(lote_id)
+        finally:
+            await gestor.detener()
+
+    mock_lote.assert_awaited_once_with(textos, "email")
+    assert [e["resultado"]["extraccion_previa"] for e in estados] == [True, True, False]
+    assert [e["lote_id"] for e in estados] == [lote_id] * 3
+    assert lote["total"] == 3
+    assert lote["terminado"] is True
+    assert lote["por_estado"]["completado"] == 3
+    assert [j["job_id"] for j in lote["jobs"]] == job_ids
+
+
+@pytest.mark.asyncio
+async def test_extraccion_incompleta_no_se_reparte_a_medias():
+    """Test: si el bloque no trae una extracción por texto, ningún job la usa."""
+    gestor = GestorJobs(max_workers=2)
+    extraccion = {"productos": [{"nombre": "PLC"}], "urgencia": "normal"}
+
+    with patch(
+        "src.core.jobs.procesar_lote_async", AsyncMock(return_value=[extraccion])
+    ), patch("src.core.jobs.procesar_solicitud_completa", side_effect=flujo_falso):
+        await gestor.iniciar()
+        try:
+            _, job_ids = await gestor.encolar_lote(["Necesito 5 PLCs", "Necesito sillas"])
+            estados = [await esperar_job(gestor, job_id) for job_id in job_ids]
+        finally:
+            await gestor.detener()
+
+    assert [e["resultado"]["extraccion_previa"] for e in estados] == [False, False]
+
+
+@pytest.mark.asyncio
+async def test_recuperacion_no_toma_jobs_de_un_lote_en_extraccion():
+    """Test: una búsqueda de pendientes durante la extracción no encola el lote sin ella."""
+    gestor = GestorJobs(max_workers=2)
+    extraccion = {"productos": [{"nombre": "PLC"}], "urgencia": "normal"}
+    liberar = asyncio.Event()
+
+    async def extraer_lento(textos, origen):
+        await liberar.wait()
+        return [extraccion] * len(textos)
+
+    with patch("src.core.jobs.procesar_lote_async", side_effect=extraer_lento), \
+            patch("src.core.jobs.procesar_solicitud_completa", side_effect=flujo_falso):
+        await gestor.iniciar()
+        try:
+            _, job_ids = await gestor.encolar_lote(["Necesito 5 PLCs", "Necesito sillas"])
+            recuperados = await gestor._recuperar_pendientes()
+            liberar.set()
+            estados = [await esperar_job(gestor, job_id) for job_id in job_ids]
+        finally:
+            await gestor.detener()
+
+    assert recuperados == 0
+    assert [e["resultado"]["extraccion_previa"] for e in estados] == [True, True]
+
+
+@pytest.mark.asyncio
+async def test_obtener_lote_inexistente():
+    """Test: un lote desconocido retorna None."""
+    assert await GestorJobs().obtener_lote("no-existe") is None
+
+
+def test_actualizar_progreso_registra_solicitud(db_session):
+    """Test: actualizar_progreso guarda etapa, progreso y solicitud."""
+    nuevo = crud_job.create(db_session, obj_in={"texto": "Test", "origen": "api"})
+
+    crud_job.actualizar_progreso(db_session, nuevo.id, "investigador", 40)
+
+    db_session.refresh(nuevo)
+    assert nuevo.etapa == "investigador"
+    assert nuevo.progreso == 40
+    assert nuevo.estado == EstadoJob.EN_COLA
+
+
+# =============================================================================
+# TESTS DE ENDPOINTS
+# =============================================================================
+
+
+def test_endpoint_procesar_completa_en_segundo_plano():
+    """Test: en_segundo_plano responde 202 con el job_id."""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    client = TestClient(app)
+
+    with patch("main.gestor_jobs.encolar", AsyncMock(return_value=42)) as mock_encolar:
+        response = client.post(
+            "/solicitud/procesar-completa",
+            json={"texto": "Necesito 5 PLCs", "origen": "api", "en_segundo_plano": True},
+        )
+
+    assert response.status_code == 202
+    assert response.json()["job_id"] == 42
+    assert response.json()["url_estado"] == "/jobs/42"
+    mock_encolar.assert_awaited_once_with(texto="Necesito 5 PLCs", origen="api")
+
+
+def test_openapi_documenta_respuesta_en_segundo_plano():
+    """Test: el esquema OpenAPI describe la respuesta 202 con el job."""
+    from main import app
+
+    respuestas = app.openapi()["paths"]["/solicitud/procesar-completa"]["post"]["responses"]
+
+    assert respuestas["202"]["content"]["application/json"]["schema"]["$ref"].endswith(
+        "/JobEncoladoResponse"
+    )
+    assert "400" in respuestas
+
+
+def test_endpoint_consultar_job():
+    """Test: GET /jobs/{id} retorna el estado o 404."""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    client = TestClient(app)
+    estado = {"job_id": 7, "estado": "ejecutando", "etapa": "investigador", "progreso": 40}
+
+    with patch("main.gestor_jobs.obtener", AsyncMock(side_effect=[estado, None])):
+        assert client.get("/jobs/7").json()["etapa"] == "investigador"
+        assert client.get("/jobs/8").status_code == 404
+
+
+def test_endpoint_procesar_lote():
+    """Test: POST /solicitudes/batch responde 202 con un job por texto."""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    client = TestClient(app)
+
+    with patch(
+        "main.gestor_jobs.encolar_lote", AsyncMock(return_value=("abc123", [10, 11]))
+    ):
+        response = client.post(
+            "/solicitudes/batch",
+            json={"textos": ["Necesito 5 PLCs", "Necesito sillas"], "origen": "email"},
+        )
+
+    assert response.status_code == 202
+    assert response.json()["lote_id"] == "abc123"
+    assert response.json()["jobs"] == [
+        {"indice": 0, "job_id": 10},
+        {"indice": 1, "job_id": 11},
+    ]
+    assert client.post("/solicitudes/batch", json={"textos": []}).status_code == 422
+
+
+def test_endpoint_consultar_lote():
+    """Test: GET /solicitudes/batch/{id} retorna el estado agregado o 404."""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    client = TestClient(app)
+    estado = {"lote_id": "abc123", "total": 2, "terminado": False}
+
+    with patch("main.gestor_jobs.obtener_lote", AsyncMock(side_effect=[estado, None])):
+        assert client.get("/solicitudes/batch/abc123").json()["total"] == 2
+        assert client.get("/solicitudes/batch/otro").status_code == 404
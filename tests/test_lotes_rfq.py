@@ -0,0 +1,269 @@
+"""
+Tests de la generación de RFQs en lote (Batch API y su sustituto local).
+"""
+import json
+from unittest.mock import patch
+
+import pytest
+
+from src.agents import generador_rfq
+from src.core.lotes_rfq import FACTOR_COSTO_LOTE, GestorLotesRFQ
+from src.core.uso_llm import calcular_costo
+from src.database.models import (
+    RFQ,
+    EstadoLoteRFQ,
+    EstadoSolicitud,
+    LoteRFQ,
+    Proveedor,
+    Solicitud,
+    UsoLLM,
+)
+from src.database.session import SessionLocal
+from src.services.batch_service import BackendBatch, BackendBatchLocal
+
+
+def responder_fake(body: dict) -> dict:
+    """Respuesta de chat completion como la devuelve la Batch API."""
+    if "FALLA" in body["messages"][-1]["content"]:
+        raise RuntimeError("modelo no disponible")
+    return {
+        "model": body["model"],
+        "choices": [{"message": {"role": "assistant", "content": "RFQ generado en lote"}}],
+        "usage": {"prompt_tokens": 1000, "completion_tokens": 500, "total_tokens": 1500},
+    }
+
+
+def kwargs_rfq(texto: str = "Generar RFQ") -> dict:
+    return {"model": "gpt-4o", "messages": [{"role": "user", "content": texto}]}
+
+
+@pytest.fixture(autouse=True)
+def sin_lotes_abiertos():
+    """Cierra los lotes que otros tests dejaron abiertos o enviados."""
+    db = SessionLocal()
+    try:
+        db.query(LoteRFQ).filter(
+            LoteRFQ.estado.in_([EstadoLoteRFQ.ACUMULANDO, EstadoLoteRFQ.ENVIADO])
+        ).update({LoteRFQ.estado: EstadoLoteRFQ.FALLIDO}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def ids_bd():
+    """Solicitud y proveedor en BD para crear los borradores."""
+    db = SessionLocal()
+    try:
+        solicitud = Solicitud(
+            usuario_nombre="Test Lote",
+            usuario_contacto="lote@test.com",
+            descripcion="Test lotes RFQ",
+            categoria="Metales",
+            estado=EstadoSolicitud.PENDIENTE,
+        )
+        proveedor = Proveedor(nombre="Aceros Lote", email="lote@aceros.com", categoria="Metales")
+        db.add_all([solicitud, proveedor])
+        db.commit()
+        return solicitud.id, proveedor.id
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def gestor(tmp_path):
+    """Gestor con backend local, sin espera mínima antes de enviar."""
+    return GestorLotesRFQ(
+        backend=BackendBatchLocal(tmp_path / "local", responder=responder_fake),
+        directorio=tmp_path,
+        max_solicitudes=10,
+        max_espera_seg=0,
+    )
+
+
+def obtener(modelo, id_: int):
+    db = SessionLocal()
+    try:
+        return db.get(modelo, id_)
+    finally:
+        db.close()
+
+
+def test_backend_local_formato_batch_api(tmp_path):
+    """Test: el sustituto local devuelve salida y errores con el formato de OpenAI."""
+    entrada = tmp_path / "entrada.jsonl"
+    entrada.write_text(
+        "\n".join(
+            json.dumps({"custom_id": cid, "method": "POST", "url": "/v1/chat/completions",
+                        "body": kwargs_rfq(texto)})
+            for cid, texto in [("rfq-1", "ok"), ("rfq-2", "FALLA")]
+        )
+    )
+    backend = BackendBatchLocal(tmp_path / "local", responder=responder_fake)
+
+    batch_id = backend.enviar(entrada)
+    estado = backend.consultar(batch_id)
+
+    assert estado["estado"] == "completed"
+    (salida,) = backend.descargar(estado["archivo_salida_id"])
+    (error,) = backend.descargar(estado["archivo_errores_id"])
+    assert salida["custom_id"] == "rfq-1"
+    assert salida["response"]["status_code"] == 200
+    assert salida["response"]["body"]["choices"][0]["message"]["content"]
+    assert error["custom_id"] == "rfq-2"
+    assert error["error"]["message"] == "modelo no disponible"
+
+
+def test_backend_incompleto_falla_al_crearse():
+    """Test: un backend sin `descargar` no se puede instanciar."""
+
+    class BackendSinDescarga(BackendBatch):
+        def enviar(self, ruta):
+            return "batch-1"
+
+        def consultar(self, batch_id):
+            return {"estado": "completed"}
+
+    with pytest.raises(TypeError, match="descargar"):
+        BackendSinDescarga()
+
+
+def test_backend_local_llama_a_openai_por_el_despachador(tmp_path):
+    """Test: sin responder propio, cada línea pasa por el despachador como generador_lote."""
+    entrada = tmp_path / "entrada.jsonl"
+    entrada.write_text(json.dumps(
+        {"custom_id": "rfq-1", "method": "POST", "url": "/v1/chat/completions",
+         "body": kwargs_rfq()}
+    ))
+    backend = BackendBatchLocal(tmp_path / "local")
+
+    with patch("src.services.batch_service.despachador_llm.ejecutar") as mock_ejecutar:
+        mock_ejecutar.return_value.model_dump.return_value = responder_fake(kwargs_rfq())
+        estado = backend.consultar(backend.enviar(entrada))
+
+    assert estado["estado"] == "completed"
+    assert mock_ejecutar.call_args.kwargs["agente"] == "generador_lote"
+    assert mock_ejecutar.call_args.kwargs["model"] == "gpt-4o"
+    # El uso ya quedó registrado por el despachador; el gestor no lo repite
+    assert backend.registra_uso
+    assert not BackendBatchLocal(tmp_path / "local", responder=responder_fake).registra_uso
+
+
+def test_lote_se_envia_al_llenarse(tmp_path, ids_bd):
+    """Test: al alcanzar max_solicitudes el lote se envía sin esperar."""
+    solicitud_id, proveedor_id = ids_bd
+    gestor = GestorLotesRFQ(
+        backend=BackendBatchLocal(tmp_path / "local", responder=responder_fake),
+        directorio=tmp_path,
+        max_solicitudes=2,
+        max_espera_seg=3600,
+    )
+
+    primero = gestor.agregar(solicitud_id, proveedor_id, kwargs_rfq())
+    assert obtener(LoteRFQ, primero["lote_id"]).estado == EstadoLoteRFQ.ACUMULANDO
+    assert gestor.enviar_pendientes() == 0  # Aún no espera lo suficiente
+
+    segundo = gestor.agregar(solicitud_id, proveedor_id, kwargs_rfq())
+    lote = obtener(LoteRFQ, segundo["lote_id"])
+    assert segundo["lote_id"] == primero["lote_id"]
+    assert lote.estado == EstadoLoteRFQ.ENVIADO
+    assert lote.total == 2
+    assert lote.batch_id.startswith("batch_local_")
+
+    # El siguiente RFQ abre un lote nuevo
+    assert gestor.agregar(solicitud_id, proveedor_id, kwargs_rfq())["lote_id"] != lote.id
+
+
+def test_resultados_se_escriben_en_borradores(gestor, ids_bd):
+    """Test: al terminar el lote cada borrador recibe su contenido y se registra el uso."""
+    solicitud_id, proveedor_id = ids_bd
+    encolados = [gestor.agregar(solicitud_id, proveedor_id, kwargs_rfq()) for _ in range(2)]
+
+    rfq_previo = obtener(RFQ, encolados[0]["rfq_id"])
+    assert rfq_previo.pendiente_generacion
+    assert rfq_previo.contenido == ""
+
+    assert gestor.procesar() == {"enviados": 1, "terminados": 1}
+
+    for encolado in encolados:
+        rfq_obj = obtener(RFQ, encolado["rfq_id"])
+        assert rfq_obj.contenido == "RFQ generado en lote"
+        assert not rfq_obj.pendiente_generacion
+
+    lote = obtener(LoteRFQ, encolados[0]["lote_id"])
+    assert (lote.estado, lote.completados, lote.fallidos) == (EstadoLoteRFQ.COMPLETADO, 2, 0)
+
+    db = SessionLocal()
+    try:
+        usos = db.query(UsoLLM).filter(
+            UsoLLM.solicitud_id == solicitud_id, UsoLLM.agente == "generador_lote"
+        ).all()
+    finally:
+        db.close()
+    assert len(usos) == 2
+    assert usos[0].costo_usd == pytest.approx(
+        calcular_costo("gpt-4o", 1000, 500) * FACTOR_COSTO_LOTE
+    )
+
+
+def test_fallidos_del_lote_se_generan_directo(gestor, ids_bd):
+    """Test: lo que el lote no devolvió se genera con una llamada normal."""
+    solicitud_id, proveedor_id = ids_bd
+    ok = gestor.agregar(solicitud_id, proveedor_id, kwargs_rfq())
+    fallido = gestor.agregar(solicitud_id, proveedor_id, kwargs_rfq("FALLA"))
+
+    with patch(
+        "src.services.openai_service.openai_service.completar", return_value="RFQ directo"
+    ) as mock_completar:
+        gestor.procesar()
+
+    mock_completar.assert_called_once()
+    assert mock_completar.call_args.args[0] == kwargs_rfq("FALLA")
+    assert obtener(RFQ, ok["rfq_id"]).contenido == "RFQ generado en lote"
+    assert obtener(RFQ, fallido["rfq_id"]).contenido == "RFQ directo"
+
+    lote = obtener(LoteRFQ, ok["lote_id"])
+    assert (lote.estado, lote.completados, lote.fallidos) == (EstadoLoteRFQ.COMPLETADO, 1, 1)
+
+
+def test_borrador_en_lote_no_se_envia_hasta_tener_contenido(gestor, ids_bd):
+    """Test: generar_borrador_rfq en modo lote deja el RFQ pendiente y sin enviar."""
+    solicitud_id, proveedor_id = ids_bd
+    proveedor = {"id": proveedor_id, "nombre": "Aceros Lote", "email": "lote@aceros.com"}
+    productos = [{"nombre": "Placas de acero", "cantidad": "50"}]
+
+    with patch.object(generador_rfq, "gestor_lotes_rfq", gestor), patch.object(
+        generador_rfq, "llamar_agente"
+    ) as mock_llamar:
+        borrador = generador_rfq.generar_borrador_rfq(
+            solicitud_id, proveedor, productos, "normal", en_lote=True
+        )
+
+    mock_llamar.assert_not_called()
+    assert borrador["exito"] and borrador["pendiente_generacion"]
+    assert borrador["contenido"] is None
+
+    with patch.object(generador_rfq, "_enviar_email_medido") as mock_email:
+        resultado = generador_rfq.enviar_rfq_existente(borrador["rfq_id"])
+    assert not resultado["exito"]
+    mock_email.assert_not_called()
+
+    gestor.procesar()
+    assert obtener(RFQ, borrador["rfq_id"]).contenido == "RFQ generado en lote"
+
+
+def test_urgentes_no_van_a_lote(ids_bd):
+    """Test: con el modo lote habilitado, solo la urgencia normal se encola."""
+    solicitud_id, proveedor_id = ids_bd
+    proveedor = {"id": proveedor_id, "nombre": "Aceros Lote", "email": "lote@aceros.com"}
+
+    with patch.object(generador_rfq.settings, "RFQ_LOTE_HABILITADO", True), patch.object(
+        generador_rfq, "_encolar_borrador_en_lote"
+    ) as mock_encolar, patch.object(
+        generador_rfq, "llamar_agente", return_value="RFQ urgente"
+    ):
+        generador_rfq.generar_borrador_rfq(solicitud_id, proveedor, [], "urgente")
+        mock_encolar.assert_not_called()
+
+        generador_rfq.generar_borrador_rfq(solicitud_id, proveedor, [], "normal")
+        mock_encolar.assert_called_once()
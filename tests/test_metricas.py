@@ -0,0 +1,78 @@
+"""
+Tests de los spans de latencia y el registro de métricas.
+"""
+import asyncio
+
+import pytest
+
+from src.core.metricas import (
+    RegistroMetricas,
+    iniciar_tiempos,
+    medir,
+    registro_metricas,
+    terminar_tiempos,
+)
+
+
+def test_percentiles_y_conteos():
+    """Test: el resumen calcula percentiles y conteos por resultado."""
+    registro = RegistroMetricas()
+    for ms in range(1, 101):
+        registro.registrar("investigador.llm", float(ms), "ok" if ms <= 90 else "error")
+
+    span = registro.resumen()["spans"]["investigador.llm"]
+
+    assert span["conteo"] == 100
+    assert span["p50_ms"] == 50
+    assert span["p95_ms"] == 95
+    assert span["p99_ms"] == 99
+    assert span["max_ms"] == 100
+    assert span["resultados"] == {"ok": 90, "error": 10}
+
+
+def test_ventana_acotada():
+    """Test: los percentiles usan solo las últimas duraciones."""
+    registro = RegistroMetricas(ventana=10)
+    for ms in range(1, 101):
+        registro.registrar("generador_rfq.smtp", float(ms))
+
+    span = registro.resumen()["spans"]["generador_rfq.smtp"]
+    assert span["conteo"] == 100
+    assert span["p50_ms"] == 95
+
+
+def test_medir_marca_error_si_hay_excepcion():
+    """Test: un span con excepción se registra como error."""
+    registro_metricas.reiniciar()
+
+    with pytest.raises(ValueError):
+        with medir("prueba.fallo"):
+            raise ValueError("boom")
+
+    resultados = registro_metricas.resumen()["spans"]["prueba.fallo"]["resultados"]
+    assert resultados == {"error": 1}
+
+
+@pytest.mark.asyncio
+async def test_tiempos_de_solicitud_incluyen_hilos():
+    """Test: los spans en to_thread se suman a los tiempos de la solicitud."""
+
+    def tarea_bloqueante():
+        with medir("prueba.hilo"):
+            pass
+
+    token = iniciar_tiempos()
+    with medir("prueba.etapa") as span:
+        await asyncio.gather(
+            asyncio.to_thread(tarea_bloqueante), asyncio.to_thread(tarea_bloqueante)
+        )
+        span.resultado = "parcial"
+    tiempos = terminar_tiempos(token)
+
+    assert tiempos["spans"]["prueba.hilo"]["llamadas"] == 2
+    assert tiempos["spans"]["prueba.etapa"]["resultados"] == {"parcial": 1}
+
+    # Fuera de la solicitud ya no se acumulan tiempos
+    with medir("prueba.fuera"):
+        pass
+    assert "prueba.fuera" not in tiempos["spans"]
@@ -0,0 +1,476 @@
+"""
+Tests del flujo asíncrono del orquestador.
+
+Verifica que `procesar_solicitud_completa` no bloquea el event loop:
+varias solicitudes concurrentes deben tardar aproximadamente lo mismo
+que una sola, usando clientes falsos con latencia simulada.
+"""
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from src.agents.orquestador import (
+    flujo_en_curso,
+    procesar_solicitud_completa,
+    reanudar_solicitud,
+)
+from src.agents.receptor import ReceptorAgent
+from src.core.jobs import GestorJobs
+from src.database.crud import job as crud_job
+from src.database.models import EstadoJob, Proveedor
+from src.database.session import SessionLocal
+
+
+LATENCIA_LLM = 0.2
+LATENCIA_SMTP = 0.05
+
+
+# =============================================================================
+# FIXTURES
+# =============================================================================
+
+
+class ClienteLLMFalso:
+    """Cliente AsyncOpenAI falso que responde tras una latencia fija."""
+
+    def __init__(self, responder, latencia: float = LATENCIA_LLM):
+        self.responder = responder
+        self.latencia = latencia
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        await asyncio.sleep(self.latencia)
+        contenido = self.responder(kwargs)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=contenido))]
+        )
+
+
+@pytest.fixture
+def proveedor_bd():
+    """Crea un proveedor en BD para las recomendaciones del investigador."""
+    db = SessionLocal()
+    proveedor = Proveedor(
+        nombre="Automatización Async", email="ventas@async.com", categoria="tecnologia"
+    )
+    db.add(proveedor)
+    db.commit()
+    db.refresh(proveedor)
+    yield proveedor
+    db.close()
+
+
+@pytest.fixture
+def pipeline_falso(proveedor_bd):
+    """Sustituye OpenAI, Serper y SMTP por dobles con latencia simulada."""
+    respuesta_receptor = json.dumps({
+        "productos": [
+            {"nombre": "PLC Siemens S7-1200", "cantidad": 5, "categoria": "tecnologia"}
+        ],
+        "urgencia": "normal",
+    })
+    respuesta_investigador = json.dumps({
+        "proveedores_recomendados": [
+            {
+                "proveedor_id": proveedor_bd.id,
+                "nombre": proveedor_bd.nombre,
+                "fuente": "base_de_datos",
+            }
+        ]
+    })
+
+    def responder_agentes(kwargs):
+        # El investigador pide JSON; el generador pide texto libre
+        if "response_format" in kwargs:
+            return respuesta_investigador
+        return "Estimado proveedor, solicitamos cotización..."
+
+    def enviar_email_lento(**kwargs):
+        time.sleep(LATENCIA_SMTP)  # SMTP es bloqueante
+        return True
+
+    with patch(
+        "src.agents.receptor.get_agente",
+        return_value=ReceptorAgent(async_client=ClienteLLMFalso(lambda kwargs: respuesta_receptor)),
+    ), patch(
+        "src.services.openai_service.openai_service.async_client",
+        ClienteLLMFalso(responder_agentes),
+    ), patch(
+        "src.agents.investigador.search_service.is_available", return_value=False
+    ), patch(
+        "src.agents.generador_rfq.email_service.send_email",
+        side_effect=enviar_email_lento,
+    ) as mock_email:
+        yield mock_email
+
+
+# =============================================================================
+# TESTS
+# =============================================================================
+
+
+@pytest.mark.asyncio
+async def test_procesar_solicitud_completa_async_exitoso(pipeline_falso):
+    """Test: el flujo asíncrono completa las 4 etapas."""
+    resultado = await procesar_solicitud_completa("Necesito 5 PLCs Siemens S7-1200")
+
+    assert resultado["exito"] is True
+    assert resultado["etapa"] == "completado"
+    assert resultado["rfqs"]["exitosos"] == 1
+    pipeline_falso.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_solicitudes_concurrentes_no_se_serializan(pipeline_falso):
+    """Test: N solicitudes concurrentes tardan mucho menos que N en serie."""
+    n = 20
+    # 3 llamadas LLM (receptor, investigador, generador) + 1 envío SMTP
+    duracion_serial = n * (3 * LATENCIA_LLM + LATENCIA_SMTP)
+
+    inicio = time.perf_counter()
+    resultados = await asyncio.gather(
+        *(procesar_solicitud_completa(f"Necesito {i} PLCs") for i in range(1, n + 1))
+    )
+    duracion = time.perf_counter() - inicio
+
+    assert all(r["exito"] for r in resultados)
+    assert len({r["solicitud_id"] for r in resultados}) == n
+    assert duracion < duracion_serial / 4
+
+
+@pytest.mark.asyncio
+async def test_event_loop_sigue_respondiendo(pipeline_falso):
+    """Test: el event loop no se congela mientras corre el pipeline."""
+    max_pausa = 0.0
+    terminado = asyncio.Event()
+
+    async def latido():
+        nonlocal max_pausa
+        anterior = time.perf_counter()
+        while not terminado.is_set():
+            await asyncio.sleep(0.01)
+            ahora = time.perf_counter()
+            max_pausa = max(max_pausa, ahora - anterior)
+            anterior = ahora
+
+    tarea_latido = asyncio.create_task(latido())
+    await procesar_solicitud_completa("Necesito 5 PLCs Siemens S7-1200")
+    terminado.set()
+    await tarea_latido
+
+    # La latencia SMTP (bloqueante) nunca debe aparecer como pausa del loop
+    assert max_pausa < LATENCIA_SMTP
+
+
+# =============================================================================
+# TESTS DE CHECKPOINTS Y REANUDACIÓN
+# =============================================================================
+
+
+def sin_llm():
+    """Hace fallar el test si la reanudación vuelve a llamar a un agente LLM."""
+    error = AssertionError("La reanudación no debe repetir llamadas al LLM")
+    return patch(
+        "src.agents.orquestador.procesar_solicitud_async", side_effect=error
+    ), patch(
+        "src.agents.orquestador.buscar_proveedores_async", side_effect=error
+    ), patch(
+        "src.agents.generador_rfq.generar_rfq_async", side_effect=error
+    )
+
+
+@pytest.mark.asyncio
+async def test_reanudar_tras_fallo_smtp_no_repite_llm(pipeline_falso):
+    """Test: tras un fallo de SMTP, reanudar solo reenvía el RFQ guardado."""
+    email_ok = pipeline_falso.side_effect
+    pipeline_falso.side_effect = lambda **kwargs: False
+
+    resultado = await procesar_solicitud_completa("Necesito 5 PLCs Siemens S7-1200")
+
+    assert resultado["exito"] is False
+    assert resultado["etapa"] == "generador_rfq"
+
+    pipeline_falso.side_effect = email_ok
+    receptor, investigador, generador = sin_llm()
+    with receptor, investigador, generador:
+        reanudado = await reanudar_solicitud(resultado["solicitud_id"])
+
+    assert reanudado["exito"] is True
+    assert reanudado["reanudada_desde"] == "generador_rfq"
+    assert reanudado["rfqs"]["exitosos"] == 1
+    assert reanudado["solicitud"]["productos"][0]["nombre"] == "PLC Siemens S7-1200"
+
+
+@pytest.mark.asyncio
+async def test_reanudar_omite_rfqs_ya_enviados(pipeline_falso):
+    """Test: reanudar una solicitud completa no reenvía emails."""
+    resultado = await procesar_solicitud_completa("Necesito 5 PLCs Siemens S7-1200")
+    assert resultado["exito"] is True
+    pipeline_falso.reset_mock()
+
+    receptor, investigador, generador = sin_llm()
+    with receptor, investigador, generador:
+        reanudado = await reanudar_solicitud(resultado["solicitud_id"])
+
+    assert reanudado["exito"] is True
+    assert reanudado["rfqs"]["detalles"][0]["omitido"] is True
+    pipeline_falso.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_reanudar_sin_checkpoint_investigador_busca_de_nuevo(pipeline_falso):
+    """Test: si el Investigador no terminó, se reanuda desde esa etapa."""
+    with patch(
+        "src.agents.orquestador.buscar_proveedores_async",
+        return_value={"error": "Timeout de OpenAI"},
+    ):
+        resultado = await procesar_solicitud_completa("Necesito 5 PLCs Siemens S7-1200")
+
+    assert resultado["exito"] is False
+    assert resultado["etapa"] == "investigador"
+
+    with patch(
+        "src.agents.orquestador.procesar_solicitud_async",
+        side_effect=AssertionError("El Receptor no debe repetirse"),
+    ):
+        reanudado = await reanudar_solicitud(resultado["solicitud_id"])
+
+    assert reanudado["exito"] is True
+    assert reanudado["reanudada_desde"] == "investigador"
+
+
+@pytest.mark.asyncio
+async def test_job_interrumpido_se_reanuda_al_reiniciar(pipeline_falso):
+    """Test: un job "ejecutando" con solicitud se reanuda sin Receptor ni reenvíos."""
+    resultado = await procesar_solicitud_completa("Necesito 5 PLCs Siemens S7-1200")
+    assert resultado["exito"] is True
+    pipeline_falso.reset_mock()
+
+    db = SessionLocal()
+    try:
+        interrumpido = crud_job.create(db, obj_in={
+            "texto": "Necesito 5 PLCs Siemens S7-1200", "origen": "api",
+            "estado": EstadoJob.EJECUTANDO, "solicitud_id": resultado["solicitud_id"],
+        })
+    finally:
+        db.close()
+
+    gestor = GestorJobs(max_workers=1)
+    receptor, investigador, generador = sin_llm()
+    with receptor, investigador, generador, patch(
+        "src.agents.orquestador.procesar_solicitud_streaming_async",
+        side_effect=AssertionError("El Receptor no debe repetirse"),
+    ):
+        await gestor.iniciar()
+        try:
+            while (await gestor.obtener(interrumpido.id))["estado"] == "ejecutando":
+                await asyncio.sleep(0.02)
+        finally:
+            await gestor.detener()
+
+    estado = await gestor.obtener(interrumpido.id)
+    assert estado["estado"] == "completado"
+    assert estado["resultado"]["reanudada_desde"] == "generador_rfq"
+    assert estado["resultado"]["rfqs"]["detalles"][0]["omitido"] is True
+    pipeline_falso.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_reanudar_con_flujo_en_curso_no_reenvia(pipeline_falso):
+    """Test: reanudar mientras el flujo original corre se rechaza sin tocar su marca."""
+    reanudaciones = []
+
+    async def al_avanzar(etapa, progreso, solicitud_id):
+        if etapa == "solicitud_guardada":
+            reanudaciones.append(await reanudar_solicitud(solicitud_id))
+            assert flujo_en_curso(solicitud_id)
+
+    resultado = await procesar_solicitud_completa(
+        "Necesito 5 PLCs Siemens S7-1200", al_avanzar=al_avanzar
+    )
+
+    assert resultado["exito"] is True
+    assert reanudaciones[0]["exito"] is False
+    assert reanudaciones[0]["en_curso"] is True
+    pipeline_falso.assert_called_once()
+
+
+def test_endpoint_reanudar_con_flujo_en_curso_responde_409():
+    """Test: POST /solicitud/{id}/reanudar responde 409 si hay un flujo en curso."""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with patch("main.flujo_en_curso", return_value=True), patch(
+        "main.reanudar_solicitud", side_effect=AssertionError("No debe reanudarse")
+    ):
+        response = TestClient(app).post("/solicitud/123/reanudar")
+
+    assert response.status_code == 409
+
+
+@pytest.mark.asyncio
+async def test_reanudar_solicitud_inexistente():
+    """Test: reanudar una solicitud que no existe retorna error."""
+    resultado = await reanudar_solicitud(999999)
+
+    assert resultado["exito"] is False
+    assert "no encontrada" in resultado["error"]
+    assert "solicitud_id" not in resultado
+
+
+@pytest.mark.asyncio
+async def test_flujo_publica_eventos_de_progreso(pipeline_falso):
+    """Test: el flujo publica etapas, resultado por RFQ y el cierre."""
+    from src.core.eventos import bus_eventos
+
+    resultado = await procesar_solicitud_completa("Necesito 5 PLCs Siemens S7-1200")
+    eventos = bus_eventos.eventos(resultado["solicitud_id"])
+
+    assert [e["tipo"] for e in eventos] == [
+        "etapa", "etapa", "proveedores", "etapa", "rfq", "finalizado"
+    ]
+    assert eventos[-2]["datos"]["exito"] is True
+    assert eventos[-1]["datos"]["rfqs_exitosos"] == 1
+
+
+@pytest.mark.asyncio
+async def test_reanudar_reinicia_los_eventos_de_la_solicitud(pipeline_falso):
+    """Test: tras reanudar, el replay contiene solo la ejecución reanudada."""
+    from src.core.eventos import bus_eventos
+
+    resultado = await procesar_solicitud_completa("Necesito 5 PLCs Siemens S7-1200")
+    solicitud_id = resultado["solicitud_id"]
+    previos = bus_eventos.eventos(solicitud_id)
+
+    await reanudar_solicitud(solicitud_id)
+    eventos = bus_eventos.eventos(solicitud_id)
+
+    assert eventos[0]["id"] > previos[-1]["id"]
+    assert [e["tipo"] for e in eventos].count("finalizado") == 1
+
+
+@pytest.mark.asyncio
+async def test_flujo_en_curso_mientras_se_procesa(pipeline_falso):
+    """Test: la solicitud figura en curso entre que se guarda y termina el flujo."""
+    en_curso = []
+
+    async def al_avanzar(etapa, progreso, solicitud_id):
+        if solicitud_id is not None:
+            en_curso.append(flujo_en_curso(solicitud_id))
+
+    resultado = await procesar_solicitud_completa(
+        "Necesito 5 PLCs Siemens S7-1200", al_avanzar=al_avanzar
+    )
+    assert en_curso and all(en_curso)
+    assert not flujo_en_curso(resultado["solicitud_id"])
+
+    en_curso.clear()
+    await reanudar_solicitud(resultado["solicitud_id"], al_avanzar)
+    assert en_curso and all(en_curso)
+    assert not flujo_en_curso(resultado["solicitud_id"])
+
+
+@pytest.mark.asyncio
+async def test_flujo_expone_tiempos_por_etapa(pipeline_falso):
+    """Test: el resultado incluye la duración de cada etapa y sub-llamada."""
+    from src.core.metricas import registro_metricas
+
+    resultado = await procesar_solicitud_completa("Necesito 5 PLCs Siemens S7-1200")
+    tiempos = resultado["tiempos"]
+
+    assert tiempos["total_ms"] >= 3 * LATENCIA_LLM * 1000
+    for span in (
+        "orquestador.receptor",
+        "orquestador.investigador",
+        "investigador.carga_bd",
+        "investigador.llm",
+        "generador_rfq.llm",
+        "generador_rfq.guardar_bd",
+        "generador_rfq.smtp",
+    ):
+        assert tiempos["spans"][span]["llamadas"] == 1, span
+
+    assert tiempos["spans"]["generador_rfq.smtp"]["ms"] >= LATENCIA_SMTP * 1000
+    assert registro_metricas.resumen()["spans"]["orquestador.total"]["resultados"]["ok"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_busqueda_web_se_adelanta_al_receptor(proveedor_bd):
+    """Test: las búsquedas web arrancan mientras el Receptor sigue respondiendo."""
+    respuesta_receptor = json.dumps({
+        "productos": [
+            {"nombre": "PLC Siemens S7-1200", "cantidad": 5, "categoria": "tecnologia"},
+            {"nombre": "Sensor PT100", "cantidad": 10, "categoria": "equipamiento"},
+        ],
+        "urgencia": "normal",
+    })
+    tamano = len(respuesta_receptor) // 4 + 1
+    fragmentos = [respuesta_receptor[i:i + tamano] for i in range(0, len(respuesta_receptor), tamano)]
+    marcas = {"busquedas": []}
+
+    class ClienteStreamingFalso:
+        def __init__(self):
+            self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+        async def _create(self, **kwargs):
+            async def stream():
+                for fragmento in fragmentos:
+                    await asyncio.sleep(0.1)
+                    yield SimpleNamespace(
+                        choices=[SimpleNamespace(delta=SimpleNamespace(content=fragmento))]
+                    )
+                marcas["fin_receptor"] = time.perf_counter()
+
+            return stream()
+
+    async def buscar_web(producto, **kwargs):
+        marcas["busquedas"].append((producto, time.perf_counter()))
+        await asyncio.sleep(0.15)
+        return [{"nombre": f"Proveedor web de {producto}"}]
+
+    async def buscar_ecommerce(producto, **kwargs):
+        await asyncio.sleep(0.15)
+        return []
+
+    respuesta_investigador = json.dumps({
+        "proveedores_recomendados": [
+            {"proveedor_id": proveedor_bd.id, "nombre": proveedor_bd.nombre, "fuente": "base_de_datos"}
+        ]
+    })
+
+    def responder_agentes(kwargs):
+        if "response_format" in kwargs:
+            return respuesta_investigador
+        return "Estimado proveedor, solicitamos cotización..."
+
+    with patch(
+        "src.agents.receptor.get_agente",
+        return_value=ReceptorAgent(async_client=ClienteStreamingFalso()),
+    ), patch(
+        "src.services.openai_service.openai_service.async_client",
+        ClienteLLMFalso(responder_agentes, latencia=0.01),
+    ), patch(
+        "src.agents.investigador.search_service.is_available", return_value=True
+    ), patch(
+        "src.agents.investigador.search_service.buscar_proveedores_web_async",
+        side_effect=buscar_web,
+    ), patch(
+        "src.agents.investigador.search_service.buscar_en_ecommerce_async",
+        side_effect=buscar_ecommerce,
+    ), patch(
+        "src.agents.generador_rfq.email_service.send_email", return_value=True
+    ):
+        resultado = await procesar_solicitud_completa("Necesito PLCs y sensores PT100")
+
+    assert resultado["exito"] is True
+    assert [producto for producto, _ in marcas["busquedas"]] == [
+        "PLC Siemens S7-1200",
+        "Sensor PT100",
+    ]
+    # La primera búsqueda empezó antes de que terminara la respuesta del Receptor
+    assert marcas["busquedas"][0][1] < marcas["fin_receptor"]
+    assert len(resultado["proveedores"]["proveedores_web"]) == 2
@@ -0,0 +1,121 @@
+"""
+Tests del planificador por prioridad de urgencia.
+"""
+import asyncio
+
+import pytest
+
+from src.core.metricas import registro_metricas
+from src.core.planificador import PlanificadorPrioridad, prioridad_de
+
+
+NORMAL, ALTA, URGENTE = prioridad_de("normal"), prioridad_de("alta"), prioridad_de("urgente")
+
+
+async def ocupar(planificador: PlanificadorPrioridad, prioridad: int, orden: list, nombre: str):
+    """Toma un turno, anota el orden de atención y lo libera."""
+    async with planificador.turno(prioridad):
+        orden.append(nombre)
+        await asyncio.sleep(0)
+
+
+def test_prioridad_de_urgencia():
+    """Test: las urgencias se mapean a 3-5 y lo desconocido a normal."""
+    assert (NORMAL, ALTA, URGENTE) == (3, 4, 5)
+    assert prioridad_de("desconocida") == NORMAL
+
+
+@pytest.mark.asyncio
+async def test_turnos_se_asignan_por_prioridad():
+    """Test: con el planificador saturado, lo urgente se atiende primero."""
+    planificador = PlanificadorPrioridad(capacidad=1, nombre="test_orden")
+    orden = []
+
+    await planificador.adquirir(NORMAL)
+    tareas = [
+        asyncio.create_task(ocupar(planificador, NORMAL, orden, "normal")),
+        asyncio.create_task(ocupar(planificador, ALTA, orden, "alta")),
+        asyncio.create_task(ocupar(planificador, URGENTE, orden, "urgente")),
+    ]
+    await asyncio.sleep(0.01)
+
+    assert planificador.estado()["en_cola"] == {"normal": 1, "alta": 1, "urgente": 1}
+
+    planificador.liberar()
+    await asyncio.gather(*tareas)
+
+    assert orden == ["urgente", "alta", "normal"]
+    assert planificador.estado()["en_uso"] == 0
+
+
+@pytest.mark.asyncio
+async def test_envejecimiento_evita_inanicion():
+    """Test: una espera normal larga supera a una urgente recién llegada."""
+    planificador = PlanificadorPrioridad(
+        capacidad=1, envejecimiento_seg=0.05, nombre="test_envejecimiento"
+    )
+    orden = []
+
+    await planificador.adquirir(NORMAL)
+    normal = asyncio.create_task(ocupar(planificador, NORMAL, orden, "normal"))
+    await asyncio.sleep(0.2)  # ~4 niveles de envejecimiento
+    urgente = asyncio.create_task(ocupar(planificador, URGENTE, orden, "urgente"))
+    await asyncio.sleep(0.01)
+
+    planificador.liberar()
+    await asyncio.gather(normal, urgente)
+
+    assert orden == ["normal", "urgente"]
+
+
+@pytest.mark.asyncio
+async def test_cancelar_espera_no_pierde_turnos():
+    """Test: una espera cancelada no se queda con el turno."""
+    planificador = PlanificadorPrioridad(capacidad=1, nombre="test_cancelar")
+    orden = []
+
+    await planificador.adquirir(NORMAL)
+    cancelada = asyncio.create_task(ocupar(planificador, URGENTE, orden, "cancelada"))
+    normal = asyncio.create_task(ocupar(planificador, NORMAL, orden, "normal"))
+    await asyncio.sleep(0.01)
+
+    cancelada.cancel()
+    await asyncio.gather(cancelada, return_exceptions=True)
+    planificador.liberar()
+    await asyncio.wait_for(normal, timeout=1)
+
+    assert orden == ["normal"]
+    assert planificador.estado()["en_uso"] == 0
+
+
+@pytest.mark.asyncio
+async def test_espera_se_mide_por_nivel():
+    """Test: el tiempo de espera queda en un span por nivel de urgencia."""
+    planificador = PlanificadorPrioridad(capacidad=1, nombre="test_espera")
+
+    await planificador.adquirir(NORMAL)
+    tarea = asyncio.create_task(ocupar(planificador, URGENTE, [], "urgente"))
+    await asyncio.sleep(0.05)
+    planificador.liberar()
+    await tarea
+
+    span = registro_metricas.resumen()["spans"]["planificador.test_espera.espera.urgente"]
+    assert span["conteo"] == 1
+    assert span["max_ms"] >= 40
+
+
+def test_capacidad_invalida():
+    """Test: un planificador sin turnos no tiene sentido."""
+    with pytest.raises(ValueError):
+        PlanificadorPrioridad(capacidad=0)
+
+
+def test_endpoint_metricas_incluye_planificador():
+    """Test: GET /metricas expone la ocupación del planificador."""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    respuesta = TestClient(app).get("/metricas").json()
+
+    assert set(respuesta["planificador"]) == {"flujos", "rfqs"}
+    assert respuesta["planificador"]["flujos"]["en_cola"]["urgente"] == 0
@@ -0,0 +1,173 @@
+"""
+Tests del mensaje del Investigador (candidatos relevantes y presupuesto de tokens).
+"""
+import json
+from unittest.mock import MagicMock, patch
+
+from src.agents import investigador
+from src.agents.investigador import _construir_mensaje, buscar_proveedores
+from src.core import tokens
+from src.core.tokens import contar_tokens
+
+PRODUCTOS = [
+    {"nombre": "PLC Siemens S7-1200", "cantidad": 5, "categoria": "Automatización"},
+    {"nombre": "Sensor de temperatura PT100", "cantidad": 10, "categoria": "Instrumentación"},
+]
+
+
+def proveedor_bd(id_: int, nombre: str, categoria: str, rating: float = 3.0) -> dict:
+    return {
+        "id": id_,
+        "nombre": nombre,
+        "categoria": categoria,
+        "rating": rating,
+        "email": f"ventas{id_}@proveedor.com",
+        "telefono": None,
+        "notas": None,
+        "es_verificado": False,
+        "fuente": "base_de_datos",
+    }
+
+
+def proveedores_bd() -> list:
+    """Dos relevantes por producto entre muchos de otras categorías."""
+    relevantes = [
+        proveedor_bd(1, "Distribuidora Siemens", "Automatizacion", rating=4.8),
+        proveedor_bd(2, "Controles PLC del Norte", "Automatización", rating=4.0),
+        proveedor_bd(3, "Instrumentos y Sensores", "Instrumentación", rating=4.5),
+        proveedor_bd(4, "Termopares PT100 MX", "Instrumentacion", rating=3.5),
+    ]
+    ruido = [proveedor_bd(100 + i, f"Papelería {i}", "Oficina") for i in range(40)]
+    return ruido + relevantes
+
+
+def ids_en_mensaje(mensaje: str) -> set:
+    ids = set()
+    for linea in mensaje.splitlines():
+        if linea.startswith("{") and '"id"' in linea:
+            ids.add(json.loads(linea)["id"])
+    return ids
+
+
+def test_solo_candidatos_relevantes_top_k():
+    """Test: por producto entran los top-K relevantes; el resto se descarta."""
+    mensaje, seleccion = _construir_mensaje(
+        PRODUCTOS, proveedores_bd(), [], [], top_k=1, max_tokens=10000
+    )
+
+    # Más términos en común; a igualdad, mejor calificado
+    assert ids_en_mensaje(mensaje) == {1, 4}
+    assert seleccion["candidatos_en_prompt"] == 2
+    assert seleccion["candidatos_descartados"] == 42
+
+
+def test_proyeccion_compacta():
+    """Test: una línea JSON por candidato, sin campos vacíos ni internos."""
+    web = [{"nombre": "Proveedor Web", "url": "https://web.mx", "descripcion": "x" * 500,
+            "fuente": "web_search", "score_relevancia": 1}]
+    mensaje, _ = _construir_mensaje(PRODUCTOS, proveedores_bd(), web, [], top_k=2)
+
+    lineas = [linea for linea in mensaje.splitlines() if linea.startswith("{")]
+    assert lineas
+    for linea in lineas:
+        candidato = json.loads(linea)
+        assert "fuente" not in candidato and "score_relevancia" not in candidato
+        assert None not in candidato.values()
+        assert ": " not in linea.replace("https://", "")  # Sin pretty-print
+
+    (linea_web,) = [linea for linea in lineas if "web.mx" in linea]
+    assert len(json.loads(linea_web)["descripcion"]) <= 161
+
+
+def test_similitud_cuenta_solo_para_su_producto():
+    """Test: un proveedor similar a un producto no entra como candidato de otro."""
+    productos = [{"nombre": "Variador de frecuencia"}, {"nombre": "Silla ergonomica"}]
+    variadores = proveedor_bd(1, "Drives Industriales", "Electrica")
+    sin_coincidencias = MagicMock()
+    sin_coincidencias.buscar.return_value = []
+    similares = MagicMock()
+    similares.buscar.side_effect = lambda db, terminos, top_k: (
+        [{**variadores, "similitud": 0.8}] if "variador" in terminos else []
+    )
+
+    with patch.object(investigador, "indice_proveedores", sin_coincidencias), \
+            patch.object(investigador, "motor_similitud", similares):
+        candidatos = investigador._cargar_proveedores_bd(None, productos)
+
+    assert candidatos[0]["similitudes"] == {0: 0.8}
+    assert investigador._ranking(set(), candidatos, "bd", 5, 0) == [0]
+    assert investigador._ranking({"silla", "ergonomica"}, candidatos, "bd", 5, 1) == []
+
+
+def test_presupuesto_de_tokens():
+    """Test: el mensaje respeta el presupuesto y reporta lo descartado."""
+    web = [
+        {"nombre": f"Sensores PT100 {i}", "url": f"https://sensores{i}.mx",
+         "descripcion": "Sensor de temperatura industrial " * 10}
+        for i in range(20)
+    ]
+    _, completo = _construir_mensaje(PRODUCTOS, proveedores_bd(), web, [], top_k=20)
+    mensaje, seleccion = _construir_mensaje(
+        PRODUCTOS, proveedores_bd(), web, [], top_k=20, max_tokens=completo["tokens_prompt"] // 2
+    )
+
+    assert seleccion["tokens_prompt"] <= completo["tokens_prompt"] // 2
+    assert seleccion["tokens_prompt"] == contar_tokens(mensaje)
+    assert seleccion["candidatos_descartados"] > completo["candidatos_descartados"]
+    # Los primeros en entrar son los mejores de cada producto
+    assert {1, 4} <= ids_en_mensaje(mensaje)
+
+
+def test_mensaje_no_crece_con_la_tabla():
+    """Test: con top-K fijo, más proveedores irrelevantes no agrandan el mensaje."""
+    base = proveedores_bd()
+    mucho_ruido = [proveedor_bd(1000 + i, f"Ferretería {i}", "Herramientas") for i in range(500)]
+
+    _, pocos = _construir_mensaje(PRODUCTOS, base, [], [])
+    _, muchos = _construir_mensaje(PRODUCTOS, base + mucho_ruido, [], [])
+
+    assert muchos["tokens_prompt"] == pocos["tokens_prompt"]
+    assert muchos["candidatos_descartados"] == pocos["candidatos_descartados"] + 500
+
+
+def test_contar_tokens_sin_tiktoken():
+    """Test: sin tiktoken se estima por caracteres."""
+    tokens._codificador.cache_clear()
+    try:
+        with patch.object(tokens, "tiktoken", None):
+            assert contar_tokens("x" * 41) == 11
+    finally:
+        tokens._codificador.cache_clear()
+
+
+def test_contar_tokens_si_tiktoken_no_carga_la_codificacion():
+    """Test: un tiktoken viejo o sin red para bajar el BPE no rompe el conteo."""
+    tiktoken_falso = MagicMock()
+    tiktoken_falso.encoding_for_model.side_effect = KeyError("modelo-nuevo")
+    tiktoken_falso.get_encoding.side_effect = ValueError("Unknown encoding o200k_base")
+
+    tokens._codificador.cache_clear()
+    try:
+        with patch.object(tokens, "tiktoken", tiktoken_falso):
+            assert contar_tokens("x" * 41, modelo="modelo-nuevo") == 11
+    finally:
+        tokens._codificador.cache_clear()
+
+
+@patch("src.agents.investigador._cargar_proveedores_bd")
+@patch("src.agents.investigador.search_service")
+@patch("src.agents.investigador.llamar_agente")
+@patch("src.agents.investigador.SessionLocal", MagicMock())
+def test_resumen_reporta_descartados(mock_llamar, mock_search, mock_cargar):
+    """Test: el resumen del investigador incluye los candidatos descartados."""
+    mock_cargar.return_value = proveedores_bd()
+    mock_search.is_available.return_value = False
+    mock_llamar.return_value = json.dumps({"proveedores_recomendados": []})
+
+    resultado = buscar_proveedores(PRODUCTOS, usar_web=False)
+
+    resumen = resultado["resumen"]
+    assert resumen["total_proveedores_bd"] == 44
+    assert resumen["candidatos_en_prompt"] == 4
+    assert resumen["candidatos_descartados"] == 40
+    assert resumen["tokens_prompt"] > 0
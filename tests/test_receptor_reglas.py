@@ -0,0 +1,178 @@
+"""
+Tests del parser por reglas del Receptor (solicitudes estructuradas sin LLM).
+"""
+import json
+import time
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+
+from src.agents.receptor import ReceptorAgent
+from src.agents.receptor_reglas import ParserReglas, categorizar, detectar_urgencia
+
+LISTA = """Hola, buenos días
+URGENTE
+Necesito:
+- 5 x PLC Siemens S7-1200
+- Sensor PT100 x 10
+- 3 monitores 24 pulgadas (Full HD)
+Entrega: bodega central"""
+
+CSV = """producto;cantidad;detalle
+Toner HP 85A;4;original
+Resmas papel carta;20;75 gr
+Presupuesto: $1.500.000"""
+
+
+def test_lista_con_vinetas_y_urgencia():
+    """Test: viñetas con cantidad al inicio o al final, urgencia y notas."""
+    datos, confianza = ParserReglas().analizar(LISTA)
+
+    assert confianza == 1.0
+    assert [(p["nombre"], p["cantidad"], p["categoria"]) for p in datos["productos"]] == [
+        ("PLC Siemens S7-1200", 5, "equipamiento"),
+        ("Sensor PT100", 10, "equipamiento"),
+        ("monitores 24 pulgadas", 3, "tecnologia"),
+    ]
+    assert datos["productos"][2]["especificaciones"] == "Full HD"
+    assert datos["urgencia"] == "urgente"
+    assert datos["notas_adicionales"] == "Entrega: bodega central"
+
+
+def test_csv_con_encabezado_y_presupuesto():
+    """Test: filas tipo CSV; la fila de títulos no cuenta y el presupuesto se lee."""
+    datos, confianza = ParserReglas().analizar(CSV)
+
+    assert confianza == 1.0
+    assert datos["productos"][0] == {
+        "nombre": "Toner HP 85A",
+        "cantidad": 4,
+        "especificaciones": "original",
+        "categoria": "insumos",
+    }
+    assert datos["presupuesto_estimado"] == 1_500_000.0
+
+
+@pytest.mark.parametrize("texto", [
+    "Necesito 5 laptops HP para el equipo de ventas",
+    "oye necesito unas sillas pa la sala de reuniones, como 6 o 7",
+    "Pantalla 1920 x 1080",
+    "Tornillos M8 x 20",
+    "Perno hexagonal 1/2 x 3",
+    'Cañería de cobre 3/4" x 6',
+    "Perfil aluminio 40mm x 6",
+])
+def test_texto_libre_va_al_llm(texto):
+    """Test: el texto libre no alcanza la confianza y se deja al LLM."""
+    assert ParserReglas().parsear(texto) is None
+
+
+def test_confianza_parcial():
+    """Test: una línea que no se entiende baja la confianza bajo el mínimo."""
+    parser = ParserReglas(confianza_minima=0.9)
+    texto = "10 sillas ergonómicas\nY lo que recomienden para la sala de espera"
+
+    assert parser.analizar(texto)[1] == 0.5
+    assert parser.parsear(texto) is None
+    assert parser.parsear("10 sillas ergonómicas") is not None
+    assert parser.estado() == {
+        "intentos": 2, "aciertos": 1, "tasa_aciertos": 0.5, "confianza_minima": 0.9
+    }
+
+
+@pytest.mark.parametrize("linea", [
+    "Teléfono: 5512345678",
+    "Tel: 5512345678",
+    "Whatsapp: 5512345678",
+    "RUT: 76.123.456",
+    "Código postal: 64000",
+    "CP: 64000",
+    "N° de cotización: 1234",
+])
+def test_datos_de_contacto_van_a_notas(linea):
+    """Test: teléfonos, RUT y códigos con etiqueta son notas, no productos."""
+    texto = f"Necesito:\n- 5 x PLC Siemens S7-1200\n- 10 sillas ergonómicas\n{linea}"
+    datos, confianza = ParserReglas().analizar(texto)
+
+    assert [p["nombre"] for p in datos["productos"]] == [
+        "PLC Siemens S7-1200", "sillas ergonómicas",
+    ]
+    assert datos["notas_adicionales"] == linea
+    assert confianza == 1.0
+
+
+def test_numero_grande_tras_dos_puntos_no_es_cantidad():
+    """Test: 'Folio: 123456' no es un producto y baja la confianza."""
+    parser = ParserReglas()
+    datos, confianza = parser.analizar("- 5 x PLC Siemens S7-1200\nFolio: 123456")
+
+    assert [p["nombre"] for p in datos["productos"]] == ["PLC Siemens S7-1200"]
+    assert confianza < parser.confianza_minima
+
+
+def test_lexico_y_urgencia():
+    """Test: prioridad de categorías y niveles de urgencia sin acentos."""
+    assert categorizar("Servicio de mantención de impresoras") == "servicios"
+    assert categorizar("Papel para impresora") == "insumos"
+    assert categorizar("Escritorios en L") == "mobiliario"
+    assert categorizar("Cosa rara") is None
+    assert detectar_urgencia("Lo antes posible por favor") == "alta"
+    assert detectar_urgencia("para mañana!!") == "urgente"
+    assert detectar_urgencia("sin apuro") == "normal"
+
+
+@patch("src.agents.receptor.OpenAI")
+def test_receptor_resuelve_sin_llm(mock_openai_class):
+    """Test: una solicitud estructurada no llama a OpenAI y termina en milisegundos."""
+    mock_client = Mock()
+    mock_openai_class.return_value = mock_client
+    agente = ReceptorAgent()
+
+    inicio = time.perf_counter()
+    resultado = agente.procesar_solicitud(LISTA)
+    duracion_ms = (time.perf_counter() - inicio) * 1000
+
+    mock_client.chat.completions.create.assert_not_called()
+    assert len(resultado["productos"]) == 3
+    assert resultado["urgencia"] == "urgente"
+    assert duracion_ms < 100
+
+
+@patch("src.agents.receptor.settings.RECEPTOR_REGLAS_HABILITADAS", False)
+@patch("src.agents.receptor.OpenAI")
+def test_reglas_deshabilitadas_usan_llm(mock_openai_class):
+    """Test: con las reglas deshabilitadas siempre se llama al LLM."""
+    mock_client = Mock()
+    mock_openai_class.return_value = mock_client
+    mock_client.chat.completions.create.return_value = Mock(
+        choices=[Mock(message=Mock(content=json.dumps({
+            "productos": [{"nombre": "PLC", "cantidad": 5, "categoria": "equipamiento"}]
+        })))]
+    )
+
+    ReceptorAgent().procesar_solicitud("5 x PLC Siemens S7-1200")
+
+    mock_client.chat.completions.create.assert_called_once()
+
+
+@patch("src.agents.receptor.AsyncOpenAI")
+async def test_lote_solo_envia_al_llm_lo_no_estructurado(mock_async_openai_class):
+    """Test: en un lote, las solicitudes estructuradas no entran en los bloques."""
+    mock_client = Mock()
+    mock_async_openai_class.return_value = mock_client
+    mock_client.chat.completions.create = AsyncMock(return_value=Mock(
+        choices=[Mock(message=Mock(content=json.dumps({"solicitudes": [{
+            "indice": 0,
+            "productos": [{"nombre": "Laptop HP", "cantidad": 5, "categoria": "tecnologia"}],
+        }]})))]
+    ))
+
+    resultados = await ReceptorAgent().procesar_lote_async(
+        [CSV, "Necesito 5 laptops HP para ventas"]
+    )
+
+    mock_client.chat.completions.create.assert_awaited_once()
+    prompt = mock_client.chat.completions.create.call_args.kwargs["messages"][1]["content"]
+    assert "Toner" not in prompt
+    assert resultados[0]["productos"][0]["nombre"] == "Toner HP 85A"
+    assert resultados[1]["productos"][0]["nombre"] == "Laptop HP"
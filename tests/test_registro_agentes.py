@@ -0,0 +1,109 @@
+"""
+Tests del registro de agentes (clientes y prompts compartidos).
+"""
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.agents.registro import (
+    ARCHIVOS_PLANTILLA,
+    ARCHIVOS_PROMPT,
+    RegistroAgentes,
+    registro_agentes,
+)
+from src.services.openai_service import openai_service
+
+
+@pytest.fixture
+def directorio_prompts(tmp_path):
+    """Directorio con un prompt por agente y las plantillas."""
+    for nombre, archivo in ARCHIVOS_PROMPT.items():
+        (tmp_path / archivo).write_text(f"Prompt {nombre} v1", encoding="utf-8")
+    for nombre, archivo in ARCHIVOS_PLANTILLA.items():
+        (tmp_path / archivo).write_text(f"Plantilla {nombre} {{{{ version }}}}", encoding="utf-8")
+    return tmp_path
+
+
+def test_prompt_se_lee_una_vez(directorio_prompts):
+    """Test: los prompts quedan en memoria hasta recargar()."""
+    registro = RegistroAgentes(directorio_prompts=directorio_prompts)
+    assert registro.prompt("investigador") == "Prompt investigador v1"
+
+    (directorio_prompts / ARCHIVOS_PROMPT["investigador"]).write_text("Prompt v2")
+    assert registro.prompt("investigador") == "Prompt investigador v1"
+
+    registro.recargar()
+    assert registro.prompt("investigador") == "Prompt v2"
+
+
+def test_plantilla_se_compila_una_vez(directorio_prompts):
+    """Test: la plantilla compilada se reutiliza hasta recargar()."""
+    registro = RegistroAgentes(directorio_prompts=directorio_prompts)
+    plantilla = registro.plantilla("rfq")
+    assert plantilla.render(version="v1") == "Plantilla rfq v1"
+
+    (directorio_prompts / ARCHIVOS_PLANTILLA["rfq"]).write_text("Nueva {{ version }}")
+    assert registro.plantilla("rfq") is plantilla
+
+    registro.recargar()
+    assert registro.plantilla("rfq").render(version="v2") == "Nueva v2"
+
+
+def test_prompt_desconocido():
+    """Test: pedir el prompt de un agente inexistente es un error."""
+    with pytest.raises(KeyError):
+        RegistroAgentes().prompt("contador")
+
+
+def test_receptor_comparte_clientes_y_prompt(directorio_prompts):
+    """Test: el receptor se construye una vez con los clientes del servicio."""
+    registro = RegistroAgentes(directorio_prompts=directorio_prompts)
+
+    with patch("src.agents.receptor.OpenAI") as mock_openai:
+        agente = registro.receptor()
+        assert registro.receptor() is agente
+
+    mock_openai.assert_not_called()
+    assert agente.client is openai_service.client
+    assert agente.async_client is openai_service.async_client
+    assert agente.system_prompt == "Prompt receptor v1"
+
+
+def test_precargar_y_recargar_clientes(directorio_prompts):
+    """Test: precargar deja todo listo; recargar(clientes=True) crea clientes nuevos."""
+    servicio = MagicMock(model_mini="gpt-4o-mini")
+    registro = RegistroAgentes(servicio=servicio, directorio_prompts=directorio_prompts)
+
+    registro.precargar()
+    anterior = registro.receptor()
+    assert registro.estado() == {
+        "prompts": sorted(ARCHIVOS_PROMPT),
+        "plantillas": sorted(ARCHIVOS_PLANTILLA),
+        "receptor": True,
+    }
+
+    registro.recargar(clientes=True)
+
+    servicio.reiniciar_clientes.assert_called_once()
+    assert registro.receptor() is not anterior
+
+
+def test_procesar_solicitud_reutiliza_agente():
+    """Test: la función de conveniencia no crea agentes ni clientes por llamada."""
+    from src.agents.receptor import get_agente, procesar_solicitud
+
+    respuesta = MagicMock()
+    respuesta.choices = [MagicMock()]
+    respuesta.choices[0].message.content = (
+        '{"productos": [{"nombre": "Laptop", "cantidad": 2, "categoria": "tecnologia"}], '
+        '"urgencia": "normal"}'
+    )
+
+    with patch("src.agents.receptor.ReceptorAgent.__init__") as mock_init, patch.object(
+        get_agente().client.chat.completions, "create", return_value=respuesta
+    ):
+        procesar_solicitud("Necesito 2 laptops")
+        procesar_solicitud("Necesito 2 laptops")
+
+    mock_init.assert_not_called()
+    assert get_agente() is registro_agentes.receptor()
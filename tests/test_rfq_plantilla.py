@@ -0,0 +1,185 @@
+"""
+Tests del modo "por_solicitud": un cuerpo de RFQ por conjunto de productos
+personalizado por proveedor con la plantilla Jinja2.
+"""
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from src.agents.generador_rfq import (
+    MODO_POR_SOLICITUD,
+    enviar_rfqs_multiples,
+    enviar_rfqs_multiples_async,
+    generar_cuerpo_rfq,
+    personalizar_rfq,
+)
+from src.database.models import RFQ, EstadoSolicitud, Proveedor, Solicitud
+from src.database.session import SessionLocal
+
+CUERPO = (
+    "Reciba un cordial saludo de parte de PEI (Productos y Servicios).\n\n"
+    "Solicitamos cotización de los siguientes productos:\n• Placas de acero"
+)
+
+PLACAS = {"nombre": "Placas de acero", "cantidad": "50"}
+TORNILLOS = {"nombre": "Tornillos M8", "cantidad": "1000"}
+
+
+@pytest.fixture
+def solicitud_y_proveedores():
+    """Solicitud y cuatro proveedores en BD (dos con contacto)."""
+    db = SessionLocal()
+    try:
+        solicitud = Solicitud(
+            usuario_nombre="Test Plantilla",
+            usuario_contacto="plantilla@test.com",
+            descripcion="Test RFQ por solicitud",
+            categoria="Metales",
+            estado=EstadoSolicitud.PENDIENTE,
+        )
+        proveedores = [
+            Proveedor(nombre=f"Aceros {i}", email=f"aceros{i}@test.com", categoria="Metales")
+            for i in range(4)
+        ]
+        db.add(solicitud)
+        db.add_all(proveedores)
+        db.commit()
+
+        recomendados = [
+            {
+                "proveedor_data": {
+                    "id": p.id,
+                    "nombre": p.nombre,
+                    "email": p.email,
+                    **({"contacto": f"Ing. Contacto {i}"} if i % 2 == 0 else {}),
+                }
+            }
+            for i, p in enumerate(proveedores)
+        ]
+        return solicitud.id, recomendados
+    finally:
+        db.close()
+
+
+def contenidos_guardados(solicitud_id: int) -> list:
+    db = SessionLocal()
+    try:
+        return [r.contenido for r in db.query(RFQ).filter(RFQ.solicitud_id == solicitud_id)]
+    finally:
+        db.close()
+
+
+def test_una_generacion_para_todos_los_proveedores(solicitud_y_proveedores):
+    """Test: N proveedores con los mismos productos cuestan una sola llamada al LLM."""
+    solicitud_id, recomendados = solicitud_y_proveedores
+
+    with patch(
+        "src.agents.generador_rfq.llamar_agente", return_value=CUERPO
+    ) as mock_llamar, patch(
+        "src.agents.generador_rfq.email_service.send_email", return_value=True
+    ) as mock_email:
+        resultado = enviar_rfqs_multiples(
+            solicitud_id, recomendados, [PLACAS], modo=MODO_POR_SOLICITUD
+        )
+
+    mock_llamar.assert_called_once()
+    assert "NO incluyas la línea de saludo" in mock_llamar.call_args.kwargs["mensaje_usuario"]
+    assert "INFORMACIÓN PROVEEDOR" not in mock_llamar.call_args.kwargs["mensaje_usuario"]
+    assert resultado["exitosos"] == 4
+
+    cuerpos = {c.kwargs["to"]: c.kwargs["body"] for c in mock_email.call_args_list}
+    assert cuerpos["aceros0@test.com"].startswith("Estimado/a Ing. Contacto 0,\n\n")
+    assert cuerpos["aceros1@test.com"].startswith("Estimado equipo de Aceros 1,\n\n")
+    assert all(c.endswith(CUERPO) for c in cuerpos.values())
+    assert sorted(contenidos_guardados(solicitud_id)) == sorted(cuerpos.values())
+
+
+def test_un_cuerpo_por_conjunto_de_productos(solicitud_y_proveedores):
+    """Test: los proveedores con productos asignados distintos reciben su propio cuerpo."""
+    solicitud_id, recomendados = solicitud_y_proveedores
+    recomendados[0]["productos_asignados"] = ["Tornillos M8"]
+    recomendados[1]["productos_asignados"] = ["Tornillos M8"]
+
+    def llamar(**kwargs):
+        return CUERPO.replace("Placas de acero", "Tornillos M8") if (
+            "Tornillos" in kwargs["mensaje_usuario"]
+            and "Placas" not in kwargs["mensaje_usuario"]
+        ) else CUERPO
+
+    with patch(
+        "src.agents.generador_rfq.llamar_agente", side_effect=llamar
+    ) as mock_llamar, patch(
+        "src.agents.generador_rfq.email_service.send_email", return_value=True
+    ) as mock_email:
+        resultado = enviar_rfqs_multiples(
+            solicitud_id, recomendados, [PLACAS, TORNILLOS], modo=MODO_POR_SOLICITUD
+        )
+
+    assert mock_llamar.call_count == 2
+    assert resultado["exitosos"] == 4
+    cuerpos = {c.kwargs["to"]: c.kwargs["body"] for c in mock_email.call_args_list}
+    assert "Tornillos M8" in cuerpos["aceros0@test.com"]
+    assert "Placas de acero" in cuerpos["aceros3@test.com"]
+
+
+async def test_modo_por_solicitud_async(solicitud_y_proveedores):
+    """Test: la versión asíncrona genera una vez y omite a los ya enviados."""
+    solicitud_id, recomendados = solicitud_y_proveedores
+    previos = {
+        recomendados[3]["proveedor_data"]["id"]: {
+            "rfq_id": 1, "numero_rfq": "RFQ-PREVIO", "estado": "enviado"
+        }
+    }
+
+    with patch(
+        "src.agents.generador_rfq.llamar_agente_async", return_value=CUERPO
+    ) as mock_llamar, patch(
+        "src.agents.generador_rfq.email_service.send_email", return_value=True
+    ) as mock_email:
+        resultado = await enviar_rfqs_multiples_async(
+            solicitud_id, recomendados, [PLACAS], rfqs_previos=previos, modo=MODO_POR_SOLICITUD
+        )
+
+    mock_llamar.assert_awaited_once()
+    assert resultado["exitosos"] == 4
+    assert resultado["detalles"][3]["omitido"]
+    assert mock_email.call_count == 3
+
+
+def test_fallo_del_cuerpo_falla_a_sus_proveedores(solicitud_y_proveedores):
+    """Test: si el cuerpo común no se genera, sus proveedores fallan sin enviar."""
+    solicitud_id, recomendados = solicitud_y_proveedores
+
+    with patch(
+        "src.agents.generador_rfq.llamar_agente", side_effect=ValueError("Respuesta vacía")
+    ), patch("src.agents.generador_rfq.email_service.send_email") as mock_email:
+        resultado = enviar_rfqs_multiples(
+            solicitud_id, recomendados, [PLACAS], modo=MODO_POR_SOLICITUD
+        )
+
+    assert resultado["fallidos"] == 4
+    assert resultado["detalles"][0]["error"] == "Respuesta vacía"
+    mock_email.assert_not_called()
+
+
+def test_cuerpo_sin_saludo_y_plantilla():
+    """Test: se quita el saludo que el modelo agregue; la plantilla pone el de cada proveedor."""
+    with patch(
+        "src.agents.generador_rfq.llamar_agente", return_value=f"Estimado proveedor,\n\n{CUERPO}"
+    ):
+        cuerpo = generar_cuerpo_rfq([PLACAS], "alta")
+
+    assert cuerpo["cuerpo"] == CUERPO
+    assert isinstance(cuerpo["fecha_limite"], datetime)
+
+    assert personalizar_rfq(cuerpo, {})["contenido"] == f"Estimado proveedor,\n\n{CUERPO}"
+    rfq = personalizar_rfq(cuerpo, {"nombre": "Aceros", "contacto": "Lic. Ana"})
+    assert rfq["contenido"] == f"Estimado/a Lic. Ana,\n\n{CUERPO}"
+    assert rfq["fecha_limite"] == cuerpo["fecha_limite"]
+
+
+def test_modo_desconocido():
+    """Test: un modo inexistente es un error de configuración."""
+    with pytest.raises(ValueError):
+        enviar_rfqs_multiples(1, [], [PLACAS], modo="por_lote")
@@ -0,0 +1,122 @@
+"""
+Tests del motor local de similitud (TF-IDF de trigramas) entre productos y proveedores.
+"""
+import random
+import time
+from unittest.mock import MagicMock, patch
+
+from src.agents.investigador import _construir_mensaje
+from src.core.indice_proveedores import palabras_clave
+from src.core.similitud_proveedores import MotorSimilitud
+
+
+def proveedor(id_: int, nombre: str, categoria: str, **extra) -> dict:
+    return {
+        "id": id_, "nombre": nombre, "categoria": categoria, "subcategorias": [],
+        "ciudad": None, "rating": 0.0, "email": f"p{id_}@test.com", "telefono": None,
+        "notas": None, "es_verificado": False, "fuente": "base_de_datos", **extra,
+    }
+
+
+def motor_con(*proveedores, similitud_minima: float = 0.15) -> MotorSimilitud:
+    """Motor construido con los proveedores dados, sin BD."""
+    motor = MotorSimilitud(similitud_minima=similitud_minima, max_antiguedad_seg=0)
+    with patch("src.core.similitud_proveedores.datos_proveedor", side_effect=lambda p: p):
+        db = MagicMock()
+        db.query.return_value.all.return_value = list(proveedores)
+        motor.construir(db)
+    return motor
+
+
+def buscar(motor: MotorSimilitud, texto: str, top_k: int = 10) -> list:
+    return motor.buscar(None, palabras_clave(texto), top_k)
+
+
+CATALOGO = [
+    proveedor(1, "Drives del Bajío", "Automatización", subcategorias=["Variador", "Drives"]),
+    proveedor(2, "Papelería Central", "Oficina", notas="Resmas, toner y carpetas"),
+    proveedor(3, "Electro Motores", "Motores eléctricos", notas="Variadores y arrancadores"),
+    proveedor(4, "Muebles Norte", "Mobiliario", subcategorias=["Sillas", "Escritorios"]),
+]
+
+
+def test_encuentra_variantes_de_palabras():
+    """Test: plurales y acentos se parecen aunque las palabras no coincidan exactas."""
+    motor = motor_con(*CATALOGO)
+
+    similares = buscar(motor, "Variadores de frecuencia para automatizacion")
+    assert [p["id"] for p in similares][:2] == [1, 3]
+    assert all(0 < p["similitud"] <= 1 for p in similares)
+    assert 2 not in [p["id"] for p in similares]
+
+    assert [p["id"] for p in buscar(motor, "Silla")] == [4]
+
+
+def test_umbral_y_top_k():
+    """Test: solo se retornan los que superan la similitud mínima, hasta top_k."""
+    motor = motor_con(*CATALOGO, similitud_minima=0.0)
+    assert len(buscar(motor, "variadores", top_k=2)) == 2
+
+    motor.similitud_minima = 0.99
+    assert buscar(motor, "variadores") == []
+    assert buscar(motor, "") == []
+
+
+def test_actualizaciones_incrementales():
+    """Test: modificar o eliminar un proveedor cambia solo su fila y reutiliza la libre."""
+    motor = motor_con(*CATALOGO)
+
+    motor.actualizar(proveedor(2, "Papelería Central", "Automatización", notas="Variadores"))
+    assert 2 in [p["id"] for p in buscar(motor, "variadores automatizacion")]
+
+    motor.eliminar(1)
+    assert 1 not in [p["id"] for p in buscar(motor, "variadores automatizacion")]
+
+    motor.actualizar(proveedor(5, "Hidráulica Sur", "Bombas sumergibles"))
+    assert [p["id"] for p in buscar(motor, "bomba sumergible")] == [5]
+    assert motor.estado()["proveedores"] == 4
+
+
+def test_catalogo_sin_texto_no_falla():
+    """Test: proveedores sin trigramas dejan el motor vacío en vez de romper la construcción."""
+    motor = motor_con(proveedor(1, "", ""), proveedor(2, "", ""))
+
+    assert buscar(motor, "variadores") == []
+    motor.actualizar(proveedor(3, "Drives del Bajío", "Automatización"))
+    assert [p["id"] for p in buscar(motor, "Drives")] == [3]
+
+
+def test_latencia_con_catalogo_grande():
+    """Test: con miles de proveedores una consulta toma pocos milisegundos."""
+    palabras = (
+        "acero inoxidable plc siemens sensor temperatura variador frecuencia bomba "
+        "valvula hidraulica papeleria toner silla escritorio laptop monitor cable "
+        "tornillo soldadura compresor iluminacion guantes transporte empaques"
+    ).split()
+    aleatorio = random.Random(7)
+    motor = motor_con(*(
+        proveedor(i, " ".join(aleatorio.sample(palabras, 2)), aleatorio.choice(palabras),
+                  notas=" ".join(aleatorio.sample(palabras, 6)))
+        for i in range(1, 5001)
+    ))
+
+    terminos = palabras_clave("Sensor de temperatura PT100 acero inoxidable")
+    duraciones = []
+    for _ in range(5):
+        inicio = time.perf_counter()
+        motor.buscar(None, terminos, 20)
+        duraciones.append((time.perf_counter() - inicio) * 1000)
+
+    assert min(duraciones) < 10
+
+
+def test_candidato_similar_entra_al_prompt():
+    """Test: un proveedor sin palabras en común pero similar no se descarta."""
+    productos = [{"nombre": "Variadores de frecuencia", "cantidad": 2}]
+    similar = proveedor(1, "Drives del Bajío", "Automatización",
+                        subcategorias=["Variador"], similitudes={0: 0.45})
+
+    mensaje, seleccion = _construir_mensaje(productos, [similar], [], [], top_k=5)
+
+    assert seleccion["candidatos_en_prompt"] == 1
+    assert "Drives del Bajío" in mensaje
@@ -0,0 +1,208 @@
+"""
+Tests de las completions en streaming, el tiempo al primer token y la
+lectura incremental de JSON.
+"""
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from src.agents import generador_rfq
+from src.agents.generador_rfq import PublicadorFragmentos, generar_rfq
+from src.core.json_incremental import LectorArregloJSON, elementos_en_stream
+from src.core.metricas import registro_metricas
+from src.services.openai_service import OpenAIService, llamar_agente_stream
+
+MENSAJES = [{"role": "user", "content": "Hola"}]
+
+RFQ = "Estimado proveedor, solicitamos cotización de 50 placas de acero inoxidable."
+
+
+def chunk(contenido=None, uso=None) -> SimpleNamespace:
+    """Chunk de chat completion en streaming; sin contenido es el chunk de uso."""
+    if uso is not None:
+        return SimpleNamespace(choices=[], usage=uso)
+    return SimpleNamespace(
+        choices=[SimpleNamespace(delta=SimpleNamespace(content=contenido))], usage=None
+    )
+
+
+USO = SimpleNamespace(prompt_tokens=12, completion_tokens=3, total_tokens=15)
+
+
+class StreamFalso:
+    """Stream síncrono de chunks que recuerda si se cerró."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.cerrado = False
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        self.cerrado = True
+
+
+class StreamFalsoAsync(StreamFalso):
+    """Stream asíncrono de chunks."""
+
+    async def __aiter__(self):
+        for c in self.chunks:
+            yield c
+
+    async def close(self):
+        self.cerrado = True
+
+
+def span(nombre: str) -> dict:
+    return registro_metricas.resumen()["spans"][nombre]
+
+
+def test_stream_entrega_fragmentos_y_mide_primer_token():
+    """Test: se entregan los fragmentos, se miden TTFT y total y se registra el uso."""
+    servicio = OpenAIService(api_key="test-key")
+    stream = StreamFalso([chunk("Hola"), chunk(None), chunk(" mundo"), chunk(uso=USO)])
+
+    with patch.object(
+        servicio.client.chat.completions, "create", return_value=stream
+    ) as mock_create, patch("src.services.openai_service.registrar_uso") as mock_uso:
+        fragmentos = list(
+            servicio.completar_stream({"model": "modelo-stream", "messages": MENSAJES})
+        )
+
+    assert fragmentos == ["Hola", " mundo"]
+    assert mock_create.call_args.kwargs["stream"] is True
+    assert mock_create.call_args.kwargs["stream_options"] == {"include_usage": True}
+    assert stream.cerrado
+
+    primer_token = span("llm.primer_token.modelo-stream")
+    total = span("llm.stream.modelo-stream")
+    assert primer_token["conteo"] == 1
+    assert total["resultados"] == {"ok": 1}
+    assert primer_token["max_ms"] <= total["max_ms"]
+
+    agente, modelo, chunk_uso, _ = mock_uso.call_args.args
+    assert (modelo, chunk_uso.usage) == ("modelo-stream", USO)
+
+
+def test_stream_interrumpido_cierra_la_conexion():
+    """Test: si el consumidor deja de leer se cierra el stream y no se cuenta como error."""
+    servicio = OpenAIService(api_key="test-key")
+    stream = StreamFalso([chunk("uno"), chunk("dos"), chunk("tres")])
+
+    with patch.object(servicio.client.chat.completions, "create", return_value=stream):
+        fragmentos = servicio.completar_stream(
+            {"model": "modelo-interrumpido", "messages": MENSAJES}
+        )
+        assert next(fragmentos) == "uno"
+        fragmentos.close()
+
+    assert stream.cerrado
+    assert span("llm.stream.modelo-interrumpido")["resultados"] == {"interrumpido": 1}
+
+
+async def test_stream_async():
+    """Test: la versión asíncrona entrega los mismos fragmentos y mide igual."""
+    servicio = OpenAIService(api_key="test-key")
+    stream = StreamFalsoAsync([chunk("Hola"), chunk(" mundo"), chunk(uso=USO)])
+
+    with patch.object(
+        servicio.async_client.chat.completions, "create", AsyncMock(return_value=stream)
+    ), patch("src.services.openai_service.registrar_uso") as mock_uso:
+        fragmentos = [
+            f async for f in servicio.completar_stream_async(
+                {"model": "modelo-stream-async", "messages": MENSAJES}
+            )
+        ]
+
+    assert fragmentos == ["Hola", " mundo"]
+    assert stream.cerrado
+    assert span("llm.primer_token.modelo-stream-async")["conteo"] == 1
+    mock_uso.assert_called_once()
+
+
+def test_llamar_agente_stream_con_tarea_usa_el_primer_modelo():
+    """Test: un stream no escala; con tarea va con el primer modelo del enrutador."""
+    with patch(
+        "src.services.openai_service.openai_service.client.chat.completions.create",
+        return_value=StreamFalso([chunk(RFQ)]),
+    ) as mock_create:
+        texto = "".join(
+            llamar_agente_stream("Sistema", "Usuario", modelo="ignorado", tarea="generar_rfq")
+        )
+
+    assert texto == RFQ
+    assert mock_create.call_args.kwargs["model"] == "gpt-4o-mini"
+
+
+def test_lector_json_emite_cada_elemento_al_cerrarse():
+    """Test: cada objeto del arreglo sale en cuanto se cierra, con cualquier corte."""
+    respuesta = json.dumps({
+        "analisis": "Dos opciones {buenas}",
+        "proveedores_recomendados": [
+            {"nombre": "Aceros \"El Norte\"", "notas": "usa [corchetes] y {llaves}"},
+            {"nombre": "Metales", "productos": ["Placas", "Tubos"], "score": 90},
+        ],
+        "resumen": "fin",
+    })
+
+    for tamano in (1, 7, len(respuesta)):
+        lector = LectorArregloJSON("proveedores_recomendados")
+        emitidos = []
+        for inicio in range(0, len(respuesta), tamano):
+            nuevos = lector.alimentar(respuesta[inicio:inicio + tamano])
+            emitidos.extend(nuevos)
+            if nuevos and len(emitidos) == 1:
+                # El primero sale antes de que llegue el segundo
+                assert "Metales" not in respuesta[:inicio + tamano]
+
+        assert [p["nombre"] for p in emitidos] == ['Aceros "El Norte"', "Metales"]
+        assert lector.terminado
+        assert json.loads(lector.texto) == json.loads(respuesta)
+
+
+def test_elementos_en_stream():
+    """Test: el helper itera los elementos desde fragmentos sueltos."""
+    fragmentos = ['{"items": [{"a"', ': 1}, {"a": 2', "}]}"]
+    assert list(elementos_en_stream(fragmentos, "items")) == [{"a": 1}, {"a": 2}]
+
+
+def test_generar_rfq_en_stream():
+    """Test: con `al_fragmento` el RFQ se redacta en streaming y se entrega por partes."""
+    recibidos = []
+    with patch.object(
+        generador_rfq, "llamar_agente_stream", return_value=iter([RFQ[:20], RFQ[20:]])
+    ), patch.object(generador_rfq, "llamar_agente") as mock_llamar:
+        resultado = generar_rfq(1, {"nombre": "Aceros"}, [{"nombre": "Placas"}], "alta",
+                                al_fragmento=recibidos.append)
+
+    assert resultado["contenido"] == RFQ
+    assert "".join(recibidos) == RFQ
+    mock_llamar.assert_not_called()
+
+
+def test_generar_rfq_en_stream_invalido_se_redacta_de_nuevo():
+    """Test: si el texto del stream no pasa la revisión, se redacta con escalamiento."""
+    with patch.object(
+        generador_rfq, "llamar_agente_stream", return_value=iter([RFQ, "\n\n[Tu Nombre]"])
+    ), patch.object(generador_rfq, "llamar_agente", return_value=RFQ) as mock_llamar:
+        resultado = generar_rfq(1, {"nombre": "Aceros"}, [{"nombre": "Placas"}],
+                                al_fragmento=lambda _: None)
+
+    assert resultado["contenido"] == RFQ
+    assert mock_llamar.call_args.kwargs["tarea"] == "generar_rfq"
+
+
+def test_publicador_agrupa_fragmentos():
+    """Test: los fragmentos se publican agrupados y `vaciar` manda el resto."""
+    publicador = PublicadorFragmentos(7, {"id": 3, "nombre": "Aceros"})
+
+    with patch.object(generador_rfq, "publicar_evento") as mock_publicar:
+        for _ in range(30):
+            publicador("x" * 10)
+        publicador.vaciar()
+        publicador.vaciar()
+
+    textos = [c.args[2]["texto"] for c in mock_publicar.call_args_list]
+    assert [len(t) for t in textos] == [200, 100]
+    assert all(c.args[:2] == (7, "rfq_fragmento") for c in mock_publicar.call_args_list)
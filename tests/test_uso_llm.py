@@ -0,0 +1,199 @@
+"""
+Tests de la contabilidad de tokens y costo del LLM.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.core.despachador import DespachadorLLM
+from src.core.uso_llm import (
+    asignar_solicitud,
+    calcular_costo,
+    iniciar_cuenta,
+    registrar_uso,
+    resumir_uso,
+    terminar_cuenta,
+)
+from src.database.crud import uso_llm as crud_uso_llm
+from src.database.models import EstadoSolicitud, Solicitud, UsoLLM
+from src.database.session import SessionLocal
+
+
+def respuesta_con_uso(prompt: int = 1000, respuesta: int = 200) -> SimpleNamespace:
+    """Respuesta de chat completion con el `usage` que reporta OpenAI."""
+    return SimpleNamespace(
+        usage=SimpleNamespace(
+            prompt_tokens=prompt, completion_tokens=respuesta, total_tokens=prompt + respuesta
+        )
+    )
+
+
+@pytest.fixture
+def solicitud_id():
+    """Solicitud nueva para aislar los registros de cada test."""
+    db = SessionLocal()
+    try:
+        solicitud = Solicitud(
+            usuario_nombre="Test Uso",
+            usuario_contacto="uso@test.com",
+            descripcion="Test uso LLM",
+            categoria="Tecnologia",
+            estado=EstadoSolicitud.PENDIENTE,
+        )
+        db.add(solicitud)
+        db.commit()
+        return solicitud.id
+    finally:
+        db.close()
+
+
+def registros_de(solicitud_id: int) -> list:
+    db = SessionLocal()
+    try:
+        return db.query(UsoLLM).filter(UsoLLM.solicitud_id == solicitud_id).all()
+    finally:
+        db.close()
+
+
+def test_calcular_costo():
+    """Test: precio por millón de tokens, con búsqueda por prefijo del modelo."""
+    assert calcular_costo("gpt-4o-mini", 1_000_000, 1_000_000) == pytest.approx(0.75)
+    assert calcular_costo("gpt-4o", 1_000_000, 0) == pytest.approx(2.50)
+    # Versiones fechadas usan el precio del prefijo más largo
+    assert calcular_costo("gpt-4o-mini-2024-07-18", 1_000_000, 0) == pytest.approx(0.15)
+    assert calcular_costo("modelo-sin-precio", 1000, 1000) == 0
+
+
+def test_registrar_uso_con_cuenta(solicitud_id):
+    """Test: las llamadas de una cuenta quedan atribuidas a su solicitud."""
+    token = iniciar_cuenta(solicitud_id)
+    try:
+        registrar_uso("investigador", "gpt-4o-mini", respuesta_con_uso(), 120.0)
+    finally:
+        terminar_cuenta(token)
+
+    (registro,) = registros_de(solicitud_id)
+    assert registro.agente == "investigador"
+    assert registro.tokens_prompt == 1000
+    assert registro.tokens_respuesta == 200
+    assert registro.costo_usd == pytest.approx(calcular_costo("gpt-4o-mini", 1000, 200))
+
+
+def test_registrar_uso_sin_usage_no_guarda(solicitud_id):
+    """Test: respuestas sin `usage` (dobles de test, streaming) se ignoran."""
+    token = iniciar_cuenta(solicitud_id)
+    try:
+        registrar_uso("receptor", "gpt-4o-mini", SimpleNamespace(usage=None), 10.0)
+        registrar_uso("receptor", "gpt-4o-mini", "texto", 10.0)
+    finally:
+        terminar_cuenta(token)
+
+    assert registros_de(solicitud_id) == []
+
+
+def test_llamadas_previas_se_asignan_al_guardar_solicitud(solicitud_id):
+    """Test: lo consumido antes de existir la solicitud se le asigna después."""
+    token = iniciar_cuenta()
+    try:
+        registrar_uso("receptor", "gpt-4o-mini", respuesta_con_uso(), 50.0)
+        asignar_solicitud(solicitud_id)
+        registrar_uso("investigador", "gpt-4o-mini", respuesta_con_uso(), 50.0)
+    finally:
+        terminar_cuenta(token)
+
+    agentes = sorted(r.agente for r in registros_de(solicitud_id))
+    assert agentes == ["investigador", "receptor"]
+
+
+def test_despachador_registra_uso_por_agente(solicitud_id):
+    """Test: el despachador guarda el consumo con el agente que llamó."""
+    despachador = DespachadorLLM()
+    kwargs = {"model": "gpt-4o", "messages": [{"role": "user", "content": "hola"}]}
+
+    token = iniciar_cuenta(solicitud_id)
+    try:
+        despachador.ejecutar(lambda **_: respuesta_con_uso(), agente="comparador", **kwargs)
+    finally:
+        terminar_cuenta(token)
+
+    (registro,) = registros_de(solicitud_id)
+    assert (registro.agente, registro.modelo) == ("comparador", "gpt-4o")
+
+
+@pytest.mark.asyncio
+async def test_despachador_async_registra_uso(solicitud_id):
+    """Test: la variante async también registra (la cuenta viaja en el contexto)."""
+    despachador = DespachadorLLM()
+    kwargs = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hola"}]}
+
+    async def crear(**_):
+        return respuesta_con_uso(300, 30)
+
+    token = iniciar_cuenta(solicitud_id)
+    try:
+        await asyncio.gather(
+            *(despachador.ejecutar_async(crear, agente="generador", **kwargs) for _ in range(3))
+        )
+    finally:
+        terminar_cuenta(token)
+
+    assert [r.agente for r in registros_de(solicitud_id)] == ["generador"] * 3
+
+
+def test_resumen_por_agente_y_dia(solicitud_id):
+    """Test: totales agrupados, ordenados por costo."""
+    token = iniciar_cuenta(solicitud_id)
+    try:
+        registrar_uso("receptor", "gpt-4o-mini", respuesta_con_uso(1000, 100), 100.0)
+        registrar_uso("receptor", "gpt-4o-mini", respuesta_con_uso(1000, 100), 300.0)
+        registrar_uso("comparador", "gpt-4o", respuesta_con_uso(1000, 100), 500.0)
+    finally:
+        terminar_cuenta(token)
+
+    db = SessionLocal()
+    try:
+        por_agente = crud_uso_llm.resumen(db, agrupar_por="agente", solicitud_id=solicitud_id)
+        por_dia = crud_uso_llm.resumen(db, agrupar_por="dia", solicitud_id=solicitud_id)
+    finally:
+        db.close()
+
+    assert [g["grupo"] for g in por_agente] == ["comparador", "receptor"]
+    receptor = por_agente[1]
+    assert receptor["llamadas"] == 2
+    assert receptor["tokens_prompt"] == 2000
+    assert receptor["latencia_promedio_ms"] == pytest.approx(200.0)
+
+    assert len(por_dia) == 1
+    assert por_dia[0]["llamadas"] == 3
+
+
+def test_resumen_agrupacion_invalida():
+    """Test: agrupar por una columna desconocida es un error."""
+    with pytest.raises(ValueError):
+        resumir_uso(agrupar_por="proveedor")
+
+
+def test_endpoint_uso_llm(solicitud_id):
+    """Test: GET /uso-llm devuelve grupos y totales; 422 si la agrupación no existe."""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    token = iniciar_cuenta(solicitud_id)
+    try:
+        registrar_uso("investigador", "gpt-4o-mini", respuesta_con_uso(), 80.0)
+    finally:
+        terminar_cuenta(token)
+
+    cliente = TestClient(app)
+    respuesta = cliente.get(
+        "/uso-llm", params={"agrupar_por": "solicitud", "solicitud_id": solicitud_id}
+    )
+
+    assert respuesta.status_code == 200
+    datos = respuesta.json()
+    assert datos["grupos"][0]["grupo"] == solicitud_id
+    assert datos["total"]["llamadas"] == 1
+    assert datos["total"]["tokens_prompt"] == 1000
+
+    assert cliente.get("/uso-llm", params={"agrupar_por": "proveedor"}).status_code == 422